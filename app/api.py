@@ -0,0 +1,689 @@
+"""
+Health and Fitness Club Management System
+Asyncio HTTP/JSON API
+
+Serves the member, trainer and admin operations concurrently from one
+process.  Each request checks out an asyncpg connection for just the
+duration of its queries.  SQL text comes from queries.py; argument
+checks, query parameters, decisions and result records come from the
+pure helpers in services.py, so the handlers only do I/O and the API and
+the CLI agree on shape and business rules.  asyncpg prepares and caches
+each statement per connection itself; the query profiler and replica
+routing in database.py cover the psycopg2 callers only.
+
+Requires: pip install asyncpg aiohttp
+Run:      python api.py --port 8080
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import re
+import sys
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+import asyncpg
+from aiohttp import web
+
+import cache
+import changefeed
+import ingest
+import queries
+import services
+import slots
+from database import DB_CONFIG
+from services import (ConflictError, NotFoundError, ServiceError,
+                      ValidationError)
+
+# Changes buffered per /changes client before it is sent a reset instead
+CHANGE_BUFFER = 1000
+# Seconds between keep-alive comments on an idle /changes stream
+CHANGE_KEEPALIVE = 15
+# Readings per POST /metrics request, and the Retry-After (seconds) sent
+# when the ingest buffer is full
+INGEST_REQUEST_MAX = 1000
+INGEST_RETRY_AFTER = 1
+
+_PARAM = re.compile(r"%\((\w+)\)s")
+_compiled = {}
+
+_STATUS = {
+    ValidationError: 400,
+    services.AuthenticationError: 401,
+    NotFoundError: 404,
+    ConflictError: 409,
+}
+
+
+# ============================================================================
+# QUERY HELPERS
+# ============================================================================
+
+def compile_query(sql):
+    """Translate %(name)s placeholders to asyncpg's $n form.
+
+    Returns (text, names); repeated names share one positional slot and
+    pyformat's escaped %% becomes a plain %.
+    """
+    cached = _compiled.get(sql)
+    if cached:
+        return cached
+    names = []
+
+    def slot(match):
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    text = _PARAM.sub(slot, sql).replace("%%", "%")
+    cached = _compiled[sql] = (text, tuple(names))
+    return cached
+
+
+def _args(sql, params):
+    text, names = compile_query(sql)
+    return text, [params[n] for n in names]
+
+
+async def fetch(conn, sql, params=None):
+    text, args = _args(sql, params or {})
+    return await conn.fetch(text, *args)
+
+
+async def fetchrow(conn, sql, params=None):
+    text, args = _args(sql, params or {})
+    return await conn.fetchrow(text, *args)
+
+
+async def execute(conn, sql, params=None):
+    """Run a statement and return the affected row count"""
+    text, args = _args(sql, params or {})
+    status = await conn.execute(text, *args)
+    return int(status.rsplit(" ", 1)[-1])
+
+
+# ============================================================================
+# JSON HELPERS
+# ============================================================================
+
+def _default(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def respond(data, status=200):
+    if dataclasses.is_dataclass(data):
+        data = dataclasses.asdict(data)
+    elif isinstance(data, list):
+        data = [dataclasses.asdict(d) if dataclasses.is_dataclass(d) else d
+                for d in data]
+    return web.json_response(data, status=status,
+                             dumps=lambda d: json.dumps(d, default=_default))
+
+
+async def body(request, *required):
+    try:
+        data = await request.json()
+    except ValueError:
+        raise ValidationError("Request body must be JSON")
+    if not isinstance(data, dict):
+        raise ValidationError("Request body must be a JSON object")
+    missing = [k for k in required if data.get(k) in (None, "")]
+    if missing:
+        raise ValidationError(f"Missing field(s): {', '.join(missing)}")
+    return data
+
+
+def body_int(data, name, default=None):
+    value = data.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        return int(str(value))
+    except ValueError:
+        raise ValidationError(f"{name} must be an integer")
+
+
+def body_decimal(data, name, default=None):
+    value = data.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        number = None
+    if number is None or not number.is_finite():
+        raise ValidationError(f"{name} must be a number")
+    return number
+
+
+def query_int(request, name, default=None):
+    value = request.query.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError(f"{name} must be an integer")
+
+
+def page_query(request, kind):
+    """Keyset page parameters from ?cursor= and ?limit=; returns
+    (params, limit)"""
+    limit = query_int(request, "limit", services.PAGE_SIZE)
+    after = request.query.get("cursor") or None
+    return services.page_params(kind, after, limit), limit
+
+
+def path_id(request, name):
+    try:
+        return int(request.match_info[name])
+    except ValueError:
+        raise ValidationError(f"{name} must be an integer")
+
+
+@web.middleware
+async def error_middleware(request, handler):
+    try:
+        return await handler(request)
+    except ServiceError as e:
+        status = next((code for cls, code in _STATUS.items()
+                       if isinstance(e, cls)), 400)
+        return web.json_response({"error": str(e)}, status=status)
+    except asyncpg.ExclusionViolationError as e:
+        message = str(services.overlap_error(e.constraint_name))
+        return web.json_response({"error": message}, status=409)
+    except asyncpg.ForeignKeyViolationError as e:
+        message = str(services.missing_error(e.constraint_name))
+        return web.json_response({"error": message}, status=404)
+    except (asyncpg.CheckViolationError, asyncpg.DataError) as e:
+        return web.json_response({"error": str(e)}, status=400)
+
+
+# ============================================================================
+# MEMBER ENDPOINTS
+# ============================================================================
+
+async def get_dashboard(request):
+    member_id = path_id(request, "member_id")
+    params = {"member_id": member_id, "limit": 3}
+    async with request.app["pool"].acquire() as conn:
+        row = await fetchrow(conn, queries.MEMBER_DASHBOARD_SCREEN, params)
+    return respond(services.dashboard_record(member_id, row))
+
+
+async def get_trend(request):
+    """Chart data from the rollups (see services.health_trend)"""
+    sql, params = services.trend_query(
+        path_id(request, "member_id"),
+        query_int(request, "days", services.TREND_DAYS),
+        request.query.get("grain", "week"))
+    async with request.app["pool"].acquire() as conn:
+        rows = await fetch(conn, sql, params)
+    return respond([services.TrendPoint(*r) for r in rows])
+
+
+async def post_metrics(request):
+    """Queue wearable readings for the batch writer (see ingest.py).
+
+    Accepted means buffered, not yet written: readings are validated on
+    the writer thread and rejects are counted in /health, not reported
+    per request.  A full buffer answers 503 with Retry-After.
+    """
+    data = await body(request, "readings")
+    readings = data["readings"]
+    if not isinstance(readings, list):
+        raise ValidationError("readings must be a list")
+    if len(readings) > INGEST_REQUEST_MAX:
+        raise ValidationError(
+            f"At most {INGEST_REQUEST_MAX} readings per request")
+    try:
+        request.app["ingest"].submit_many(readings, timeout=0)
+    except ingest.IngestError as e:
+        return web.json_response(
+            {"error": str(e)}, status=503,
+            headers={"Retry-After": str(INGEST_RETRY_AFTER)})
+    return respond({"accepted": len(readings)}, status=202)
+
+
+async def get_member_search(request):
+    """Ranked member search (see services.search_members)"""
+    sql, params = services.search_query(
+        request.query.get("q", ""), query_int(request, "trainer_id"),
+        query_int(request, "limit", services.SEARCH_PAGE_SIZE),
+        query_int(request, "offset", 0))
+    # The pool's connections start with the search threshold set
+    async with request.app["pool"].acquire() as conn:
+        rows = await fetch(conn, sql, params)
+    return respond([services.MemberMatch(*r) for r in rows])
+
+
+async def post_session(request):
+    member_id = path_id(request, "member_id")
+    data = await body(request, "trainer_id", "session_date", "start_time",
+                      "end_time")
+    params = services.booking_params(
+        member_id, body_int(data, "trainer_id"),
+        services.parse_date(data["session_date"]),
+        services.parse_time(data["start_time"]),
+        services.parse_time(data["end_time"]))
+
+    # See services.book_personal_training
+    async with request.app["pool"].acquire() as conn:
+        async with conn.transaction():
+            await execute(conn, queries.TRAINER_BOOKING_LOCK, params)
+            for attempt in range(services.BOOKING_ATTEMPTS):
+                try:
+                    async with conn.transaction():
+                        row = await fetchrow(conn, queries.SESSION_BOOK,
+                                             params)
+                    break
+                except asyncpg.ExclusionViolationError as e:
+                    await asyncio.sleep(
+                        services.booking_backoff(e.constraint_name, attempt))
+            if not row:
+                raise services.booking_error(*await fetchrow(
+                    conn, queries.BOOKING_BLOCKERS, params))
+
+    return respond(services.Booking(
+        row[0], params["trainer_id"], row[1], params["session_date"],
+        params["start_time"], params["end_time"]), status=201)
+
+
+async def get_slots(request):
+    """Next bookable PT slots (see services.find_free_slots)"""
+    today = date.today()
+    first_day = services.parse_date(request.query.get("from", str(today)))
+    last_day = services.parse_date(
+        request.query.get("to", str(first_day + timedelta(days=30))))
+    limit = query_int(request, "limit", 10)
+    weeks, length, step, not_before = services.slot_search(
+        first_day, last_day, query_int(request, "minutes", 60),
+        query_int(request, "step", 30), limit)
+
+    trainer_id = query_int(request, "trainer_id")
+    specialization = request.query.get("specialization") or None
+    room_id = query_int(request, "room_id")
+
+    found = []
+    async with request.app["pool"].acquire() as conn:
+        async def load_windows():
+            return slots.group_windows(await fetch(
+                conn, queries.SLOT_TRAINER_WINDOWS,
+                {"trainer_id": trainer_id, "specialization": specialization}))
+
+        async def load_rooms():
+            return tuple(r[0] for r in await fetch(
+                conn, queries.TRAINING_ROOMS, {"room_id": None}))
+
+        names, windows = await services.availability_cache.get_async(
+            ("windows", trainer_id, specialization), load_windows)
+        rooms = [r for r in await services.room_cache.get_async(
+                     "training", load_rooms)
+                 if room_id is None or r == room_id]
+        if not names or not rooms:
+            return respond(found)
+
+        for week in weeks:
+            busy = await fetch(conn, queries.SLOT_BUSY_PERIODS,
+                               services.busy_params(week, names, rooms))
+            found.extend(islice(services.week_free_slots(
+                week, busy, names, windows, rooms, length, step, not_before),
+                limit - len(found)))
+            if len(found) == limit:
+                break
+    return respond(found)
+
+
+async def get_classes(request):
+    params, limit = page_query(request, "open_classes")
+
+    async def load():
+        async with request.app["pool"].acquire() as conn:
+            rows = await fetch(conn, queries.OPEN_CLASSES, params)
+        return services.build_page("open_classes", rows, limit,
+                                   services.ClassListing)
+    key = (request.query.get("cursor") or None, limit)
+    return respond(await services.class_cache.get_async(key, load))
+
+
+async def post_registration(request):
+    class_id = path_id(request, "class_id")
+    data = await body(request, "member_id")
+    params = {"member_id": body_int(data, "member_id"), "class_id": class_id}
+    async with request.app["pool"].acquire() as conn:
+        try:
+            row = await fetchrow(conn, queries.CLASS_SEAT_CLAIM, params)
+        except asyncpg.NoDataFoundError:
+            raise NotFoundError("Class not found")
+        except asyncpg.UniqueViolationError:
+            raise ConflictError("Already registered for this class!")
+        except asyncpg.ForeignKeyViolationError:
+            raise NotFoundError("Member not found")
+    services.class_cache.invalidate()
+    return respond(services.SeatClaim(row[0], class_id, row[1], row[2]),
+                   status=201)
+
+
+async def delete_registration(request):
+    params = {"class_id": path_id(request, "class_id"),
+              "member_id": path_id(request, "member_id")}
+    async with request.app["pool"].acquire() as conn:
+        async with conn.transaction():
+            await fetchrow(conn, queries.CLASS_LOCK, params)
+            row = await fetchrow(conn, queries.CLASS_REGISTRATION_CANCEL,
+                                 params)
+            if not row:
+                raise NotFoundError("No active registration for this class")
+    services.class_cache.invalidate()
+    return respond({"registration_id": row[0], "status": "Cancelled"})
+
+
+# ============================================================================
+# TRAINER ENDPOINTS
+# ============================================================================
+
+async def get_trainers(request):
+    async def load():
+        async with request.app["pool"].acquire() as conn:
+            rows = await fetch(conn, queries.TRAINER_LIST)
+        return tuple(services.Trainer(*r) for r in rows)
+    return respond(list(await services.trainer_cache.get_async("all", load)))
+
+
+async def get_trainer_schedule(request):
+    """First page of sessions and classes; /sessions and /classes page on"""
+    limit = query_int(request, "limit", services.PAGE_SIZE)
+    params = services.schedule_params(path_id(request, "trainer_id"), limit)
+    async with request.app["pool"].acquire() as conn:
+        row = await fetchrow(conn, queries.TRAINER_SCHEDULE_SCREEN, params)
+    return respond(services.schedule_record(row, limit))
+
+
+async def get_trainer_sessions(request):
+    params, limit = page_query(request, "trainer_sessions")
+    params["trainer_id"] = path_id(request, "trainer_id")
+    async with request.app["pool"].acquire() as conn:
+        rows = await fetch(conn, queries.TRAINER_UPCOMING_SESSIONS, params)
+    return respond(services.build_page("trainer_sessions", rows, limit,
+                                       services.TrainerSession))
+
+
+async def get_trainer_classes(request):
+    params, limit = page_query(request, "trainer_classes")
+    params["trainer_id"] = path_id(request, "trainer_id")
+    async with request.app["pool"].acquire() as conn:
+        rows = await fetch(conn, queries.TRAINER_UPCOMING_CLASSES, params)
+    return respond(services.build_page("trainer_classes", rows, limit,
+                                       services.TrainerClass))
+
+
+async def post_availability(request):
+    trainer_id = path_id(request, "trainer_id")
+    data = await body(request, "day_of_week", "start_time", "end_time")
+    params = services.availability_params(
+        trainer_id, data["day_of_week"],
+        services.parse_time(data["start_time"]),
+        services.parse_time(data["end_time"]))
+
+    async with request.app["pool"].acquire() as conn:
+        row = await fetchrow(conn, queries.AVAILABILITY_INSERT, params)
+    services.availability_cache.invalidate()
+    return respond({"availability_id": row[0]}, status=201)
+
+
+# ============================================================================
+# ADMIN ENDPOINTS
+# ============================================================================
+
+async def get_equipment(request):
+    params, limit = page_query(request, "equipment")
+
+    async def load():
+        async with request.app["pool"].acquire() as conn:
+            rows = await fetch(conn, queries.EQUIPMENT_LIST, params)
+        return services.build_page("equipment", rows, limit,
+                                   services.EquipmentItem)
+    key = (request.query.get("cursor") or None, limit)
+    return respond(await services.equipment_cache.get_async(key, load))
+
+
+async def patch_equipment(request):
+    equipment_id = path_id(request, "equipment_id")
+    data = await body(request, "status")
+    if data["status"] not in services.EQUIPMENT_STATUSES:
+        raise ValidationError(f"Invalid status '{data['status']}'")
+    async with request.app["pool"].acquire() as conn:
+        count = await execute(conn, queries.EQUIPMENT_UPDATE_STATUS, {
+            "equipment_id": equipment_id, "status": data["status"],
+            "notes": data.get("notes") or None,
+        })
+    if not count:
+        raise NotFoundError("Equipment not found")
+    services.equipment_cache.invalidate()
+    return respond({"equipment_id": equipment_id, "status": data["status"]})
+
+
+async def get_bills(request):
+    params, limit = page_query(request, "member_bills")
+    params["member_id"] = path_id(request, "member_id")
+    async with request.app["pool"].acquire() as conn:
+        rows = await fetch(conn, queries.MEMBER_BILLS, params)
+    return respond(services.build_page("member_bills", rows, limit,
+                                       services.BillRecord))
+
+
+async def post_bill(request):
+    member_id = path_id(request, "member_id")
+    data = await body(request, "description", "amount", "due_days")
+    params = services.bill_params(member_id, data["description"],
+                                  body_decimal(data, "amount"),
+                                  body_int(data, "due_days"))
+    async with request.app["pool"].acquire() as conn:
+        try:
+            row = await fetchrow(conn, queries.BILL_INSERT, params)
+        except asyncpg.ForeignKeyViolationError:
+            raise NotFoundError("Member not found")
+    return respond({"bill_id": row[0]}, status=201)
+
+
+async def post_payment(request):
+    bill_id = path_id(request, "bill_id")
+    data = await body(request, "amount", "method")
+    params = services.payment_params(bill_id, body_decimal(data, "amount"),
+                                     data["method"], data.get("reference"))
+
+    async with request.app["pool"].acquire() as conn:
+        async with conn.transaction():
+            remaining = services.bill_remaining(
+                await fetchrow(conn, queries.BILL_BALANCE, params))
+            row = await fetchrow(conn, queries.PAYMENT_INSERT, params)
+    receipt = services.PaymentReceipt(row[0], bill_id, params["amount"],
+                                      remaining)
+    return respond(dict(dataclasses.asdict(receipt),
+                        overpayment=receipt.overpayment), status=201)
+
+
+async def get_health(request):
+    pool = request.app["pool"]
+    return respond({
+        "size": pool.get_size(),
+        "idle": pool.get_idle_size(),
+        "in_use": pool.get_size() - pool.get_idle_size(),
+        "max_size": pool.get_max_size(),
+        "cache": cache.stats(),
+        "changes": request.app["feed"].stats(),
+        "ingest": request.app["ingest"].stats(),
+    })
+
+
+async def get_changes(request):
+    """Live change stream (server-sent events), one event per change.
+
+    ``tables`` limits it to some tables (comma-separated, default all).
+    A client that falls CHANGE_BUFFER changes behind gets a single reset
+    event (op "R", keys null) and should reload what it shows.
+    """
+    tables = [t.strip().lower()
+              for t in request.query.get("tables", changefeed.ALL_TABLES).split(",")
+              if t.strip()]
+    queue = asyncio.Queue(CHANGE_BUFFER)
+    overflowed = asyncio.Event()
+
+    def enqueue(change):
+        try:
+            queue.put_nowait(change)
+        except asyncio.QueueFull:
+            overflowed.set()
+
+    feed = request.app["feed"]
+    for table in tables:
+        feed.subscribe(table, enqueue)
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream",
+                                           "Cache-Control": "no-cache"})
+    try:
+        await response.prepare(request)
+        while True:
+            if overflowed.is_set():
+                while not queue.empty():
+                    queue.get_nowait()
+                overflowed.clear()
+                change = changefeed.Change(changefeed.ALL_TABLES,
+                                           changefeed.RESET, None)
+            else:
+                try:
+                    change = await asyncio.wait_for(queue.get(),
+                                                    CHANGE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    await response.write(b": keep-alive\n\n")
+                    continue
+            data = json.dumps({
+                "table": change.table, "op": change.op,
+                "keys": None if change.keys is None else sorted(change.keys)})
+            await response.write(f"event: change\ndata: {data}\n\n".encode())
+    finally:
+        for table in tables:
+            feed.unsubscribe(table, enqueue)
+
+
+# ============================================================================
+# APPLICATION
+# ============================================================================
+
+async def listen_changes(feed, config):
+    """Feed ``feed`` from a dedicated LISTEN connection, reconnecting"""
+    backoff = 0.1
+    connected_before = False
+    while True:
+        conn = None
+        try:
+            conn = await asyncpg.connect(**config)
+            closed = asyncio.Event()
+            conn.add_termination_listener(lambda c: closed.set())
+            await conn.add_listener(
+                changefeed.CHANNEL,
+                lambda c, pid, channel, payload: feed.dispatch(payload))
+            feed.listening = True
+            if connected_before:
+                feed.reset()
+            connected_before = True
+            backoff = 0.1
+            await closed.wait()
+        except (OSError, asyncpg.PostgresError,
+                asyncpg.InterfaceError) as e:
+            print(f"Change feed disconnected, retrying: {e}".strip(),
+                  file=sys.stderr)
+        finally:
+            feed.listening = False
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, feed.max_backoff)
+
+
+def create_app(min_size=5, max_size=50, **connect_kwargs):
+    """Build the aiohttp application with an asyncpg pool"""
+    config = dict(DB_CONFIG, **connect_kwargs)
+
+    async def pool_context(app):
+        # Member search's trigram cut-off for the whole session, so a
+        # search needs no transaction to set it per query
+        app["pool"] = await asyncpg.create_pool(
+            min_size=min_size, max_size=max_size,
+            server_settings={"pg_trgm.word_similarity_threshold":
+                             str(services.SEARCH_THRESHOLD)},
+            **config)
+        yield
+        await app["pool"].close()
+
+    async def feed_context(app):
+        app["feed"] = changefeed.ChangeFeed(**connect_kwargs)
+        services.follow_changes(app["feed"])
+        listener = asyncio.ensure_future(listen_changes(app["feed"], config))
+        yield
+        listener.cancel()
+        try:
+            await listener
+        except asyncio.CancelledError:
+            pass
+
+    async def ingest_context(app):
+        app["ingest"] = ingest.MetricIngester(**connect_kwargs)
+        app["ingest"].start()
+        yield
+        # Write what is still buffered before shutting down
+        await asyncio.get_running_loop().run_in_executor(
+            None, app["ingest"].stop)
+
+    app = web.Application(middlewares=[error_middleware])
+    app.cleanup_ctx.append(pool_context)
+    app.cleanup_ctx.append(feed_context)
+    app.cleanup_ctx.append(ingest_context)
+    app.add_routes([
+        web.get("/health", get_health),
+        web.get("/changes", get_changes),
+        web.get("/members/search", get_member_search),
+        web.post("/metrics", post_metrics),
+        web.get("/members/{member_id}/dashboard", get_dashboard),
+        web.get("/members/{member_id}/trend", get_trend),
+        web.post("/members/{member_id}/sessions", post_session),
+        web.get("/members/{member_id}/bills", get_bills),
+        web.post("/members/{member_id}/bills", post_bill),
+        web.get("/slots", get_slots),
+        web.get("/classes", get_classes),
+        web.post("/classes/{class_id}/registrations", post_registration),
+        web.delete("/classes/{class_id}/registrations/{member_id}",
+                   delete_registration),
+        web.get("/trainers", get_trainers),
+        web.get("/trainers/{trainer_id}/schedule", get_trainer_schedule),
+        web.get("/trainers/{trainer_id}/sessions", get_trainer_sessions),
+        web.get("/trainers/{trainer_id}/classes", get_trainer_classes),
+        web.post("/trainers/{trainer_id}/availability", post_availability),
+        web.get("/equipment", get_equipment),
+        web.patch("/equipment/{equipment_id}", patch_equipment),
+        web.post("/bills/{bill_id}/payments", post_payment),
+    ])
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fitness club JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--min-pool", type=int, default=5)
+    parser.add_argument("--max-pool", type=int, default=50)
+    args = parser.parse_args()
+
+    web.run_app(create_app(args.min_pool, args.max_pool),
+                host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
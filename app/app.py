@@ -1,59 +1,45 @@
 """
 Health and Fitness Club Management System
 Main Application File
+
+Command-line interface.  All business logic lives in services.py; the
+functions here only prompt, call the service and print the result.
 """
 
-import psycopg2
-from psycopg2 import pool
-from datetime import datetime, date, time
+import argparse
 import sys
+from datetime import date, timedelta
+from decimal import Decimal
 
+import audit
+import datagen
+import services
+from changefeed import ChangeFeed
+from database import MAX_REPLICA_LAG, db
+from profiler import QueryProfiler
+from services import ServiceError
 
-class Database:
-    """Database connection manager"""
-
-    def __init__(self):
-        self.connection_pool = None
-
-    def initialize_pool(self, minconn=1, maxconn=10):
-        """Initialize connection pool"""
-        try:
-            self.connection_pool = psycopg2.pool.SimpleConnectionPool(
-                minconn,
-                maxconn,
-                host="localhost",
-                database="fitness_club",
-                user="postgres",
-                password="",  # Change this
-                port="5432"
-            )
-            print("Database connection pool created successfully")
-        except Exception as e:
-            print(f"Error creating connection pool: {e}")
-            sys.exit(1)
-
-    def get_connection(self):
-        """Get connection from pool"""
-        return self.connection_pool.getconn()
-
-    def return_connection(self, connection):
-        """Return connection to pool"""
-        self.connection_pool.putconn(connection)
-
-    def close_all_connections(self):
-        """Close all connections"""
-        if self.connection_pool:
-            self.connection_pool.closeall()
+# ============================================================================
+# HELPERS
+# ============================================================================
 
+def print_pages(page, more, show):
+    """Print ``page`` with ``show(item)``, then further pages from
+    ``more(next_cursor)`` for as long as the user asks for them"""
+    while True:
+        for item in page:
+            show(item)
+        if not page.next_cursor:
+            return
+        if input("  (n = next page, Enter = continue): ").strip().lower() != 'n':
+            return
+        page = more(page.next_cursor)
 
-# Global database instance
-db = Database()
 
 # ============================================================================
 # MEMBER FUNCTIONS (4 operations required)
 # ============================================================================
 
-
 def member_registration():
     """Member Function 1: User Registration"""
     print("\n=== Member Registration ===")
@@ -67,35 +53,13 @@ def member_registration():
     phone = input("Phone: ").strip()
     address = input("Address: ").strip()
 
-    conn = db.get_connection()
     try:
-        cursor = conn.cursor()
-
-        # Check if email already exists
-        cursor.execute("SELECT email FROM Member WHERE email = %s", (email,))
-        if cursor.fetchone():
-            print("❌ Error: Email already registered!")
-            return
-
-        # Insert new member
-        cursor.execute("""
-            INSERT INTO Member (email, password, first_name, last_name, date_of_birth, 
-                               gender, phone, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING member_id
-        """, (email, password, first_name, last_name, dob, gender, phone, address))
-
-        member_id = cursor.fetchone()[0]
-        conn.commit()
-
+        member_id = services.register_member(
+            email, password, first_name, last_name, services.parse_date(dob),
+            gender or None, phone or None, address or None)
         print(f"✓ Registration successful! Member ID: {member_id}")
-
     except Exception as e:
-        conn.rollback()
         print(f"❌ Error: {e}")
-    finally:
-        cursor.close()
-        db.return_connection(conn)
 
 
 def profile_management(member_id):
@@ -104,13 +68,11 @@ def profile_management(member_id):
     print("1. Update Personal Information")
     print("2. Add/Update Fitness Goal")
     print("3. Add Health Metric")
+    print("4. View Progress Trend")
 
     choice = input("\nSelect option: ").strip()
 
-    conn = db.get_connection()
     try:
-        cursor = conn.cursor()
-
         if choice == '1':
             # Update personal information
             print("\n--- Update Personal Information ---")
@@ -119,22 +81,7 @@ def profile_management(member_id):
             phone = input("New Phone: ").strip()
             address = input("New Address: ").strip()
 
-            updates = []
-            params = []
-
-            if phone:
-                updates.append("phone = %s")
-                params.append(phone)
-            if address:
-                updates.append("address = %s")
-                params.append(address)
-
-            if updates:
-                params.append(member_id)
-                query = f"UPDATE Member SET {
-                    ', '.join(updates)} WHERE member_id = %s"
-                cursor.execute(query, params)
-                conn.commit()
+            if services.update_member_contact(member_id, phone, address):
                 print("✓ Profile updated successfully!")
             else:
                 print("No changes made.")
@@ -148,13 +95,8 @@ def profile_management(member_id):
             current = float(input("Current Value: "))
             target_date = input("Target Date (YYYY-MM-DD): ").strip()
 
-            cursor.execute("""
-                INSERT INTO FitnessGoal (member_id, goal_type, target_value, 
-                                        current_value, target_date, status)
-                VALUES (%s, %s, %s, %s, %s, 'Active')
-            """, (member_id, goal_type, target, current, target_date))
-
-            conn.commit()
+            services.add_fitness_goal(member_id, goal_type, target, current,
+                                      services.parse_date(target_date))
             print("✓ Fitness goal added successfully!")
 
         elif choice == '3':
@@ -167,281 +109,156 @@ def profile_management(member_id):
             body_fat = input("Body Fat % (optional): ").strip()
             notes = input("Notes (optional): ").strip()
 
-            cursor.execute("""
-                INSERT INTO HealthMetric (member_id, weight, height, heart_rate, 
-                                         blood_pressure, body_fat_percentage, notes)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (member_id,
-                  float(weight) if weight else None,
-                  float(height) if height else None,
-                  int(heart_rate) if heart_rate else None,
-                  blood_pressure if blood_pressure else None,
-                  float(body_fat) if body_fat else None,
-                  notes if notes else None))
-
-            conn.commit()
+            services.add_health_metric(
+                member_id,
+                weight=float(weight) if weight else None,
+                height=float(height) if height else None,
+                heart_rate=int(heart_rate) if heart_rate else None,
+                blood_pressure=blood_pressure if blood_pressure else None,
+                body_fat_percentage=float(body_fat) if body_fat else None,
+                notes=notes if notes else None)
             print("✓ Health metric recorded successfully!")
 
+        elif choice == '4':
+            # Weekly averages over the last year
+            trend = services.health_trend(member_id)
+            if not trend:
+                print("No health metrics recorded in the last year.")
+                return
+            print(f"\n📈 Weekly Progress ({trend[0].period} to today):")
+            print(f"  {'Week of':<10} {'Readings':>8} {'Weight':>8} "
+                  f"{'Range':>15} {'Heart':>6} {'Body Fat':>9}")
+            for p in trend:
+                weight = f"{p.avg_weight:.1f}" if p.avg_weight else "-"
+                spread = (f"{p.min_weight:.1f}-{p.max_weight:.1f}"
+                          if p.min_weight else "-")
+                heart = f"{p.avg_heart_rate:.0f}" if p.avg_heart_rate else "-"
+                fat = f"{p.avg_body_fat:.1f}%" if p.avg_body_fat else "-"
+                print(f"  {p.period!s:<10} {p.readings:>8} {weight:>8} "
+                      f"{spread:>15} {heart:>6} {fat:>9}")
+
         else:
             print("Invalid option")
 
     except Exception as e:
-        conn.rollback()
         print(f"❌ Error: {e}")
-    finally:
-        cursor.close()
-        db.return_connection(conn)
 
 
 def member_dashboard(member_id):
     """Member Function 3: Dashboard - View personalized summary"""
     print("\n=== Member Dashboard ===")
 
-    conn = db.get_connection()
     try:
-        cursor = conn.cursor()
-
-        # Use the view we created
-        cursor.execute("""
-            SELECT first_name, last_name, email, latest_weight, latest_heart_rate,
-                   last_metric_date, active_goals, upcoming_sessions, 
-                   classes_attended, pending_balance
-            FROM MemberDashboard
-            WHERE member_id = %s
-        """, (member_id,))
-
-        row = cursor.fetchone()
-        if row:
-            print(f"\n👤 {row[0]} {row[1]} ({row[2]})")
-            print("=" * 60)
-            print("\n📊 LATEST HEALTH METRICS:")
-            print(f"  Weight: {row[3] if row[3] else 'N/A'} lbs")
-            print(f"  Heart Rate: {row[4] if row[4] else 'N/A'} bpm")
-            print(f"  Last Updated: {row[5] if row[5] else 'Never'}")
-
-            print("\n🎯 FITNESS GOALS:")
-            print(f"  Active Goals: {row[6]}")
-
-            # Show goal details
-            cursor.execute("""
-                SELECT goal_type, current_value, target_value, target_date
-                FROM FitnessGoal
-                WHERE member_id = %s AND status = 'Active'
-            """, (member_id,))
-
-            for goal in cursor.fetchall():
-                progress = (goal[1] / goal[2] * 100) if goal[2] else 0
-                print(f"  - {goal[0]}: {goal[1]
-                                        }/{goal[2]} (Target: {goal[3]})")
-
-            print("\n📅 SCHEDULE:")
-            print(f"  Upcoming PT Sessions: {row[7]}")
-            print(f"  Classes Attended: {row[8]}")
-
-            # Show upcoming sessions
-            cursor.execute("""
-                SELECT session_date, start_time, end_time, 
-                       t.first_name || ' ' || t.last_name as trainer_name,
-                       r.room_name
-                FROM PersonalTrainingSession pts
-                JOIN Trainer t ON pts.trainer_id = t.trainer_id
-                JOIN Room r ON pts.room_id = r.room_id
-                WHERE pts.member_id = %s 
-                  AND pts.session_date >= CURRENT_DATE 
-                  AND pts.status = 'Scheduled'
-                ORDER BY session_date, start_time
-                LIMIT 3
-            """, (member_id,))
-
-            sessions = cursor.fetchall()
-            if sessions:
-                print("\n  Next Sessions:")
-                for s in sessions:
-                    print(f"    • {s[0]} at {s[1]} with {s[3]} ({s[4]})")
-
-            print("\n💰 BILLING:")
-            print(f"  Pending Balance: ${row[9]:.2f}")
-        else:
-            print("Member not found")
-
+        dash = services.member_dashboard(member_id)
+    except services.NotFoundError:
+        print("Member not found")
+        return
     except Exception as e:
         print(f"❌ Error: {e}")
-    finally:
-        cursor.close()
-        db.return_connection(conn)
+        return
+
+    print(f"\n👤 {dash.first_name} {dash.last_name} ({dash.email})")
+    print("=" * 60)
+    print("\n📊 LATEST HEALTH METRICS:")
+    print(f"  Weight: {dash.latest_weight or 'N/A'} lbs")
+    print(f"  Heart Rate: {dash.latest_heart_rate or 'N/A'} bpm")
+    print(f"  Last Updated: {dash.last_metric_date or 'Never'}")
+
+    print("\n🎯 FITNESS GOALS:")
+    print(f"  Active Goals: {dash.active_goals}")
+    for goal in dash.goals:
+        print(f"  - {goal.goal_type}: {goal.current_value}/"
+              f"{goal.target_value} (Target: {goal.target_date})")
+
+    print("\n📅 SCHEDULE:")
+    print(f"  Upcoming PT Sessions: {dash.upcoming_sessions}")
+    print(f"  Classes Attended: {dash.classes_attended}")
+    if dash.next_sessions:
+        print("\n  Next Sessions:")
+        for s in dash.next_sessions:
+            print(f"    • {s.session_date} at {s.start_time} with "
+                  f"{s.trainer_name} ({s.room_name})")
+
+    print("\n💰 BILLING:")
+    print(f"  Pending Balance: ${dash.pending_balance:.2f}")
 
 
 def schedule_personal_training(member_id):
     """Member Function 4: Schedule Personal Training Session"""
     print("\n=== Schedule Personal Training Session ===")
 
-    conn = db.get_connection()
     try:
-        cursor = conn.cursor()
-
         # Show available trainers
-        cursor.execute("""
-            SELECT trainer_id, first_name, last_name, specialization
-            FROM Trainer
-            ORDER BY trainer_id
-        """)
-
-        trainers = cursor.fetchall()
         print("\nAvailable Trainers:")
-        for t in trainers:
-            print(f"  {t[0]}. {t[1]} {t[2]} - {t[3]}")
+        for t in services.list_trainers():
+            print(f"  {t.trainer_id}. {t.first_name} {t.last_name} - "
+                  f"{t.specialization}")
 
         trainer_id = int(input("\nSelect Trainer ID: "))
-        session_date = input("Session Date (YYYY-MM-DD): ").strip()
-        start_time = input("Start Time (HH:MM): ").strip()
-        end_time = input("End Time (HH:MM): ").strip()
-
-        # Check trainer availability
-        day_of_week = datetime.strptime(
-            session_date, '%Y-%m-%d').strftime('%A')
-
-        cursor.execute("""
-            SELECT availability_id
-            FROM TrainerAvailability
-            WHERE trainer_id = %s 
-              AND day_of_week = %s
-              AND start_time <= %s
-              AND end_time >= %s
-        """, (trainer_id, day_of_week, start_time, end_time))
-
-        if not cursor.fetchone():
-            print("❌ Error: Trainer not available at this time!")
-            return
-
-        # Check for trainer conflicts
-        cursor.execute("""
-            SELECT session_id FROM PersonalTrainingSession
-            WHERE trainer_id = %s 
-              AND session_date = %s
-              AND status = 'Scheduled'
-              AND (
-                  (start_time <= %s AND end_time > %s) OR
-                  (start_time < %s AND end_time >= %s) OR
-                  (start_time >= %s AND end_time <= %s)
-              )
-        """, (trainer_id, session_date, start_time, start_time,
-              end_time, end_time, start_time, end_time))
-
-        if cursor.fetchone():
-            print("❌ Error: Trainer already has a session at this time!")
-            return
-
-        # Find available room
-        cursor.execute("""
-            SELECT room_id FROM Room
-            WHERE room_type = 'Personal Training'
-              AND room_id NOT IN (
-                  SELECT room_id FROM PersonalTrainingSession
-                  WHERE session_date = %s
-                    AND status = 'Scheduled'
-                    AND (
-                        (start_time <= %s AND end_time > %s) OR
-                        (start_time < %s AND end_time >= %s) OR
-                        (start_time >= %s AND end_time <= %s)
-                    )
-              )
-            LIMIT 1
-        """, (session_date, start_time, start_time, end_time, end_time,
-              start_time, end_time))
-
-        room = cursor.fetchone()
-        if not room:
-            print("❌ Error: No rooms available at this time!")
-            return
-
-        room_id = room[0]
 
-        # Book the session
-        cursor.execute("""
-            INSERT INTO PersonalTrainingSession 
-                (member_id, trainer_id, room_id, session_date, start_time, end_time, status)
-            VALUES (%s, %s, %s, %s, %s, %s, 'Scheduled')
-            RETURNING session_id
-        """, (member_id, trainer_id, room_id, session_date, start_time, end_time))
-
-        session_id = cursor.fetchone()[0]
-        conn.commit()
-
-        print(f"✓ Session booked successfully! Session ID: {session_id}")
-        print(f"  Room: {room_id}, Date: {
-              session_date}, Time: {start_time}-{end_time}")
+        # Suggest the trainer's next open slots so the member need not guess
+        today = date.today()
+        free = services.find_free_slots(today, today + timedelta(days=30),
+                                        limit=5, trainer_id=trainer_id)
+        if free:
+            print("\nNext open 1-hour slots:")
+            for slot in free:
+                print(f"  {slot.session_date} "
+                      f"{slot.start_time:%H:%M}-{slot.end_time:%H:%M} "
+                      f"(Room {slot.room_id})")
+
+        session_date = services.parse_date(
+            input("Session Date (YYYY-MM-DD): "))
+        start_time = services.parse_time(input("Start Time (HH:MM): "))
+        end_time = services.parse_time(input("End Time (HH:MM): "))
+
+        booking = services.book_personal_training(
+            member_id, trainer_id, session_date, start_time, end_time)
+
+        print(f"✓ Session booked successfully! Session ID: {booking.session_id}")
+        print(f"  Room: {booking.room_id}, Date: {booking.session_date}, "
+              f"Time: {booking.start_time:%H:%M}-{booking.end_time:%H:%M}")
 
     except Exception as e:
-        conn.rollback()
         print(f"❌ Error: {e}")
-    finally:
-        cursor.close()
-        db.return_connection(conn)
 
 
 def register_for_class(member_id):
     """Member Function (Bonus): Register for Group Class"""
     print("\n=== Register for Group Class ===")
 
-    conn = db.get_connection()
     try:
-        cursor = conn.cursor()
-
         # Show upcoming classes with availability
-        cursor.execute("""
-            SELECT c.class_id, c.class_name, c.schedule_date, c.start_time, c.end_time,
-                   t.first_name || ' ' || t.last_name as trainer_name,
-                   c.current_enrollment, c.capacity,
-                   (c.capacity - c.current_enrollment) as spots_left
-            FROM Class c
-            JOIN Trainer t ON c.trainer_id = t.trainer_id
-            WHERE c.schedule_date >= CURRENT_DATE
-              AND c.status = 'Scheduled'
-              AND c.current_enrollment < c.capacity
-            ORDER BY c.schedule_date, c.start_time
-        """)
-
-        classes = cursor.fetchall()
+        classes = services.list_open_classes()
         if not classes:
             print("No classes available for registration.")
             return
 
+        def show(cls):
+            print(f"  {cls.class_id}. {cls.class_name} - "
+                  f"{cls.schedule_date} at {cls.start_time}")
+            if cls.spots_left > 0:
+                print(f"      Trainer: {cls.trainer_name}, "
+                      f"Spots: {cls.spots_left}/{cls.capacity} available")
+            else:
+                print(f"      Trainer: {cls.trainer_name}, "
+                      f"Full - {cls.waitlisted} on waitlist")
+
         print("\nAvailable Classes:")
-        for cls in classes:
-            print(f"  {cls[0]}. {cls[1]} - {cls[2]} at {cls[3]}")
-            print(f"      Trainer: {cls[5]}, Spots: {
-                  cls[8]}/{cls[7]} available")
+        print_pages(classes, services.list_open_classes, show)
 
         class_id = int(input("\nSelect Class ID: "))
 
-        # Check if already registered
-        cursor.execute("""
-            SELECT registration_id FROM ClassRegistration
-            WHERE member_id = %s AND class_id = %s
-        """, (member_id, class_id))
-
-        if cursor.fetchone():
-            print("❌ Error: Already registered for this class!")
-            return
-
-        # Register for class (trigger will update enrollment count)
-        cursor.execute("""
-            INSERT INTO ClassRegistration (member_id, class_id, status)
-            VALUES (%s, %s, 'Registered')
-            RETURNING registration_id
-        """, (member_id, class_id))
-
-        reg_id = cursor.fetchone()[0]
-        conn.commit()
-
-        print(f"✓ Successfully registered! Registration ID: {reg_id}")
+        claim = services.register_for_class(member_id, class_id)
+        if claim.waitlisted:
+            print(f"✓ Class is full - you are #{claim.waitlist_position} "
+                  f"on the waitlist and will be enrolled if a seat opens.")
+        else:
+            print(f"✓ Successfully registered! "
+                  f"Registration ID: {claim.registration_id}")
 
     except Exception as e:
-        conn.rollback()
         print(f"❌ Error: {e}")
-    finally:
-        cursor.close()
-        db.return_connection(conn)
 
 
 # ============================================================================
@@ -456,212 +273,130 @@ def set_trainer_availability(trainer_id):
     start_time = input("Start Time (HH:MM): ").strip()
     end_time = input("End Time (HH:MM): ").strip()
 
-    conn = db.get_connection()
     try:
-        cursor = conn.cursor()
-
-        # Check for overlapping availability
-        cursor.execute("""
-            SELECT availability_id FROM TrainerAvailability
-            WHERE trainer_id = %s 
-              AND day_of_week = %s
-              AND (
-                  (start_time <= %s AND end_time > %s) OR
-                  (start_time < %s AND end_time >= %s) OR
-                  (start_time >= %s AND end_time <= %s)
-              )
-        """, (trainer_id, day_of_week, start_time, start_time,
-              end_time, end_time, start_time, end_time))
-
-        if cursor.fetchone():
-            print("❌ Error: Overlapping availability exists!")
-            return
-
-        # Insert availability
-        cursor.execute("""
-            INSERT INTO TrainerAvailability (trainer_id, day_of_week, start_time, end_time)
-            VALUES (%s, %s, %s, %s)
-            RETURNING availability_id
-        """, (trainer_id, day_of_week, start_time, end_time))
-
-        avail_id = cursor.fetchone()[0]
-        conn.commit()
-
+        avail_id = services.set_trainer_availability(
+            trainer_id, day_of_week.capitalize(),
+            services.parse_time(start_time), services.parse_time(end_time))
         print(f"✓ Availability set successfully! ID: {avail_id}")
-
     except Exception as e:
-        conn.rollback()
         print(f"❌ Error: {e}")
-    finally:
-        cursor.close()
-        db.return_connection(conn)
 
 
 def view_trainer_schedule(trainer_id):
     """Trainer Function 2: View Assigned Sessions and Classes"""
     print("\n=== Trainer Schedule ===")
 
-    conn = db.get_connection()
     try:
-        cursor = conn.cursor()
+        schedule = services.trainer_schedule(trainer_id)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return
+
+    def show_session(s):
+        print(f"  • {s.session_date} {s.start_time}-{s.end_time}: "
+              f"{s.member_name} in {s.room_name}")
+        if s.notes:
+            print(f"    Notes: {s.notes}")
+
+    def show_class(cls):
+        print(f"  • {cls.class_name}: {cls.schedule_date} "
+              f"{cls.start_time}-{cls.end_time}")
+        print(f"    Room: {cls.room_name}, "
+              f"Enrollment: {cls.current_enrollment}/{cls.capacity}")
 
+    try:
         # Show personal training sessions
         print("\n📋 PERSONAL TRAINING SESSIONS:")
-        cursor.execute("""
-            SELECT pts.session_date, pts.start_time, pts.end_time,
-                   m.first_name || ' ' || m.last_name as member_name,
-                   r.room_name, pts.status, pts.notes
-            FROM PersonalTrainingSession pts
-            JOIN Member m ON pts.member_id = m.member_id
-            JOIN Room r ON pts.room_id = r.room_id
-            WHERE pts.trainer_id = %s
-              AND pts.session_date >= CURRENT_DATE
-              AND pts.status = 'Scheduled'
-            ORDER BY pts.session_date, pts.start_time
-        """, (trainer_id,))
-
-        sessions = cursor.fetchall()
-        if sessions:
-            for s in sessions:
-                print(f"  • {s[0]} {s[1]}-{s[2]}: {s[3]} in {s[4]}")
-                if s[6]:
-                    print(f"    Notes: {s[6]}")
+        if schedule.sessions:
+            print_pages(schedule.sessions,
+                        lambda after: services.trainer_sessions(trainer_id,
+                                                                after),
+                        show_session)
         else:
             print("  No upcoming sessions")
 
         # Show group classes
         print("\n👥 GROUP CLASSES:")
-        cursor.execute("""
-            SELECT c.class_name, c.schedule_date, c.start_time, c.end_time,
-                   r.room_name, c.current_enrollment, c.capacity
-            FROM Class c
-            JOIN Room r ON c.room_id = r.room_id
-            WHERE c.trainer_id = %s
-              AND c.schedule_date >= CURRENT_DATE
-              AND c.status = 'Scheduled'
-            ORDER BY c.schedule_date, c.start_time
-        """, (trainer_id,))
-
-        classes = cursor.fetchall()
-        if classes:
-            for cls in classes:
-                print(f"  • {cls[0]}: {cls[1]} {cls[2]}-{cls[3]}")
-                print(f"    Room: {cls[4]}, Enrollment: {cls[5]}/{cls[6]}")
+        if schedule.classes:
+            print_pages(schedule.classes,
+                        lambda after: services.trainer_classes(trainer_id,
+                                                               after),
+                        show_class)
         else:
             print("  No upcoming classes")
-
-        # Show availability schedule
-        print("\n⏰ YOUR AVAILABILITY:")
-        cursor.execute("""
-            SELECT day_of_week, start_time, end_time
-            FROM TrainerAvailability
-            WHERE trainer_id = %s
-            ORDER BY 
-                CASE day_of_week
-                    WHEN 'Monday' THEN 1
-                    WHEN 'Tuesday' THEN 2
-                    WHEN 'Wednesday' THEN 3
-                    WHEN 'Thursday' THEN 4
-                    WHEN 'Friday' THEN 5
-                    WHEN 'Saturday' THEN 6
-                    WHEN 'Sunday' THEN 7
-                END,
-                start_time
-        """, (trainer_id,))
-
-        avails = cursor.fetchall()
-        if avails:
-            for a in avails:
-                print(f"  • {a[0]}: {a[1]} - {a[2]}")
-        else:
-            print("  No availability set")
-
     except Exception as e:
         print(f"❌ Error: {e}")
-    finally:
-        cursor.close()
-        db.return_connection(conn)
+        return
+
+    # Show availability schedule
+    print("\n⏰ YOUR AVAILABILITY:")
+    if schedule.availability:
+        for a in schedule.availability:
+            print(f"  • {a.day_of_week}: {a.start_time} - {a.end_time}")
+    else:
+        print("  No availability set")
+
 
+def member_search(trainer_id=None):
+    """Trainer Function (Bonus) / Admin: Search and View Member Information
 
-def member_search_by_trainer(trainer_id):
-    """Trainer Function (Bonus): Search and View Member Information"""
+    Trainers search their own members; admins (no trainer_id) search the
+    whole club.
+    """
     print("\n=== Member Search ===")
 
-    search_name = input("Enter member name to search: ").strip().lower()
+    query = input("Enter member name or email to search: ").strip()
 
-    conn = db.get_connection()
     try:
-        cursor = conn.cursor()
-
-        # Find members who have sessions with this trainer
-        cursor.execute("""
-            SELECT DISTINCT m.member_id, m.first_name, m.last_name, m.email
-            FROM Member m
-            JOIN PersonalTrainingSession pts ON m.member_id = pts.member_id
-            WHERE pts.trainer_id = %s
-              AND (LOWER(m.first_name) LIKE %s OR LOWER(m.last_name) LIKE %s)
-        """, (trainer_id, f'%{search_name}%', f'%{search_name}%'))
-
-        members = cursor.fetchall()
-        if not members:
-            print("No members found.")
+        offset = 0
+        while True:
+            members = services.search_members(query, trainer_id,
+                                              offset=offset)
+            if not members:
+                print("No members found." if offset == 0
+                      else "No more members.")
+                return
+
+            print("\nFound Members:")
+            for m in members:
+                print(f"  {m.member_id}. {m.first_name} {m.last_name} "
+                      f"({m.email})  [{m.score:.0%} match]")
+
+            choice = input("\nSelect Member ID to view details "
+                           "(n = next page, Enter = back): ").strip()
+            if not choice:
+                return
+            if choice.lower() != 'n':
+                break
+            offset += len(members)
+
+        member_id = int(choice)
+
+        try:
+            profile = services.member_profile(member_id)
+        except services.NotFoundError as e:
+            print(e)
             return
 
-        print("\nFound Members:")
-        for m in members:
-            print(f"  {m[0]}. {m[1]} {m[2]} ({m[3]})")
-
-        member_id = int(input("\nSelect Member ID to view details: "))
-
-        # Get member details
-        cursor.execute("""
-            SELECT m.first_name, m.last_name, m.email, m.date_of_birth, m.phone
-            FROM Member m
-            WHERE m.member_id = %s
-        """, (member_id,))
-
-        member = cursor.fetchone()
-        if member:
-            print(f"\n👤 {member[0]} {member[1]}")
-            print(f"   Email: {member[2]}")
-            print(f"   DOB: {member[3]}")
-            print(f"   Phone: {member[4]}")
-
-            # Get latest health metric
-            cursor.execute("""
-                SELECT weight, heart_rate, recorded_date
-                FROM HealthMetric
-                WHERE member_id = %s
-                ORDER BY recorded_date DESC
-                LIMIT 1
-            """, (member_id,))
-
-            metric = cursor.fetchone()
-            if metric:
-                print(f"\n📊 Latest Metrics ({metric[2]}):")
-                print(f"   Weight: {metric[0]} lbs")
-                print(f"   Heart Rate: {metric[1]} bpm")
-
-            # Get active goals
-            cursor.execute("""
-                SELECT goal_type, current_value, target_value, target_date
-                FROM FitnessGoal
-                WHERE member_id = %s AND status = 'Active'
-            """, (member_id,))
-
-            goals = cursor.fetchall()
-            if goals:
-                print("\n🎯 Active Goals:")
-                for g in goals:
-                    print(f"   - {g[0]}: {g[1]}/{g[2]} (Target: {g[3]})")
-        else:
-            print("Member details not found.")
+        print(f"\n👤 {profile.first_name} {profile.last_name}")
+        print(f"   Email: {profile.email}")
+        print(f"   DOB: {profile.date_of_birth}")
+        print(f"   Phone: {profile.phone}")
+
+        metric = profile.latest_metric
+        if metric:
+            print(f"\n📊 Latest Metrics ({metric.recorded_date}):")
+            print(f"   Weight: {metric.weight} lbs")
+            print(f"   Heart Rate: {metric.heart_rate} bpm")
+
+        if profile.goals:
+            print("\n🎯 Active Goals:")
+            for g in profile.goals:
+                print(f"   - {g.goal_type}: {g.current_value}/"
+                      f"{g.target_value} (Target: {g.target_date})")
 
     except Exception as e:
         print(f"❌ Error: {e}")
-    finally:
-        cursor.close()
-        db.return_connection(conn)
 
 
 # ============================================================================
@@ -672,74 +407,82 @@ def manage_room_booking():
     """Admin Function 1: Room Booking Management"""
     print("\n=== Room Booking Management ===")
     print("1. View Room Schedule")
-    print("2. Book Room for Class")
+    print("2. Book Room for a Weekly Class (whole season)")
+    print("3. View Class Templates")
+    print("4. Expand Class Templates")
 
     choice = input("\nSelect option: ").strip()
 
-    conn = db.get_connection()
     try:
-        cursor = conn.cursor()
-
         if choice == '1':
             # View room schedule
             room_date = input(
                 "Enter date (YYYY-MM-DD) or press Enter for today: ").strip()
-            if not room_date:
-                room_date = date.today().strftime('%Y-%m-%d')
-
-            print(f"\n📅 Room Schedule for {room_date}:")
-
-            # Classes
-            cursor.execute("""
-                SELECT r.room_name, c.class_name, c.start_time, c.end_time,
-                       t.first_name || ' ' || t.last_name as trainer
-                FROM Class c
-                JOIN Room r ON c.room_id = r.room_id
-                JOIN Trainer t ON c.trainer_id = t.trainer_id
-                WHERE c.schedule_date = %s AND c.status = 'Scheduled'
-                ORDER BY r.room_name, c.start_time
-            """, (room_date,))
-
-            classes = cursor.fetchall()
-            if classes:
+            day = services.parse_date(room_date) if room_date else date.today()
+
+            print(f"\n📅 Room Schedule for {day}:")
+            schedule = services.room_schedule(day)
+
+            if schedule.classes:
                 print("\nClasses:")
-                for cls in classes:
-                    print(f"  {cls[0]}: {
-                          cls[1]} ({cls[2]}-{cls[3]}) - {cls[4]}")
-
-            # Personal Training Sessions
-            cursor.execute("""
-                SELECT r.room_name, pts.start_time, pts.end_time,
-                       t.first_name || ' ' || t.last_name as trainer,
-                       m.first_name || ' ' || m.last_name as member
-                FROM PersonalTrainingSession pts
-                JOIN Room r ON pts.room_id = r.room_id
-                JOIN Trainer t ON pts.trainer_id = t.trainer_id
-                JOIN Member m ON pts.member_id = m.member_id
-                WHERE pts.session_date = %s AND pts.status = 'Scheduled'
-                ORDER BY r.room_name, pts.start_time
-            """, (room_date,))
-
-            sessions = cursor.fetchall()
-            if sessions:
+                print_pages(
+                    schedule.classes,
+                    lambda after: services.room_classes(day, after),
+                    lambda cls: print(f"  {cls.room_name}: {cls.class_name} "
+                                      f"({cls.start_time}-{cls.end_time}) - "
+                                      f"{cls.trainer_name}"))
+
+            if schedule.sessions:
                 print("\nPersonal Training Sessions:")
-                for s in sessions:
-                    print(f"  {s[0]}: {s[1]}-{s[2]} - {s[3]} with {s[4]}")
-
-            if not classes and not sessions:
+                print_pages(
+                    schedule.sessions,
+                    lambda after: services.room_sessions(day, after),
+                    lambda s: print(f"  {s.room_name}: "
+                                    f"{s.start_time}-{s.end_time} - "
+                                    f"{s.trainer_name} with {s.member_name}"))
+
+            if not schedule.classes and not schedule.sessions:
                 print("  No bookings for this date")
 
         elif choice == '2':
-            print("Room booking for classes is handled through Class Management")
+            print("\nTrainers:")
+            for t in services.list_trainers():
+                print(f"  {t.trainer_id}. {t.first_name} {t.last_name} - "
+                      f"{t.specialization}")
+            trainer_id = int(input("\nTrainer ID: "))
+            room_id = int(input("Room ID: "))
+            class_name = input("Class Name: ").strip()
+            day_of_week = input("Day of Week (Monday-Sunday): ").strip()
+            start_time = services.parse_time(input("Start Time (HH:MM): "))
+            end_time = services.parse_time(input("End Time (HH:MM): "))
+            capacity = int(input("Capacity: "))
+            season_start = services.parse_date(
+                input("Season Start (YYYY-MM-DD): "))
+            season_end = services.parse_date(
+                input("Season End (YYYY-MM-DD): "))
+
+            template_id = services.create_class_template(
+                class_name, trainer_id, room_id, day_of_week.capitalize(),
+                start_time, end_time, capacity, season_start, season_end)
+            print(f"✓ Class template {template_id} created")
+            print_season_expansion(services.expand_class_templates(
+                [template_id], first_day=max(season_start, date.today())))
+
+        elif choice == '3':
+            print_class_templates(services.class_templates())
+
+        elif choice == '4':
+            ids = input("Template IDs (comma-separated, Enter = all): ").strip()
+            template_ids = ([int(i) for i in ids.split(',')] if ids else
+                            [t.template_id for t in services.class_templates()])
+            print_season_expansion(
+                services.expand_class_templates(template_ids))
 
         else:
             print("Invalid option")
 
     except Exception as e:
         print(f"❌ Error: {e}")
-    finally:
-        cursor.close()
-        db.return_connection(conn)
 
 
 def manage_equipment():
@@ -751,45 +494,28 @@ def manage_equipment():
 
     choice = input("\nSelect option: ").strip()
 
-    conn = db.get_connection()
     try:
-        cursor = conn.cursor()
-
         if choice == '1':
             # View all equipment
-            cursor.execute("""
-                SELECT e.equipment_id, e.equipment_name, r.room_name, e.status,
-                       e.last_maintenance_date, e.maintenance_notes
-                FROM Equipment e
-                LEFT JOIN Room r ON e.room_id = r.room_id
-                ORDER BY e.status DESC, e.equipment_name
-            """)
-
-            equipment = cursor.fetchall()
+            def show(eq):
+                status_icon = "✓" if eq.status == "Operational" else "⚠"
+                print(f"  {status_icon} [{eq.equipment_id}] "
+                      f"{eq.equipment_name} - {eq.room_name or 'No Room'}")
+                print(f"       Status: {eq.status}, Last Maintenance: "
+                      f"{eq.last_maintenance_date or 'Never'}")
+                if eq.maintenance_notes:
+                    print(f"       Notes: {eq.maintenance_notes}")
+
             print("\n🔧 Equipment List:")
-            for eq in equipment:
-                status_icon = "✓" if eq[3] == "Operational" else "⚠"
-                print(f"  {status_icon} [{eq[0]}] {
-                      eq[1]} - {eq[2] if eq[2] else 'No Room'}")
-                print(f"       Status: {eq[3]}, Last Maintenance: {
-                      eq[4] if eq[4] else 'Never'}")
-                if eq[5]:
-                    print(f"       Notes: {eq[5]}")
+            print_pages(services.list_equipment(), services.list_equipment,
+                        show)
 
         elif choice == '2':
             # Log maintenance issue
             equipment_id = int(input("Equipment ID: "))
             issue = input("Describe the issue: ").strip()
 
-            cursor.execute("""
-                UPDATE Equipment
-                SET status = 'Under Maintenance',
-                    maintenance_notes = %s,
-                    last_maintenance_date = CURRENT_DATE
-                WHERE equipment_id = %s
-            """, (issue, equipment_id))
-
-            conn.commit()
+            services.log_maintenance_issue(equipment_id, issue)
             print("✓ Maintenance issue logged successfully!")
 
         elif choice == '3':
@@ -799,26 +525,14 @@ def manage_equipment():
             new_status = input("New Status: ").strip()
             notes = input("Notes (optional): ").strip()
 
-            cursor.execute("""
-                UPDATE Equipment
-                SET status = %s,
-                    maintenance_notes = %s,
-                    last_maintenance_date = CURRENT_DATE
-                WHERE equipment_id = %s
-            """, (new_status, notes if notes else None, equipment_id))
-
-            conn.commit()
+            services.update_equipment_status(equipment_id, new_status, notes)
             print("✓ Equipment status updated successfully!")
 
         else:
             print("Invalid option")
 
     except Exception as e:
-        conn.rollback()
         print(f"❌ Error: {e}")
-    finally:
-        cursor.close()
-        db.return_connection(conn)
 
 
 def manage_billing(member_id=None):
@@ -827,13 +541,12 @@ def manage_billing(member_id=None):
     print("1. Generate Bill")
     print("2. Record Payment")
     print("3. View Member Bills")
+    print("4. Run Monthly Billing")
+    print("5. Overdue Sweep & Aging Report")
 
     choice = input("\nSelect option: ").strip()
 
-    conn = db.get_connection()
     try:
-        cursor = conn.cursor()
-
         if choice == '1':
             # Generate bill
             if not member_id:
@@ -844,15 +557,8 @@ def manage_billing(member_id=None):
             amount = float(input("Amount: $"))
             due_days = int(input("Days until due: "))
 
-            cursor.execute("""
-                INSERT INTO Bill (member_id, due_date, total_amount, description)
-                VALUES (%s, CURRENT_DATE + INTERVAL '%s days', %s, %s)
-                RETURNING bill_id
-            """, (member_id, due_days, amount, description))
-
-            bill_id = cursor.fetchone()[0]
-            conn.commit()
-
+            bill_id = services.generate_bill(member_id, description, amount,
+                                             due_days)
             print(f"✓ Bill generated successfully! Bill ID: {bill_id}")
 
         elif choice == '2':
@@ -863,131 +569,407 @@ def manage_billing(member_id=None):
                 "Payment Method (Cash/Credit Card/Debit Card/Bank Transfer): ").strip()
             reference = input("Transaction Reference (optional): ").strip()
 
-            # Check bill exists and get details
-            cursor.execute("""
-                SELECT total_amount, amount_paid, status
-                FROM Bill
-                WHERE bill_id = %s
-            """, (bill_id,))
-
-            bill = cursor.fetchone()
-            if not bill:
-                print("❌ Bill not found!")
-                return
-
-            remaining = bill[0] - bill[1]
-            if amount > remaining:
-                print(f"⚠ Warning: Payment exceeds remaining balance of ${
-                      remaining:.2f}")
-
-            # Record payment (trigger will update bill)
-            cursor.execute("""
-                INSERT INTO Payment (bill_id, amount, payment_method, transaction_reference)
-                VALUES (%s, %s, %s, %s)
-                RETURNING payment_id
-            """, (bill_id, amount, method, reference if reference else None))
-
-            payment_id = cursor.fetchone()[0]
-            conn.commit()
-
-            print(f"✓ Payment recorded successfully! Payment ID: {
-                  payment_id}")
+            # Trigger updates the bill
+            receipt = services.record_payment(bill_id, amount, method,
+                                              reference)
+            if receipt.overpayment:
+                print(f"⚠ Warning: Payment exceeds remaining balance of "
+                      f"${receipt.remaining_before:.2f}")
+            print(f"✓ Payment recorded successfully! Payment ID: "
+                  f"{receipt.payment_id}")
 
         elif choice == '3':
             # View member bills
             if not member_id:
                 member_id = int(input("Member ID: "))
 
-            cursor.execute("""
-                SELECT bill_id, bill_date, due_date, total_amount, amount_paid, 
-                       status, description
-                FROM Bill
-                WHERE member_id = %s
-                ORDER BY bill_date DESC
-            """, (member_id,))
+            def show(b):
+                status_icon = "✓" if b.status == "Paid" else "⏳"
+                print(f"  {status_icon} [{b.bill_id}] {b.description}")
+                print(f"      Date: {b.bill_date}, Due: {b.due_date}, "
+                      f"Status: {b.status}")
+                print(f"      Amount: ${b.total_amount:.2f}, "
+                      f"Paid: ${b.amount_paid:.2f}, "
+                      f"Balance: ${b.balance:.2f}")
 
-            bills = cursor.fetchall()
+            bills = services.member_bills(member_id)
             if bills:
                 print(f"\n💰 Bills for Member {member_id}:")
-                for b in bills:
-                    status_icon = "✓" if b[5] == "Paid" else "⏳"
-                    print(f"  {status_icon} [{b[0]}] {b[6]}")
-                    print(f"      Date: {b[1]}, Due: {b[2]}, Status: {b[5]}")
-                    print(f"      Amount: ${b[3]:.2f}, Paid: ${
-                          b[4]:.2f}, Balance: ${b[3] - b[4]:.2f}")
+                print_pages(bills,
+                            lambda after: services.member_bills(member_id,
+                                                                after),
+                            show)
             else:
                 print("No bills found for this member.")
 
+        elif choice == '4':
+            period = services.parse_period(
+                input("Billing Period (YYYY-MM): "))
+            print_billing_run(services.run_billing(period))
+
+        elif choice == '5':
+            swept = services.sweep_overdue_bills()
+            print(f"✓ {swept} bill(s) marked Overdue")
+            print_aging_report(services.ar_aging_report())
+
         else:
             print("Invalid option")
 
     except Exception as e:
-        conn.rollback()
         print(f"❌ Error: {e}")
-    finally:
-        cursor.close()
-        db.return_connection(conn)
+
+
+def print_billing_run(run):
+    print(f"✓ Billing run for {run.period:%B %Y} complete "
+          f"in {run.seconds:.2f}s")
+    print(f"  Membership bills:  {run.membership_bills}")
+    print(f"  PT package bills:  {run.pt_package_bills}")
+    print(f"  Already billed:    {run.already_billed}")
+    print(f"  Total billed:      ${run.total_amount:.2f}")
+
+
+def print_class_templates(templates):
+    if not templates:
+        print("  No class templates with a current season")
+    for t in templates:
+        print(f"  {t.template_id}. {t.class_name} - {t.day_of_week}s "
+              f"{t.start_time:%H:%M}-{t.end_time:%H:%M}, {t.room_name}, "
+              f"{t.trainer_name} ({t.season_start} to {t.season_end}, "
+              f"{t.expanded} week(s) scheduled)")
+
+
+def print_season_expansion(expansion, dry_run=False):
+    if dry_run:
+        print(f"✓ {expansion.occurrences - expansion.skipped} of "
+              f"{expansion.occurrences} class(es) would be scheduled")
+    else:
+        print(f"✓ {expansion.scheduled} of {expansion.occurrences} "
+              f"class(es) scheduled")
+    for c in expansion.clashes:
+        print(f"  ⚠ {c.schedule_date} {c.start_time:%H:%M} {c.class_name} "
+              f"(template {c.template_id}): {c.resource} taken by "
+              f"{c.clash_with}")
+
+
+def print_aging_report(report):
+    print(f"\n📊 Accounts Receivable Aging (as of {report.as_of})")
+    print(f"  {'Member':>8} {'0-30':>12} {'31-60':>12} {'61-90':>12} "
+          f"{'90+':>12} {'Total':>12}")
+    for row in report.members + [report.total]:
+        label = row.member_id if row.member_id is not None else "TOTAL"
+        print(f"  {label:>8} {row.days_0_30:>12.2f} {row.days_31_60:>12.2f} "
+              f"{row.days_61_90:>12.2f} {row.days_over_90:>12.2f} "
+              f"{row.total:>12.2f}")
 
 
 # ============================================================================
-# MAIN APPLICATION
+# BATCH COMMANDS
 # ============================================================================
 
-def member_menu():
-    """Member interface"""
-    print("\n" + "=" * 60)
-    print("MEMBER MENU")
-    print("=" * 60)
+def billing_run_command(args):
+    """python app.py billing-run YYYY-MM"""
+    run = services.run_billing(services.parse_period(args.period),
+                               membership_fee=Decimal(args.fee),
+                               session_rate=Decimal(args.session_rate),
+                               due_days=args.due_days)
+    print_billing_run(run)
+
+
+def overdue_sweep_command(args):
+    """python app.py overdue-sweep [--as-of YYYY-MM-DD]"""
+    as_of = services.parse_date(args.as_of) if args.as_of else None
+    print(f"✓ {services.sweep_overdue_bills(as_of)} bill(s) marked Overdue")
+
+
+def ar_aging_command(args):
+    """python app.py ar-aging [--as-of YYYY-MM-DD] [--limit N]"""
+    as_of = services.parse_date(args.as_of) if args.as_of else None
+    print_aging_report(services.ar_aging_report(as_of, args.limit))
+
+
+def import_payments_command(args):
+    """python app.py import-payments payments.csv"""
+    try:
+        with open(args.file, newline='') as csv_file:
+            result = services.import_payments(csv_file)
+    except OSError as e:
+        raise ServiceError(f"Cannot read {args.file}: {e.strerror}")
+    print(f"✓ Imported {result.imported} of {result.rows} payment(s) "
+          f"in {result.seconds:.2f}s; {result.bills_settled} bill(s) updated")
+    for reason, (count, first_row) in sorted(result.rejected.items()):
+        print(f"  ⚠ {count} skipped - {reason} (first at data row {first_row})")
+
+
+def generate_data_command(args):
+    """python app.py generate-data --scale N [--seed N] [--as-of YYYY-MM-DD]"""
+    as_of = services.parse_date(args.as_of) if args.as_of else None
+    print(f"Generating scale factor {args.scale:g} (seed {args.seed})...")
+
+    def progress(load):
+        rows = f"{load.rows:>12,}" if load.rows is not None else f"{'-':>12}"
+        print(f"  {load.table:<24} {rows} rows {load.seconds:>8.1f}s")
+
+    loads = datagen.generate(args.scale, args.seed, as_of, progress)
+    total_rows = sum(load.rows or 0 for load in loads)
+    total_seconds = sum(load.seconds for load in loads)
+    print(f"✓ Loaded {total_rows:,} rows in {total_seconds:.1f}s")
+
+
+def metric_partitions_command(args):
+    """python app.py metric-partitions [--ahead MONTHS]"""
+    today = date.today()
+    last_day = date(today.year + (today.month + args.ahead - 1) // 12,
+                    (today.month + args.ahead - 1) % 12 + 1, 1)
+    created = services.create_metric_partitions(today, last_day)
+    print(f"✓ {created} HealthMetric partition(s) created "
+          f"(covered through {last_day:%B %Y})")
+
+
+def index_audit_command(args):
+    """python app.py index-audit [--min-rows N]"""
+    report = audit.run_audit(args.min_rows)
+    print(f"Planned {report.planned} statement(s), "
+          f"skipped {len(report.skipped)}")
+    for reason in report.skipped:
+        print(f"  - {reason}")
+
+    print(f"\nSequential scans of tables with {args.min_rows:,}+ rows:")
+    if not report.seq_scans:
+        print("  ✓ none")
+    for scan in report.seq_scans:
+        print(f"  ⚠ {scan.query:<32} {scan.relation:<24} {scan.rows:>12,}")
+        if scan.filter:
+            print(f"      filter: {scan.filter}")
+
+    print("\nForeign keys without a leading index:")
+    if not report.unindexed_keys:
+        print("  ✓ none")
+    for key in report.unindexed_keys:
+        print(f"  ⚠ {key.table}.{key.constraint} ({key.rows:,} rows)")
+        print(f"      {key.definition}")
+
+
+def expand_classes_command(args):
+    """python app.py expand-classes [--template ID ...] [--dry-run]"""
+    first_day = services.parse_date(args.first_day) if args.first_day else None
+    last_day = services.parse_date(args.last_day) if args.last_day else None
+    template_ids = args.templates or [
+        t.template_id for t in services.class_templates(first_day)]
+    expansion = services.expand_class_templates(template_ids, first_day,
+                                                last_day, args.dry_run)
+    print_season_expansion(expansion, args.dry_run)
+
+
+def export_command(args):
+    """python app.py export sessions|classes|bills|equipment [--out FILE]"""
+    out = args.out or f"{args.what}.csv"
+    first_day = services.parse_date(args.first_day) if args.first_day else None
+    last_day = services.parse_date(args.last_day) if args.last_day else None
+    try:
+        with open(out, "w", newline="") as csv_file:
+            rows = services.export_csv(args.what, csv_file, first_day,
+                                       last_day, args.trainer, args.member,
+                                       args.batch)
+    except OSError as e:
+        raise ServiceError(f"Cannot write {out}: {e.strerror}")
+    print(f"✓ Exported {rows:,} row(s) to {out}")
+
+
+def replica_address(text):
+    """HOST[:PORT] as the DB_CONFIG keys for a replica"""
+    host, colon, port = text.rpartition(':')
+    if not colon:
+        return {"host": text}
+    try:
+        return {"host": host, "port": int(port)}
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bad replica address '{text}'")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Health & Fitness Club Management System")
+    parser.add_argument(
+        "--profile", metavar="FILE",
+        help="profile every query and write the report to FILE "
+             "('-' for stdout) on exit")
+    parser.add_argument("--profile-format", choices=("json", "prometheus"),
+                        default="json")
+    parser.add_argument("--slow-ms", type=float, default=100.0,
+                        help="slow-query threshold in ms (default 100)")
+    parser.add_argument("--slow-log", metavar="FILE",
+                        help="append slow queries to FILE as JSON lines")
+    parser.add_argument("--explain", action="store_true",
+                        help="capture EXPLAIN (ANALYZE, BUFFERS) plans of "
+                             "slow queries")
+    parser.add_argument("--replica", metavar="HOST[:PORT]", action="append",
+                        type=replica_address, dest="replicas",
+                        help="read replica for screens and reports "
+                             "(repeatable)")
+    parser.add_argument("--max-lag", type=float, default=MAX_REPLICA_LAG,
+                        help="seconds a replica may trail the primary and "
+                             f"still serve reads (default {MAX_REPLICA_LAG:g})")
+    commands = parser.add_subparsers(dest="command")
+
+    billing = commands.add_parser(
+        "billing-run", help="bill every member for a month (idempotent)")
+    billing.add_argument("period", help="billing month, YYYY-MM")
+    billing.add_argument("--fee", default=str(services.MEMBERSHIP_FEE),
+                         help="monthly membership fee")
+    billing.add_argument("--session-rate",
+                         default=str(services.PT_SESSION_RATE),
+                         help="charge per PT session in the month")
+    billing.add_argument("--due-days", type=int, default=14)
+    billing.set_defaults(handler=billing_run_command)
+
+    sweep = commands.add_parser(
+        "overdue-sweep", help="mark past-due pending bills 'Overdue'")
+    sweep.add_argument("--as-of", help="date to age against, YYYY-MM-DD")
+    sweep.set_defaults(handler=overdue_sweep_command)
+
+    aging = commands.add_parser(
+        "ar-aging", help="unpaid balances by days past due")
+    aging.add_argument("--as-of", help="date to age against, YYYY-MM-DD")
+    aging.add_argument("--limit", type=int, default=20,
+                       help="members to list, largest balance first")
+    aging.set_defaults(handler=ar_aging_command)
+
+    payments = commands.add_parser(
+        "import-payments", help="import and settle a payment CSV file")
+    payments.add_argument(
+        "file", help="CSV with header: bill_id,amount,payment_date,"
+                     "payment_method,transaction_reference")
+    payments.set_defaults(handler=import_payments_command)
+
+    generate = commands.add_parser(
+        "generate-data", help="load a reproducible synthetic data set")
+    generate.add_argument("--scale", type=float, default=1.0,
+                          help="scale factor; 1 = 5,000 members and ~500k "
+                               "health metrics")
+    generate.add_argument("--seed", type=int, default=1)
+    generate.add_argument("--as-of", help="date the history runs up to, "
+                                          "YYYY-MM-DD (default today)")
+    generate.set_defaults(handler=generate_data_command)
+
+    partitions = commands.add_parser(
+        "metric-partitions",
+        help="create the coming months' HealthMetric partitions")
+    partitions.add_argument("--ahead", type=int, default=3,
+                            help="months ahead of this one (default 3)")
+    partitions.set_defaults(handler=metric_partitions_command)
+
+    index_audit = commands.add_parser(
+        "index-audit",
+        help="EXPLAIN every app query and flag unindexed access paths")
+    index_audit.add_argument("--min-rows", type=int, default=audit.MIN_ROWS,
+                             help="smallest table a sequential scan is "
+                                  f"flagged on (default {audit.MIN_ROWS:,})")
+    index_audit.set_defaults(handler=index_audit_command)
+
+    expand = commands.add_parser(
+        "expand-classes",
+        help="schedule the weeks of class template seasons as classes")
+    expand.add_argument("--template", type=int, action="append",
+                        dest="templates", metavar="ID",
+                        help="template to expand (repeatable; default every "
+                             "template with a current season)")
+    expand.add_argument("--from", dest="first_day",
+                        help="first day, YYYY-MM-DD (default today)")
+    expand.add_argument("--to", dest="last_day",
+                        help="last day, YYYY-MM-DD (default season end)")
+    expand.add_argument("--dry-run", action="store_true",
+                        help="report clashes without scheduling anything")
+    expand.set_defaults(handler=expand_classes_command)
+
+    export = commands.add_parser(
+        "export", help="stream a full listing to CSV with constant memory")
+    export.add_argument("what", choices=sorted(services.EXPORTS))
+    export.add_argument("--out", help="CSV file to write (default WHAT.csv)")
+    export.add_argument("--from", dest="first_day",
+                        help="first day, YYYY-MM-DD")
+    export.add_argument("--to", dest="last_day", help="last day, YYYY-MM-DD")
+    export.add_argument("--trainer", type=int, help="only this trainer")
+    export.add_argument("--member", type=int, help="only this member")
+    export.add_argument("--batch", type=int, default=services.EXPORT_BATCH,
+                        help="rows per round trip")
+    export.set_defaults(handler=export_command)
+
+    args = parser.parse_args(argv)
+    if args.explain and not (args.profile or args.slow_log):
+        parser.error("--explain needs --profile or --slow-log")
+    return args
+
+
+def write_profile(profiler, args):
+    """Write the query profile requested with --profile"""
+    if not args.profile:
+        return
+    report = (profiler.to_json() if args.profile_format == "json"
+              else profiler.to_prometheus())
+    if args.profile == "-":
+        print(report)
+        return
+    with open(args.profile, "w") as f:
+        f.write(report)
+    print(f"Query profile written to {args.profile}")
+
+
+# ============================================================================
+# MAIN APPLICATION
+# ============================================================================
 
+def _login(authenticate):
+    """Prompt for credentials and return the Account, or None"""
     email = input("Email: ").strip()
     password = input("Password: ").strip()
 
-    conn = db.get_connection()
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT member_id, first_name, last_name
-            FROM Member
-            WHERE email = %s AND password = %s
-        """, (email, password))
-
-        user = cursor.fetchone()
-        if not user:
-            print("❌ Invalid credentials!")
-            return
+        user = authenticate(email, password)
+    except ServiceError as e:
+        print(f"❌ {e}")
+        return None
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return None
 
-        member_id, first_name, last_name = user
-        print(f"\n✓ Welcome, {first_name} {last_name}!")
+    print(f"\n✓ Welcome, {user.first_name} {user.last_name}!")
+    return user
 
-        while True:
-            print(f"\n{'=' * 60}")
-            print("1. View Dashboard")
-            print("2. Update Profile / Manage Goals / Add Health Metric")
-            print("3. Schedule Personal Training Session")
-            print("4. Register for Group Class")
-            print("5. Logout")
 
-            choice = input("\nSelect option: ").strip()
+def member_menu():
+    """Member interface"""
+    print("\n" + "=" * 60)
+    print("MEMBER MENU")
+    print("=" * 60)
 
-            if choice == '1':
-                member_dashboard(member_id)
-            elif choice == '2':
-                profile_management(member_id)
-            elif choice == '3':
-                schedule_personal_training(member_id)
-            elif choice == '4':
-                register_for_class(member_id)
-            elif choice == '5':
-                print("Logging out...")
-                break
-            else:
-                print("Invalid option")
+    user = _login(services.authenticate_member)
+    if not user:
+        return
+    member_id = user.user_id
 
-    except Exception as e:
-        print(f"❌ Error: {e}")
-    finally:
-        cursor.close()
-        db.return_connection(conn)
+    while True:
+        print(f"\n{'=' * 60}")
+        print("1. View Dashboard")
+        print("2. Update Profile / Manage Goals / Add Health Metric")
+        print("3. Schedule Personal Training Session")
+        print("4. Register for Group Class")
+        print("5. Logout")
+
+        choice = input("\nSelect option: ").strip()
+
+        if choice == '1':
+            member_dashboard(member_id)
+        elif choice == '2':
+            profile_management(member_id)
+        elif choice == '3':
+            schedule_personal_training(member_id)
+        elif choice == '4':
+            register_for_class(member_id)
+        elif choice == '5':
+            print("Logging out...")
+            break
+        else:
+            print("Invalid option")
 
 
 def trainer_menu():
@@ -996,52 +978,31 @@ def trainer_menu():
     print("TRAINER MENU")
     print("=" * 60)
 
-    email = input("Email: ").strip()
-    password = input("Password: ").strip()
+    user = _login(services.authenticate_trainer)
+    if not user:
+        return
+    trainer_id = user.user_id
 
-    conn = db.get_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT trainer_id, first_name, last_name
-            FROM Trainer
-            WHERE email = %s AND password = %s
-        """, (email, password))
-
-        user = cursor.fetchone()
-        if not user:
-            print("❌ Invalid credentials!")
-            return
-
-        trainer_id, first_name, last_name = user
-        print(f"\n✓ Welcome, {first_name} {last_name}!")
+    while True:
+        print(f"\n{'=' * 60}")
+        print("1. View My Schedule")
+        print("2. Set Availability")
+        print("3. Search Member")
+        print("4. Logout")
 
-        while True:
-            print(f"\n{'=' * 60}")
-            print("1. View My Schedule")
-            print("2. Set Availability")
-            print("3. Search Member")
-            print("4. Logout")
-
-            choice = input("\nSelect option: ").strip()
-
-            if choice == '1':
-                view_trainer_schedule(trainer_id)
-            elif choice == '2':
-                set_trainer_availability(trainer_id)
-            elif choice == '3':
-                member_search_by_trainer(trainer_id)
-            elif choice == '4':
-                print("Logging out...")
-                break
-            else:
-                print("Invalid option")
+        choice = input("\nSelect option: ").strip()
 
-    except Exception as e:
-        print(f"❌ Error: {e}")
-    finally:
-        cursor.close()
-        db.return_connection(conn)
+        if choice == '1':
+            view_trainer_schedule(trainer_id)
+        elif choice == '2':
+            set_trainer_availability(trainer_id)
+        elif choice == '3':
+            member_search(trainer_id)
+        elif choice == '4':
+            print("Logging out...")
+            break
+        else:
+            print("Invalid option")
 
 
 def admin_menu():
@@ -1050,62 +1011,69 @@ def admin_menu():
     print("ADMIN MENU")
     print("=" * 60)
 
-    email = input("Email: ").strip()
-    password = input("Password: ").strip()
+    user = _login(services.authenticate_admin)
+    if not user:
+        return
 
-    conn = db.get_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT admin_id, first_name, last_name
-            FROM AdminStaff
-            WHERE email = %s AND password = %s
-        """, (email, password))
-
-        user = cursor.fetchone()
-        if not user:
-            print("❌ Invalid credentials!")
-            return
-
-        admin_id, first_name, last_name = user
-        print(f"\n✓ Welcome, {first_name} {last_name}!")
-
-        while True:
-            print(f"\n{'=' * 60}")
-            print("1. Manage Room Bookings")
-            print("2. Manage Equipment Maintenance")
-            print("3. Manage Billing & Payments")
-            print("4. Logout")
-
-            choice = input("\nSelect option: ").strip()
+    while True:
+        print(f"\n{'=' * 60}")
+        print("1. Manage Room Bookings")
+        print("2. Manage Equipment Maintenance")
+        print("3. Manage Billing & Payments")
+        print("4. Search Members")
+        print("5. Logout")
 
-            if choice == '1':
-                manage_room_booking()
-            elif choice == '2':
-                manage_equipment()
-            elif choice == '3':
-                manage_billing()
-            elif choice == '4':
-                print("Logging out...")
-                break
-            else:
-                print("Invalid option")
+        choice = input("\nSelect option: ").strip()
 
-    except Exception as e:
-        print(f"❌ Error: {e}")
-    finally:
-        cursor.close()
-        db.return_connection(conn)
+        if choice == '1':
+            manage_room_booking()
+        elif choice == '2':
+            manage_equipment()
+        elif choice == '3':
+            manage_billing()
+        elif choice == '4':
+            member_search()
+        elif choice == '5':
+            print("Logging out...")
+            break
+        else:
+            print("Invalid option")
 
 
 def main():
     """Main application entry point"""
+    args = parse_args()
+    profiler = None
+    if args.profile or args.slow_log:
+        profiler = QueryProfiler(args.slow_ms, args.slow_log, args.explain)
+
+    if args.command:
+        db.initialize_pool(profiler=profiler, replicas=args.replicas,
+                           max_lag=args.max_lag)
+        try:
+            args.handler(args)
+        except ServiceError as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+        finally:
+            db.close_all_connections()
+            if profiler:
+                write_profile(profiler, args)
+        return
+
     print("\n" + "=" * 60)
     print(" HEALTH & FITNESS CLUB MANAGEMENT SYSTEM")
     print("=" * 60)
 
     # Initialize database connection
-    db.initialize_pool()
+    db.initialize_pool(profiler=profiler, replicas=args.replicas,
+                       max_lag=args.max_lag)
+
+    # Keep cached classes, availability and equipment in step with other
+    # running copies of the app
+    feed = ChangeFeed()
+    services.follow_changes(feed)
+    feed.start()
 
     try:
         while True:
@@ -1136,8 +1104,11 @@ def main():
 
     finally:
         # Close database connections
+        feed.stop()
         db.close_all_connections()
         print("Database connections closed.")
+        if profiler:
+            write_profile(profiler, args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,167 @@
+"""
+Health and Fitness Club Management System
+Index Audit
+
+Plans every statement the application runs (the queries.py constants,
+less the bulk loaders) with EXPLAIN against the current database, and
+flags sequential scans of tables big enough for one to matter.  Plans
+depend on the data, so generate a data set at the scale of interest
+first (app.py generate-data --scale N).  EXPLAIN only plans the
+statement it is given, not the queries inside the functions and
+triggers it sets off, so the audit also lists foreign keys that no
+index leads with: each of those makes the referential checks and
+ON DELETE cascades scan the referencing table.
+"""
+
+import json
+import re
+from dataclasses import dataclass
+from datetime import date, time, timedelta
+from decimal import Decimal
+from typing import List, Optional
+
+import queries
+from database import db
+from services import DAYS_OF_WEEK, PAYMENT_METHODS
+
+# Tables smaller than this are cheaper to scan than to probe an index
+MIN_ROWS = 10000
+
+# Bulk loaders and staging steps: planned against temp tables that only
+# exist mid-import, or not meant to be fast per call
+SKIP_PREFIXES = ('DATAGEN_', 'PAYMENT_IMPORT_', 'INGEST_')
+
+# Statements EXPLAIN can plan
+_PLANNABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+_PARAM = re.compile(r"%\((\w+)\)s")
+
+
+@dataclass(frozen=True)
+class SeqScan:
+    query: str              # queries.py constant name
+    relation: str
+    rows: int               # table size (pg_class.reltuples)
+    filter: Optional[str]   # predicate applied during the scan
+
+
+@dataclass(frozen=True)
+class UnindexedKey:
+    table: str
+    constraint: str
+    definition: str
+    rows: int
+
+
+@dataclass(frozen=True)
+class AuditReport:
+    planned: int
+    skipped: List[str]      # 'NAME: reason'
+    seq_scans: List[SeqScan]
+    unindexed_keys: List[UnindexedKey]
+
+
+def sample_params(cursor):
+    """Values for every %(name)s parameter, drawn from the busiest rows
+    so the plans are those of the heaviest real calls"""
+    cursor.execute(queries.AUDIT_SAMPLES)
+    (member_id, email, trainer_id, class_id, room_id, bill_id,
+     equipment_id) = cursor.fetchone()
+    today = date.today()
+    return {
+        'member_id': member_id, 'email': email, 'trainer_id': trainer_id,
+        'class_id': class_id, 'room_id': room_id, 'bill_id': bill_id,
+        'equipment_id': equipment_id,
+        'trainer_ids': [trainer_id], 'room_ids': [room_id],
+        'template_ids': [0], 'dry_run': True,
+        'class_name': 'Audit', 'capacity': 20,
+        'season_start': today, 'season_end': today + timedelta(days=90),
+        'password': 'audit', 'first_name': 'Audit', 'last_name': 'Audit',
+        'date_of_birth': None, 'gender': None, 'phone': None,
+        'address': None,
+        'goal_type': 'Weight Loss', 'target_value': Decimal('1'),
+        'current_value': Decimal('1'), 'target_date': today,
+        'weight': None, 'height': None, 'heart_rate': None,
+        'blood_pressure': None, 'body_fat_percentage': None, 'notes': None,
+        'day': today, 'session_date': today, 'as_of': today,
+        'first_day': today, 'last_day': today + timedelta(days=30),
+        'period': today.replace(day=1),
+        'day_of_week': DAYS_OF_WEEK[today.weekday()],
+        'start_time': time(9), 'end_time': time(10),
+        'after_date': today, 'after_time': time(0), 'after_id': 0,
+        'after_room': '', 'after_rank': 0, 'after_name': '',
+        'before_date': date(9999, 12, 31), 'before_id': 2 ** 31 - 1,
+        'limit': 50, 'offset': 0, 'query': 'smith', 'threshold': '0.4',
+        'specialization': None, 'status': 'Operational',
+        'amount': Decimal('10.00'), 'method': PAYMENT_METHODS[0],
+        'methods': list(PAYMENT_METHODS), 'reference': None,
+        'description': 'Audit', 'due_days': 14,
+        'membership_fee': Decimal('150.00'),
+        'session_rate': Decimal('50.00'),
+    }
+
+
+def app_statements():
+    """(name, sql) for every queries.py statement the audit plans, plus
+    the names it skips with the reason"""
+    statements, skipped = [], []
+    for name, sql in vars(queries).items():
+        if not name.isupper() or not isinstance(sql, str):
+            continue
+        if name.startswith(SKIP_PREFIXES) or name.startswith('AUDIT_'):
+            continue
+        if not sql.lstrip().upper().startswith(_PLANNABLE):
+            skipped.append(f"{name}: not a plannable statement")
+            continue
+        statements.append((name, sql))
+    return statements, skipped
+
+
+def _seq_scans(plan):
+    """Yield (relation, filter) for every Seq Scan node in a JSON plan"""
+    if plan.get('Node Type') in ('Seq Scan', 'Parallel Seq Scan'):
+        yield plan['Relation Name'], plan.get('Filter')
+    for child in plan.get('Plans', ()):
+        yield from _seq_scans(child)
+
+
+def run_audit(min_rows=MIN_ROWS):
+    """Plan every application statement and check foreign keys"""
+    statements, skipped = app_statements()
+    planned = 0
+    scans = []
+    with db.connection() as conn, conn.cursor() as cursor:
+        params = sample_params(cursor)
+        cursor.execute(queries.AUDIT_TABLE_ROWS)
+        sizes = dict(cursor.fetchall())
+
+        for name, sql in statements:
+            missing = set(_PARAM.findall(sql)) - set(params)
+            if missing:
+                skipped.append(f"{name}: no sample for "
+                               f"{', '.join(sorted(missing))}")
+                continue
+            # EXPLAIN without ANALYZE does not run the statement; the
+            # rollback also drops any locks planning took
+            try:
+                cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                plan = cursor.fetchone()[0]
+            except Exception as e:
+                conn.rollback()
+                skipped.append(f"{name}: {str(e).splitlines()[0]}")
+                continue
+            conn.rollback()
+            planned += 1
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            for relation, predicate in _seq_scans(plan[0]['Plan']):
+                rows = sizes.get(relation, 0)
+                if rows >= min_rows:
+                    scans.append(SeqScan(name, relation, rows, predicate))
+
+        cursor.execute(queries.AUDIT_UNINDEXED_FOREIGN_KEYS)
+        keys = [UnindexedKey(*row) for row in cursor.fetchall()]
+        conn.rollback()
+
+    scans.sort(key=lambda s: (-s.rows, s.query))
+    return AuditReport(planned, skipped, scans, keys)
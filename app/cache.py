@@ -0,0 +1,135 @@
+"""
+Health and Fitness Club Management System
+Reference Data Cache
+
+In-process read-through cache for rows that change a few times a day
+(trainers, rooms, availability, class listings, equipment).  Each cache
+keeps entries for a fixed TTL, evicts the least recently used key beyond
+``maxsize``, and is invalidated by the services that write the data.
+Caches are per process: a write made by another process shows up once
+the entry expires.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+# name -> TTLCache, for stats()
+_registry = {}
+
+
+class _Entry:
+    """A cached value and the monotonic time it expires"""
+    __slots__ = ('value', 'expires')
+
+    def __init__(self, value, expires):
+        self.value = value
+        self.expires = expires
+
+
+class TTLCache:
+    """Thread-safe read-through cache with a TTL and LRU eviction.
+
+    ``get(key, load)`` returns the cached value for ``key`` if it has not
+    expired; otherwise it calls ``load()`` outside the lock and caches the
+    result.  ``invalidate()`` drops one key or every key.  A load that was
+    in flight when an invalidation happened is returned to its caller but
+    not cached, so a writer's change is never masked by older data.
+    Cached values are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, name, ttl=300.0, maxsize=128, clock=time.monotonic):
+        if ttl <= 0 or maxsize < 1:
+            raise ValueError("require ttl > 0 and maxsize >= 1")
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> _Entry, least recent first
+        self._generation = 0            # bumped by every invalidation
+
+        # Counters, read through stats()
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._stale_loads = 0
+
+        _registry[name] = self
+
+    def get(self, key, load):
+        """Cached value for ``key``, calling ``load()`` on a miss"""
+        value, generation = self._lookup(key)
+        if value is _MISSING:
+            value = load()
+            self._store(key, value, generation)
+        return value
+
+    async def get_async(self, key, load):
+        """Same as get() for a coroutine function ``load``"""
+        value, generation = self._lookup(key)
+        if value is _MISSING:
+            value = await load()
+            self._store(key, value, generation)
+        return value
+
+    def invalidate(self, key=_MISSING):
+        """Drop ``key``, or every entry when no key is given"""
+        with self._lock:
+            self._generation += 1
+            self._invalidations += 1
+            if key is _MISSING:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires > self._clock():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry.value, self._generation
+                del self._entries[key]
+                self._expired += 1
+            self._misses += 1
+            return _MISSING, self._generation
+
+    def _store(self, key, value, generation):
+        with self._lock:
+            if generation != self._generation:
+                self._stale_loads += 1
+                return
+            self._entries[key] = _Entry(value, self._clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def stats(self):
+        """Snapshot of cache counters"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "expired": self._expired,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "stale_loads": self._stale_loads,
+            }
+
+
+def stats():
+    """Counters for every cache in this process, by name"""
+    return {name: c.stats() for name, c in sorted(_registry.items())}
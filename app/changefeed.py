@@ -0,0 +1,197 @@
+"""
+Health and Fitness Club Management System
+Change Feed
+
+Consumes the notifications the notify_change triggers publish (see
+DDL.sql) and fans each one out to subscribers, so caches and live views
+in this process follow writes made by any other process within
+milliseconds.  ChangeFeed.start() listens from a background thread on a
+dedicated connection (outside the pool, since LISTEN lasts for the whole
+session); the asyncio API feeds dispatch() from an asyncpg listener.
+"""
+
+import select
+import sys
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+
+import psycopg2
+from psycopg2 import extensions
+
+from database import DB_CONFIG
+
+CHANNEL = 'fitness_changes'
+
+# Change.op values: the trigger's I/U/D, plus RESET after the listener
+# reconnects (notifications may have been missed, so assume everything
+# changed)
+INSERT, UPDATE, DELETE, RESET = 'I', 'U', 'D', 'R'
+
+# Subscribe to this to receive every change
+ALL_TABLES = '*'
+
+
+@dataclass(frozen=True)
+class Change:
+    __slots__ = ('table', 'op', 'keys')
+    table: str
+    op: str
+    keys: Optional[FrozenSet[int]]  # None: any row may have changed
+
+
+def parse(payload):
+    """'<table> <op> <k1,k2,...|*>' -> Change"""
+    table, op, keys = payload.split(' ', 2)
+    if keys == '*':
+        return Change(table, op, None)
+    return Change(table, op, frozenset(int(k) for k in keys.split(',')))
+
+
+class ChangeFeed:
+    """Fan-out of change notifications to per-table subscribers.
+
+    Callbacks take one Change and run on the listener's thread (or event
+    loop), so they should be quick; an exception in one is counted and
+    does not stop delivery to the others.
+    """
+
+    def __init__(self, channel=CHANNEL, poll_timeout=1.0, max_backoff=5.0,
+                 **connect_kwargs):
+        self.channel = channel
+        self.poll_timeout = poll_timeout
+        self.max_backoff = max_backoff
+        self._connect_kwargs = dict(DB_CONFIG, **connect_kwargs)
+
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(list)   # table -> [callback]
+        self._stop = threading.Event()
+        self._thread = None
+        self._conn = None
+        self.listening = False      # set by whichever transport feeds us
+
+        self._received = 0
+        self._delivered = 0
+        self._errors = 0
+        self._reconnects = 0
+        self._last_error = None
+
+    # ------------------------------------------------------------------
+    # Subscribers
+    # ------------------------------------------------------------------
+
+    def subscribe(self, table, callback):
+        """Call ``callback(change)`` for changes to ``table`` (lower case)"""
+        with self._lock:
+            self._subscribers[table].append(callback)
+
+    def unsubscribe(self, table, callback):
+        with self._lock:
+            if callback in self._subscribers.get(table, ()):
+                self._subscribers[table].remove(callback)
+
+    def dispatch(self, payload):
+        """Deliver one notification payload to its subscribers"""
+        try:
+            change = parse(payload)
+        except ValueError:
+            with self._lock:
+                self._errors += 1
+                self._last_error = f"bad payload {payload!r}"
+            return
+        self._deliver(change, (change.table, ALL_TABLES))
+
+    def reset(self):
+        """Tell every subscriber that any row may have changed"""
+        with self._lock:
+            tables = list(self._subscribers)
+        for table in tables:
+            self._deliver(Change(table, RESET, None), (table,))
+
+    def _deliver(self, change, tables):
+        with self._lock:
+            self._received += 1
+            callbacks = [cb for t in tables for cb in self._subscribers.get(t, ())]
+        for callback in callbacks:
+            try:
+                callback(change)
+            except Exception as e:
+                with self._lock:
+                    self._errors += 1
+                    self._last_error = f"{type(e).__name__}: {e}"
+            else:
+                with self._lock:
+                    self._delivered += 1
+
+    # ------------------------------------------------------------------
+    # Listener thread (psycopg2)
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Listen from a daemon thread until stop()"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='change-feed',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _listen(self):
+        conn = psycopg2.connect(**self._connect_kwargs)
+        conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN {self.channel}')
+        return conn
+
+    def _run(self):
+        backoff = 0.1
+        connected_before = False
+        while not self._stop.is_set():
+            try:
+                self._conn = self._listen()
+                self.listening = True
+                if connected_before:
+                    self.reset()
+                connected_before = True
+                backoff = 0.1
+                while not self._stop.is_set():
+                    ready, _, _ = select.select([self._conn], [], [],
+                                                self.poll_timeout)
+                    if not ready:
+                        continue
+                    self._conn.poll()
+                    while self._conn.notifies:
+                        self.dispatch(self._conn.notifies.pop(0).payload)
+            except psycopg2.Error as e:
+                with self._lock:
+                    self._reconnects += 1
+                    self._last_error = f"{type(e).__name__}: {e}".strip()
+                print(f"Change feed disconnected, retrying: {e}".strip(),
+                      file=sys.stderr)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            finally:
+                self.listening = False
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+
+    def stats(self):
+        """Snapshot of feed counters"""
+        with self._lock:
+            return {
+                "listening": self.listening,
+                "subscribers": sum(len(v) for v in self._subscribers.values()),
+                "received": self._received,
+                "delivered": self._delivered,
+                "errors": self._errors,
+                "reconnects": self._reconnects,
+                "last_error": self._last_error,
+            }
@@ -0,0 +1,628 @@
+"""
+Health and Fitness Club Management System
+Database Connection Pool
+"""
+
+import contextvars
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+
+# Connection settings shared by the sync pool and the async API
+DB_CONFIG = {
+    "host": "localhost",
+    "database": "fitness_club",
+    "user": "postgres",
+    "password": "",  # Change this
+    "port": 5432,
+}
+
+# Read replicas (streaming standbys of the primary above), each given as
+# the DB_CONFIG keys that differ, e.g. {"host": "replica1"}.  With none,
+# every read goes to the primary.
+REPLICAS = []
+
+# A replica further behind the primary than this many seconds gets no reads
+MAX_REPLICA_LAG = 5.0
+# Replica lag is re-measured at most this often (seconds)
+LAG_CHECK_INTERVAL = 1.0
+# Seconds to wait for a replica connection before reading from the primary
+REPLICA_TIMEOUT = 2.0
+
+# Where each read_only checkout went, and why the primary when it did
+READ_ROUTES = ('replica', 'read_your_writes', 'lagging', 'unavailable')
+
+_PARAM = re.compile(r"%\((\w+)\)s")
+
+_PRIMARY_LSN = "SELECT pg_current_wal_lsn()"
+
+# Whether the open transaction has written (only writes assign an xid)
+_WROTE = "SELECT pg_current_xact_id_if_assigned() IS NOT NULL"
+
+# How far the replica has replayed, and how old the last transaction it
+# replayed is (its lag, when it has not caught up)
+_REPLICA_STATUS = """
+    SELECT pg_last_wal_replay_lsn(),
+           EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+"""
+
+# WAL position of the primary after this session's (thread's or task's)
+# last commit; a replica serves the session's reads only once it has
+# replayed that far
+_last_write = contextvars.ContextVar('last_write', default=None)
+
+
+def _lsn(text):
+    """pg_lsn text ('16/B374D848') as an integer"""
+    high, low = text.split('/')
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+class PoolError(Exception):
+    """Raised when the pool cannot hand out a connection"""
+
+
+class PoolTimeout(PoolError):
+    """Raised when no connection became free within the checkout timeout"""
+
+
+# Handed to a waiter in place of a connection: a slot is free, open one
+_OPEN = object()
+
+
+class _Waiter:
+    """A caller queued for a connection"""
+    __slots__ = ('ready', 'handoff')
+
+    def __init__(self, lock):
+        self.ready = threading.Condition(lock)
+        self.handoff = None         # (connection, idle_since) or _OPEN
+
+
+class ConnectionPool:
+    """Thread-safe connection pool with a bounded wait queue.
+
+    Callers that find the pool exhausted wait (up to ``timeout`` seconds) for
+    a connection to be returned instead of failing immediately.  Waiters are
+    served first come, first served: a returned connection goes straight to
+    the longest waiter, so a busy caller that checks out again at once
+    cannot starve the queue.  At most ``max_waiting`` callers may queue;
+    beyond that checkout fails fast.  Idle connections are health-checked
+    before reuse and recycled once they are older than ``max_lifetime``
+    seconds.
+    """
+
+    def __init__(self, minconn, maxconn, timeout=30.0, max_waiting=100,
+                 max_lifetime=3600.0, check_after=30.0, **connect_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("require 0 <= minconn <= maxconn and maxconn >= 1")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_waiting = max_waiting
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self._connect_kwargs = connect_kwargs
+
+        self._lock = threading.Lock()
+        self._idle = deque()        # (connection, returned_at)
+        self._in_use = set()
+        self._born = {}             # id(connection) -> created_at
+        self._size = 0              # idle + in use + being opened
+        self._queue = deque()       # _Waiter, oldest first
+        self._closed = False
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._rejected = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._created = 0
+        self._recycled = 0
+        self._discarded = 0
+
+        for _ in range(minconn):
+            self._size += 1
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        try:
+            conn = psycopg2.connect(**self._connect_kwargs)
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._hand_over(None)
+            raise
+        with self._lock:
+            self._born[id(conn)] = time.monotonic()
+            self._created += 1
+        return conn
+
+    def _close(self, conn):
+        """Close a connection that no longer counts against the pool (lock held)"""
+        self._born.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _expired(self, conn, now):
+        return now - self._born.get(id(conn), now) > self.max_lifetime
+
+    def _healthy(self, conn, idle_since, now):
+        if conn.closed:
+            return False
+        if now - idle_since < self.check_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _hand_over(self, candidate):
+        """Give a returned connection, or a freed slot (None), to the
+        longest waiter; with nobody waiting the connection goes idle.
+        Called with the lock held.
+        """
+        if self._queue and not self._closed:
+            waiter = self._queue.popleft()
+            if candidate is None:
+                self._size += 1
+            waiter.handoff = _OPEN if candidate is None else candidate
+            waiter.ready.notify()
+        elif candidate is not None:
+            self._idle.append(candidate)
+
+    def _wait(self, deadline, timeout):
+        """Queue until a connection or slot is handed over (lock held)"""
+        if len(self._queue) >= self.max_waiting:
+            self._rejected += 1
+            raise PoolError(
+                f"connection pool exhausted ({len(self._queue)} waiting)")
+        waiter = _Waiter(self._lock)
+        self._queue.append(waiter)
+        while waiter.handoff is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._closed:
+                self._queue.remove(waiter)
+                self._timeouts += 1
+                raise PoolTimeout(
+                    f"no connection available after {timeout:.1f}s")
+            waiter.ready.wait(remaining)
+        return None if waiter.handoff is _OPEN else waiter.handoff
+
+    def getconn(self, timeout=None):
+        """Check out a connection, waiting up to ``timeout`` seconds"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+
+        with self._lock:
+            if self._closed:
+                raise PoolError("connection pool is closed")
+            if self._queue:
+                candidate = self._wait(started + timeout, timeout)
+            elif self._idle:
+                candidate = self._idle.pop()
+            elif self._size < self.maxconn:
+                self._size += 1
+                candidate = None
+            else:
+                candidate = self._wait(started + timeout, timeout)
+
+        conn = None
+        if candidate is not None:
+            conn, idle_since = candidate
+            now = time.monotonic()
+            with self._lock:
+                expired = self._expired(conn, now)
+            # The health check may run a query, so only the bookkeeping locks
+            if expired or not self._healthy(conn, idle_since, now):
+                with self._lock:
+                    if expired:
+                        self._recycled += 1
+                    else:
+                        self._discarded += 1
+                    self._close(conn)
+                conn = None
+        if conn is None:
+            conn = self._connect()
+
+        waited = time.monotonic() - started
+        with self._lock:
+            self._in_use.add(conn)
+            self._checkouts += 1
+            self._wait_time += waited
+            self._max_wait = max(self._max_wait, waited)
+        return conn
+
+    def putconn(self, conn, close=False):
+        """Return a connection; broken or expired connections are dropped"""
+        with self._lock:
+            if conn not in self._in_use:
+                raise PoolError("connection was not checked out from this pool")
+            self._in_use.discard(conn)
+
+        if not close and not conn.closed:
+            try:
+                status = conn.get_transaction_status()
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    close = True
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                close = True
+
+        now = time.monotonic()
+        with self._lock:
+            if self._closed or close or conn.closed:
+                self._discarded += 1
+                self._close(conn)
+                self._size -= 1
+                self._hand_over(None)
+            elif self._expired(conn, now) and self._size > self.minconn:
+                self._recycled += 1
+                self._close(conn)
+                self._size -= 1
+                self._hand_over(None)
+            else:
+                self._hand_over((conn, now))
+
+    def closeall(self):
+        """Close every idle connection and refuse further checkouts"""
+        with self._lock:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._close(conn)
+                self._size -= 1
+            for waiter in self._queue:
+                waiter.ready.notify()
+
+    def stats(self):
+        """Snapshot of pool counters"""
+        with self._lock:
+            return {
+                "size": self._size,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "waiting": len(self._queue),
+                "maxconn": self.maxconn,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "rejected": self._rejected,
+                "wait_time_total": self._wait_time,
+                "wait_time_max": self._max_wait,
+                "wait_time_avg": (self._wait_time / self._checkouts
+                                  if self._checkouts else 0.0),
+                "created": self._created,
+                "recycled": self._recycled,
+                "discarded": self._discarded,
+            }
+
+
+class RegistryConnection(extensions.connection):
+    """psycopg2 connection that remembers which registered statements
+    are prepared in its session.  A reconnect opens a new connection,
+    which starts with none."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+class PrimaryConnection(RegistryConnection):
+    """Primary connection used when there are replicas.  A commit that
+    wrote notes the WAL position it reached, for read-your-writes routing.
+
+    Read-only blocks and transactions that only read record nothing.
+    Neither do autocommit writes: they have no commit to hook, so a
+    session that writes that way may read its own write stale.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read_only = False
+
+    def commit(self):
+        if (self.read_only or self.autocommit or self.get_transaction_status()
+                != extensions.TRANSACTION_STATUS_INTRANS):
+            return super().commit()
+        with self.cursor(cursor_factory=extensions.cursor) as cursor:
+            cursor.execute(_WROTE)
+            wrote = cursor.fetchone()[0]
+        super().commit()
+        if not wrote:
+            return
+        autocommit, self.autocommit = self.autocommit, True
+        try:
+            with self.cursor(cursor_factory=extensions.cursor) as cursor:
+                cursor.execute(_PRIMARY_LSN)
+                lsn = _lsn(cursor.fetchone()[0])
+        finally:
+            self.autocommit = autocommit
+        if lsn > (_last_write.get() or 0):
+            _last_write.set(lsn)
+
+
+class Replica:
+    """A read replica's pool and its position at the last lag check"""
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.replay_lsn = 0
+        self.lag = None             # seconds behind; None = unreachable
+        self.error = None
+
+    def failed(self, error):
+        """Take the replica out of rotation until the next lag check"""
+        self.lag = None
+        self.error = str(error).strip().splitlines()[0]
+
+
+class Database:
+    """Database connection manager"""
+
+    def __init__(self):
+        self.connection_pool = None
+        self.profiler = None
+        self.replicas = []
+        self.max_lag = MAX_REPLICA_LAG
+        self._statements = {}       # name -> (SQL with $n, param names)
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._checked_at = float('-inf')
+        self._turn = 0
+        self._reads = dict.fromkeys(READ_ROUTES, 0)
+
+    def initialize_pool(self, minconn=1, maxconn=10, timeout=30.0,
+                        max_waiting=100, max_lifetime=3600.0, profiler=None,
+                        replicas=None, max_lag=MAX_REPLICA_LAG):
+        """Initialize connection pool
+
+        With a profiler.QueryProfiler, every pooled cursor is timed and
+        every checkout's wait is recorded.  ``replicas`` (default
+        REPLICAS) each get a pool of up to ``maxconn`` connections for
+        read_only checkouts.  A replica that is down does not stop
+        startup: reads go to the primary until it answers.
+        """
+        self.profiler = profiler
+        replicas = REPLICAS if replicas is None else replicas
+        config = dict(DB_CONFIG, connection_factory=(
+            PrimaryConnection if replicas else RegistryConnection))
+        if profiler:
+            config["cursor_factory"] = profiler.cursor_class
+        try:
+            self.connection_pool = ConnectionPool(
+                minconn,
+                maxconn,
+                timeout=timeout,
+                max_waiting=max_waiting,
+                max_lifetime=max_lifetime,
+                **config
+            )
+            print("Database connection pool created successfully")
+        except Exception as e:
+            print(f"Error creating connection pool: {e}")
+            sys.exit(1)
+
+        self.max_lag = max_lag
+        self.replicas = []
+        for overrides in replicas:
+            replica = dict(config, connection_factory=RegistryConnection,
+                           connect_timeout=int(REPLICA_TIMEOUT), **overrides)
+            self.replicas.append(Replica(
+                f"{replica['host']}:{replica['port']}",
+                ConnectionPool(0, maxconn, timeout=REPLICA_TIMEOUT,
+                               max_waiting=max_waiting,
+                               max_lifetime=max_lifetime, **replica)))
+        self._checked_at = float('-inf')
+
+    def _getconn(self, pool, timeout=None):
+        if not self.profiler:
+            return pool.getconn(timeout)
+        started = time.perf_counter()
+        conn = pool.getconn(timeout)
+        self.profiler.record_pool_wait(time.perf_counter() - started)
+        return conn
+
+    def get_connection(self, timeout=None):
+        """Get connection from pool"""
+        return self._getconn(self.connection_pool, timeout)
+
+    def return_connection(self, connection, close=False):
+        """Return connection to pool"""
+        self.connection_pool.putconn(connection, close=close)
+
+    @contextmanager
+    def connection(self, timeout=None, autocommit=False, read_only=False):
+        """Check out a connection for the duration of a ``with`` block.
+
+        The transaction is rolled back if the block raises, and the
+        connection always goes back to the pool.  With ``autocommit``
+        every statement is its own transaction and no BEGIN or ROLLBACK
+        is sent, so a one-statement read is one round trip.  A
+        ``read_only`` block may be given a replica connection (see
+        _route); it must not write.
+        """
+        pool, conn = self.connection_pool, None
+        if read_only and self.replicas:
+            replica, route = self._route()
+            if replica:
+                try:
+                    conn = self._getconn(replica.pool, REPLICA_TIMEOUT)
+                    pool = replica.pool
+                except (PoolError, psycopg2.OperationalError) as e:
+                    replica.failed(e)
+                    route = 'unavailable'
+            with self._lock:
+                self._reads[route] += 1
+        if conn is None:
+            conn = self._getconn(pool, timeout)
+        if isinstance(conn, PrimaryConnection):
+            conn.read_only = read_only
+
+        conn.autocommit = autocommit
+        try:
+            yield conn
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            if autocommit and not conn.closed:
+                conn.autocommit = False
+            pool.putconn(conn)
+
+    def _route(self):
+        """(replica, 'replica') for a read, or (None, why not).
+
+        A replica qualifies if it answered the last lag check, was at
+        most max_lag seconds behind, and had replayed this session's last
+        commit (read-your-writes).  Qualifying replicas take turns.  The
+        positions used are at most LAG_CHECK_INTERVAL old and only ever
+        behind the truth, so a replica is never wrongly taken as fresh.
+        """
+        self._check_lag()
+        written = _last_write.get()
+        live = [r for r in self.replicas
+                if r.lag is not None and r.lag <= self.max_lag]
+        fresh = [r for r in live if written is None or r.replay_lsn >= written]
+        if fresh:
+            with self._lock:
+                self._turn += 1
+                return fresh[self._turn % len(fresh)], 'replica'
+        if live:
+            return None, 'read_your_writes'
+        if any(r.lag is not None for r in self.replicas):
+            return None, 'lagging'
+        return None, 'unavailable'
+
+    def _check_lag(self):
+        """Re-measure every replica's lag if the last check is older
+        than LAG_CHECK_INTERVAL.  Callers that find a check running go on
+        with the previous figures."""
+        if time.monotonic() - self._checked_at < LAG_CHECK_INTERVAL:
+            return
+        if not self._check_lock.acquire(blocking=False):
+            return
+        try:
+            with self.connection(autocommit=True) as conn, \
+                    conn.cursor() as cursor:
+                cursor.execute(_PRIMARY_LSN)
+                primary = _lsn(cursor.fetchone()[0])
+            for replica in self.replicas:
+                try:
+                    conn = self._getconn(replica.pool, REPLICA_TIMEOUT)
+                except (PoolError, psycopg2.OperationalError) as e:
+                    replica.failed(e)
+                    continue
+                try:
+                    conn.autocommit = True
+                    with conn.cursor() as cursor:
+                        cursor.execute(_REPLICA_STATUS)
+                        replayed, behind = cursor.fetchone()
+                    if replayed is None:
+                        raise PoolError("not a standby (not in recovery)")
+                    replica.replay_lsn = _lsn(replayed)
+                    replica.lag = (0.0 if replica.replay_lsn >= primary
+                                   else float('inf') if behind is None
+                                   else max(float(behind), 0.0))
+                    replica.error = None
+                except (PoolError, psycopg2.Error) as e:
+                    replica.failed(e)
+                finally:
+                    if not conn.closed:
+                        conn.autocommit = False
+                    replica.pool.putconn(conn)
+            self._checked_at = time.monotonic()
+        finally:
+            self._check_lock.release()
+
+    def prepare(self, name, sql):
+        """Register ``sql`` (with %(name)s parameters) to run as the
+        server-side prepared statement ``name`` through execute()"""
+        names = []
+
+        def slot(match):
+            if match.group(1) not in names:
+                names.append(match.group(1))
+            return f"${names.index(match.group(1)) + 1}"
+
+        self._statements[name] = (_PARAM.sub(slot, sql), tuple(names))
+
+    def execute(self, cursor, name, params=None):
+        """Run registered statement ``name`` on ``cursor``.
+
+        The first time a connection runs the statement it is PREPAREd
+        there, so it is parsed once per connection.  After a few runs
+        PostgreSQL plans it once as well, when a generic plan does as
+        well as the custom ones.  A prepared statement lasts as long as
+        its session, including across rollbacks.
+        """
+        conn = cursor.connection
+        if name not in conn.prepared:
+            cursor.execute(f"PREPARE {name} AS {self._statements[name][0]}",
+                           ())
+            conn.prepared.add(name)
+        cursor.execute(*self.execute_statement(name, params))
+
+    def execute_statement(self, name, params=None):
+        """The EXECUTE statement and its arguments for ``name``"""
+        names = self._statements[name][1]
+        if not names:
+            return f"EXECUTE {name}", ()
+        return (f"EXECUTE {name}({', '.join(['%s'] * len(names))})",
+                [params[n] for n in names])
+
+    def stream(self, sql, params=None, batch_size=2000, read_only=False):
+        """Yield the rows of a query through a named (server-side) cursor.
+
+        Rows are fetched ``batch_size`` at a time, so memory stays flat
+        however many rows match.  The connection is held, in one read
+        transaction, until the generator is exhausted or closed.
+        """
+        with self.connection(read_only=read_only) as conn:
+            with conn.cursor(name='stream') as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(sql, params)
+                yield from cursor
+            conn.rollback()
+
+    def stats(self):
+        """Pool counters: checkouts, wait time, in-use and idle connections.
+
+        With replicas, also where read_only checkouts went and each
+        replica's lag and pool counters.
+        """
+        if not self.connection_pool:
+            return {}
+        stats = self.connection_pool.stats()
+        if self.replicas:
+            with self._lock:
+                stats["reads"] = dict(self._reads)
+            stats["replicas"] = [
+                dict(name=r.name, lag=r.lag, error=r.error, **r.pool.stats())
+                for r in self.replicas]
+        return stats
+
+    def close_all_connections(self):
+        """Close all connections"""
+        if self.connection_pool:
+            self.connection_pool.closeall()
+        for replica in self.replicas:
+            replica.pool.closeall()
+
+
+# Global database instance
+db = Database()
@@ -0,0 +1,634 @@
+"""
+Health and Fitness Club Management System
+Synthetic Data Generator
+
+Loads a club of any size for load tests and query tuning: members,
+trainers with weekly availability, rooms and equipment, fitness goals,
+years of health metrics, a year of classes with registrations and PT
+sessions (plus four weeks ahead), and the monthly bills and payments they
+lead to.  Scale factor 1 is 5,000 members and about 500,000 health
+metrics; every table grows linearly with it.
+
+The same seed, scale factor, as-of date and starting ids always produce
+the same rows.  Rows are numbered after the highest existing ids, so the
+sample data in DML.sql can stay, and are streamed with COPY in a single
+transaction.  They satisfy every constraint in DDL.sql: the timetable is
+laid out so no trainer or room is double-booked, and enrollment counts,
+bill balances and statuses agree with the registrations and payments
+generated alongside them.
+"""
+
+import calendar
+import random
+import tempfile
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import islice
+from time import perf_counter
+from typing import Callable, List, Optional
+
+import queries
+from database import db
+from services import (DAYS_OF_WEEK, MEMBERSHIP_FEE, PAYMENT_METHODS,
+                      PT_SESSION_RATE, ValidationError)
+
+# Rows per unit of scale factor
+MEMBERS_PER_SF = 5000
+TRAINERS_PER_SF = 20
+GROUP_ROOMS_PER_SF = 4
+PT_ROOMS_PER_SF = 8
+GYM_FLOORS_PER_SF = 1
+EQUIPMENT_PER_SF = 40
+
+# Health metrics per member on average, spread over their membership
+METRICS_PER_MEMBER = 100
+
+# Members joined over the last three years; classes and PT sessions cover
+# the last year and the next four weeks
+MEMBER_HISTORY_DAYS = 3 * 365
+SCHEDULE_HISTORY_DAYS = 365
+SCHEDULE_AHEAD_DAYS = 28
+
+# Timetable: hours classes and PT sessions start at, and the share of
+# room-hours that are booked.  Trainers work two shifts a day (06-12 and
+# 13-22) six days a week, so every slot falls inside their availability.
+CLASS_HOURS = (7, 9, 11, 17, 18, 19)
+PT_HOURS = (6, 7, 8, 9, 10, 11, 13, 14, 15, 16, 17, 18, 19, 20, 21)
+SHIFTS = (('06:00:00', '12:00:00'), ('13:00:00', '22:00:00'))
+CLASS_FILL = 0.5
+PT_FILL = 0.3
+
+# Bills fall due two weeks after the first of the month
+BILL_DUE_DAYS = 14
+
+# Every generated member and trainer can log in with this password
+PASSWORD = 'pass123'
+
+FIRST_NAMES = (
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael',
+    'Linda', 'David', 'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan',
+    'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen', 'Daniel',
+    'Nancy', 'Matthew', 'Lisa', 'Anthony', 'Betty', 'Mark', 'Sandra',
+    'Steven', 'Ashley', 'Paul', 'Emily', 'Andrew', 'Michelle', 'Joshua',
+    'Amanda', 'Kevin', 'Melissa', 'Brian', 'Stephanie', 'Omar', 'Aisha',
+    'Wei', 'Mei', 'Raj', 'Priya', 'Carlos', 'Sofia', 'Liam', 'Chloe',
+)
+LAST_NAMES = (
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller',
+    'Davis', 'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Gonzalez',
+    'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+    'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark',
+    'Ramirez', 'Lewis', 'Robinson', 'Walker', 'Young', 'Allen', 'King',
+    'Wright', 'Scott', 'Torres', 'Nguyen', 'Hill', 'Flores', 'Tremblay',
+    'Gagnon', 'Roy', 'Cote', 'Bouchard', 'Chen', 'Wang', 'Singh', 'Patel',
+    'Kim',
+)
+STREETS = ('Main St', 'Oak Ave', 'Pine Rd', 'Elm St', 'Maple Dr', 'Bank St',
+           'Rideau St', 'Preston St', 'Somerset St', 'Carling Ave')
+SPECIALIZATIONS = ('Strength Training', 'Yoga & Flexibility', 'Cardio & HIIT',
+                   'Pilates', 'Boxing', 'Spin', 'Rehabilitation', 'Nutrition')
+CLASS_NAMES = ('Morning Yoga', 'HIIT Cardio', 'Strength Training 101',
+               'Evening Yoga', 'Weekend Boot Camp', 'Spin Express', 'Pilates',
+               'Boxing Basics', 'Core Blast', 'Mobility & Stretch')
+EQUIPMENT_NAMES = ('Treadmill', 'Elliptical Machine', 'Rowing Machine',
+                   'Spin Bike', 'Weight Bench', 'Squat Rack', 'Cable Machine',
+                   'Dumbbell Set', 'Kettlebell Set', 'Yoga Mats (Set of 20)')
+EQUIPMENT_NOTES = ('Routine maintenance completed', 'Cleaned and lubricated',
+                   'Belt replacement needed', 'No issues',
+                   'All systems functioning', 'Awaiting parts')
+GOAL_TYPES = ('Weight Loss', 'Weight Gain', 'Body Fat Percentage',
+              'Run 5K Time', 'Resting Heart Rate')
+METRIC_NOTES = ('Initial measurement', 'Good progress', 'Continuing well',
+                'Plateau this month', 'Back after a break')
+SESSION_NOTES = ('Focus on upper body', 'Lower body workout',
+                 'Flexibility and core', 'Cardio assessment',
+                 'Full body introduction', 'Great session', 'Good progress')
+
+NULL = '\\N'
+
+
+@dataclass(frozen=True)
+class TableLoad:
+    table: str
+    rows: Optional[int]     # None for the derived-table rebuilds
+    seconds: float
+
+
+def _money(cents):
+    return f"{cents // 100}.{cents % 100:02d}"
+
+
+class _CopyStream:
+    """File-like reader over generated COPY text lines, for copy_expert()"""
+
+    def __init__(self, lines, batch=2000):
+        self._lines = iter(lines)
+        self._batch = batch
+        self.rows = 0
+
+    def read(self, size=-1):
+        chunk = list(islice(self._lines, self._batch))
+        self.rows += len(chunk)
+        return ''.join(chunk)
+
+
+class _Spool:
+    """Rows generated now and COPYed later, for tables made in one pass"""
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile('w+', encoding='utf-8')
+        self.rows = 0
+
+    def write(self, line):
+        self._file.write(line)
+        self.rows += 1
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def rewind(self):
+        self._file.seek(0)
+        return self
+
+    def close(self):
+        self._file.close()
+
+
+class _Generator:
+    """Row streams for one scale factor, seed and as-of date"""
+
+    def __init__(self, scale, seed, as_of, max_ids):
+        self.seed = seed
+        self.as_of = as_of.toordinal()
+        (self.member_base, self.trainer_base, self.room_base,
+         self.equipment_base, self.goal_base, self.metric_base,
+         self.availability_base, self.class_base, self.registration_base,
+         self.session_base, self.bill_base, self.payment_base) = max_ids
+
+        self.members = max(1, round(MEMBERS_PER_SF * scale))
+        self.trainers = max(2, round(TRAINERS_PER_SF * scale))
+        self.group_rooms = max(1, round(GROUP_ROOMS_PER_SF * scale))
+        self.pt_rooms = max(1, round(PT_ROOMS_PER_SF * scale))
+        self.gym_floors = max(1, round(GYM_FLOORS_PER_SF * scale))
+        self.equipment_items = max(1, round(EQUIPMENT_PER_SF * scale))
+
+        # Join days, ascending, so member n (0-based) is the n+1-th to join
+        # and the members who had joined by a day are a prefix of the ids
+        rng = self._rng('joins')
+        self.joins = sorted(self.as_of - 1 - int(rng.random() * MEMBER_HISTORY_DAYS)
+                            for _ in range(self.members))
+
+        # Months billed: the month of the earliest join through as_of's
+        month = date.fromordinal(self.joins[0]).replace(day=1)
+        self.months = []
+        while month.toordinal() <= self.as_of:
+            self.months.append(month)
+            month = (month + timedelta(days=32)).replace(day=1)
+        self.month_starts = [m.toordinal() for m in self.months]
+        self.next_month = month.toordinal()
+
+        # ISO text for every day a generated date can fall on, from the
+        # start of the first billed month (bills date from month starts)
+        self.first_day = min(self.as_of - MEMBER_HISTORY_DAYS - 1,
+                             self.month_starts[0])
+        self.days = [date.fromordinal(d).isoformat()
+                     for d in range(self.first_day,
+                                    self.as_of + SCHEDULE_AHEAD_DAYS + 1)]
+
+        # Rooms in id order: group studios, PT rooms, then gym floors
+        rng = self._rng('rooms')
+        self.group_room_ids = [self.room_base + 1 + i
+                               for i in range(self.group_rooms)]
+        self.pt_room_ids = [self.room_base + 1 + self.group_rooms + i
+                            for i in range(self.pt_rooms)]
+        self.room_capacity = {room_id: rng.choice((20, 25, 30, 40))
+                              for room_id in self.group_room_ids}
+
+        # Trainers on duty per weekday (each has one day off a week)
+        self.on_duty = [[self.trainer_base + 1 + t for t in range(self.trainers)
+                         if t % 7 != weekday] for weekday in range(7)]
+
+        # (member_id, month index) -> billable PT sessions, from schedule()
+        self.pt_sessions = {}
+
+    def _rng(self, stream):
+        return random.Random(f"{self.seed}:{stream}")
+
+    def _day(self, ordinal):
+        return self.days[ordinal - self.first_day]
+
+    def _joined_by(self, ordinal):
+        """Number of members who had joined on or before a day"""
+        return bisect_right(self.joins, ordinal)
+
+    # ------------------------------------------------------------------
+    # People, rooms and equipment
+    # ------------------------------------------------------------------
+
+    def member_rows(self):
+        rng = self._rng('members')
+        for i, joined in enumerate(self.joins):
+            member_id = self.member_base + 1 + i
+            born = self.as_of - int((18 + rng.random() * 57) * 365.25)
+            yield (f"{member_id}\tmember{member_id}@example.com\t{PASSWORD}\t"
+                   f"{rng.choice(FIRST_NAMES)}\t{rng.choice(LAST_NAMES)}\t"
+                   f"{date.fromordinal(born).isoformat()}\t"
+                   f"{'Female' if rng.random() < 0.5 else 'Male'}\t"
+                   f"613-555-{member_id % 10000:04d}\t"
+                   f"{1 + int(rng.random() * 999)} {rng.choice(STREETS)}, "
+                   f"Ottawa, ON\t{self._day(joined)}\n")
+
+    def trainer_rows(self):
+        rng = self._rng('trainers')
+        for t in range(self.trainers):
+            trainer_id = self.trainer_base + 1 + t
+            hired = self.as_of - 365 - int(rng.random() * 8 * 365)
+            yield (f"{trainer_id}\ttrainer{trainer_id}@fitness.example.com\t"
+                   f"{PASSWORD}\t{rng.choice(FIRST_NAMES)}\t"
+                   f"{rng.choice(LAST_NAMES)}\t{rng.choice(SPECIALIZATIONS)}\t"
+                   f"613-555-{trainer_id % 10000:04d}\t"
+                   f"{date.fromordinal(hired).isoformat()}\n")
+
+    def availability_rows(self):
+        availability_id = self.availability_base
+        for t in range(self.trainers):
+            for weekday, day_name in enumerate(DAYS_OF_WEEK):
+                if weekday == t % 7:
+                    continue
+                for start, end in SHIFTS:
+                    availability_id += 1
+                    yield (f"{availability_id}\t{self.trainer_base + 1 + t}\t"
+                           f"{day_name}\t{start}\t{end}\n")
+
+    def room_rows(self):
+        for n, room_id in enumerate(self.group_room_ids, 1):
+            yield (f"{room_id}\tStudio {n}\t{self.room_capacity[room_id]}\t"
+                   f"Group Class\n")
+        for n, room_id in enumerate(self.pt_room_ids, 1):
+            yield f"{room_id}\tTraining Room {n}\t2\tPersonal Training\n"
+        first_floor = self.room_base + self.group_rooms + self.pt_rooms + 1
+        for n in range(self.gym_floors):
+            yield f"{first_floor + n}\tGym Floor {n + 1}\t50\tGeneral Use\n"
+
+    def equipment_rows(self):
+        rng = self._rng('equipment')
+        rooms = self.group_rooms + self.pt_rooms + self.gym_floors
+        for n in range(self.equipment_items):
+            bought = self.as_of - 30 - int(rng.random() * 5 * 365)
+            roll = rng.random()
+            status = ('Operational' if roll < 0.9 else
+                      'Under Maintenance' if roll < 0.97 else 'Out of Service')
+            serviced = NULL
+            if rng.random() < 0.8:
+                serviced = self._day(max(self.first_day, bought + int(
+                    rng.random() * (self.as_of - bought))))
+            yield (f"{self.equipment_base + 1 + n}\t"
+                   f"{self.room_base + 1 + int(rng.random() * rooms)}\t"
+                   f"{rng.choice(EQUIPMENT_NAMES)} #{n + 1}\t"
+                   f"{date.fromordinal(bought).isoformat()}\t{status}\t"
+                   f"{serviced}\t{rng.choice(EQUIPMENT_NOTES)}\n")
+
+    # ------------------------------------------------------------------
+    # Member history
+    # ------------------------------------------------------------------
+
+    def goal_rows(self):
+        rng = self._rng('goals')
+        goal_id = self.goal_base
+        for i, joined in enumerate(self.joins):
+            for _ in range(int(rng.random() * 4)):
+                goal_id += 1
+                created = joined + int(rng.random() * (self.as_of - joined))
+                target_date = created + 30 + int(rng.random() * 335)
+                if target_date < self.as_of:
+                    roll = rng.random()
+                    status = ('Achieved' if roll < 0.4 else
+                              'Abandoned' if roll < 0.7 else 'Active')
+                else:
+                    status = 'Active'
+                current = 20 + rng.random() * 180
+                target = current * (0.8 + rng.random() * 0.4)
+                yield (f"{goal_id}\t{self.member_base + 1 + i}\t"
+                       f"{rng.choice(GOAL_TYPES)}\t{target:.2f}\t"
+                       f"{current:.2f}\t"
+                       f"{date.fromordinal(target_date).isoformat()}\t"
+                       f"{self._day(created)}\t{status}\n")
+
+    def metric_rows(self):
+        """Readings spread over each membership; longer members have more"""
+        rng = self._rng('metrics')
+        random_ = rng.random
+        days = self.days
+        first_day = self.first_day
+        mean_tenure = MEMBER_HISTORY_DAYS / 2
+        metric_id = self.metric_base
+        for i, joined in enumerate(self.joins):
+            member_id = self.member_base + 1 + i
+            tenure = self.as_of - joined
+            count = max(1, int(METRICS_PER_MEMBER * tenure / mean_tenure
+                               * (0.5 + random_())))
+            height = f"{60 + random_() * 16:.2f}"
+            weight = 110 + random_() * 150
+            fat = 12 + random_() * 20
+            note = METRIC_NOTES[0]
+            for day in sorted(joined + int(random_() * tenure)
+                              for _ in range(count)):
+                weight = min(400.0, max(90.0, weight + (random_() - 0.52) * 3))
+                fat = min(50.0, max(5.0, fat + (random_() - 0.52) * 0.6))
+                minute = int(random_() * 960)       # 06:00 to 21:59
+                metric_id += 1
+                yield (f"{metric_id}\t{member_id}\t{days[day - first_day]} "
+                       f"{6 + minute // 60:02d}:{minute % 60:02d}:00\t"
+                       f"{weight:.2f}\t{height}\t{55 + int(random_() * 40)}\t"
+                       f"{105 + int(random_() * 40)}/{65 + int(random_() * 30)}\t"
+                       f"{fat:.2f}\t{note}\n")
+                note = (METRIC_NOTES[int(random_() * len(METRIC_NOTES))]
+                        if random_() < 0.02 else NULL)
+
+    # ------------------------------------------------------------------
+    # Timetable: classes, registrations and PT sessions
+    # ------------------------------------------------------------------
+
+    def schedule(self):
+        """Generate the timetable into (classes, registrations, sessions).
+
+        Each hour, a random rotation of the trainers on duty is dealt out
+        to the booked group rooms and then the booked PT rooms, so within
+        an hour every trainer and room appears at most once.
+        """
+        rng = self._rng('schedule')
+        random_ = rng.random
+        classes, registrations, sessions = _Spool(), _Spool(), _Spool()
+        class_id = self.class_base
+        registration_id = self.registration_base
+        session_id = self.session_base
+        hours = sorted(set(CLASS_HOURS) | set(PT_HOURS))
+
+        for day in range(self.as_of - SCHEDULE_HISTORY_DAYS,
+                         self.as_of + SCHEDULE_AHEAD_DAYS):
+            when = date.fromordinal(day)
+            day_text = self._day(day)
+            past = day < self.as_of
+            duty = self.on_duty[when.weekday()]
+            # Sessions after as_of's month are not billed yet
+            month = (bisect_right(self.month_starts, day) - 1
+                     if day < self.next_month else None)
+            class_members = self._joined_by(day - 14)
+            session_members = self._joined_by(day)
+
+            for hour in hours:
+                start = f"{hour:02d}:00:00"
+                offset = int(random_() * len(duty))
+                dealt = 0
+
+                for room_id in self.group_room_ids if hour in CLASS_HOURS else ():
+                    if random_() >= CLASS_FILL or dealt == len(duty):
+                        continue
+                    trainer_id = duty[(offset + dealt) % len(duty)]
+                    dealt += 1
+                    class_id += 1
+                    capacity = min(self.room_capacity[room_id],
+                                   rng.choice((10, 15, 20, 25, 30)))
+                    roll = random_()
+                    if past:
+                        status = 'Cancelled' if roll < 0.03 else 'Completed'
+                    else:
+                        status = 'Cancelled' if roll < 0.02 else 'Scheduled'
+
+                    # First come, first seated; later claimants wait
+                    demand = min(int(capacity * (0.3 + random_() * 0.9)),
+                                 class_members)
+                    if status != 'Scheduled':
+                        demand = min(demand, capacity)
+                    starts_at = datetime(when.year, when.month, when.day, hour)
+                    claimed = sorted(
+                        starts_at - timedelta(seconds=3600 + int(random_() * 14 * 86400))
+                        for _ in range(demand))
+                    enrolled = 0
+                    for n, (member, claimed_at) in enumerate(
+                            zip(rng.sample(range(class_members), demand), claimed)):
+                        if status == 'Cancelled':
+                            outcome = 'Cancelled'
+                        elif status == 'Completed':
+                            outcome = 'Attended' if random_() < 0.88 else 'Cancelled'
+                        elif n >= capacity:
+                            outcome = 'Waitlisted'
+                        elif demand <= capacity and random_() < 0.05:
+                            outcome = 'Cancelled'
+                        else:
+                            outcome = 'Registered'
+                        enrolled += outcome in ('Registered', 'Attended')
+                        registration_id += 1
+                        registrations.write(
+                            f"{registration_id}\t{self.member_base + 1 + member}\t"
+                            f"{class_id}\t{claimed_at}\t{outcome}\n")
+
+                    end = f"{hour:02d}:45:00" if random_() < 0.5 else f"{hour + 1:02d}:00:00"
+                    classes.write(
+                        f"{class_id}\t{rng.choice(CLASS_NAMES)}\t{trainer_id}\t"
+                        f"{room_id}\t{day_text}\t{start}\t{end}\t{capacity}\t"
+                        f"{enrolled}\t{status}\n")
+
+                if hour not in PT_HOURS or not session_members:
+                    continue
+                for room_id in self.pt_room_ids:
+                    if random_() >= PT_FILL or dealt == len(duty):
+                        continue
+                    trainer_id = duty[(offset + dealt) % len(duty)]
+                    dealt += 1
+                    session_id += 1
+                    member_id = (self.member_base + 1
+                                 + int(random_() * session_members))
+                    roll = random_()
+                    if past:
+                        status = 'Cancelled' if roll < 0.08 else 'Completed'
+                    else:
+                        status = 'Cancelled' if roll < 0.05 else 'Scheduled'
+                    if status != 'Cancelled' and month is not None:
+                        key = (member_id, month)
+                        self.pt_sessions[key] = self.pt_sessions.get(key, 0) + 1
+                    notes = (rng.choice(SESSION_NOTES) if random_() < 0.3
+                             else NULL)
+                    sessions.write(
+                        f"{session_id}\t{member_id}\t{trainer_id}\t{room_id}\t"
+                        f"{day_text}\t{start}\t{hour + 1:02d}:00:00\t{status}\t"
+                        f"{notes}\n")
+
+        return classes.rewind(), registrations.rewind(), sessions.rewind()
+
+    # ------------------------------------------------------------------
+    # Billing: monthly bills and the payments that settle them
+    # ------------------------------------------------------------------
+
+    def billing(self):
+        """Generate (bills, payments), as monthly billing runs would have.
+
+        Most members pay within three weeks of the bill date; a few are
+        unreliable payers.  Bills with no full payment by as_of are
+        Pending, or Overdue once past due (as the overdue sweep leaves
+        them).  Call after schedule(), which counts the PT sessions billed.
+        """
+        rng = self._rng('billing')
+        random_ = rng.random
+        bills, payments = _Spool(), _Spool()
+        bill_id = self.bill_base
+        payment_id = self.payment_base
+        membership_cents = int(MEMBERSHIP_FEE * 100)
+        session_cents = int(PT_SESSION_RATE * 100)
+
+        def pay(bill_id, cents, day):
+            nonlocal payment_id
+            payment_id += 1
+            payments.write(
+                f"{payment_id}\t{bill_id}\t{self._day(day)} "
+                f"{8 + int(random_() * 12):02d}:{int(random_() * 60):02d}:00\t"
+                f"{_money(cents)}\t"
+                f"{PAYMENT_METHODS[int(random_() * len(PAYMENT_METHODS))]}\t"
+                f"GEN-{payment_id}\n")
+
+        for i, joined in enumerate(self.joins):
+            member_id = self.member_base + 1 + i
+            reliability = 0.6 if random_() < 0.08 else 0.97
+            for month in range(bisect_right(self.month_starts, joined) - 1,
+                               len(self.months)):
+                period = self.months[month]
+                billed = self.month_starts[month]
+                due = billed + BILL_DUE_DAYS
+                charges = [(membership_cents, 'Membership',
+                            f"Monthly Membership - "
+                            f"{calendar.month_name[period.month]} {period.year}")]
+                sessions = self.pt_sessions.get((member_id, month))
+                if sessions:
+                    charges.append((sessions * session_cents, 'PT Package',
+                                    f"Personal Training Package "
+                                    f"({sessions} sessions)"))
+
+                for cents, bill_type, description in charges:
+                    bill_id += 1
+                    paid = 0
+                    if random_() < reliability:
+                        paid_on = billed + int(random_() * 24)
+                        if paid_on <= self.as_of:
+                            if random_() < 0.05 and paid_on > billed:
+                                pay(bill_id, cents // 2, billed)
+                                pay(bill_id, cents - cents // 2, paid_on)
+                            else:
+                                pay(bill_id, cents, paid_on)
+                            paid = cents
+                    elif random_() < 0.25:
+                        paid_on = billed + int(random_() * BILL_DUE_DAYS)
+                        if paid_on <= self.as_of:
+                            paid = cents // 2
+                            pay(bill_id, paid, paid_on)
+                    status = ('Paid' if paid >= cents else
+                              'Overdue' if due < self.as_of else 'Pending')
+                    bills.write(
+                        f"{bill_id}\t{member_id}\t{self._day(billed)}\t"
+                        f"{self._day(due)}\t{_money(cents)}\t{_money(paid)}\t"
+                        f"{status}\t{description}\t{period.isoformat()}\t"
+                        f"{bill_type}\n")
+
+        return bills.rewind(), payments.rewind()
+
+
+def generate(scale=1.0, seed=1, as_of=None,
+             progress: Optional[Callable[[TableLoad], None]] = None
+             ) -> List[TableLoad]:
+    """Load a synthetic club at ``scale`` (1 = 5,000 members).
+
+    Runs in one transaction with the per-row triggers switched off (see
+    DATAGEN_TRIGGERS_OFF), so the tables are locked until it commits.
+    ``progress`` is called with each TableLoad as it finishes.
+    """
+    if scale <= 0:
+        raise ValidationError("Scale factor must be positive!")
+    as_of = as_of or date.today()
+    loads = []
+    mark = perf_counter()
+
+    def finished(table, rows):
+        nonlocal mark
+        now = perf_counter()
+        load = TableLoad(table, rows, now - mark)
+        mark = now
+        loads.append(load)
+        if progress:
+            progress(load)
+
+    with db.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(queries.DATAGEN_MAX_IDS)
+            gen = _Generator(scale, seed, as_of, cursor.fetchone())
+            cursor.execute(queries.DATAGEN_TRIGGERS_OFF)
+
+            def copy(table, statement, source):
+                cursor.copy_expert(statement, source, size=1 << 16)
+                finished(table, source.rows)
+
+            copy('Member', queries.DATAGEN_COPY_MEMBERS,
+                 _CopyStream(gen.member_rows()))
+            copy('Trainer', queries.DATAGEN_COPY_TRAINERS,
+                 _CopyStream(gen.trainer_rows()))
+            copy('TrainerAvailability', queries.DATAGEN_COPY_AVAILABILITY,
+                 _CopyStream(gen.availability_rows()))
+            copy('Room', queries.DATAGEN_COPY_ROOMS,
+                 _CopyStream(gen.room_rows()))
+            copy('Equipment', queries.DATAGEN_COPY_EQUIPMENT,
+                 _CopyStream(gen.equipment_rows()))
+            copy('FitnessGoal', queries.DATAGEN_COPY_GOALS,
+                 _CopyStream(gen.goal_rows()))
+
+            cursor.execute(queries.DATAGEN_METRIC_PARTITIONS, {
+                "first_day": date.fromordinal(gen.first_day),
+                "last_day": date.fromordinal(gen.as_of)})
+            cursor.execute(queries.DATAGEN_METRIC_COUNT)
+            defer = cursor.fetchone()[0] < gen.members * METRICS_PER_MEMBER
+            if defer:
+                cursor.execute(queries.DATAGEN_DEFER_KEYS)
+
+            copy('HealthMetric', queries.DATAGEN_COPY_METRICS,
+                 _CopyStream(gen.metric_rows()))
+
+            spools = gen.schedule() + gen.billing()
+            try:
+                for table, statement, spool in zip(
+                        ('Class', 'ClassRegistration', 'PersonalTrainingSession',
+                         'Bill', 'Payment'),
+                        (queries.DATAGEN_COPY_CLASSES,
+                         queries.DATAGEN_COPY_REGISTRATIONS,
+                         queries.DATAGEN_COPY_SESSIONS,
+                         queries.DATAGEN_COPY_BILLS,
+                         queries.DATAGEN_COPY_PAYMENTS),
+                        spools):
+                    copy(table, statement, spool)
+            finally:
+                for spool in spools:
+                    spool.close()
+
+            if defer:
+                cursor.execute(queries.DATAGEN_RESTORE_KEYS)
+                finished('keys and indexes', None)
+
+            cursor.execute(queries.DATAGEN_SESSION_BOOKINGS,
+                           {"after": gen.session_base})
+            booked = cursor.rowcount
+            cursor.execute(queries.DATAGEN_CLASS_BOOKINGS,
+                           {"after": gen.class_base})
+            finished('ResourceBooking', booked + cursor.rowcount)
+            cursor.execute(queries.DATAGEN_SUMMARY)
+            finished('MemberSummary', None)
+            cursor.execute(queries.DATAGEN_ROLLUPS, {"after": gen.member_base})
+            finished('HealthMetric rollups', None)
+
+            cursor.execute(queries.DATAGEN_TRIGGERS_ON)
+            cursor.execute(queries.DATAGEN_SEQUENCES)
+            cursor.execute(queries.DATAGEN_NOTIFY)
+        conn.commit()
+
+        # Planner statistics, after the commit so the tables unlock sooner
+        with conn.cursor() as cursor:
+            cursor.execute(queries.DATAGEN_ANALYZE)
+        conn.commit()
+        finished('ANALYZE', None)
+    return loads
@@ -0,0 +1,406 @@
+"""
+Health and Fitness Club Management System
+Health Metric Ingestion
+
+Takes readings from wearables at a rate a commit per reading could not
+keep up with.  submit() only timestamps a reading and appends it to a
+bounded buffer; a background thread takes up to ``batch_size`` readings
+at a time, as soon as that many are waiting or the oldest has waited
+``flush_interval`` seconds, validates them and writes the batch in one
+transaction (COPY through a staging table, or one execute_values
+INSERT).  When the buffer is full, submit() waits up to its timeout for
+room and then raises IngestBusy, so producers are slowed to the rate the
+database sustains instead of the buffer growing without bound.  The
+writer holds its own connection, outside the pool.
+"""
+
+import io
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+import queries
+from database import DB_CONFIG
+
+BATCH_SIZE = 1000
+FLUSH_INTERVAL = 0.2        # seconds the oldest buffered reading may wait
+MAX_BUFFER = 10000
+SUBMIT_TIMEOUT = 1.0        # seconds submit() waits for room
+WRITE_ATTEMPTS = 3          # per batch, when the connection is lost
+
+METHODS = ('copy', 'values')
+
+# Plausible ranges (pounds, inches, bpm, percent); anything outside is a
+# sensor or unit error and is rejected
+RANGES = {
+    'weight': (Decimal('40'), Decimal('999.99')),
+    'height': (Decimal('20'), Decimal('108')),
+    'heart_rate': (25, 250),
+    'body_fat_percentage': (Decimal('1'), Decimal('75')),
+}
+MEASUREMENTS = ('weight', 'height', 'heart_rate', 'blood_pressure',
+                'body_fat_percentage')
+FIELDS = ('member_id', 'recorded_date') + MEASUREMENTS + ('notes',)
+BLOOD_PRESSURE = re.compile(r'^\d{2,3}/\d{2,3}$')
+MAX_NOTES = 500
+
+# Device clocks drift: allow readings slightly ahead of the server, and
+# late uploads from a device that was offline for a while
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+MAX_READING_AGE = timedelta(days=90)
+
+
+class IngestError(Exception):
+    """Raised when the ingester cannot take readings"""
+
+
+class IngestBusy(IngestError):
+    """Raised when the buffer stayed full for the whole submit timeout"""
+
+
+def _number(value, kind, name):
+    low, high = RANGES[name]
+    try:
+        number = kind(value) if kind is int else Decimal(str(value))
+    except (TypeError, ValueError, InvalidOperation):
+        raise ValueError(f"{name} is not a number")
+    if kind is int and isinstance(value, float) and value != number:
+        raise ValueError(f"{name} is not a number")
+    if not low <= number <= high:
+        raise ValueError(f"{name} out of range")
+    return number if kind is int else number.quantize(Decimal('0.01'))
+
+
+def clean(reading, received_at):
+    """Validated row tuple (in INGEST_* column order) for one reading, or
+    ValueError naming the reason it was rejected"""
+    if not isinstance(reading, dict):
+        raise ValueError("reading is not an object")
+    unknown = set(reading) - set(FIELDS)
+    if unknown:
+        raise ValueError("unknown field")
+
+    member_id = reading.get('member_id')
+    if isinstance(member_id, bool) or not isinstance(member_id, int) \
+            or member_id <= 0:
+        raise ValueError("bad member_id")
+
+    recorded = reading.get('recorded_date')
+    if recorded is None:
+        recorded = received_at
+    elif not isinstance(recorded, datetime):
+        try:
+            recorded = datetime.fromisoformat(str(recorded))
+        except ValueError:
+            raise ValueError("bad recorded_date")
+    if recorded.tzinfo is not None:
+        recorded = recorded.astimezone().replace(tzinfo=None)
+    if recorded > received_at + MAX_CLOCK_SKEW:
+        raise ValueError("recorded_date in the future")
+    if recorded < received_at - MAX_READING_AGE:
+        raise ValueError("recorded_date too old")
+
+    if all(reading.get(m) is None for m in MEASUREMENTS):
+        raise ValueError("no measurements")
+    weight, height, heart_rate, body_fat = (
+        None if reading.get(name) is None
+        else _number(reading[name], kind, name)
+        for name, kind in (('weight', Decimal), ('height', Decimal),
+                           ('heart_rate', int),
+                           ('body_fat_percentage', Decimal)))
+    pressure = reading.get('blood_pressure')
+    if pressure is not None and not BLOOD_PRESSURE.match(str(pressure)):
+        raise ValueError("bad blood_pressure")
+    notes = reading.get('notes')
+    if notes is not None:
+        notes = str(notes)[:MAX_NOTES]
+    return (member_id, recorded, weight, height, heart_rate, pressure,
+            body_fat, notes)
+
+
+def _copy_field(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, str):
+        return (value.replace('\\', '\\\\').replace('\t', '\\t')
+                .replace('\n', '\\n').replace('\r', '\\r'))
+    return str(value)
+
+
+class MetricIngester:
+    """Bounded buffer of readings drained in batches by a writer thread.
+
+    ``method`` is 'copy' (COPY into a temp table, then one INSERT ...
+    SELECT) or 'values' (one execute_values INSERT).  Either way a batch
+    is one transaction, and readings for unknown members are dropped and
+    counted rather than failing the batch.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 max_buffer=MAX_BUFFER, timeout=SUBMIT_TIMEOUT, method='copy',
+                 **connect_kwargs):
+        if method not in METHODS:
+            raise ValueError(f"method must be one of: {', '.join(METHODS)}")
+        if not 0 < batch_size <= max_buffer:
+            raise ValueError("require 0 < batch_size <= max_buffer")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.timeout = timeout
+        self.method = method
+        self._connect_kwargs = dict(DB_CONFIG, **connect_kwargs)
+
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)    # writer: work due
+        self._space = threading.Condition(self._lock)    # producers: room
+        self._idle = threading.Condition(self._lock)     # flush(): drained
+        self._buffer = deque()      # (queued_at, received_at, reading)
+        self._writing = 0           # readings taken but not yet committed
+        self._flushers = 0          # callers waiting in flush()
+        self._stopping = False
+        self._thread = None
+        self._conn = None
+
+        self._submitted = 0
+        self._written = 0
+        self._rejected = Counter()  # reason -> readings
+        self._failed = 0
+        self._batches = 0
+        self._waits = 0
+        self._refused = 0
+        self._peak = 0
+        self._write_time = 0.0
+        self._max_delay = 0.0       # queued to committed, seconds
+        self._last_error = None
+
+    # ------------------------------------------------------------------
+    # Producers
+    # ------------------------------------------------------------------
+
+    def submit(self, reading, timeout=None):
+        """Queue one reading (a dict of FIELDS); see submit_many()"""
+        self.submit_many((reading,), timeout)
+
+    def submit_many(self, readings, timeout=None):
+        """Queue readings all together, waiting up to ``timeout`` seconds
+        (0: not at all) for room in the buffer; raises IngestBusy if there
+        is still none.  Validation happens later, on the writer thread.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        readings = list(readings)
+        if len(readings) > self.max_buffer:
+            raise IngestError(f"at most {self.max_buffer} readings at once")
+        received_at = datetime.now()
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            waited = False
+            while len(self._buffer) + len(readings) > self.max_buffer:
+                if self._stopping:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._refused += len(readings)
+                    raise IngestBusy(
+                        f"ingest buffer full ({len(self._buffer)} readings)")
+                if not waited:
+                    self._waits += 1
+                    waited = True
+                self._space.wait(remaining)
+            if self._stopping:
+                raise IngestError("ingester is stopped")
+
+            before = len(self._buffer)
+            queued_at = time.monotonic()
+            self._buffer.extend((queued_at, received_at, r) for r in readings)
+            self._submitted += len(readings)
+            self._peak = max(self._peak, len(self._buffer))
+            if before == 0 or before < self.batch_size <= len(self._buffer):
+                self._ready.notify()
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Write batches from a daemon thread until stop()"""
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='ingest',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=30.0):
+        """Refuse new readings, write what is buffered, then stop"""
+        with self._lock:
+            self._stopping = True
+            self._ready.notify()
+            self._space.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def flush(self, timeout=None):
+        """Wait until every reading submitted so far is written (or
+        rejected); returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._flushers += 1
+            self._ready.notify()
+            try:
+                while self._buffer or self._writing:
+                    remaining = (None if deadline is None
+                                 else deadline - time.monotonic())
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._idle.wait(remaining)
+            finally:
+                self._flushers -= 1
+        return True
+
+    def _take(self):
+        """Next batch, once one is due; None when stopped and drained"""
+        with self._lock:
+            while True:
+                if self._buffer:
+                    due = self._buffer[0][0] + self.flush_interval
+                    now = time.monotonic()
+                    # Someone in flush() does not wait for the timer
+                    if (len(self._buffer) >= self.batch_size
+                            or self._stopping or self._flushers
+                            or now >= due):
+                        break
+                    self._ready.wait(due - now)
+                elif self._stopping:
+                    return None
+                else:
+                    self._ready.wait()
+            count = min(self.batch_size, len(self._buffer))
+            batch = [self._buffer.popleft() for _ in range(count)]
+            self._writing = count
+            self._space.notify_all()
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            if batch is None:
+                break
+            self._write(batch)
+            with self._lock:
+                self._writing = 0
+                if not self._buffer:
+                    self._idle.notify_all()
+
+    def _connect(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg2.connect(**self._connect_kwargs)
+            if self.method == 'copy':
+                with self._conn.cursor() as cursor:
+                    cursor.execute(queries.INGEST_STAGE)
+                self._conn.commit()
+        return self._conn
+
+    def _insert(self, conn, rows):
+        """Write one batch; returns the readings inserted"""
+        with conn.cursor() as cursor:
+            if self.method == 'values':
+                execute_values(cursor, queries.INGEST_VALUES, rows,
+                               template=queries.INGEST_VALUES_TEMPLATE,
+                               page_size=len(rows))
+            else:
+                data = io.StringIO(''.join(
+                    '\t'.join(_copy_field(v) for v in row) + '\n'
+                    for row in rows))
+                cursor.copy_expert(queries.INGEST_COPY, data)
+                cursor.execute(queries.INGEST_STAGED)
+            inserted = cursor.rowcount
+        conn.commit()
+        return inserted
+
+    def _write(self, batch):
+        started = time.monotonic()
+        rows = []
+        rejected = Counter()
+        for _, received_at, reading in batch:
+            try:
+                rows.append(clean(reading, received_at))
+            except ValueError as e:
+                rejected[str(e)] += 1
+
+        inserted = failed = 0
+        error = None
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            if not rows:
+                break
+            try:
+                inserted = self._insert(self._connect(), rows)
+                break
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                # Connection lost: reconnect and retry the whole batch
+                error = e
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+                if attempt == WRITE_ATTEMPTS:
+                    failed = len(rows)
+                else:
+                    time.sleep(0.1 * 2 ** attempt)
+            except psycopg2.Error as e:
+                error = e
+                self._conn.rollback()
+                failed = len(rows)
+                break
+        if error is not None:
+            print(f"Ingest write failed: {error}".strip(), file=sys.stderr)
+        if rows and not failed and inserted < len(rows):
+            rejected["unknown member"] += len(rows) - inserted
+
+        now = time.monotonic()
+        with self._lock:
+            self._batches += 1
+            self._written += inserted
+            self._rejected.update(rejected)
+            self._failed += failed
+            self._write_time += now - started
+            if inserted:
+                self._max_delay = max(self._max_delay, now - batch[0][0])
+            if error is not None:
+                self._last_error = f"{type(error).__name__}: {error}".strip()
+
+    def stats(self):
+        """Snapshot of ingest counters"""
+        with self._lock:
+            return {
+                "running": bool(self._thread and self._thread.is_alive()),
+                "method": self.method,
+                "buffered": len(self._buffer),
+                "buffer_peak": self._peak,
+                "max_buffer": self.max_buffer,
+                "submitted": self._submitted,
+                "written": self._written,
+                "rejected": sum(self._rejected.values()),
+                "rejected_by_reason": dict(self._rejected),
+                "failed": self._failed,
+                "batches": self._batches,
+                "avg_batch": (round((self._written + self._failed
+                                     + sum(self._rejected.values()))
+                                    / self._batches, 1)
+                              if self._batches else 0.0),
+                "backpressure_waits": self._waits,
+                "refused": self._refused,
+                "write_time_total": round(self._write_time, 3),
+                "max_delay": round(self._max_delay, 3),
+                "last_error": self._last_error,
+            }
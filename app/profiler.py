@@ -0,0 +1,325 @@
+"""
+Health and Fitness Club Management System
+Query Profiler
+
+Optional instrumentation for the connection pool.  Pass a QueryProfiler to
+db.initialize_pool() and every pooled cursor times its execute() and
+copy_expert() calls, and every checkout records its pool wait.  Statements
+are grouped by fingerprint: the queries.py constant name when the SQL is
+one of those, otherwise the text with whitespace collapsed and literals
+replaced by '?'.  For each fingerprint the profiler keeps call, error and
+row counts and a latency histogram (p50/p95/p99 are estimated from it).
+Statements slower than ``slow_ms`` go to the slow-query log, optionally
+with their EXPLAIN (ANALYZE, BUFFERS) plan.  snapshot(), to_json() and
+to_prometheus() dump the counters.
+"""
+
+import json
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+
+from psycopg2 import extensions, sql
+
+# Histogram bucket upper bounds (ms): 0.05 ms to ~21 s, each 1.5x the last,
+# so a percentile read from the buckets is within about 25% of the truth
+BUCKETS_MS = tuple(round(0.05 * 1.5 ** i, 4) for i in range(33))
+
+# Slow statements kept in memory for snapshot()
+SLOW_LOG_SIZE = 100
+
+# Statements EXPLAIN can take; everything else (SAVEPOINT, COPY, SET, ...)
+# is logged without a plan
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'VALUES',
+                'EXECUTE')
+
+# Registered statements (Database.prepare) run as EXECUTE NAME(...)
+_PREPARED = re.compile(r"(EXECUTE|PREPARE) (\w+)")
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+
+class Histogram:
+    """Latency counts per BUCKETS_MS bucket, plus an overflow bucket"""
+    __slots__ = ('counts', 'count', 'sum_ms', 'max_ms')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, p):
+        """Estimate by linear interpolation inside the bucket"""
+        if not self.count:
+            return 0.0
+        rank = p * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = BUCKETS_MS[i - 1] if i else 0.0
+                high = BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max_ms
+                return min(low + (high - low) * (rank - seen) / n, self.max_ms)
+            seen += n
+        return self.max_ms
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.sum_ms, 3),
+            "mean_ms": round(self.sum_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.50), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+class QueryStats:
+    """Counters for one statement fingerprint"""
+    __slots__ = ('calls', 'errors', 'rows', 'latency', 'explained_at')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.latency = Histogram()
+        self.explained_at = None
+
+
+class ProfilingCursor(extensions.cursor):
+    """psycopg2 cursor that reports each statement to ``profiler``"""
+    profiler = None
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            result = super().execute(query, vars)
+        except Exception:
+            self.profiler.record(self, query, vars,
+                                 time.perf_counter() - started, error=True)
+            raise
+        self.profiler.record(self, query, vars, time.perf_counter() - started)
+        return result
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            result = super().copy_expert(sql, file, size)
+        except Exception:
+            self.profiler.record(self, sql, None,
+                                 time.perf_counter() - started, error=True)
+            raise
+        self.profiler.record(self, sql, None, time.perf_counter() - started)
+        return result
+
+
+class QueryProfiler:
+    """Per-fingerprint statement statistics and a slow-query log.
+
+    ``slow_ms``: statements at least this slow are logged (to memory, and
+    as JSON lines to ``slow_log`` if given).  ``explain``: also capture the
+    plan of slow statements, at most once per fingerprint every
+    ``explain_interval`` seconds.  The plan comes from EXPLAIN (ANALYZE,
+    BUFFERS), which re-runs the statement inside a read-only savepoint
+    that is rolled back.  A statement that writes cannot run there, so it
+    gets a plain EXPLAIN.
+    """
+
+    def __init__(self, slow_ms=100.0, slow_log=None, explain=False,
+                 explain_interval=60.0):
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self.cursor_class = type('ProfilingCursor', (ProfilingCursor,),
+                                 {'profiler': self})
+
+        self._lock = threading.Lock()
+        self._stats = {}                # fingerprint -> QueryStats
+        self._pool_wait = Histogram()
+        self._slow = deque(maxlen=SLOW_LOG_SIZE)
+        self._slow_count = 0
+        self._fingerprints = {}         # SQL text -> fingerprint
+        self._names = self._query_names()
+        self._started = datetime.now()
+
+    @staticmethod
+    def _query_names():
+        """Normalized SQL -> constant name for every statement in queries.py"""
+        try:
+            import queries
+        except ImportError:
+            return {}
+        return {' '.join(text.split()): name
+                for name, text in vars(queries).items()
+                if name.isupper() and isinstance(text, str)}
+
+    def fingerprint(self, query, cursor=None):
+        if isinstance(query, sql.Composable):
+            query = query.as_string(cursor)
+        elif isinstance(query, bytes):
+            query = query.decode()
+        found = self._fingerprints.get(query)
+        if found is None:
+            text = ' '.join(query.split())
+            found = self._names.get(text)
+            prepared = _PREPARED.match(text)
+            if prepared:
+                command, name = prepared.groups()
+                found = name if command == 'EXECUTE' else f"PREPARE {name}"
+            elif found is None:
+                found = _NUMBER.sub('?', _STRING.sub('?', text))
+            if len(self._fingerprints) < 10000:
+                self._fingerprints[query] = found
+        return found
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def record(self, cursor, query, vars, seconds, error=False):
+        ms = seconds * 1000
+        key = self.fingerprint(query, cursor)
+        rows = 0 if error else max(cursor.rowcount, 0)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = QueryStats()
+            stats.calls += 1
+            stats.errors += error
+            stats.rows += rows
+            stats.latency.add(ms)
+            if error or ms < self.slow_ms:
+                return
+            self._slow_count += 1
+            now = time.monotonic()
+            explain = self.explain and (
+                stats.explained_at is None
+                or now - stats.explained_at >= self.explain_interval)
+            if explain:
+                stats.explained_at = now
+
+        entry = {
+            "time": datetime.now().isoformat(timespec='milliseconds'),
+            "query": key,
+            "ms": round(ms, 3),
+            "rows": rows,
+            "params": repr(vars)[:500] if vars is not None else None,
+        }
+        if explain:
+            entry["plan"] = self._explain(cursor, query, vars)
+        with self._lock:
+            self._slow.append(entry)
+            if self.slow_log:
+                with open(self.slow_log, 'a') as f:
+                    f.write(json.dumps(entry, default=str) + '\n')
+
+    def record_pool_wait(self, seconds):
+        with self._lock:
+            self._pool_wait.add(seconds * 1000)
+
+    def _explain(self, cursor, query, vars):
+        """Plan lines for a just-run statement, or None if not explainable"""
+        conn = cursor.connection
+        statement = cursor.mogrify(query, vars).decode()
+        if (not statement.lstrip().upper().startswith(_EXPLAINABLE)
+                or conn.autocommit
+                or conn.get_transaction_status()
+                != extensions.TRANSACTION_STATUS_INTRANS):
+            return None
+        with conn.cursor(cursor_factory=extensions.cursor) as c:
+            for options in ('ANALYZE, BUFFERS', 'COSTS'):
+                c.execute("SAVEPOINT profiler_explain")
+                try:
+                    if options.startswith('ANALYZE'):
+                        c.execute("SET LOCAL transaction_read_only = on")
+                    c.execute(f"EXPLAIN ({options}) {statement}")
+                    return [r[0] for r in c.fetchall()]
+                except Exception:
+                    continue
+                finally:
+                    c.execute("ROLLBACK TO SAVEPOINT profiler_explain")
+                    c.execute("RELEASE SAVEPOINT profiler_explain")
+        return None
+
+    # ------------------------------------------------------------------
+    # Output
+    # ------------------------------------------------------------------
+
+    def snapshot(self):
+        """Counters as plain data, most total time first"""
+        with self._lock:
+            queries = []
+            for key, s in self._stats.items():
+                latency = s.latency.summary()
+                del latency["count"]
+                queries.append(dict(query=key, calls=s.calls, errors=s.errors,
+                                    rows=s.rows, **latency))
+            pool_wait = self._pool_wait.summary()
+            slow = list(self._slow)
+            slow_count = self._slow_count
+        queries.sort(key=lambda q: q["total_ms"], reverse=True)
+        return {
+            "since": self._started.isoformat(timespec='seconds'),
+            "slow_ms": self.slow_ms,
+            "queries": queries,
+            "pool_wait": pool_wait,
+            "slow_queries": slow_count,
+            "slow_log": slow,
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, default=str)
+
+    def to_prometheus(self):
+        """Prometheus text exposition format"""
+        def label(value):
+            return (value.replace('\\', '\\\\').replace('"', '\\"')
+                    .replace('\n', '\\n'))
+
+        def histogram(lines, name, hist, labels):
+            cumulative = 0
+            for bound, n in zip(BUCKETS_MS + (None,), hist.counts):
+                cumulative += n
+                le = '+Inf' if bound is None else repr(bound / 1000)
+                lines.append(f'{name}_bucket{{{labels}le="{le}"}} {cumulative}')
+            tail = '{' + labels.rstrip(',') + '}' if labels else ''
+            lines.append(f'{name}_sum{tail} {hist.sum_ms / 1000}')
+            lines.append(f'{name}_count{tail} {hist.count}')
+
+        lines = [
+            '# HELP fitness_query_duration_seconds Statement latency',
+            '# TYPE fitness_query_duration_seconds histogram',
+        ]
+        with self._lock:
+            stats = sorted(self._stats.items())
+            for key, s in stats:
+                histogram(lines, 'fitness_query_duration_seconds', s.latency,
+                          f'query="{label(key)}",')
+            for metric, help_text, attr in (
+                    ('fitness_query_errors_total', 'Statements that raised',
+                     'errors'),
+                    ('fitness_query_rows_total', 'Rows returned or affected',
+                     'rows')):
+                lines += [f'# HELP {metric} {help_text}',
+                          f'# TYPE {metric} counter']
+                lines += [f'{metric}{{query="{label(key)}"}} '
+                          f'{getattr(s, attr)}' for key, s in stats]
+            lines += ['# HELP fitness_pool_wait_seconds Connection checkout wait',
+                      '# TYPE fitness_pool_wait_seconds histogram']
+            histogram(lines, 'fitness_pool_wait_seconds', self._pool_wait, '')
+            lines += ['# HELP fitness_slow_queries_total Statements over slow_ms',
+                      '# TYPE fitness_slow_queries_total counter',
+                      f'fitness_slow_queries_total {self._slow_count}']
+        return '\n'.join(lines) + '\n'
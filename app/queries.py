@@ -0,0 +1,1221 @@
+"""
+Health and Fitness Club Management System
+SQL Statements
+
+Every statement the application runs, named once so that the service
+layer, the API and tooling share the same text.  Parameters use the
+psycopg2 named style: %(name)s.
+"""
+
+# ============================================================================
+# AUTHENTICATION
+# ============================================================================
+
+MEMBER_LOGIN = """
+    SELECT member_id, first_name, last_name
+    FROM Member
+    WHERE email = %(email)s AND password = %(password)s
+"""
+
+TRAINER_LOGIN = """
+    SELECT trainer_id, first_name, last_name
+    FROM Trainer
+    WHERE email = %(email)s AND password = %(password)s
+"""
+
+ADMIN_LOGIN = """
+    SELECT admin_id, first_name, last_name
+    FROM AdminStaff
+    WHERE email = %(email)s AND password = %(password)s
+"""
+
+# ============================================================================
+# MEMBER
+# ============================================================================
+
+MEMBER_EMAIL_EXISTS = """
+    SELECT email FROM Member WHERE email = %(email)s
+"""
+
+MEMBER_INSERT = """
+    INSERT INTO Member (email, password, first_name, last_name, date_of_birth,
+                        gender, phone, address)
+    VALUES (%(email)s, %(password)s, %(first_name)s, %(last_name)s,
+            %(date_of_birth)s, %(gender)s, %(phone)s, %(address)s)
+    RETURNING member_id
+"""
+
+MEMBER_UPDATE_CONTACT = """
+    UPDATE Member
+    SET phone = COALESCE(%(phone)s, phone),
+        address = COALESCE(%(address)s, address)
+    WHERE member_id = %(member_id)s
+"""
+
+FITNESS_GOAL_INSERT = """
+    INSERT INTO FitnessGoal (member_id, goal_type, target_value,
+                             current_value, target_date, status)
+    VALUES (%(member_id)s, %(goal_type)s, %(target_value)s,
+            %(current_value)s, %(target_date)s, 'Active')
+    RETURNING goal_id
+"""
+
+HEALTH_METRIC_INSERT = """
+    INSERT INTO HealthMetric (member_id, weight, height, heart_rate,
+                              blood_pressure, body_fat_percentage, notes)
+    VALUES (%(member_id)s, %(weight)s, %(height)s, %(heart_rate)s,
+            %(blood_pressure)s, %(body_fat_percentage)s, %(notes)s)
+    RETURNING metric_id
+"""
+
+MEMBER_DASHBOARD = """
+    SELECT first_name, last_name, email, latest_weight, latest_heart_rate,
+           last_metric_date, active_goals, upcoming_sessions,
+           classes_attended, pending_balance
+    FROM MemberDashboard
+    WHERE member_id = %(member_id)s
+"""
+
+MEMBER_ACTIVE_GOALS = """
+    SELECT goal_type, current_value, target_value, target_date
+    FROM FitnessGoal
+    WHERE member_id = %(member_id)s AND status = 'Active'
+"""
+
+MEMBER_UPCOMING_SESSIONS = """
+    SELECT session_date, start_time, end_time,
+           t.first_name || ' ' || t.last_name as trainer_name,
+           r.room_name
+    FROM PersonalTrainingSession pts
+    JOIN Trainer t ON pts.trainer_id = t.trainer_id
+    JOIN Room r ON pts.room_id = r.room_id
+    WHERE pts.member_id = %(member_id)s
+      AND pts.session_date >= CURRENT_DATE
+      AND pts.status = 'Scheduled'
+    ORDER BY session_date, start_time
+    LIMIT %(limit)s
+"""
+
+MEMBER_DETAILS = """
+    SELECT m.member_id, m.first_name, m.last_name, m.email, m.date_of_birth,
+           m.phone
+    FROM Member m
+    WHERE m.member_id = %(member_id)s
+"""
+
+# Kept current by the HealthMetric summary trigger, so the latest reading
+# is a primary-key lookup rather than a probe of every monthly partition
+MEMBER_LATEST_METRIC = """
+    SELECT latest_weight, latest_heart_rate, last_metric_date
+    FROM MemberSummary
+    WHERE member_id = %(member_id)s AND last_metric_date IS NOT NULL
+"""
+
+# Trend charts read the rollups (see HealthMetricDaily in DDL.sql): one
+# primary-key range scan, one row per day or week with readings
+HEALTH_TREND_DAILY = """
+    SELECT day, readings,
+           ROUND(weight_sum / NULLIF(weight_count, 0), 2),
+           weight_min, weight_max,
+           ROUND(heart_rate_sum::numeric / NULLIF(heart_rate_count, 0), 1),
+           heart_rate_min, heart_rate_max,
+           ROUND(body_fat_sum / NULLIF(body_fat_count, 0), 2),
+           body_fat_min, body_fat_max
+    FROM HealthMetricDaily
+    WHERE member_id = %(member_id)s
+      AND day BETWEEN %(first_day)s AND %(last_day)s
+    ORDER BY day
+"""
+
+HEALTH_TREND_WEEKLY = """
+    SELECT week, readings,
+           ROUND(weight_sum / NULLIF(weight_count, 0), 2),
+           weight_min, weight_max,
+           ROUND(heart_rate_sum::numeric / NULLIF(heart_rate_count, 0), 1),
+           heart_rate_min, heart_rate_max,
+           ROUND(body_fat_sum / NULLIF(body_fat_count, 0), 2),
+           body_fat_min, body_fat_max
+    FROM HealthMetricWeekly
+    WHERE member_id = %(member_id)s
+      AND week BETWEEN %(first_day)s AND %(last_day)s
+    ORDER BY week
+"""
+
+HEALTH_METRIC_PARTITIONS = """
+    SELECT create_health_metric_partitions(%(first_day)s, %(last_day)s)
+"""
+
+# Wearable ingestion (ingest.py): each batch is one INSERT, so the rollup
+# and summary triggers fire once per batch.  Readings of unknown members
+# are dropped here instead of failing the whole batch on the foreign key.
+# For psycopg2.extras.execute_values; the casts type the NULLs
+INGEST_VALUES = """
+    INSERT INTO HealthMetric (member_id, recorded_date, weight, height,
+                              heart_rate, blood_pressure,
+                              body_fat_percentage, notes)
+    SELECT v.*
+    FROM (VALUES %s) AS v (member_id, recorded_date, weight, height,
+                           heart_rate, blood_pressure,
+                           body_fat_percentage, notes)
+    WHERE EXISTS (SELECT 1 FROM Member m WHERE m.member_id = v.member_id)
+"""
+
+INGEST_VALUES_TEMPLATE = """
+    (%s::int, %s::timestamp, %s::numeric, %s::numeric, %s::int,
+     %s::varchar, %s::numeric, %s::text)
+"""
+
+# COPY path: stage the batch in a session temp table, then insert it
+INGEST_STAGE = """
+    CREATE TEMP TABLE IF NOT EXISTS metric_ingest (
+        member_id INT,
+        recorded_date TIMESTAMP,
+        weight DECIMAL(5, 2),
+        height DECIMAL(5, 2),
+        heart_rate INT,
+        blood_pressure VARCHAR(20),
+        body_fat_percentage DECIMAL(5, 2),
+        notes TEXT
+    ) ON COMMIT DELETE ROWS
+"""
+
+INGEST_COPY = """
+    COPY metric_ingest FROM STDIN
+"""
+
+INGEST_STAGED = """
+    INSERT INTO HealthMetric (member_id, recorded_date, weight, height,
+                              heart_rate, blood_pressure,
+                              body_fat_percentage, notes)
+    SELECT s.*
+    FROM metric_ingest s
+    WHERE EXISTS (SELECT 1 FROM Member m WHERE m.member_id = s.member_id)
+"""
+
+# ============================================================================
+# PERSONAL TRAINING
+# ============================================================================
+
+TRAINER_LIST = """
+    SELECT trainer_id, first_name, last_name, specialization
+    FROM Trainer
+    ORDER BY trainer_id
+"""
+
+# Serializes bookings for one trainer for the rest of the transaction, so
+# concurrent requests queue here instead of racing the checks below.
+# Key class 1 is reserved for PT bookings.
+TRAINER_BOOKING_LOCK = """
+    SELECT pg_advisory_xact_lock(1, %(trainer_id)s)
+"""
+
+# Availability check, trainer conflict check, room pick and insert in one
+# statement.  Inserts nothing if any check fails; the exclusion constraints
+# on ResourceBooking still reject anything that slips past (a concurrent
+# class, or another trainer's session taking the same room).
+SESSION_BOOK = """
+    WITH slot AS (
+        SELECT tsrange(%(session_date)s::date + %(start_time)s::time,
+                       %(session_date)s::date + %(end_time)s::time) AS period
+    )
+    INSERT INTO PersonalTrainingSession
+        (member_id, trainer_id, room_id, session_date, start_time, end_time, status)
+    SELECT %(member_id)s::int, %(trainer_id)s::int, r.room_id,
+           %(session_date)s::date, %(start_time)s::time, %(end_time)s::time,
+           'Scheduled'
+    FROM slot, Room r
+    WHERE r.room_type = 'Personal Training'
+      AND EXISTS (
+          SELECT 1 FROM TrainerAvailability a
+          WHERE a.trainer_id = %(trainer_id)s
+            AND a.day_of_week = %(day_of_week)s
+            AND a.available_hours @> timerange(%(start_time)s::time,
+                                               %(end_time)s::time)
+      )
+      AND NOT EXISTS (
+          SELECT 1 FROM ResourceBooking b
+          WHERE (b.trainer_id = %(trainer_id)s OR b.room_id = r.room_id)
+            AND b.period && slot.period
+      )
+    ORDER BY r.room_id
+    LIMIT 1
+    RETURNING session_id, room_id
+"""
+
+# Why SESSION_BOOK inserted nothing: (trainer available, trainer busy)
+BOOKING_BLOCKERS = """
+    SELECT EXISTS (
+               SELECT 1 FROM TrainerAvailability
+               WHERE trainer_id = %(trainer_id)s
+                 AND day_of_week = %(day_of_week)s
+                 AND available_hours @> timerange(%(start_time)s::time,
+                                                  %(end_time)s::time)),
+           EXISTS (
+               SELECT 1 FROM ResourceBooking
+               WHERE trainer_id = %(trainer_id)s
+                 AND period && tsrange(%(session_date)s::date + %(start_time)s::time,
+                                       %(session_date)s::date + %(end_time)s::time))
+"""
+
+SLOT_TRAINER_WINDOWS = """
+    SELECT t.trainer_id, t.first_name || ' ' || t.last_name AS trainer_name,
+           a.day_of_week, a.start_time, a.end_time
+    FROM Trainer t
+    JOIN TrainerAvailability a ON a.trainer_id = t.trainer_id
+    WHERE (%(trainer_id)s::int IS NULL OR t.trainer_id = %(trainer_id)s::int)
+      AND (%(specialization)s::text IS NULL
+           OR t.specialization ILIKE '%%' || %(specialization)s::text || '%%')
+"""
+
+TRAINING_ROOMS = """
+    SELECT room_id FROM Room
+    WHERE room_type = 'Personal Training'
+      AND (%(room_id)s::int IS NULL OR room_id = %(room_id)s::int)
+    ORDER BY room_id
+"""
+
+SLOT_BUSY_PERIODS = """
+    SELECT trainer_id, room_id, lower(period), upper(period)
+    FROM ResourceBooking
+    WHERE period && tsrange(%(first_day)s::date, %(last_day)s::date + 1)
+      AND (trainer_id = ANY(%(trainer_ids)s::int[])
+           OR room_id = ANY(%(room_ids)s::int[]))
+"""
+
+# Keyset-paginated lists end each row with its sort key, which
+# services.build_page() strips off and turns into the next page's cursor.
+# The %(after_*)s / %(before_*)s parameters are the previous page's last key
+# (services.PAGE_KEYS gives the first page's), so every page is a range scan
+# from where the last one stopped instead of an OFFSET that re-reads it.
+
+# ============================================================================
+# GROUP CLASSES
+# ============================================================================
+
+OPEN_CLASSES = """
+    SELECT c.class_id, c.class_name, c.schedule_date, c.start_time, c.end_time,
+           t.first_name || ' ' || t.last_name as trainer_name,
+           c.current_enrollment, c.capacity,
+           (c.capacity - c.current_enrollment) as spots_left,
+           (SELECT COUNT(*) FROM ClassRegistration r
+            WHERE r.class_id = c.class_id AND r.status = 'Waitlisted') as waitlisted,
+           c.schedule_date, c.start_time, c.class_id
+    FROM Class c
+    JOIN Trainer t ON c.trainer_id = t.trainer_id
+    WHERE c.schedule_date >= CURRENT_DATE
+      AND c.status = 'Scheduled'
+      AND (c.schedule_date, c.start_time, c.class_id)
+          > (%(after_date)s, %(after_time)s, %(after_id)s)
+    ORDER BY c.schedule_date, c.start_time, c.class_id
+    LIMIT %(limit)s
+"""
+
+# Seat or waitlist place in one call; see claim_class_seat() in DDL.sql
+CLASS_SEAT_CLAIM = """
+    SELECT registration_id, status, waitlist_position
+    FROM claim_class_seat(%(member_id)s, %(class_id)s)
+"""
+
+# Taken before cancelling so a waitlist promotion cannot pick a row that is
+# being cancelled at the same time
+CLASS_LOCK = """
+    SELECT class_id FROM Class WHERE class_id = %(class_id)s FOR NO KEY UPDATE
+"""
+
+# Cancelling a 'Registered' row promotes the head of the waitlist (trigger)
+CLASS_REGISTRATION_CANCEL = """
+    UPDATE ClassRegistration SET status = 'Cancelled'
+    WHERE member_id = %(member_id)s AND class_id = %(class_id)s
+      AND status IN ('Registered', 'Waitlisted')
+    RETURNING registration_id
+"""
+
+# ----------------------------------------------------------------------------
+# Class templates: a weekly class for a season, expanded into Class rows
+
+CLASS_TEMPLATE_INSERT = """
+    INSERT INTO ClassTemplate (class_name, trainer_id, room_id, day_of_week,
+                               start_time, end_time, capacity, season_start,
+                               season_end)
+    VALUES (%(class_name)s, %(trainer_id)s, %(room_id)s, %(day_of_week)s,
+            %(start_time)s, %(end_time)s, %(capacity)s, %(season_start)s,
+            %(season_end)s)
+    RETURNING template_id
+"""
+
+# Templates whose season has not ended, with how many weeks are expanded
+CLASS_TEMPLATES = """
+    SELECT ct.template_id, ct.class_name,
+           t.first_name || ' ' || t.last_name as trainer_name, r.room_name,
+           ct.day_of_week, ct.start_time, ct.end_time, ct.capacity,
+           ct.season_start, ct.season_end,
+           (SELECT COUNT(*) FROM Class c
+            WHERE c.template_id = ct.template_id) as expanded
+    FROM ClassTemplate ct
+    LEFT JOIN Trainer t ON t.trainer_id = ct.trainer_id
+    LEFT JOIN Room r ON r.room_id = ct.room_id
+    WHERE ct.season_end >= %(as_of)s
+    ORDER BY ct.season_start, ct.template_id
+"""
+
+# Serializes expansion with PT bookings (TRAINER_BOOKING_LOCK) for every
+# trainer involved, in a fixed order so two expansions cannot deadlock
+CLASS_TEMPLATE_LOCK = """
+    SELECT pg_advisory_xact_lock(1, trainer_id)
+    FROM (SELECT DISTINCT trainer_id FROM ClassTemplate
+          WHERE template_id = ANY(%(template_ids)s::int[])
+            AND trainer_id IS NOT NULL
+          ORDER BY trainer_id) t
+"""
+
+# Every week of the templates' seasons inside [first_day, last_day] that
+# has no Class row yet, checked for clashes in one pass and inserted with
+# one INSERT.  Bookings never cross midnight, so the check joins on day:
+# one range read of ResourceBooking for the whole window, hash-joined to
+# the occurrences by (trainer, day) and (room, day), and the occurrences
+# joined to themselves the same way for templates that clash with each
+# other.
+# Clashing occurrences are skipped (both sides of a template pair) and
+# returned as JSON; with %(dry_run)s nothing is inserted.  Returns
+# (templates found, inserted, occurrences, clashes).  The exclusion constraints on
+# ResourceBooking still reject anything booked concurrently.
+CLASS_TEMPLATE_EXPAND = """
+    WITH template AS (
+        SELECT ct.*,
+               GREATEST(ct.season_start, %(first_day)s::date) AS first_day,
+               LEAST(ct.season_end, %(last_day)s::date) AS last_day,
+               array_position(ARRAY['Monday', 'Tuesday', 'Wednesday',
+                                    'Thursday', 'Friday', 'Saturday',
+                                    'Sunday'], ct.day_of_week) AS isodow
+        FROM ClassTemplate ct
+        WHERE ct.template_id = ANY(%(template_ids)s::int[])
+    ),
+    occurrence AS MATERIALIZED (
+        SELECT t.template_id, t.class_name, t.trainer_id, t.room_id,
+               d.day, t.start_time, t.end_time, t.capacity,
+               tsrange(d.day + t.start_time, d.day + t.end_time) AS period
+        FROM template t
+        CROSS JOIN LATERAL (
+            SELECT day::date
+            FROM generate_series(
+                t.first_day + (t.isodow - extract(isodow FROM t.first_day)::int
+                               + 7) %% 7,
+                t.last_day, interval '7 days') day
+        ) d
+        WHERE NOT EXISTS (SELECT 1 FROM Class c
+                          WHERE c.template_id = t.template_id
+                            AND c.schedule_date = d.day)
+    ),
+    booked AS MATERIALIZED (
+        SELECT trainer_id, room_id, class_id, session_id, period,
+               lower(period)::date AS day
+        FROM ResourceBooking
+        WHERE period && (SELECT tsrange(MIN(first_day), MAX(last_day) + 1)
+                         FROM template)
+    ),
+    clash AS (
+        SELECT o.template_id, o.day, 'trainer' AS resource,
+               COALESCE('class ' || b.class_id,
+                        'session ' || b.session_id) AS clash_with
+        FROM occurrence o
+        JOIN booked b ON b.trainer_id = o.trainer_id AND b.day = o.day
+                     AND b.period && o.period
+        UNION ALL
+        SELECT o.template_id, o.day, 'room',
+               COALESCE('class ' || b.class_id, 'session ' || b.session_id)
+        FROM occurrence o
+        JOIN booked b ON b.room_id = o.room_id AND b.day = o.day
+                     AND b.period && o.period
+        UNION ALL
+        SELECT a.template_id, a.day, 'trainer', 'template ' || b.template_id
+        FROM occurrence a
+        JOIN occurrence b ON b.trainer_id = a.trainer_id AND b.day = a.day
+                         AND b.template_id <> a.template_id
+                         AND b.period && a.period
+        UNION ALL
+        SELECT a.template_id, a.day, 'room', 'template ' || b.template_id
+        FROM occurrence a
+        JOIN occurrence b ON b.room_id = a.room_id AND b.day = a.day
+                         AND b.template_id <> a.template_id
+                         AND b.period && a.period
+    ),
+    inserted AS (
+        INSERT INTO Class (class_name, trainer_id, room_id, schedule_date,
+                           start_time, end_time, capacity, template_id)
+        SELECT o.class_name, o.trainer_id, o.room_id, o.day, o.start_time,
+               o.end_time, o.capacity, o.template_id
+        FROM occurrence o
+        WHERE NOT %(dry_run)s
+          AND NOT EXISTS (SELECT 1 FROM clash x
+                          WHERE x.template_id = o.template_id
+                            AND x.day = o.day)
+        ORDER BY o.day, o.start_time
+        RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM template),
+           (SELECT COUNT(*) FROM inserted),
+           (SELECT COUNT(*) FROM occurrence),
+           (SELECT COALESCE(json_agg(x), '[]')::text
+            FROM (SELECT DISTINCT x.template_id, t.class_name, x.day,
+                         t.start_time, x.resource, x.clash_with
+                  FROM clash x JOIN template t USING (template_id)
+                  ORDER BY x.day, t.start_time, x.template_id, x.resource,
+                           x.clash_with) x)
+"""
+
+# ============================================================================
+# TRAINER
+# ============================================================================
+
+# Overlapping windows are rejected by the no_overlap exclusion constraint
+AVAILABILITY_INSERT = """
+    INSERT INTO TrainerAvailability (trainer_id, day_of_week, start_time, end_time)
+    VALUES (%(trainer_id)s, %(day_of_week)s, %(start_time)s, %(end_time)s)
+    RETURNING availability_id
+"""
+
+TRAINER_UPCOMING_SESSIONS = """
+    SELECT pts.session_date, pts.start_time, pts.end_time,
+           m.first_name || ' ' || m.last_name as member_name,
+           r.room_name, pts.status, pts.notes,
+           pts.session_date, pts.start_time, pts.session_id
+    FROM PersonalTrainingSession pts
+    JOIN Member m ON pts.member_id = m.member_id
+    JOIN Room r ON pts.room_id = r.room_id
+    WHERE pts.trainer_id = %(trainer_id)s
+      AND pts.session_date >= CURRENT_DATE
+      AND pts.status = 'Scheduled'
+      AND (pts.session_date, pts.start_time, pts.session_id)
+          > (%(after_date)s, %(after_time)s, %(after_id)s)
+    ORDER BY pts.session_date, pts.start_time, pts.session_id
+    LIMIT %(limit)s
+"""
+
+TRAINER_UPCOMING_CLASSES = """
+    SELECT c.class_name, c.schedule_date, c.start_time, c.end_time,
+           r.room_name, c.current_enrollment, c.capacity,
+           c.schedule_date, c.start_time, c.class_id
+    FROM Class c
+    JOIN Room r ON c.room_id = r.room_id
+    WHERE c.trainer_id = %(trainer_id)s
+      AND c.schedule_date >= CURRENT_DATE
+      AND c.status = 'Scheduled'
+      AND (c.schedule_date, c.start_time, c.class_id)
+          > (%(after_date)s, %(after_time)s, %(after_id)s)
+    ORDER BY c.schedule_date, c.start_time, c.class_id
+    LIMIT %(limit)s
+"""
+
+TRAINER_AVAILABILITY = """
+    SELECT day_of_week, start_time, end_time
+    FROM TrainerAvailability
+    WHERE trainer_id = %(trainer_id)s
+    ORDER BY
+        CASE day_of_week
+            WHEN 'Monday' THEN 1
+            WHEN 'Tuesday' THEN 2
+            WHEN 'Wednesday' THEN 3
+            WHEN 'Thursday' THEN 4
+            WHEN 'Friday' THEN 5
+            WHEN 'Saturday' THEN 6
+            WHEN 'Sunday' THEN 7
+        END,
+        start_time
+"""
+
+# ----------------------------------------------------------------------------
+# Member search: pg_trgm word similarity against full name and email.  The
+# <% operator is served by the trigram GIN indexes and matches when the
+# query is similar to some run of words in the name or email (so "smyth"
+# finds Smith); its cut-off is set per transaction by MEMBER_SEARCH_THRESHOLD.
+# Best match first, ties broken by name so pages are stable.
+# ----------------------------------------------------------------------------
+
+MEMBER_SEARCH_THRESHOLD = """
+    SELECT set_config('pg_trgm.word_similarity_threshold', %(threshold)s, true)
+"""
+
+MEMBER_SEARCH = """
+    SELECT m.member_id, m.first_name, m.last_name, m.email,
+           GREATEST(word_similarity(%(query)s, m.first_name || ' ' || m.last_name),
+                    word_similarity(%(query)s, m.email)) AS score
+    FROM Member m
+    WHERE %(query)s <%% (m.first_name || ' ' || m.last_name)
+       OR %(query)s <%% m.email
+    ORDER BY score DESC, m.last_name, m.first_name, m.member_id
+    LIMIT %(limit)s OFFSET %(offset)s
+"""
+
+# Only members who have had a session with the trainer
+TRAINER_MEMBER_SEARCH = """
+    SELECT m.member_id, m.first_name, m.last_name, m.email,
+           GREATEST(word_similarity(%(query)s, m.first_name || ' ' || m.last_name),
+                    word_similarity(%(query)s, m.email)) AS score
+    FROM Member m
+    WHERE m.member_id IN (SELECT member_id FROM PersonalTrainingSession
+                          WHERE trainer_id = %(trainer_id)s)
+      AND (%(query)s <%% (m.first_name || ' ' || m.last_name)
+           OR %(query)s <%% m.email)
+    ORDER BY score DESC, m.last_name, m.first_name, m.member_id
+    LIMIT %(limit)s OFFSET %(offset)s
+"""
+
+# ============================================================================
+# ADMIN
+# ============================================================================
+
+ROOM_SCHEDULE_CLASSES = """
+    SELECT r.room_name, c.class_name, c.start_time, c.end_time,
+           t.first_name || ' ' || t.last_name as trainer,
+           r.room_name, c.start_time, c.class_id
+    FROM Class c
+    JOIN Room r ON c.room_id = r.room_id
+    JOIN Trainer t ON c.trainer_id = t.trainer_id
+    WHERE c.schedule_date = %(day)s AND c.status = 'Scheduled'
+      AND (r.room_name, c.start_time, c.class_id)
+          > (%(after_room)s, %(after_time)s, %(after_id)s)
+    ORDER BY r.room_name, c.start_time, c.class_id
+    LIMIT %(limit)s
+"""
+
+ROOM_SCHEDULE_SESSIONS = """
+    SELECT r.room_name, pts.start_time, pts.end_time,
+           t.first_name || ' ' || t.last_name as trainer,
+           m.first_name || ' ' || m.last_name as member,
+           r.room_name, pts.start_time, pts.session_id
+    FROM PersonalTrainingSession pts
+    JOIN Room r ON pts.room_id = r.room_id
+    JOIN Trainer t ON pts.trainer_id = t.trainer_id
+    JOIN Member m ON pts.member_id = m.member_id
+    WHERE pts.session_date = %(day)s AND pts.status = 'Scheduled'
+      AND (r.room_name, pts.start_time, pts.session_id)
+          > (%(after_room)s, %(after_time)s, %(after_id)s)
+    ORDER BY r.room_name, pts.start_time, pts.session_id
+    LIMIT %(limit)s
+"""
+
+# Equipment needing attention first: status rank 1 = Under Maintenance,
+# 2 = Out of Service, 3 = Operational
+EQUIPMENT_LIST = """
+    SELECT * FROM (
+        SELECT e.equipment_id, e.equipment_name, r.room_name, e.status,
+               e.last_maintenance_date, e.maintenance_notes,
+               CASE e.status WHEN 'Under Maintenance' THEN 1
+                             WHEN 'Out of Service' THEN 2
+                             ELSE 3 END as status_rank,
+               e.equipment_name as sort_name, e.equipment_id as sort_id
+        FROM Equipment e
+        LEFT JOIN Room r ON e.room_id = r.room_id
+    ) e
+    WHERE (status_rank, sort_name, sort_id)
+          > (%(after_rank)s, %(after_name)s, %(after_id)s)
+    ORDER BY status_rank, sort_name, sort_id
+    LIMIT %(limit)s
+"""
+
+EQUIPMENT_UPDATE_STATUS = """
+    UPDATE Equipment
+    SET status = %(status)s,
+        maintenance_notes = %(notes)s,
+        last_maintenance_date = CURRENT_DATE
+    WHERE equipment_id = %(equipment_id)s
+"""
+
+# ============================================================================
+# BILLING
+# ============================================================================
+
+BILL_INSERT = """
+    INSERT INTO Bill (member_id, due_date, total_amount, description)
+    VALUES (%(member_id)s, CURRENT_DATE + %(due_days)s::int,
+            %(amount)s, %(description)s)
+    RETURNING bill_id
+"""
+
+# Month-end run: a membership bill for every member who had joined by the
+# end of the period, plus a PT package bill for each member's scheduled or
+# completed sessions in it.  Members already billed for the period are
+# skipped via idx_bill_period, so the run can safely be repeated.
+# Returns (bill_type, candidates, created, amount) per bill type.
+BILLING_RUN = """
+    WITH period AS (
+        SELECT %(period)s::date AS first_day,
+               (%(period)s::date + INTERVAL '1 month')::date AS next_month
+    ), charges AS (
+        SELECT m.member_id, 'Membership' AS bill_type,
+               %(membership_fee)s::numeric AS amount,
+               'Monthly Membership - ' || to_char(p.first_day, 'FMMonth YYYY')
+                   AS description
+        FROM Member m, period p
+        WHERE m.registration_date < p.next_month
+        UNION ALL
+        SELECT s.member_id, 'PT Package', COUNT(*) * %(session_rate)s::numeric,
+               'Personal Training Package (' || COUNT(*) || ' sessions)'
+        FROM PersonalTrainingSession s, period p
+        WHERE s.session_date >= p.first_day AND s.session_date < p.next_month
+          AND s.status IN ('Scheduled', 'Completed')
+          AND s.member_id IS NOT NULL
+        GROUP BY s.member_id
+    ), billed AS (
+        INSERT INTO Bill (member_id, bill_date, due_date, total_amount,
+                          description, billing_period, bill_type)
+        SELECT c.member_id, CURRENT_DATE, CURRENT_DATE + %(due_days)s::int,
+               c.amount, c.description, p.first_day, c.bill_type
+        FROM charges c, period p
+        ON CONFLICT (member_id, bill_type, billing_period)
+            WHERE billing_period IS NOT NULL DO NOTHING
+        RETURNING bill_type, total_amount
+    )
+    SELECT t.bill_type,
+           (SELECT COUNT(*) FROM charges c WHERE c.bill_type = t.bill_type),
+           COUNT(b.bill_type),
+           COALESCE(SUM(b.total_amount), 0)
+    FROM (VALUES ('Membership'), ('PT Package')) t (bill_type)
+    LEFT JOIN billed b ON b.bill_type = t.bill_type
+    GROUP BY t.bill_type
+    ORDER BY t.bill_type
+"""
+
+# Both statements below read idx_bill_unpaid (partial, unpaid bills only)
+OVERDUE_SWEEP = """
+    UPDATE Bill SET status = 'Overdue'
+    WHERE status = 'Pending' AND due_date < %(as_of)s::date
+"""
+
+# Unpaid balance by days past due, per member plus a grand total row
+# (member_id NULL, first), in one aggregate pass.  Bills not yet due fall
+# in the 0-30 bucket.
+AR_AGING = """
+    SELECT member_id,
+           COALESCE(SUM(balance) FILTER (WHERE days_late <= 30), 0),
+           COALESCE(SUM(balance) FILTER (WHERE days_late BETWEEN 31 AND 60), 0),
+           COALESCE(SUM(balance) FILTER (WHERE days_late BETWEEN 61 AND 90), 0),
+           COALESCE(SUM(balance) FILTER (WHERE days_late > 90), 0),
+           SUM(balance) AS total
+    FROM (
+        SELECT member_id, total_amount - amount_paid AS balance,
+               %(as_of)s::date - due_date AS days_late
+        FROM Bill
+        WHERE status IN ('Pending', 'Overdue')
+    ) unpaid
+    GROUP BY GROUPING SETS ((member_id), ())
+    ORDER BY GROUPING(member_id) DESC, total DESC, member_id
+    LIMIT %(limit)s::int + 1
+"""
+
+BILL_BALANCE = """
+    SELECT total_amount, amount_paid, status
+    FROM Bill
+    WHERE bill_id = %(bill_id)s
+"""
+
+PAYMENT_INSERT = """
+    INSERT INTO Payment (bill_id, amount, payment_method, transaction_reference)
+    VALUES (%(bill_id)s, %(amount)s, %(method)s, %(reference)s)
+    RETURNING payment_id
+"""
+
+# ----------------------------------------------------------------------------
+# Bulk payment import: COPY into a staging table, then match and settle in
+# one statement (update_bill_status settles all bills in a single UPDATE)
+# ----------------------------------------------------------------------------
+
+# Key class 2: one import at a time, so two imports never lock the same
+# bills in different orders
+PAYMENT_IMPORT_LOCK = """
+    SELECT pg_advisory_xact_lock(2, 0)
+"""
+
+PAYMENT_IMPORT_STAGE = """
+    CREATE TEMP TABLE payment_import (
+        line_no BIGSERIAL,
+        bill_id INT,
+        amount DECIMAL(10, 2),
+        payment_date TIMESTAMP,
+        payment_method VARCHAR(50),
+        transaction_reference VARCHAR(100)
+    ) ON COMMIT DROP
+"""
+
+PAYMENT_IMPORT_COPY = """
+    COPY payment_import (bill_id, amount, payment_date, payment_method,
+                         transaction_reference)
+    FROM STDIN WITH (FORMAT csv, HEADER true)
+"""
+
+# Temp tables are never auto-analyzed; without stats the settle plans blind
+PAYMENT_IMPORT_ANALYZE = """
+    ANALYZE payment_import
+"""
+
+# Returns (problem, rows, first data row) per outcome -- problem NULL for the
+# imported rows -- plus a ('bills settled', count, NULL) row.  A reference
+# already recorded, or repeated earlier in the file, is a duplicate.  Only
+# rows that are otherwise valid are numbered for repeats, so a line rejected
+# for another reason does not make a later copy of its reference a duplicate.
+PAYMENT_IMPORT_SETTLE = """
+    WITH checked AS (
+        SELECT i.line_no, i.bill_id, i.amount, i.payment_date,
+               i.payment_method, i.transaction_reference,
+               CASE
+                   WHEN i.bill_id IS NULL OR i.amount IS NULL
+                        OR i.payment_method IS NULL THEN 'missing field'
+                   WHEN i.amount <= 0 THEN 'non-positive amount'
+                   WHEN i.payment_method <> ALL(%(methods)s) THEN 'invalid payment method'
+                   WHEN b.bill_id IS NULL THEN 'unknown bill'
+                   WHEN EXISTS (
+                        SELECT 1 FROM Payment p
+                        WHERE p.transaction_reference = i.transaction_reference)
+                        THEN 'duplicate reference'
+               END AS problem
+        FROM payment_import i
+        LEFT JOIN Bill b ON b.bill_id = i.bill_id
+    ), numbered AS (
+        SELECT line_no, bill_id, amount, payment_date, payment_method,
+               transaction_reference,
+               CASE
+                   WHEN problem IS NOT NULL THEN problem
+                   WHEN transaction_reference IS NOT NULL
+                        AND row_number() OVER (
+                                PARTITION BY problem IS NULL, transaction_reference
+                                ORDER BY line_no) > 1
+                        THEN 'duplicate reference'
+               END AS problem
+        FROM checked
+    ), settled AS (
+        INSERT INTO Payment (bill_id, payment_date, amount, payment_method,
+                             transaction_reference)
+        SELECT bill_id, COALESCE(payment_date, CURRENT_TIMESTAMP), amount,
+               payment_method, transaction_reference
+        FROM numbered
+        WHERE problem IS NULL
+        RETURNING bill_id
+    )
+    SELECT problem, COUNT(*), MIN(line_no) FROM numbered GROUP BY problem
+    UNION ALL
+    SELECT 'bills settled', COUNT(DISTINCT bill_id), NULL FROM settled
+"""
+
+# Newest first; bill_date is nullable, so undated bills sort last
+MEMBER_BILLS = """
+    SELECT bill_id, bill_date, due_date, total_amount, amount_paid,
+           status, description,
+           COALESCE(bill_date, DATE '0001-01-01') as sort_date, bill_id
+    FROM Bill
+    WHERE member_id = %(member_id)s
+      AND (COALESCE(bill_date, DATE '0001-01-01'), bill_id)
+          < (%(before_date)s, %(before_id)s)
+    ORDER BY COALESCE(bill_date, DATE '0001-01-01') DESC, bill_id DESC
+    LIMIT %(limit)s
+"""
+
+# ----------------------------------------------------------------------------
+# Exports: full listings streamed through a named server-side cursor
+# (db.stream), so memory stays flat however many rows match.  NULL filters
+# match everything.
+# ----------------------------------------------------------------------------
+
+EXPORT_SESSIONS = """
+    SELECT pts.session_id, pts.session_date, pts.start_time, pts.end_time,
+           pts.trainer_id, t.first_name || ' ' || t.last_name as trainer,
+           pts.member_id, m.first_name || ' ' || m.last_name as member,
+           r.room_name, pts.status, pts.notes
+    FROM PersonalTrainingSession pts
+    JOIN Trainer t ON pts.trainer_id = t.trainer_id
+    JOIN Member m ON pts.member_id = m.member_id
+    JOIN Room r ON pts.room_id = r.room_id
+    WHERE pts.session_date BETWEEN %(first_day)s AND %(last_day)s
+      AND (%(trainer_id)s::int IS NULL OR pts.trainer_id = %(trainer_id)s)
+      AND (%(member_id)s::int IS NULL OR pts.member_id = %(member_id)s)
+    ORDER BY pts.session_date, pts.start_time, pts.session_id
+"""
+
+EXPORT_CLASSES = """
+    SELECT c.class_id, c.schedule_date, c.start_time, c.end_time,
+           c.class_name, c.trainer_id,
+           t.first_name || ' ' || t.last_name as trainer, r.room_name,
+           c.current_enrollment, c.capacity, c.status
+    FROM Class c
+    LEFT JOIN Trainer t ON c.trainer_id = t.trainer_id
+    LEFT JOIN Room r ON c.room_id = r.room_id
+    WHERE c.schedule_date BETWEEN %(first_day)s AND %(last_day)s
+      AND (%(trainer_id)s::int IS NULL OR c.trainer_id = %(trainer_id)s)
+    ORDER BY c.schedule_date, c.start_time, c.class_id
+"""
+
+EXPORT_BILLS = """
+    SELECT bill_id, member_id, bill_date, due_date, bill_type, billing_period,
+           total_amount, amount_paid, status, description
+    FROM Bill
+    WHERE COALESCE(bill_date, due_date) BETWEEN %(first_day)s AND %(last_day)s
+      AND (%(member_id)s::int IS NULL OR member_id = %(member_id)s)
+    ORDER BY bill_date, bill_id
+"""
+
+EXPORT_EQUIPMENT = """
+    SELECT e.equipment_id, e.equipment_name, r.room_name, e.status,
+           e.last_maintenance_date, e.maintenance_notes
+    FROM Equipment e
+    LEFT JOIN Room r ON e.room_id = r.room_id
+    ORDER BY e.equipment_id
+"""
+
+
+# ============================================================================
+# SCREENS
+# ============================================================================
+# ----------------------------------------------------------------------------
+# Each screen in one round trip: the statements above run as subqueries of
+# one SELECT.  A screen's header row keeps its native columns; each list
+# comes back as the json_agg of its rows, cast to text so the caller can
+# decode numbers as Decimal (services.json_rows).  Row objects keep their
+# columns in select order, duplicated key columns included, and json_agg
+# takes each sorted subquery's rows in order.  Lists on one screen share
+# their first-page keyset parameters and page size.
+# ----------------------------------------------------------------------------
+
+MEMBER_DASHBOARD_SCREEN = f"""
+    SELECT d.*,
+           (SELECT COALESCE(json_agg(g), '[]')::text
+            FROM ({MEMBER_ACTIVE_GOALS}) g),
+           (SELECT COALESCE(json_agg(s), '[]')::text
+            FROM ({MEMBER_UPCOMING_SESSIONS}) s)
+    FROM ({MEMBER_DASHBOARD}) d
+"""
+
+MEMBER_PROFILE_SCREEN = f"""
+    SELECT d.*, l.*,
+           (SELECT COALESCE(json_agg(g), '[]')::text
+            FROM ({MEMBER_ACTIVE_GOALS}) g)
+    FROM ({MEMBER_DETAILS}) d
+    LEFT JOIN ({MEMBER_LATEST_METRIC}) l ON true
+"""
+
+TRAINER_SCHEDULE_SCREEN = f"""
+    SELECT (SELECT COALESCE(json_agg(s), '[]')::text
+            FROM ({TRAINER_UPCOMING_SESSIONS}) s),
+           (SELECT COALESCE(json_agg(c), '[]')::text
+            FROM ({TRAINER_UPCOMING_CLASSES}) c),
+           (SELECT COALESCE(json_agg(a), '[]')::text
+            FROM ({TRAINER_AVAILABILITY}) a)
+"""
+
+ROOM_SCHEDULE_SCREEN = f"""
+    SELECT (SELECT COALESCE(json_agg(c), '[]')::text
+            FROM ({ROOM_SCHEDULE_CLASSES}) c),
+           (SELECT COALESCE(json_agg(s), '[]')::text
+            FROM ({ROOM_SCHEDULE_SESSIONS}) s)
+"""
+
+
+# ============================================================================
+# PREPARED STATEMENTS
+# ============================================================================
+
+# Run on every login, dashboard visit, booking and class listing.  The
+# services register these with db.prepare() and run them with
+# db.execute(), so each connection parses them once.  Parameters must be
+# typed by their context: PREPARE infers the types once for all calls.
+PREPARED = (
+    'MEMBER_LOGIN', 'TRAINER_LOGIN', 'ADMIN_LOGIN',
+    'MEMBER_DASHBOARD_SCREEN', 'MEMBER_PROFILE_SCREEN',
+    'TRAINER_SCHEDULE_SCREEN', 'ROOM_SCHEDULE_SCREEN',
+    'TRAINER_BOOKING_LOCK', 'SESSION_BOOK', 'BOOKING_BLOCKERS',
+    'OPEN_CLASSES', 'CLASS_SEAT_CLAIM',
+)
+
+
+# ============================================================================
+# INDEX AUDIT (audit.py)
+# ============================================================================
+
+# Sample parameters: the member with the most bills, the busiest trainer,
+# class and room, so each statement is planned for its heaviest real call
+AUDIT_SAMPLES = """
+    WITH m AS (
+        SELECT member_id FROM Bill
+        GROUP BY member_id
+        ORDER BY COUNT(*) DESC, member_id
+        LIMIT 1
+    )
+    SELECT m.member_id,
+           (SELECT email FROM Member WHERE member_id = m.member_id),
+           (SELECT trainer_id FROM PersonalTrainingSession
+            WHERE trainer_id IS NOT NULL
+            GROUP BY trainer_id ORDER BY COUNT(*) DESC, trainer_id LIMIT 1),
+           (SELECT class_id FROM ClassRegistration
+            GROUP BY class_id ORDER BY COUNT(*) DESC, class_id LIMIT 1),
+           (SELECT room_id FROM Class
+            WHERE room_id IS NOT NULL
+            GROUP BY room_id ORDER BY COUNT(*) DESC, room_id LIMIT 1),
+           (SELECT MAX(bill_id) FROM Bill WHERE member_id = m.member_id),
+           (SELECT MIN(equipment_id) FROM Equipment)
+    FROM (SELECT 1) one
+    LEFT JOIN m ON TRUE
+"""
+
+# Planner row estimates per table (and per partition)
+AUDIT_TABLE_ROWS = """
+    SELECT relname::text, GREATEST(reltuples, 0)::bigint
+    FROM pg_class
+    WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace
+"""
+
+# Foreign keys whose columns no full index leads with (in any order).
+# Partition clones of a parent's key are left out; the parent's row
+# count is the sum of its partitions'.
+AUDIT_UNINDEXED_FOREIGN_KEYS = """
+    SELECT t.relname::text, c.conname::text, pg_get_constraintdef(c.oid),
+           GREATEST(t.reltuples,
+                    (SELECT SUM(p.reltuples)
+                     FROM pg_inherits h
+                     JOIN pg_class p ON p.oid = h.inhrelid
+                     WHERE h.inhparent = t.oid), 0)::bigint AS rows
+    FROM pg_constraint c
+    JOIN pg_class t ON t.oid = c.conrelid
+    WHERE c.contype = 'f'
+      AND c.conparentid = 0
+      AND t.relnamespace = 'public'::regnamespace
+      AND NOT EXISTS (
+          SELECT 1
+          FROM pg_index i
+          WHERE i.indrelid = c.conrelid
+            AND i.indpred IS NULL
+            AND (string_to_array(i.indkey::text, ' ')::int2[])
+                    [1:cardinality(c.conkey)] @> c.conkey
+            AND (string_to_array(i.indkey::text, ' ')::int2[])
+                    [1:cardinality(c.conkey)] <@ c.conkey)
+    ORDER BY rows DESC, t.relname, c.conname
+"""
+
+
+# ============================================================================
+# SYNTHETIC DATA (datagen.py)
+# ============================================================================
+
+# Highest id in use per table; generated rows are numbered after these
+DATAGEN_MAX_IDS = """
+    SELECT (SELECT COALESCE(MAX(member_id), 0) FROM Member),
+           (SELECT COALESCE(MAX(trainer_id), 0) FROM Trainer),
+           (SELECT COALESCE(MAX(room_id), 0) FROM Room),
+           (SELECT COALESCE(MAX(equipment_id), 0) FROM Equipment),
+           (SELECT COALESCE(MAX(goal_id), 0) FROM FitnessGoal),
+           (SELECT COALESCE(MAX(metric_id), 0) FROM HealthMetric),
+           (SELECT COALESCE(MAX(availability_id), 0) FROM TrainerAvailability),
+           (SELECT COALESCE(MAX(class_id), 0) FROM Class),
+           (SELECT COALESCE(MAX(registration_id), 0) FROM ClassRegistration),
+           (SELECT COALESCE(MAX(session_id), 0) FROM PersonalTrainingSession),
+           (SELECT COALESCE(MAX(bill_id), 0) FROM Bill),
+           (SELECT COALESCE(MAX(payment_id), 0) FROM Payment)
+"""
+
+# The generator writes the rows the triggers would otherwise derive
+# (enrollment counts, bill settlement) and rebuilds MemberSummary and
+# ResourceBooking set-based afterwards, so per-row triggers stay off during
+# the load.  Constraint checks, foreign keys included, stay on.
+DATAGEN_TRIGGERS_OFF = """
+    ALTER TABLE Member DISABLE TRIGGER USER;
+    ALTER TABLE Equipment DISABLE TRIGGER USER;
+    ALTER TABLE FitnessGoal DISABLE TRIGGER USER;
+    ALTER TABLE HealthMetric DISABLE TRIGGER USER;
+    ALTER TABLE TrainerAvailability DISABLE TRIGGER USER;
+    ALTER TABLE Class DISABLE TRIGGER USER;
+    ALTER TABLE ClassRegistration DISABLE TRIGGER USER;
+    ALTER TABLE PersonalTrainingSession DISABLE TRIGGER USER;
+    ALTER TABLE Bill DISABLE TRIGGER USER;
+    ALTER TABLE Payment DISABLE TRIGGER USER
+"""
+
+DATAGEN_TRIGGERS_ON = """
+    ALTER TABLE Member ENABLE TRIGGER USER;
+    ALTER TABLE Equipment ENABLE TRIGGER USER;
+    ALTER TABLE FitnessGoal ENABLE TRIGGER USER;
+    ALTER TABLE HealthMetric ENABLE TRIGGER USER;
+    ALTER TABLE TrainerAvailability ENABLE TRIGGER USER;
+    ALTER TABLE Class ENABLE TRIGGER USER;
+    ALTER TABLE ClassRegistration ENABLE TRIGGER USER;
+    ALTER TABLE PersonalTrainingSession ENABLE TRIGGER USER;
+    ALTER TABLE Bill ENABLE TRIGGER USER;
+    ALTER TABLE Payment ENABLE TRIGGER USER
+"""
+
+DATAGEN_COPY_MEMBERS = """
+    COPY Member (member_id, email, password, first_name, last_name,
+                 date_of_birth, gender, phone, address, registration_date)
+    FROM STDIN
+"""
+
+DATAGEN_COPY_TRAINERS = """
+    COPY Trainer (trainer_id, email, password, first_name, last_name,
+                  specialization, phone, hire_date)
+    FROM STDIN
+"""
+
+DATAGEN_COPY_ROOMS = """
+    COPY Room (room_id, room_name, capacity, room_type) FROM STDIN
+"""
+
+DATAGEN_COPY_EQUIPMENT = """
+    COPY Equipment (equipment_id, room_id, equipment_name, purchase_date,
+                    status, last_maintenance_date, maintenance_notes)
+    FROM STDIN
+"""
+
+DATAGEN_COPY_GOALS = """
+    COPY FitnessGoal (goal_id, member_id, goal_type, target_value,
+                      current_value, target_date, created_date, status)
+    FROM STDIN
+"""
+
+# For a load that dwarfs what is already there, the foreign keys of the
+# bulk tables, and HealthMetric's key and index, are dropped for the COPY
+# and rebuilt afterwards in one pass each (as pg_restore does) instead of
+# being checked row by row.  Adding a foreign key back validates every row.
+# Must match DDL.sql.
+DATAGEN_DEFER_KEYS = """
+    ALTER TABLE HealthMetric DROP CONSTRAINT healthmetric_member_id_fkey;
+    ALTER TABLE HealthMetric DROP CONSTRAINT healthmetric_pkey;
+    DROP INDEX idx_health_metric_member_date;
+    ALTER TABLE ClassRegistration DROP CONSTRAINT classregistration_member_id_fkey;
+    ALTER TABLE ClassRegistration DROP CONSTRAINT classregistration_class_id_fkey;
+    ALTER TABLE Bill DROP CONSTRAINT bill_member_id_fkey;
+    ALTER TABLE Payment DROP CONSTRAINT payment_bill_id_fkey
+"""
+
+DATAGEN_RESTORE_KEYS = """
+    SET LOCAL maintenance_work_mem = '512MB';
+    ALTER TABLE HealthMetric ADD CONSTRAINT healthmetric_pkey
+        PRIMARY KEY (metric_id, recorded_date);
+    CREATE INDEX idx_health_metric_member_date
+        ON HealthMetric(member_id, recorded_date DESC);
+    ALTER TABLE HealthMetric ADD CONSTRAINT healthmetric_member_id_fkey
+        FOREIGN KEY (member_id) REFERENCES Member(member_id) ON DELETE CASCADE;
+    ALTER TABLE ClassRegistration ADD CONSTRAINT classregistration_member_id_fkey
+        FOREIGN KEY (member_id) REFERENCES Member(member_id) ON DELETE CASCADE;
+    ALTER TABLE ClassRegistration ADD CONSTRAINT classregistration_class_id_fkey
+        FOREIGN KEY (class_id) REFERENCES Class(class_id) ON DELETE CASCADE;
+    ALTER TABLE Bill ADD CONSTRAINT bill_member_id_fkey
+        FOREIGN KEY (member_id) REFERENCES Member(member_id) ON DELETE CASCADE;
+    ALTER TABLE Payment ADD CONSTRAINT payment_bill_id_fkey
+        FOREIGN KEY (bill_id) REFERENCES Bill(bill_id) ON DELETE CASCADE
+"""
+
+# Summed over the partitions (a partitioned table has no rows of its own)
+DATAGEN_METRIC_COUNT = """
+    SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint
+    FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'healthmetric'::regclass
+"""
+
+# Monthly HealthMetric partitions for the generated history
+DATAGEN_METRIC_PARTITIONS = """
+    SELECT create_health_metric_partitions(%(first_day)s, %(last_day)s)
+"""
+
+DATAGEN_COPY_METRICS = """
+    COPY HealthMetric (metric_id, member_id, recorded_date, weight, height,
+                       heart_rate, blood_pressure, body_fat_percentage, notes)
+    FROM STDIN
+"""
+
+DATAGEN_COPY_AVAILABILITY = """
+    COPY TrainerAvailability (availability_id, trainer_id, day_of_week,
+                              start_time, end_time)
+    FROM STDIN
+"""
+
+DATAGEN_COPY_CLASSES = """
+    COPY Class (class_id, class_name, trainer_id, room_id, schedule_date,
+                start_time, end_time, capacity, current_enrollment, status)
+    FROM STDIN
+"""
+
+DATAGEN_COPY_REGISTRATIONS = """
+    COPY ClassRegistration (registration_id, member_id, class_id,
+                            registration_date, status)
+    FROM STDIN
+"""
+
+DATAGEN_COPY_SESSIONS = """
+    COPY PersonalTrainingSession (session_id, member_id, trainer_id, room_id,
+                                  session_date, start_time, end_time, status,
+                                  notes)
+    FROM STDIN
+"""
+
+DATAGEN_COPY_BILLS = """
+    COPY Bill (bill_id, member_id, bill_date, due_date, total_amount,
+               amount_paid, status, description, billing_period, bill_type)
+    FROM STDIN
+"""
+
+DATAGEN_COPY_PAYMENTS = """
+    COPY Payment (payment_id, bill_id, payment_date, amount, payment_method,
+                  transaction_reference)
+    FROM STDIN
+"""
+
+# What sync_session_booking / sync_class_booking would have mirrored.  The
+# exclusion constraints check the generated timetable here.
+DATAGEN_SESSION_BOOKINGS = """
+    INSERT INTO ResourceBooking (session_id, trainer_id, room_id, period)
+    SELECT session_id, trainer_id, room_id,
+           tsrange(session_date + start_time, session_date + end_time)
+    FROM PersonalTrainingSession
+    WHERE session_id > %(after)s AND status = 'Scheduled'
+"""
+
+DATAGEN_CLASS_BOOKINGS = """
+    INSERT INTO ResourceBooking (class_id, trainer_id, room_id, period)
+    SELECT class_id, trainer_id, room_id,
+           tsrange(schedule_date + start_time, schedule_date + end_time)
+    FROM Class
+    WHERE class_id > %(after)s AND status = 'Scheduled'
+"""
+
+DATAGEN_SUMMARY = """
+    SELECT refresh_member_summary()
+"""
+
+# Daily and weekly rollups of the generated members' readings
+DATAGEN_ROLLUPS = """
+    SELECT rebuild_health_metric_rollups(%(after)s)
+"""
+
+# Rows were loaded with explicit ids, so move each sequence past them
+DATAGEN_SEQUENCES = """
+    SELECT setval(pg_get_serial_sequence(t, c), m)
+    FROM (VALUES
+        ('member', 'member_id', (SELECT MAX(member_id) FROM Member)),
+        ('trainer', 'trainer_id', (SELECT MAX(trainer_id) FROM Trainer)),
+        ('room', 'room_id', (SELECT MAX(room_id) FROM Room)),
+        ('equipment', 'equipment_id', (SELECT MAX(equipment_id) FROM Equipment)),
+        ('fitnessgoal', 'goal_id', (SELECT MAX(goal_id) FROM FitnessGoal)),
+        ('healthmetric', 'metric_id', (SELECT MAX(metric_id) FROM HealthMetric)),
+        ('traineravailability', 'availability_id',
+         (SELECT MAX(availability_id) FROM TrainerAvailability)),
+        ('class', 'class_id', (SELECT MAX(class_id) FROM Class)),
+        ('classregistration', 'registration_id',
+         (SELECT MAX(registration_id) FROM ClassRegistration)),
+        ('personaltrainingsession', 'session_id',
+         (SELECT MAX(session_id) FROM PersonalTrainingSession)),
+        ('bill', 'bill_id', (SELECT MAX(bill_id) FROM Bill)),
+        ('payment', 'payment_id', (SELECT MAX(payment_id) FROM Payment))
+    ) s (t, c, m)
+    WHERE m IS NOT NULL
+"""
+
+DATAGEN_ANALYZE = """
+    ANALYZE Member, Trainer, Room, Equipment, FitnessGoal, HealthMetric,
+            TrainerAvailability, Class, ClassRegistration,
+            PersonalTrainingSession, Bill, Payment, ResourceBooking,
+            MemberSummary, HealthMetricDaily, HealthMetricWeekly
+"""
+
+# The notify triggers were off, so tell change feed listeners that every
+# row of the feed's tables may have changed
+DATAGEN_NOTIFY = """
+    SELECT pg_notify('fitness_changes', t || ' I *')
+    FROM unnest(ARRAY['class', 'classregistration', 'traineravailability',
+                      'equipment', 'bill']) t
+"""
@@ -0,0 +1,1495 @@
+"""
+Health and Fitness Club Management System
+Service Layer
+
+Business operations with no terminal I/O.  Each function takes typed
+arguments, checks out its own pooled connection, and either returns a
+result record or raises a ServiceError subclass.  The CLI in app.py, the
+API and batch jobs are all thin callers of this module.
+"""
+
+import base64
+import binascii
+import csv
+import functools
+import json
+import random
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from itertools import islice
+from time import sleep
+from typing import (List, Optional, Tuple, Union, get_args, get_origin,
+                    get_type_hints)
+
+from psycopg2 import errors
+
+import cache
+import queries
+import slots
+from database import db
+
+DAYS_OF_WEEK = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday',
+                'Saturday', 'Sunday')
+EQUIPMENT_STATUSES = ('Operational', 'Under Maintenance', 'Out of Service')
+PAYMENT_METHODS = ('Cash', 'Credit Card', 'Debit Card', 'Bank Transfer',
+                   'Other')
+
+# Default month-end billing charges
+MEMBERSHIP_FEE = Decimal('150.00')
+PT_SESSION_RATE = Decimal('50.00')
+
+# Attempts at a PT booking when another transaction takes the chosen room
+# first, and the base backoff between attempts (seconds, doubled each time)
+BOOKING_ATTEMPTS = 4
+BOOKING_BACKOFF = 0.005
+
+# Member search: shortest query accepted, word-similarity cut-off (0..1,
+# lower tolerates more typos) and default page size
+SEARCH_MIN_LENGTH = 2
+SEARCH_THRESHOLD = 0.4
+SEARCH_PAGE_SIZE = 20
+
+# Health trend charts: grains (rollup table per grain), default span and
+# longest span in days
+TREND_GRAINS = ('day', 'week')
+TREND_DAYS = 365
+MAX_TREND_DAYS = 5 * 366
+
+# Longest season a class template may span, in days
+MAX_SEASON_DAYS = 366
+
+# List screens: default and largest page size, and rows per round trip when
+# streaming an export
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+EXPORT_BATCH = 2000
+
+# Reference data cache lifetimes (seconds).  Class listings carry live seat
+# counts, so they expire sooner; writes made through this module
+# invalidate the affected cache at once either way.
+REFERENCE_TTL = 300.0
+CLASS_LISTING_TTL = 30.0
+
+# Exclusion constraints that reject overlapping bookings, and the message
+# shown for each
+OVERLAP_MESSAGES = {
+    'booking_trainer_no_overlap': "Trainer already has a session at this time!",
+    'booking_room_no_overlap': "No rooms available at this time!",
+    'no_overlap': "Overlapping availability exists!",
+}
+
+# Foreign keys a booking or availability insert can violate, and the
+# message shown for each
+MISSING_MESSAGES = {
+    'personaltrainingsession_member_id_fkey': "Member not found",
+    'personaltrainingsession_trainer_id_fkey': "Trainer not found",
+    'personaltrainingsession_room_id_fkey': "Room not found",
+    'traineravailability_trainer_id_fkey': "Trainer not found",
+}
+
+
+# Read-through caches for the booking and admin screens (see cache.py)
+trainer_cache = cache.TTLCache('trainers', REFERENCE_TTL, maxsize=1)
+room_cache = cache.TTLCache('rooms', REFERENCE_TTL, maxsize=1)
+availability_cache = cache.TTLCache('availability', REFERENCE_TTL, maxsize=256)
+class_cache = cache.TTLCache('open_classes', CLASS_LISTING_TTL, maxsize=64)
+equipment_cache = cache.TTLCache('equipment', REFERENCE_TTL, maxsize=64)
+
+# Hot statements run as per-connection prepared statements (db.execute)
+for _name in queries.PREPARED:
+    db.prepare(_name, getattr(queries, _name))
+
+# Keyset pagination (see queries.py).  Per list: the query parameter and
+# type of each sort key column, and the key that sorts before every row,
+# which fetches the first page.
+_SCHEDULE_KEY = (('after_date', date), ('after_time', time), ('after_id', int))
+_ROOM_KEY = (('after_room', str), ('after_time', time), ('after_id', int))
+PAGE_KEYS = {
+    'open_classes': (_SCHEDULE_KEY, (date.min, time.min, 0)),
+    'trainer_sessions': (_SCHEDULE_KEY, (date.min, time.min, 0)),
+    'trainer_classes': (_SCHEDULE_KEY, (date.min, time.min, 0)),
+    'room_classes': (_ROOM_KEY, ('', time.min, 0)),
+    'room_sessions': (_ROOM_KEY, ('', time.min, 0)),
+    'equipment': ((('after_rank', int), ('after_name', str), ('after_id', int)),
+                  (0, '', 0)),
+    'member_bills': ((('before_date', date), ('before_id', int)),
+                     (date.max, 2 ** 31 - 1)),
+}
+
+
+# ============================================================================
+# ERRORS
+# ============================================================================
+
+class ServiceError(Exception):
+    """Base class for business rule failures"""
+
+
+class ValidationError(ServiceError):
+    """Input is malformed or outside the allowed values"""
+
+
+class NotFoundError(ServiceError):
+    """The referenced record does not exist"""
+
+
+class ConflictError(ServiceError):
+    """The operation clashes with existing data"""
+
+
+class AuthenticationError(ServiceError):
+    """Email/password combination was not recognised"""
+
+
+# ============================================================================
+# RESULT RECORDS
+# ============================================================================
+
+@dataclass(frozen=True)
+class Page:
+    """One page of a list screen; pass next_cursor back for the next page
+    (None on the last page).  Iterates over its items."""
+    items: tuple
+    next_cursor: Optional[str] = None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+@dataclass(frozen=True)
+class Account:
+    user_id: int
+    first_name: str
+    last_name: str
+
+
+@dataclass(frozen=True)
+class Goal:
+    goal_type: str
+    current_value: Optional[Decimal]
+    target_value: Optional[Decimal]
+    target_date: Optional[date]
+
+
+@dataclass(frozen=True)
+class UpcomingSession:
+    session_date: date
+    start_time: time
+    end_time: time
+    trainer_name: str
+    room_name: str
+
+
+@dataclass(frozen=True)
+class Dashboard:
+    member_id: int
+    first_name: str
+    last_name: str
+    email: str
+    latest_weight: Optional[Decimal]
+    latest_heart_rate: Optional[int]
+    last_metric_date: Optional[datetime]
+    active_goals: int
+    upcoming_sessions: int
+    classes_attended: int
+    pending_balance: Decimal
+    goals: List[Goal] = field(default_factory=list)
+    next_sessions: List[UpcomingSession] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class Trainer:
+    __slots__ = ('trainer_id', 'first_name', 'last_name', 'specialization')
+    trainer_id: int
+    first_name: str
+    last_name: str
+    specialization: Optional[str]
+
+
+@dataclass(frozen=True)
+class Booking:
+    session_id: int
+    trainer_id: int
+    room_id: int
+    session_date: date
+    start_time: time
+    end_time: time
+
+
+@dataclass(frozen=True)
+class FreeSlot:
+    trainer_id: int
+    trainer_name: str
+    room_id: int
+    session_date: date
+    start_time: time
+    end_time: time
+
+
+@dataclass(frozen=True)
+class ClassListing:
+    __slots__ = ('class_id', 'class_name', 'schedule_date', 'start_time',
+                 'end_time', 'trainer_name', 'current_enrollment', 'capacity',
+                 'spots_left', 'waitlisted')
+    class_id: int
+    class_name: str
+    schedule_date: date
+    start_time: time
+    end_time: time
+    trainer_name: str
+    current_enrollment: int
+    capacity: int
+    spots_left: int
+    waitlisted: int
+
+
+@dataclass(frozen=True)
+class SeatClaim:
+    registration_id: int
+    class_id: int
+    status: str
+    waitlist_position: Optional[int]
+
+    @property
+    def waitlisted(self):
+        return self.status == 'Waitlisted'
+
+
+@dataclass(frozen=True)
+class TrainerSession:
+    session_date: date
+    start_time: time
+    end_time: time
+    member_name: str
+    room_name: str
+    status: str
+    notes: Optional[str]
+
+
+@dataclass(frozen=True)
+class TrainerClass:
+    class_name: str
+    schedule_date: date
+    start_time: time
+    end_time: time
+    room_name: str
+    current_enrollment: int
+    capacity: int
+
+
+@dataclass(frozen=True)
+class AvailabilitySlot:
+    __slots__ = ('day_of_week', 'start_time', 'end_time')
+    day_of_week: str
+    start_time: time
+    end_time: time
+
+
+@dataclass(frozen=True)
+class TrainerSchedule:
+    sessions: Page
+    classes: Page
+    availability: Tuple[AvailabilitySlot, ...]
+
+
+@dataclass(frozen=True)
+class MemberMatch:
+    member_id: int
+    first_name: str
+    last_name: str
+    email: str
+    score: float
+
+
+@dataclass(frozen=True)
+class HealthSnapshot:
+    weight: Optional[Decimal]
+    heart_rate: Optional[int]
+    recorded_date: datetime
+
+
+@dataclass(frozen=True)
+class TrendPoint:
+    """One day or week (starting Monday) of a member's readings"""
+    __slots__ = ('period', 'readings', 'avg_weight', 'min_weight',
+                 'max_weight', 'avg_heart_rate', 'min_heart_rate',
+                 'max_heart_rate', 'avg_body_fat', 'min_body_fat',
+                 'max_body_fat')
+    period: date
+    readings: int
+    avg_weight: Optional[Decimal]
+    min_weight: Optional[Decimal]
+    max_weight: Optional[Decimal]
+    avg_heart_rate: Optional[Decimal]
+    min_heart_rate: Optional[int]
+    max_heart_rate: Optional[int]
+    avg_body_fat: Optional[Decimal]
+    min_body_fat: Optional[Decimal]
+    max_body_fat: Optional[Decimal]
+
+
+@dataclass(frozen=True)
+class MemberProfile:
+    member_id: int
+    first_name: str
+    last_name: str
+    email: str
+    date_of_birth: date
+    phone: Optional[str]
+    latest_metric: Optional[HealthSnapshot]
+    goals: List[Goal]
+
+
+@dataclass(frozen=True)
+class RoomClassBooking:
+    room_name: str
+    class_name: str
+    start_time: time
+    end_time: time
+    trainer_name: str
+
+
+@dataclass(frozen=True)
+class RoomSessionBooking:
+    room_name: str
+    start_time: time
+    end_time: time
+    trainer_name: str
+    member_name: str
+
+
+@dataclass(frozen=True)
+class RoomSchedule:
+    day: date
+    classes: Page
+    sessions: Page
+
+
+@dataclass(frozen=True)
+class ClassTemplate:
+    template_id: int
+    class_name: str
+    trainer_name: Optional[str]
+    room_name: Optional[str]
+    day_of_week: str
+    start_time: time
+    end_time: time
+    capacity: int
+    season_start: date
+    season_end: date
+    expanded: int           # weeks scheduled as Class rows so far
+
+
+@dataclass(frozen=True)
+class ScheduleClash:
+    template_id: int
+    class_name: str
+    schedule_date: date
+    start_time: time
+    resource: str           # 'trainer' or 'room'
+    clash_with: str         # 'class N', 'session N' or 'template N'
+
+
+@dataclass(frozen=True)
+class SeasonExpansion:
+    scheduled: int
+    occurrences: int        # weeks in the window not scheduled before
+    clashes: List[ScheduleClash]
+
+    @property
+    def skipped(self):
+        """Weeks left unscheduled because they clash"""
+        return len({(c.template_id, c.schedule_date) for c in self.clashes})
+
+
+@dataclass(frozen=True)
+class EquipmentItem:
+    __slots__ = ('equipment_id', 'equipment_name', 'room_name', 'status',
+                 'last_maintenance_date', 'maintenance_notes')
+    equipment_id: int
+    equipment_name: str
+    room_name: Optional[str]
+    status: str
+    last_maintenance_date: Optional[date]
+    maintenance_notes: Optional[str]
+
+
+@dataclass(frozen=True)
+class PaymentReceipt:
+    payment_id: int
+    bill_id: int
+    amount: Decimal
+    remaining_before: Decimal
+
+    @property
+    def overpayment(self):
+        """Amount paid beyond the outstanding balance (0 if none)"""
+        return max(self.amount - self.remaining_before, Decimal('0'))
+
+
+@dataclass(frozen=True)
+class BillingRun:
+    period: date
+    membership_bills: int
+    pt_package_bills: int
+    already_billed: int
+    total_amount: Decimal
+    seconds: float
+
+
+@dataclass(frozen=True)
+class AgingRow:
+    member_id: Optional[int]
+    days_0_30: Decimal
+    days_31_60: Decimal
+    days_61_90: Decimal
+    days_over_90: Decimal
+    total: Decimal
+
+
+@dataclass(frozen=True)
+class AgingReport:
+    as_of: date
+    total: AgingRow
+    members: List[AgingRow]
+
+
+@dataclass(frozen=True)
+class PaymentImport:
+    rows: int
+    imported: int
+    bills_settled: int
+    rejected: dict = field(default_factory=dict)
+    seconds: float = 0.0
+
+
+@dataclass(frozen=True)
+class BillRecord:
+    bill_id: int
+    bill_date: date
+    due_date: date
+    total_amount: Decimal
+    amount_paid: Decimal
+    status: str
+    description: Optional[str]
+
+    @property
+    def balance(self):
+        return self.total_amount - self.amount_paid
+
+
+# ============================================================================
+# INPUT PARSING
+# ============================================================================
+
+def parse_date(text):
+    """Parse YYYY-MM-DD, raising ValidationError on bad input"""
+    try:
+        return datetime.strptime(str(text).strip(), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValidationError(f"Invalid date '{text}', expected YYYY-MM-DD")
+
+
+def parse_period(text):
+    """Parse YYYY-MM to the first day of that month"""
+    try:
+        return datetime.strptime(text.strip(), '%Y-%m').date()
+    except ValueError:
+        raise ValidationError(f"Invalid period '{text}', expected YYYY-MM")
+
+
+def parse_time(text):
+    """Parse HH:MM (or HH:MM:SS), raising ValidationError on bad input"""
+    text = str(text).strip()
+    for fmt in ('%H:%M', '%H:%M:%S'):
+        try:
+            return datetime.strptime(text, fmt).time()
+        except ValueError:
+            continue
+    raise ValidationError(f"Invalid time '{text}', expected HH:MM")
+
+
+def _check_time_range(start_time, end_time):
+    if start_time >= end_time:
+        raise ValidationError("Start time must be before end time")
+
+
+def encode_cursor(kind, key):
+    """Opaque page token holding the sort key of a page's last row"""
+    values = [v.isoformat() if isinstance(v, (date, time)) else v
+              for v in key]
+    raw = json.dumps([kind, values], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode_cursor(kind, token, columns):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        tag, values = json.loads(raw)
+        if tag != kind or len(values) != len(columns):
+            raise ValueError
+        key = []
+        for (_, kind_type), value in zip(columns, values):
+            if kind_type in (date, time):
+                value = kind_type.fromisoformat(value)
+            elif type(value) is not kind_type:
+                raise ValueError
+            key.append(value)
+        return tuple(key)
+    except (ValueError, TypeError, binascii.Error):
+        raise ValidationError("Invalid page cursor")
+
+
+def page_params(kind, after=None, limit=PAGE_SIZE):
+    """Keyset parameters for the page after token ``after`` (None = first).
+
+    One extra row is fetched to tell whether another page follows.
+    """
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        raise ValidationError(
+            f"Page size must be between 1 and {MAX_PAGE_SIZE}")
+    columns, first = PAGE_KEYS[kind]
+    key = first if after is None else _decode_cursor(kind, after, columns)
+    params = {name: value for (name, _), value in zip(columns, key)}
+    params['limit'] = limit + 1
+    return params
+
+
+def build_page(kind, rows, limit, record):
+    """Page of ``record``s from keyset query rows (each ending in its key)"""
+    width = len(PAGE_KEYS[kind][0])
+    rows = [tuple(r) for r in rows]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(kind, rows[-1][-width:])
+    return Page(tuple(record(*r[:-width]) for r in rows), next_cursor)
+
+
+# JSON has no date, time or decimal type; screen queries send them as text
+# (dates, times) and numbers, converted back per column type
+_FROM_JSON = {date: date.fromisoformat, time: time.fromisoformat,
+              Decimal: Decimal}
+
+
+@functools.lru_cache(maxsize=None)
+def _column_types(record, kind=None):
+    types = []
+    for hint in get_type_hints(record).values():
+        if get_origin(hint) is Union:
+            hint = next(a for a in get_args(hint) if a is not type(None))
+        types.append(hint)
+    if kind:
+        types.extend(kind_type for _, kind_type in PAGE_KEYS[kind][0])
+    return tuple(types)
+
+
+def json_rows(text, record, kind=None):
+    """Tuples from a list column of a screen query (see SCREENS in
+    queries.py), typed as ``record``'s fields followed by the ``kind``
+    page key, as a cursor would return them"""
+    types = _column_types(record, kind)
+    rows = json.loads(text, parse_float=Decimal,
+                      object_pairs_hook=lambda pairs: [v for _, v in pairs])
+    return [tuple(v if v is None or t not in _FROM_JSON else _FROM_JSON[t](v)
+                  for t, v in zip(types, row))
+            for row in rows]
+
+
+def overlap_error(constraint_name):
+    """ConflictError for a violated no-overlap exclusion constraint"""
+    return ConflictError(OVERLAP_MESSAGES.get(
+        constraint_name, "Time slot overlaps an existing booking!"))
+
+
+def missing_error(constraint_name):
+    """NotFoundError for a violated foreign key"""
+    return NotFoundError(MISSING_MESSAGES.get(
+        constraint_name, "Referenced record not found"))
+
+
+# ============================================================================
+# AUTHENTICATION
+# ============================================================================
+
+def _login(name, email, password):
+    with db.connection() as conn, conn.cursor() as cursor:
+        db.execute(cursor, name, {'email': email, 'password': password})
+        row = cursor.fetchone()
+    if not row:
+        raise AuthenticationError("Invalid credentials!")
+    return Account(*row)
+
+
+def authenticate_member(email, password):
+    """Return the member Account for these credentials"""
+    return _login('MEMBER_LOGIN', email, password)
+
+
+def authenticate_trainer(email, password):
+    """Return the trainer Account for these credentials"""
+    return _login('TRAINER_LOGIN', email, password)
+
+
+def authenticate_admin(email, password):
+    """Return the admin Account for these credentials"""
+    return _login('ADMIN_LOGIN', email, password)
+
+
+# ============================================================================
+# MEMBER OPERATIONS
+# ============================================================================
+
+def register_member(email, password, first_name, last_name, date_of_birth,
+                    gender=None, phone=None, address=None):
+    """Create a member account and return its member_id"""
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(queries.MEMBER_EMAIL_EXISTS, {'email': email})
+        if cursor.fetchone():
+            raise ConflictError("Email already registered!")
+        try:
+            cursor.execute(queries.MEMBER_INSERT, {
+                'email': email, 'password': password,
+                'first_name': first_name, 'last_name': last_name,
+                'date_of_birth': date_of_birth, 'gender': gender,
+                'phone': phone, 'address': address,
+            })
+        except errors.UniqueViolation:
+            raise ConflictError("Email already registered!")
+        except errors.CheckViolation:
+            raise ValidationError(f"Invalid email address '{email}'")
+        member_id = cursor.fetchone()[0]
+        conn.commit()
+    return member_id
+
+
+def update_member_contact(member_id, phone=None, address=None):
+    """Update phone and/or address; returns False when nothing changed"""
+    if not phone and not address:
+        return False
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(queries.MEMBER_UPDATE_CONTACT, {
+            'member_id': member_id, 'phone': phone or None,
+            'address': address or None,
+        })
+        if cursor.rowcount == 0:
+            raise NotFoundError("Member not found")
+        conn.commit()
+    return True
+
+
+def add_fitness_goal(member_id, goal_type, target_value, current_value,
+                     target_date):
+    """Add an active fitness goal and return its goal_id"""
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(queries.FITNESS_GOAL_INSERT, {
+            'member_id': member_id, 'goal_type': goal_type,
+            'target_value': target_value, 'current_value': current_value,
+            'target_date': target_date,
+        })
+        goal_id = cursor.fetchone()[0]
+        conn.commit()
+    return goal_id
+
+
+def add_health_metric(member_id, weight=None, height=None, heart_rate=None,
+                      blood_pressure=None, body_fat_percentage=None,
+                      notes=None):
+    """Record a health metric (never overwrites history); returns metric_id"""
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(queries.HEALTH_METRIC_INSERT, {
+            'member_id': member_id, 'weight': weight, 'height': height,
+            'heart_rate': heart_rate, 'blood_pressure': blood_pressure,
+            'body_fat_percentage': body_fat_percentage, 'notes': notes,
+        })
+        metric_id = cursor.fetchone()[0]
+        conn.commit()
+    return metric_id
+
+
+def trend_query(member_id, days=TREND_DAYS, grain='week', as_of=None):
+    """(sql, params) for health_trend, after checking its arguments"""
+    if grain not in TREND_GRAINS:
+        raise ValidationError(
+            f"Grain must be one of: {', '.join(TREND_GRAINS)}")
+    if not 0 < days <= MAX_TREND_DAYS:
+        raise ValidationError(f"Days must be between 1 and {MAX_TREND_DAYS}")
+    last_day = as_of or date.today()
+    first_day = last_day - timedelta(days=days - 1)
+    if grain == 'week':
+        first_day -= timedelta(days=first_day.weekday())
+
+    sql = (queries.HEALTH_TREND_WEEKLY if grain == 'week'
+           else queries.HEALTH_TREND_DAILY)
+    return sql, {'member_id': member_id, 'first_day': first_day,
+                 'last_day': last_day}
+
+
+def health_trend(member_id, days=TREND_DAYS, grain='week', as_of=None):
+    """A member's readings per day or week over the ``days`` up to
+    ``as_of`` (default today), oldest first; periods without readings
+    are left out.  Read from the rollup tables, not the raw readings.
+    """
+    sql, params = trend_query(member_id, days, grain, as_of)
+    with db.connection(read_only=True) as conn, conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [TrendPoint(*r) for r in cursor.fetchall()]
+
+
+def create_metric_partitions(first_day, last_day):
+    """Create the monthly HealthMetric partitions covering first_day to
+    last_day that are missing; returns how many were created"""
+    if first_day > last_day:
+        raise ValidationError("First day must not be after last day")
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(queries.HEALTH_METRIC_PARTITIONS,
+                       {'first_day': first_day, 'last_day': last_day})
+        created = cursor.fetchone()[0]
+        conn.commit()
+    return created
+
+
+def dashboard_record(member_id, row):
+    """Dashboard from a MEMBER_DASHBOARD_SCREEN row (None: no member)"""
+    if not row:
+        raise NotFoundError("Member not found")
+    *summary, goals, sessions = row
+    return Dashboard(
+        member_id, *summary,
+        goals=[Goal(*g) for g in json_rows(goals, Goal)],
+        next_sessions=[UpcomingSession(*s)
+                       for s in json_rows(sessions, UpcomingSession)])
+
+
+def member_dashboard(member_id, session_limit=3):
+    """Summary, active goals and next sessions for one member"""
+    with db.connection(autocommit=True, read_only=True) as conn, \
+            conn.cursor() as cursor:
+        db.execute(cursor, 'MEMBER_DASHBOARD_SCREEN',
+                  {'member_id': member_id, 'limit': session_limit})
+        row = cursor.fetchone()
+    return dashboard_record(member_id, row)
+
+
+def list_trainers():
+    """All trainers, ordered by id (cached)"""
+    def load():
+        with db.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(queries.TRAINER_LIST)
+            return tuple(Trainer(*t) for t in cursor.fetchall())
+    return trainer_cache.get('all', load)
+
+
+def booking_params(member_id, trainer_id, session_date, start_time,
+                   end_time):
+    """SESSION_BOOK parameters, after checking the time range"""
+    _check_time_range(start_time, end_time)
+    return {
+        'member_id': member_id, 'trainer_id': trainer_id,
+        'session_date': session_date, 'start_time': start_time,
+        'end_time': end_time, 'day_of_week': session_date.strftime('%A'),
+    }
+
+
+def booking_backoff(constraint_name, attempt):
+    """Seconds to wait before retrying a booking whose insert violated
+    ``constraint_name``.  Only losing a room to a concurrent booking is
+    retried; any other overlap, or the last attempt, raises ConflictError.
+    """
+    if (constraint_name != 'booking_room_no_overlap'
+            or attempt == BOOKING_ATTEMPTS - 1):
+        raise overlap_error(constraint_name)
+    return BOOKING_BACKOFF * 2 ** attempt * random.random()
+
+
+def booking_error(available, busy):
+    """Why SESSION_BOOK found no slot, from the BOOKING_BLOCKERS row"""
+    if not available:
+        return ConflictError("Trainer not available at this time!")
+    if busy:
+        return ConflictError("Trainer already has a session at this time!")
+    return ConflictError("No rooms available at this time!")
+
+
+def book_personal_training(member_id, trainer_id, session_date, start_time,
+                           end_time):
+    """Book a PT session after availability and room checks.
+
+    Bookings for one trainer are serialized by an advisory lock, and the
+    checks and insert run as one statement.  If a concurrent booking for
+    another trainer takes the chosen room first, the insert is retried
+    with backoff so the next free room is used instead.  Exclusion
+    constraints remain the final guard against double-booking.
+    """
+    params = booking_params(member_id, trainer_id, session_date, start_time,
+                            end_time)
+
+    with db.connection() as conn, conn.cursor() as cursor:
+        db.execute(cursor, 'TRAINER_BOOKING_LOCK', params)
+        for attempt in range(BOOKING_ATTEMPTS):
+            cursor.execute("SAVEPOINT booking")
+            try:
+                db.execute(cursor, 'SESSION_BOOK', params)
+                break
+            except errors.ExclusionViolation as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT booking")
+                sleep(booking_backoff(e.diag.constraint_name, attempt))
+            except errors.ForeignKeyViolation as e:
+                raise missing_error(e.diag.constraint_name)
+
+        row = cursor.fetchone()
+        if not row:
+            db.execute(cursor, 'BOOKING_BLOCKERS', params)
+            raise booking_error(*cursor.fetchone())
+        session_id, room_id = row
+        conn.commit()
+
+    return Booking(session_id, trainer_id, room_id, session_date,
+                   start_time, end_time)
+
+
+def slot_search(first_day, last_day, minutes=60, step_minutes=30, limit=10,
+                not_before=None):
+    """Check a free-slot search; returns (weeks, length, step, not_before).
+
+    ``weeks`` are the (first, last) day chunks to read busy periods for,
+    nearest first, starting no earlier than ``not_before`` (default now).
+    """
+    if minutes <= 0 or step_minutes <= 0 or limit <= 0:
+        raise ValidationError("Session length, step and limit must be positive")
+    if last_day < first_day:
+        raise ValidationError("End date must not be before start date")
+    not_before = not_before or datetime.now()
+    return (slots.weeks(max(first_day, not_before.date()), last_day),
+            timedelta(minutes=minutes), timedelta(minutes=step_minutes),
+            not_before)
+
+
+def busy_params(week, names, rooms):
+    """SLOT_BUSY_PERIODS parameters for one week of a slot search"""
+    return {'first_day': week[0], 'last_day': week[1],
+            'trainer_ids': list(names), 'room_ids': rooms}
+
+
+def week_free_slots(week, busy, names, windows, rooms, length, step,
+                    not_before):
+    """FreeSlots in one week of a slot search, earliest first, given the
+    week's SLOT_BUSY_PERIODS rows"""
+    trainer_busy, room_busy = slots.index_busy(busy, names)
+    for start, end, t_id, r_id in slots.sweep(
+            slots.date_range(*week), windows, trainer_busy, room_busy,
+            rooms, length, step, not_before):
+        yield FreeSlot(t_id, names[t_id], r_id, start.date(), start.time(),
+                       end.time())
+
+
+def find_free_slots(first_day, last_day, minutes=60, limit=10,
+                    trainer_id=None, specialization=None, room_id=None,
+                    step_minutes=30, not_before=None):
+    """Next ``limit`` bookable PT slots between two dates (inclusive).
+
+    Slots fall inside the trainer's weekly availability, clear of the
+    trainer's sessions and classes, with a free 'Personal Training' room.
+    Filter by ``trainer_id``, a ``specialization`` substring, or a
+    specific ``room_id``. Each slot is independently bookable.
+    Busy periods are read a week at a time so a near-term answer does
+    not load the whole range.
+    """
+    weeks, length, step, not_before = slot_search(
+        first_day, last_day, minutes, step_minutes, limit, not_before)
+
+    with db.connection() as conn, conn.cursor() as cursor:
+        def load_windows():
+            cursor.execute(queries.SLOT_TRAINER_WINDOWS, {
+                'trainer_id': trainer_id, 'specialization': specialization})
+            return slots.group_windows(cursor.fetchall())
+
+        def load_rooms():
+            cursor.execute(queries.TRAINING_ROOMS, {'room_id': None})
+            return tuple(r[0] for r in cursor.fetchall())
+
+        names, windows = availability_cache.get(
+            ('windows', trainer_id, specialization), load_windows)
+        rooms = [r for r in room_cache.get('training', load_rooms)
+                 if room_id is None or r == room_id]
+        if not names or not rooms:
+            return []
+
+        found = []
+        for week in weeks:
+            cursor.execute(queries.SLOT_BUSY_PERIODS,
+                           busy_params(week, names, rooms))
+            found.extend(islice(week_free_slots(
+                week, cursor.fetchall(), names, windows, rooms, length, step,
+                not_before), limit - len(found)))
+            if len(found) == limit:
+                break
+
+    return found
+
+
+def list_open_classes(after=None, limit=PAGE_SIZE):
+    """A page of upcoming scheduled classes with seat and waitlist counts
+    (cached)"""
+    params = page_params('open_classes', after, limit)
+
+    def load():
+        with db.connection() as conn, conn.cursor() as cursor:
+            db.execute(cursor, 'OPEN_CLASSES', params)
+            return build_page('open_classes', cursor.fetchall(), limit,
+                              ClassListing)
+    return class_cache.get((after, limit), load)
+
+
+def register_for_class(member_id, class_id):
+    """Claim a seat in a class, or a place on its waitlist if it is full"""
+    params = {'member_id': member_id, 'class_id': class_id}
+    with db.connection() as conn, conn.cursor() as cursor:
+        try:
+            db.execute(cursor, 'CLASS_SEAT_CLAIM', params)
+        except errors.NoDataFound:
+            raise NotFoundError("Class not found")
+        except errors.UniqueViolation:
+            raise ConflictError("Already registered for this class!")
+        except errors.ForeignKeyViolation:
+            raise NotFoundError("Member not found")
+        reg_id, status, position = cursor.fetchone()
+        conn.commit()
+    class_cache.invalidate()
+    return SeatClaim(reg_id, class_id, status, position)
+
+
+def cancel_class_registration(member_id, class_id):
+    """Cancel a registration or waitlist place; a freed seat is promoted"""
+    params = {'member_id': member_id, 'class_id': class_id}
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(queries.CLASS_LOCK, params)
+        cursor.execute(queries.CLASS_REGISTRATION_CANCEL, params)
+        row = cursor.fetchone()
+        if not row:
+            raise NotFoundError("No active registration for this class")
+        conn.commit()
+    class_cache.invalidate()
+    return row[0]
+
+
+# ============================================================================
+# TRAINER OPERATIONS
+# ============================================================================
+
+def availability_params(trainer_id, day_of_week, start_time, end_time):
+    """AVAILABILITY_INSERT parameters, after checking the day and times"""
+    day = str(day_of_week).capitalize()
+    if day not in DAYS_OF_WEEK:
+        raise ValidationError(f"Invalid day '{day_of_week}'")
+    _check_time_range(start_time, end_time)
+    return {'trainer_id': trainer_id, 'day_of_week': day,
+            'start_time': start_time, 'end_time': end_time}
+
+
+def set_trainer_availability(trainer_id, day_of_week, start_time, end_time):
+    """Add a weekly availability window; returns availability_id"""
+    params = availability_params(trainer_id, day_of_week, start_time,
+                                 end_time)
+
+    with db.connection() as conn, conn.cursor() as cursor:
+        try:
+            cursor.execute(queries.AVAILABILITY_INSERT, params)
+        except errors.ExclusionViolation as e:
+            raise overlap_error(e.diag.constraint_name)
+        except errors.ForeignKeyViolation as e:
+            raise missing_error(e.diag.constraint_name)
+        avail_id = cursor.fetchone()[0]
+        conn.commit()
+    availability_cache.invalidate()
+    return avail_id
+
+
+def trainer_sessions(trainer_id, after=None, limit=PAGE_SIZE):
+    """A page of a trainer's upcoming PT sessions"""
+    params = page_params('trainer_sessions', after, limit)
+    params['trainer_id'] = trainer_id
+    with db.connection(read_only=True) as conn, conn.cursor() as cursor:
+        cursor.execute(queries.TRAINER_UPCOMING_SESSIONS, params)
+        return build_page('trainer_sessions', cursor.fetchall(), limit,
+                          TrainerSession)
+
+
+def trainer_classes(trainer_id, after=None, limit=PAGE_SIZE):
+    """A page of a trainer's upcoming classes"""
+    params = page_params('trainer_classes', after, limit)
+    params['trainer_id'] = trainer_id
+    with db.connection(read_only=True) as conn, conn.cursor() as cursor:
+        cursor.execute(queries.TRAINER_UPCOMING_CLASSES, params)
+        return build_page('trainer_classes', cursor.fetchall(), limit,
+                          TrainerClass)
+
+
+def schedule_params(trainer_id, limit=PAGE_SIZE):
+    """TRAINER_SCHEDULE_SCREEN parameters"""
+    # Both lists start from the same first-page key
+    return dict(page_params('trainer_sessions', limit=limit),
+                trainer_id=trainer_id)
+
+
+def schedule_record(row, limit=PAGE_SIZE):
+    """TrainerSchedule from a TRAINER_SCHEDULE_SCREEN row"""
+    sessions, classes, availability = row
+    return TrainerSchedule(
+        build_page('trainer_sessions',
+                   json_rows(sessions, TrainerSession, 'trainer_sessions'),
+                   limit, TrainerSession),
+        build_page('trainer_classes',
+                   json_rows(classes, TrainerClass, 'trainer_classes'),
+                   limit, TrainerClass),
+        tuple(AvailabilitySlot(*a)
+              for a in json_rows(availability, AvailabilitySlot)))
+
+
+def trainer_schedule(trainer_id, limit=PAGE_SIZE):
+    """First page of upcoming sessions and classes, and the weekly
+    availability, for a trainer"""
+    with db.connection(autocommit=True, read_only=True) as conn, \
+            conn.cursor() as cursor:
+        db.execute(cursor, 'TRAINER_SCHEDULE_SCREEN',
+                   schedule_params(trainer_id, limit))
+        row = cursor.fetchone()
+    return schedule_record(row, limit)
+
+
+def search_query(query, trainer_id=None, limit=SEARCH_PAGE_SIZE, offset=0):
+    """(sql, params) for search_members, after checking its arguments"""
+    query = ' '.join(query.split())
+    if len(query) < SEARCH_MIN_LENGTH:
+        raise ValidationError(
+            f"Enter at least {SEARCH_MIN_LENGTH} characters to search")
+    if limit <= 0 or offset < 0:
+        raise ValidationError("Limit must be positive and offset not negative")
+
+    params = {'query': query, 'trainer_id': trainer_id,
+              'limit': limit, 'offset': offset,
+              'threshold': str(SEARCH_THRESHOLD)}
+    sql = (queries.MEMBER_SEARCH if trainer_id is None
+           else queries.TRAINER_MEMBER_SEARCH)
+    return sql, params
+
+
+def search_members(query, trainer_id=None, limit=SEARCH_PAGE_SIZE, offset=0):
+    """Members whose name or email resembles ``query``, best match first.
+
+    Tolerates typos and partial words.  With ``trainer_id`` only members
+    who have had a session with that trainer are searched; without it the
+    whole club is (admin search).
+    """
+    sql, params = search_query(query, trainer_id, limit, offset)
+    with db.connection(autocommit=True, read_only=True) as conn, \
+            conn.cursor() as cursor:
+        # One message: a multi-statement query runs as one implicit
+        # transaction, so the local threshold still applies to the search
+        cursor.execute(queries.MEMBER_SEARCH_THRESHOLD + ';' + sql, params)
+        return [MemberMatch(*m) for m in cursor.fetchall()]
+
+
+def member_profile(member_id):
+    """Read-only member details with latest metric and active goals"""
+    with db.connection(autocommit=True, read_only=True) as conn, \
+            conn.cursor() as cursor:
+        db.execute(cursor, 'MEMBER_PROFILE_SCREEN', {'member_id': member_id})
+        row = cursor.fetchone()
+    if not row:
+        raise NotFoundError("Member details not found.")
+
+    member, metric, goals = row[:6], row[6:9], row[9]
+    return MemberProfile(
+        *member,
+        latest_metric=HealthSnapshot(*metric) if metric[2] else None,
+        goals=[Goal(*g) for g in json_rows(goals, Goal)])
+
+
+# ============================================================================
+# ADMIN OPERATIONS
+# ============================================================================
+
+def room_classes(day, after=None, limit=PAGE_SIZE):
+    """A page of the classes booked in every room on ``day``"""
+    params = page_params('room_classes', after, limit)
+    params['day'] = day
+    with db.connection(read_only=True) as conn, conn.cursor() as cursor:
+        cursor.execute(queries.ROOM_SCHEDULE_CLASSES, params)
+        return build_page('room_classes', cursor.fetchall(), limit,
+                          RoomClassBooking)
+
+
+def room_sessions(day, after=None, limit=PAGE_SIZE):
+    """A page of the PT sessions booked in every room on ``day``"""
+    params = page_params('room_sessions', after, limit)
+    params['day'] = day
+    with db.connection(read_only=True) as conn, conn.cursor() as cursor:
+        cursor.execute(queries.ROOM_SCHEDULE_SESSIONS, params)
+        return build_page('room_sessions', cursor.fetchall(), limit,
+                          RoomSessionBooking)
+
+
+def room_schedule(day, limit=PAGE_SIZE):
+    """First page of the classes and PT sessions booked in every room on
+    ``day``; room_classes() / room_sessions() page further"""
+    # Both lists start from the same first-page key
+    params = dict(page_params('room_classes', limit=limit), day=day)
+    with db.connection(autocommit=True, read_only=True) as conn, \
+            conn.cursor() as cursor:
+        db.execute(cursor, 'ROOM_SCHEDULE_SCREEN', params)
+        classes, sessions = cursor.fetchone()
+
+    return RoomSchedule(
+        day,
+        build_page('room_classes',
+                   json_rows(classes, RoomClassBooking, 'room_classes'),
+                   limit, RoomClassBooking),
+        build_page('room_sessions',
+                   json_rows(sessions, RoomSessionBooking, 'room_sessions'),
+                   limit, RoomSessionBooking))
+
+
+def create_class_template(class_name, trainer_id, room_id, day_of_week,
+                          start_time, end_time, capacity, season_start,
+                          season_end):
+    """Add a class held every week of a season; returns template_id.
+    Nothing is scheduled until the season is expanded."""
+    if not class_name:
+        raise ValidationError("Class name is required")
+    if day_of_week not in DAYS_OF_WEEK:
+        raise ValidationError(f"Invalid day '{day_of_week}'")
+    _check_time_range(start_time, end_time)
+    if capacity <= 0:
+        raise ValidationError("Capacity must be positive")
+    if season_end < season_start:
+        raise ValidationError("Season must not end before it starts")
+    if (season_end - season_start).days >= MAX_SEASON_DAYS:
+        raise ValidationError(
+            f"A season can span at most {MAX_SEASON_DAYS} days")
+    params = {
+        'class_name': class_name, 'trainer_id': trainer_id,
+        'room_id': room_id, 'day_of_week': day_of_week,
+        'start_time': start_time, 'end_time': end_time,
+        'capacity': capacity, 'season_start': season_start,
+        'season_end': season_end,
+    }
+
+    with db.connection() as conn, conn.cursor() as cursor:
+        try:
+            cursor.execute(queries.CLASS_TEMPLATE_INSERT, params)
+        except errors.ForeignKeyViolation:
+            raise NotFoundError("Trainer or room not found")
+        template_id = cursor.fetchone()[0]
+        conn.commit()
+    return template_id
+
+
+def class_templates(as_of=None):
+    """Templates whose season runs to ``as_of`` (default today) or later"""
+    with db.connection(read_only=True) as conn, conn.cursor() as cursor:
+        cursor.execute(queries.CLASS_TEMPLATES,
+                       {'as_of': as_of or date.today()})
+        return [ClassTemplate(*r) for r in cursor.fetchall()]
+
+
+def expand_class_templates(template_ids, first_day=None, last_day=None,
+                           dry_run=False):
+    """Schedule every week of the templates' seasons from ``first_day``
+    (default today) to ``last_day`` (default the season end) that is not
+    scheduled yet.
+
+    The weeks are checked for trainer and room clashes, with existing
+    bookings and with each other, and inserted in one statement.  Weeks
+    that clash are skipped and reported; re-expanding after the clash is
+    resolved schedules just those.  With ``dry_run`` nothing is inserted.
+    """
+    if not template_ids:
+        raise ValidationError("No class templates to expand")
+    params = {'template_ids': list(template_ids),
+              'first_day': first_day or date.today(),
+              'last_day': last_day or date.max, 'dry_run': dry_run}
+    if params['last_day'] < params['first_day']:
+        raise ValidationError("End date must not be before start date")
+
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(queries.CLASS_TEMPLATE_LOCK, params)
+        try:
+            cursor.execute(queries.CLASS_TEMPLATE_EXPAND, params)
+        except errors.ExclusionViolation:
+            raise ConflictError(
+                "A booking made during the expansion clashes with it; "
+                "try again")
+        except errors.UniqueViolation:
+            raise ConflictError("Season is already being expanded")
+        found, scheduled, occurrences, clashes = cursor.fetchone()
+        if found < len(set(params['template_ids'])):
+            raise NotFoundError("Class template not found")
+        conn.commit()
+    if scheduled:
+        class_cache.invalidate()
+    return SeasonExpansion(scheduled, occurrences,
+                           [ScheduleClash(*c)
+                            for c in json_rows(clashes, ScheduleClash)])
+
+
+def list_equipment(after=None, limit=PAGE_SIZE):
+    """A page of equipment with room and maintenance status, items needing
+    attention first (cached)"""
+    params = page_params('equipment', after, limit)
+
+    def load():
+        with db.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(queries.EQUIPMENT_LIST, params)
+            return build_page('equipment', cursor.fetchall(), limit,
+                              EquipmentItem)
+    return equipment_cache.get((after, limit), load)
+
+
+def update_equipment_status(equipment_id, status, notes=None):
+    """Set equipment status and notes, stamping today's maintenance date"""
+    if status not in EQUIPMENT_STATUSES:
+        raise ValidationError(f"Invalid status '{status}'")
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(queries.EQUIPMENT_UPDATE_STATUS, {
+            'equipment_id': equipment_id, 'status': status,
+            'notes': notes or None,
+        })
+        if cursor.rowcount == 0:
+            raise NotFoundError("Equipment not found")
+        conn.commit()
+    equipment_cache.invalidate()
+
+
+def log_maintenance_issue(equipment_id, issue):
+    """Mark equipment as under maintenance with a description"""
+    update_equipment_status(equipment_id, 'Under Maintenance', issue)
+
+
+def bill_params(member_id, description, amount, due_days):
+    """BILL_INSERT parameters, after checking the amount"""
+    if amount < 0:
+        raise ValidationError("Amount cannot be negative")
+    return {'member_id': member_id, 'description': description,
+            'amount': amount, 'due_days': due_days}
+
+
+def generate_bill(member_id, description, amount, due_days):
+    """Create a pending bill due in ``due_days`` days; returns bill_id"""
+    params = bill_params(member_id, description, amount, due_days)
+    with db.connection() as conn, conn.cursor() as cursor:
+        try:
+            cursor.execute(queries.BILL_INSERT, params)
+        except errors.ForeignKeyViolation:
+            raise NotFoundError("Member not found")
+        bill_id = cursor.fetchone()[0]
+        conn.commit()
+    return bill_id
+
+
+def run_billing(period, membership_fee=MEMBERSHIP_FEE,
+                session_rate=PT_SESSION_RATE, due_days=14):
+    """Bill every member for ``period`` (first of the month) in one statement.
+
+    Safe to re-run: members already billed for the period are counted in
+    ``already_billed`` and left alone.
+    """
+    if membership_fee < 0 or session_rate < 0:
+        raise ValidationError("Charges cannot be negative")
+    period = period.replace(day=1)
+    started = datetime.now()
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(queries.BILLING_RUN, {
+            'period': period, 'membership_fee': membership_fee,
+            'session_rate': session_rate, 'due_days': due_days,
+        })
+        counts = {bill_type: (candidates, created, amount)
+                  for bill_type, candidates, created, amount
+                  in cursor.fetchall()}
+        conn.commit()
+    seconds = (datetime.now() - started).total_seconds()
+    membership, pt_package = counts['Membership'], counts['PT Package']
+    return BillingRun(
+        period, membership[1], pt_package[1],
+        membership[0] + pt_package[0] - membership[1] - pt_package[1],
+        membership[2] + pt_package[2], seconds)
+
+
+def sweep_overdue_bills(as_of=None):
+    """Mark pending bills past their due date 'Overdue'; returns the count"""
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(queries.OVERDUE_SWEEP, {'as_of': as_of or date.today()})
+        count = cursor.rowcount
+        conn.commit()
+    return count
+
+
+def ar_aging_report(as_of=None, limit=20):
+    """Unpaid balances in 0-30/31-60/61-90/90+ days-past-due buckets.
+
+    ``members`` holds the ``limit`` members owing the most; ``total``
+    covers every unpaid bill.
+    """
+    as_of = as_of or date.today()
+    with db.connection(read_only=True) as conn, conn.cursor() as cursor:
+        cursor.execute(queries.AR_AGING, {'as_of': as_of, 'limit': limit})
+        rows = [AgingRow(*r) for r in cursor.fetchall()]
+    if not rows:
+        zero = Decimal('0.00')
+        return AgingReport(as_of, AgingRow(None, zero, zero, zero, zero, zero),
+                           [])
+    return AgingReport(as_of, rows[0], rows[1:])
+
+
+def payment_params(bill_id, amount, method, reference=None):
+    """PAYMENT_INSERT parameters, after checking the method and amount"""
+    if method not in PAYMENT_METHODS:
+        raise ValidationError(f"Invalid payment method '{method}'")
+    if amount <= 0:
+        raise ValidationError("Payment amount must be positive")
+    return {'bill_id': bill_id, 'amount': Decimal(str(amount)),
+            'method': method, 'reference': reference or None}
+
+
+def bill_remaining(bill):
+    """Balance left on a bill, from its BILL_BALANCE row (None: no bill)"""
+    if not bill:
+        raise NotFoundError("Bill not found!")
+    return bill[0] - bill[1]
+
+
+def record_payment(bill_id, amount, method, reference=None):
+    """Record a payment against a bill (trigger settles the bill)"""
+    params = payment_params(bill_id, amount, method, reference)
+
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(queries.BILL_BALANCE, params)
+        remaining = bill_remaining(cursor.fetchone())
+        cursor.execute(queries.PAYMENT_INSERT, params)
+        payment_id = cursor.fetchone()[0]
+        conn.commit()
+
+    return PaymentReceipt(payment_id, bill_id, params['amount'], remaining)
+
+
+def import_payments(csv_file):
+    """Import a processor/bank payment file and settle the bills it pays.
+
+    ``csv_file`` is a file object with a header row and the columns
+    bill_id, amount, payment_date, payment_method, transaction_reference.
+    Rows that do not match a bill, or repeat a recorded reference, are
+    skipped and counted in ``rejected`` (reason -> rows, first data row),
+    so a file whose rows carry references can safely be re-imported.
+    The whole file is one transaction.
+    """
+    started = datetime.now()
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(queries.PAYMENT_IMPORT_LOCK)
+        cursor.execute(queries.PAYMENT_IMPORT_STAGE)
+        try:
+            cursor.copy_expert(queries.PAYMENT_IMPORT_COPY, csv_file)
+        except (errors.InvalidTextRepresentation, errors.BadCopyFileFormat,
+                errors.InvalidDatetimeFormat, errors.DatetimeFieldOverflow,
+                errors.NumericValueOutOfRange,
+                errors.StringDataRightTruncation) as e:
+            raise ValidationError(f"Unreadable payment file: {e.diag.message_primary}"
+                                  f" ({e.diag.context})")
+        cursor.execute(queries.PAYMENT_IMPORT_ANALYZE)
+        cursor.execute(queries.PAYMENT_IMPORT_SETTLE,
+                       {'methods': list(PAYMENT_METHODS)})
+        outcomes = {problem: (count, first_line)
+                    for problem, count, first_line in cursor.fetchall()}
+        conn.commit()
+
+    imported = outcomes.pop(None, (0, None))[0]
+    settled = outcomes.pop('bills settled')[0]
+    rows = imported + sum(count for count, _ in outcomes.values())
+    return PaymentImport(rows, imported, settled, outcomes,
+                         (datetime.now() - started).total_seconds())
+
+
+def member_bills(member_id, after=None, limit=PAGE_SIZE):
+    """A page of a member's bills, newest first"""
+    params = page_params('member_bills', after, limit)
+    params['member_id'] = member_id
+    with db.connection(read_only=True) as conn, conn.cursor() as cursor:
+        cursor.execute(queries.MEMBER_BILLS, params)
+        return build_page('member_bills', cursor.fetchall(), limit,
+                          BillRecord)
+
+
+# ============================================================================
+# EXPORTS
+# ============================================================================
+
+# Export name -> (query, CSV header)
+EXPORTS = {
+    'sessions': (queries.EXPORT_SESSIONS,
+                 ('session_id', 'session_date', 'start_time', 'end_time',
+                  'trainer_id', 'trainer', 'member_id', 'member', 'room',
+                  'status', 'notes')),
+    'classes': (queries.EXPORT_CLASSES,
+                ('class_id', 'schedule_date', 'start_time', 'end_time',
+                 'class_name', 'trainer_id', 'trainer', 'room',
+                 'current_enrollment', 'capacity', 'status')),
+    'bills': (queries.EXPORT_BILLS,
+              ('bill_id', 'member_id', 'bill_date', 'due_date', 'bill_type',
+               'billing_period', 'total_amount', 'amount_paid', 'status',
+               'description')),
+    'equipment': (queries.EXPORT_EQUIPMENT,
+                  ('equipment_id', 'equipment_name', 'room', 'status',
+                   'last_maintenance_date', 'maintenance_notes')),
+}
+
+
+def export_csv(name, out, first_day=None, last_day=None, trainer_id=None,
+               member_id=None, batch_size=EXPORT_BATCH):
+    """Write a full listing as CSV to the text file ``out``; returns the
+    number of rows written.
+
+    Rows arrive from a server-side cursor ``batch_size`` at a time, so
+    memory stays flat however large the export.  Date bounds apply to
+    sessions, classes and bills; trainer_id to sessions and classes;
+    member_id to sessions and bills.
+    """
+    if name not in EXPORTS:
+        raise ValidationError(f"Unknown export '{name}'")
+    if first_day and last_day and first_day > last_day:
+        raise ValidationError("First day must not be after last day")
+    if batch_size <= 0:
+        raise ValidationError("Batch size must be positive")
+    sql, header = EXPORTS[name]
+    params = {'first_day': first_day or date.min,
+              'last_day': last_day or date.max,
+              'trainer_id': trainer_id, 'member_id': member_id}
+
+    writer = csv.writer(out)
+    writer.writerow(header)
+    rows = 0
+    for row in db.stream(sql, params, batch_size, read_only=True):
+        writer.writerow(row)
+        rows += 1
+    return rows
+
+
+# ============================================================================
+# CHANGE FEED
+# ============================================================================
+
+def follow_changes(feed):
+    """Invalidate this process's caches when any process changes the data.
+
+    ``feed`` is a changefeed.ChangeFeed; writes made here already
+    invalidate directly, so the feed covers the other processes.
+    """
+    def invalidate(target):
+        return lambda change: target.invalidate()
+
+    feed.subscribe('class', invalidate(class_cache))
+    feed.subscribe('classregistration', invalidate(class_cache))
+    feed.subscribe('traineravailability', invalidate(availability_cache))
+    feed.subscribe('equipment', invalidate(equipment_cache))
@@ -0,0 +1,106 @@
+"""
+Health and Fitness Club Management System
+Free-Slot Sweep
+
+Pure interval logic behind services.find_free_slots: given weekly trainer
+availability and the busy periods of trainers and rooms, walk the calendar
+and yield the bookable (trainer, room, start, end) slots in time order.
+No database access here, so it can be timed and reasoned about alone.
+"""
+
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+
+class BusyIndex:
+    """Busy periods per key (trainer or room), sorted for overlap probes"""
+
+    def __init__(self):
+        self._periods = defaultdict(list)
+        self._sorted = True
+
+    def add(self, key, start, end):
+        self._periods[key].append((start, end))
+        self._sorted = False
+
+    def _sort(self):
+        if not self._sorted:
+            for periods in self._periods.values():
+                periods.sort()
+            self._sorted = True
+
+    def is_free(self, key, start, end):
+        """True if nothing booked for ``key`` overlaps [start, end)"""
+        self._sort()
+        periods = self._periods.get(key)
+        if not periods:
+            return True
+        # Only the period starting just before ``end`` and its predecessors
+        # can overlap; busy periods for one key never overlap each other.
+        i = bisect_left(periods, (end,))
+        return i == 0 or periods[i - 1][1] <= start
+
+
+def group_windows(rows):
+    """(trainer_id, name, day, start, end) rows -> (names, windows)"""
+    names = {}
+    windows = defaultdict(list)
+    for trainer_id, name, day_of_week, start, end in rows:
+        names[trainer_id] = name
+        windows[day_of_week].append((trainer_id, start, end))
+    return names, windows
+
+
+def index_busy(rows, trainer_ids):
+    """(trainer_id, room_id, start, end) rows -> (trainer_busy, room_busy)"""
+    trainer_busy = BusyIndex()
+    room_busy = BusyIndex()
+    for trainer_id, room_id, start, end in rows:
+        if trainer_id in trainer_ids:
+            trainer_busy.add(trainer_id, start, end)
+        if room_id is not None:
+            room_busy.add(room_id, start, end)
+    return trainer_busy, room_busy
+
+
+def sweep(days, windows, trainer_busy, room_busy, rooms, length, step,
+          not_before=None):
+    """Yield (start, end, trainer_id, room_id) in chronological order.
+
+    ``windows`` maps weekday name -> [(trainer_id, start_time, end_time)];
+    candidate starts are spaced ``step`` apart from each window's start.
+    Each slot is assigned the first room in ``rooms`` that is free.
+    """
+    for day in days:
+        candidates = []
+        for trainer_id, win_start, win_end in windows.get(day.strftime('%A'), ()):
+            start = datetime.combine(day, win_start)
+            limit = datetime.combine(day, win_end)
+            while start + length <= limit:
+                end = start + length
+                if (not_before is None or start >= not_before) and \
+                        trainer_busy.is_free(trainer_id, start, end):
+                    candidates.append((start, trainer_id, end))
+                start += step
+        candidates.sort()
+        for start, trainer_id, end in candidates:
+            room_id = next((r for r in rooms
+                            if room_busy.is_free(r, start, end)), None)
+            if room_id is not None:
+                yield start, end, trainer_id, room_id
+
+
+def weeks(first, last):
+    """Split [first, last] into (chunk_start, chunk_end) 7-day spans"""
+    while first <= last:
+        end = min(first + timedelta(days=6), last)
+        yield first, end
+        first = end + timedelta(days=1)
+
+
+def date_range(first, last):
+    day = first
+    while day <= last:
+        yield day
+        day += timedelta(days=1)
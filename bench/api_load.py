@@ -0,0 +1,162 @@
+"""
+Health and Fitness Club Management System
+API Load Test
+
+Compares the asyncio JSON API against the blocking per-process model
+(one thread calling services.py, as the CLI does) on the same read mix:
+dashboard, open classes, trainer schedule, equipment and bill history.
+
+    cd app && python api.py --port 8080 &
+    python bench/api_load.py --mode api --concurrency 200 --duration 30
+    python bench/api_load.py --mode sync --concurrency 200 --duration 30
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+
+def _requests(members, trainers):
+    """Endless (label, path) stream for the read mix"""
+    while True:
+        pick = random.random()
+        if pick < 0.4:
+            yield "dashboard", f"/members/{random.randint(1, members)}/dashboard"
+        elif pick < 0.6:
+            yield "classes", "/classes"
+        elif pick < 0.8:
+            yield "trainer_schedule", \
+                f"/trainers/{random.randint(1, trainers)}/schedule"
+        elif pick < 0.9:
+            yield "equipment", "/equipment"
+        else:
+            yield "bills", f"/members/{random.randint(1, members)}/bills"
+
+
+def summarize(mode, latencies, errors, elapsed, concurrency):
+    latencies.sort()
+    count = len(latencies)
+
+    def pct(p):
+        return latencies[min(count - 1, int(p * count))] * 1000 if count else 0.0
+
+    print(f"\n=== {mode} (concurrency {concurrency}) ===")
+    print(f"  Requests:  {count} ok, {errors} errors in {elapsed:.1f}s")
+    print(f"  Throughput: {count / elapsed:.0f} req/s")
+    print(f"  Latency:   p50 {pct(0.50):.1f} ms, p99 {pct(0.99):.1f} ms")
+
+
+async def run_api(args):
+    import aiohttp
+
+    latencies = []
+    errors = 0
+    stream = _requests(args.members, args.trainers)
+    deadline = time.perf_counter() + args.duration
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+
+    async with aiohttp.ClientSession(args.url, connector=connector) as http:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                _, path = next(stream)
+                started = time.perf_counter()
+                try:
+                    async with http.get(path) as resp:
+                        await resp.read()
+                        ok = resp.status < 500
+                except aiohttp.ClientError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    summarize("asyncio API", latencies, errors, elapsed, args.concurrency)
+
+
+def run_sync(args):
+    """Blocking model: one process serves one request at a time.
+
+    ``concurrency`` client threads queue on a single lock and connection,
+    so reported latency includes the wait for the process to become free.
+    """
+    import threading
+
+    import services
+    from database import db
+
+    db.initialize_pool(1, 1)
+    calls = {
+        "dashboard": lambda path: services.member_dashboard(
+            int(path.split("/")[2])),
+        "classes": lambda path: services.list_open_classes(),
+        "trainer_schedule": lambda path: services.trainer_schedule(
+            int(path.split("/")[2])),
+        "equipment": lambda path: services.list_equipment(),
+        "bills": lambda path: services.member_bills(int(path.split("/")[2])),
+    }
+    latencies = []
+    errors = 0
+    server = threading.Lock()
+    stream = _requests(args.members, args.trainers)
+    deadline = time.perf_counter() + args.duration
+
+    def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            with server:
+                label, path = next(stream)
+                try:
+                    calls[label](path)
+                except services.NotFoundError:
+                    pass
+                except Exception:
+                    errors += 1
+                    continue
+            latencies.append(time.perf_counter() - t0)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client)
+               for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    db.close_all_connections()
+
+    summarize("per-process (blocking)", latencies, errors, elapsed,
+              args.concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mode", choices=("api", "sync"), default="api")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--members", type=int, default=5,
+                        help="highest member_id to request")
+    parser.add_argument("--trainers", type=int, default=3,
+                        help="highest trainer_id to request")
+    args = parser.parse_args()
+
+    if args.mode == "api":
+        asyncio.run(run_api(args))
+    else:
+        run_sync(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Health and Fitness Club Management System
+Overdue Sweep & AR Aging Benchmark
+
+Grows Bill to --bills rows (mostly paid, as a mature table is), then
+times the overdue sweep and the aging report with the idx_bill_unpaid
+partial index, and the report again with index scans disabled (a full
+scan of Bill) for comparison.
+
+    python bench/ar_aging.py --bills 2000000
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import queries  # noqa: E402
+from database import db  # noqa: E402
+
+SEED_MEMBERS = """
+INSERT INTO Member (email, password, first_name, last_name, date_of_birth)
+SELECT 'agingbench' || g || '@example.com', 'x', 'Bench', 'Debtor' || g,
+       DATE '1985-01-01'
+FROM generate_series(1, %(members)s) g
+ON CONFLICT (email) DO NOTHING
+"""
+
+# Due dates spread over the last ~13 months; one bill in seven unpaid
+SEED_BILLS = """
+INSERT INTO Bill (member_id, bill_date, due_date, total_amount, amount_paid,
+                  status, description)
+SELECT m.first_id + g %% m.members,
+       CURRENT_DATE - (g %% 400), CURRENT_DATE - (g %% 400) + 14,
+       150,
+       CASE WHEN g %% 7 = 0 THEN (g %% 3) * 25 ELSE 150 END,
+       CASE WHEN g %% 7 = 0 THEN 'Pending' ELSE 'Paid' END,
+       'Aging bench bill'
+FROM generate_series(%(first)s, %(last)s) g,
+     (SELECT MIN(member_id) AS first_id, COUNT(*) AS members FROM Member
+      WHERE email LIKE 'agingbench%%') m
+"""
+
+NO_INDEX = """
+SET enable_indexscan = off;
+SET enable_indexonlyscan = off;
+SET enable_bitmapscan = off
+"""
+
+
+def seed(cursor, members, bills, batch=250000):
+    cursor.execute(SEED_MEMBERS, {"members": members})
+    cursor.connection.commit()
+    cursor.execute("SELECT COUNT(*) FROM Bill")
+    have = cursor.fetchone()[0]
+    while have < bills:
+        last = min(bills, have + batch)
+        cursor.execute(SEED_BILLS, {"first": have + 1, "last": last})
+        cursor.connection.commit()
+        have = last
+        print(f"  seeded {have} bills", end="\r")
+    print()
+
+
+def timed(cursor, sql, params, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        if cursor.description:
+            cursor.fetchall()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def plan(cursor, sql, params):
+    cursor.execute("EXPLAIN " + sql, params)
+    return [r[0].strip() for r in cursor.fetchall()
+            if "Scan" in r[0]][0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bills", type=int, default=2000000)
+    parser.add_argument("--members", type=int, default=50000)
+    args = parser.parse_args()
+
+    db.initialize_pool(1, 1)
+    with db.connection() as conn, conn.cursor() as cursor:
+        seed(cursor, args.members, args.bills)
+        params = {"as_of": date.today(), "limit": 20}
+
+        started = time.perf_counter()
+        cursor.execute(queries.OVERDUE_SWEEP, params)
+        swept = cursor.rowcount
+        conn.commit()
+        sweep_ms = (time.perf_counter() - started) * 1000
+
+        conn.autocommit = True
+        cursor.execute("VACUUM ANALYZE Bill")
+        conn.autocommit = False
+        repeat_ms = timed(cursor, queries.OVERDUE_SWEEP, params, repeat=1)
+        conn.commit()
+        cursor.execute("SELECT COUNT(*) FILTER (WHERE status IN "
+                       "('Pending', 'Overdue')), COUNT(*) FROM Bill")
+        unpaid, total = cursor.fetchone()
+
+        print(f"\nBills: {total} ({unpaid} unpaid)")
+        print(f"  Overdue sweep:          {sweep_ms:10.1f} ms "
+              f"({swept} bills marked Overdue)")
+        print(f"  Sweep again (vacuumed): {repeat_ms:10.1f} ms")
+
+        indexed_ms = timed(cursor, queries.AR_AGING, params)
+        indexed_plan = plan(cursor, queries.AR_AGING, params)
+        cursor.execute(NO_INDEX)
+        full_ms = timed(cursor, queries.AR_AGING, params)
+        full_plan = plan(cursor, queries.AR_AGING, params)
+        conn.rollback()
+
+        print(f"  Aging report (index):   {indexed_ms:10.1f} ms  {indexed_plan}")
+        print(f"  Aging report (no index):{full_ms:10.1f} ms  {full_plan}")
+    db.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
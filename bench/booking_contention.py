@@ -0,0 +1,162 @@
+"""
+Health and Fitness Club Management System
+Booking Contention Benchmark
+
+Hammers services.book_personal_training from --threads threads against
+--trainers bench trainers (one by default), each thread booking random
+one-hour slots over the next --days days.  Reports attempts and bookings
+per second, then checks the session table itself for any trainer or room
+double-booking.
+
+    python bench/booking_contention.py --threads 100 --duration 20
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from datetime import time as clock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import services  # noqa: E402
+from database import db  # noqa: E402
+
+SPECIALIZATION = "Booking Bench"
+
+SEED = """
+WITH new_trainers AS (
+    INSERT INTO Trainer (email, password, first_name, last_name, specialization)
+    SELECT 'bookbench' || g || '@example.com', 'x', 'Bench', 'Booker' || g,
+           %(specialization)s
+    FROM generate_series(1, %(trainers)s) g
+    ON CONFLICT (email) DO NOTHING
+    RETURNING trainer_id
+)
+INSERT INTO TrainerAvailability (trainer_id, day_of_week, start_time, end_time)
+SELECT trainer_id, d, TIME '06:00', TIME '22:00'
+FROM new_trainers,
+     unnest(ARRAY['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday',
+                  'Saturday', 'Sunday']) d
+"""
+
+BENCH_TRAINERS = """
+SELECT trainer_id FROM Trainer
+WHERE specialization = %(specialization)s
+ORDER BY trainer_id
+LIMIT %(trainers)s
+"""
+
+CLEAR = """
+DELETE FROM PersonalTrainingSession
+WHERE trainer_id IN (SELECT trainer_id FROM Trainer
+                     WHERE specialization = %(specialization)s)
+"""
+
+# Checked against PersonalTrainingSession and Class directly, not against
+# ResourceBooking, so the check does not rely on the constraints under test
+DOUBLE_BOOKINGS = """
+WITH booked AS (
+    SELECT trainer_id, room_id, session_date AS day, start_time, end_time
+    FROM PersonalTrainingSession WHERE status = 'Scheduled'
+    UNION ALL
+    SELECT trainer_id, room_id, schedule_date, start_time, end_time
+    FROM Class WHERE status = 'Scheduled'
+)
+SELECT COUNT(*) FILTER (WHERE a.trainer_id = b.trainer_id),
+       COUNT(*) FILTER (WHERE a.room_id = b.room_id)
+FROM booked a
+JOIN booked b
+  ON a.day = b.day
+ AND (a.trainer_id = b.trainer_id OR a.room_id = b.room_id)
+ AND a.start_time < b.end_time AND b.start_time < a.end_time
+ AND (a.trainer_id, a.room_id, a.start_time)
+     < (b.trainer_id, b.room_id, b.start_time)
+"""
+
+
+def seed(trainers):
+    params = {"specialization": SPECIALIZATION, "trainers": trainers}
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(SEED, params)
+        cursor.execute(CLEAR, params)
+        cursor.execute(BENCH_TRAINERS, params)
+        trainer_ids = [r[0] for r in cursor.fetchall()]
+        cursor.execute("SELECT member_id FROM Member")
+        member_ids = [r[0] for r in cursor.fetchall()]
+        conn.commit()
+    return trainer_ids, member_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--threads", type=int, default=100)
+    parser.add_argument("--trainers", type=int, default=1)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--duration", type=float, default=20.0)
+    args = parser.parse_args()
+
+    db.initialize_pool(args.threads, args.threads, timeout=60)
+    trainer_ids, member_ids = seed(args.trainers)
+    first_day = date.today() + timedelta(days=1)
+
+    outcomes = Counter()
+    latencies = []
+    record = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def client():
+        while time.perf_counter() < deadline:
+            day = first_day + timedelta(days=random.randrange(args.days))
+            half_hour = random.randrange(12, 42)    # 06:00 .. 20:30 starts
+            start = clock(half_hour // 2, 30 * (half_hour % 2))
+            end = clock(half_hour // 2 + 1, start.minute)
+            started = time.perf_counter()
+            try:
+                services.book_personal_training(
+                    random.choice(member_ids), random.choice(trainer_ids),
+                    day, start, end)
+                outcome = "booked"
+            except services.ConflictError as e:
+                outcome = f"conflict: {e}"
+            except Exception as e:
+                outcome = f"error: {type(e).__name__}: {e}"
+            with record:
+                outcomes[outcome] += 1
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(DOUBLE_BOOKINGS)
+        trainer_doubles, room_doubles = cursor.fetchone()
+    db.close_all_connections()
+
+    latencies.sort()
+    attempts = len(latencies)
+    booked = outcomes["booked"]
+    print(f"\nThreads: {args.threads}, trainers: {len(trainer_ids)}, "
+          f"slots: {args.days} days x 30 start times")
+    print(f"  Attempts:  {attempts} in {elapsed:.1f}s "
+          f"({attempts / elapsed:.0f}/s)")
+    print(f"  Booked:    {booked} ({booked / elapsed:.1f} bookings/s)")
+    print(f"  Latency:   p50 {latencies[attempts // 2] * 1000:.1f} ms, "
+          f"p99 {latencies[int(attempts * 0.99)] * 1000:.1f} ms")
+    for outcome, count in sorted(outcomes.items()):
+        if outcome != "booked":
+            print(f"  {outcome}: {count}")
+    print(f"  Double-bookings: trainer {trainer_doubles}, room {room_doubles}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Health and Fitness Club Management System
+Change Feed Benchmark
+
+Starts a ChangeFeed listener, then from a separate connection commits
+--changes single-row Equipment updates one at a time and measures how
+long each takes to reach the subscriber (commit to callback).  Kills the
+listener's backend to check that it reconnects and sends a reset, and
+times a --bulk row Bill insert with and without the notify trigger to
+show the per-statement cost on bulk writes.
+
+    python bench/change_feed.py --changes 1000 --bulk 100000
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import changefeed  # noqa: E402
+from database import db  # noqa: E402
+
+TOUCH = """
+UPDATE Equipment SET maintenance_notes = maintenance_notes
+WHERE equipment_id = %(equipment_id)s
+"""
+
+LISTENER_PID = """
+SELECT pid FROM pg_stat_activity
+WHERE query LIKE 'LISTEN %%' AND pid <> pg_backend_pid()
+"""
+
+BULK_BILLS = """
+INSERT INTO Bill (member_id, due_date, total_amount, description)
+SELECT (SELECT MIN(member_id) FROM Member), CURRENT_DATE + 30, 10,
+       'Change feed bench bill'
+FROM generate_series(1, %(bulk)s)
+"""
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--changes", type=int, default=1000)
+    parser.add_argument("--bulk", type=int, default=100000)
+    args = parser.parse_args()
+
+    db.initialize_pool(1, 1)
+    arrived = threading.Event()
+    resets = []
+
+    def on_change(change):
+        if change.op == changefeed.RESET:
+            resets.append(change)
+        arrived.set()
+
+    feed = changefeed.ChangeFeed()
+    feed.subscribe('equipment', on_change)
+    feed.start()
+    while not feed.listening:
+        time.sleep(0.01)
+
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT MIN(equipment_id) FROM Equipment")
+        params = {"equipment_id": cursor.fetchone()[0]}
+        conn.commit()
+
+        latencies = []
+        for _ in range(args.changes):
+            arrived.clear()
+            cursor.execute(TOUCH, params)
+            started = time.perf_counter()
+            conn.commit()
+            if not arrived.wait(5):
+                print("  change not delivered within 5 s")
+                break
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        # Reconnect: drop the listener's session and wait for the reset
+        cursor.execute(LISTENER_PID)
+        cursor.execute("SELECT pg_terminate_backend(%(pid)s)",
+                       {"pid": cursor.fetchone()[0]})
+        conn.commit()
+        deadline = time.perf_counter() + 10
+        while not resets and time.perf_counter() < deadline:
+            time.sleep(0.01)
+
+        # Bulk insert cost with and without the notify trigger
+        timings = {}
+        for label, toggle in (("with notify", None),
+                              ("without", "bill_notify_insert_trigger")):
+            if toggle:
+                cursor.execute(f"ALTER TABLE Bill DISABLE TRIGGER {toggle}")
+            started = time.perf_counter()
+            cursor.execute(BULK_BILLS, {"bulk": args.bulk})
+            timings[label] = (time.perf_counter() - started) * 1000
+            conn.rollback()
+    feed.stop()
+    db.close_all_connections()
+
+    stats = feed.stats()
+    print(f"\nCommit-to-subscriber latency over {len(latencies)} changes:")
+    print(f"  p50 {percentile(latencies, 0.5):.2f} ms, "
+          f"p99 {percentile(latencies, 0.99):.2f} ms, "
+          f"max {max(latencies):.2f} ms")
+    print(f"  Reconnect: {stats['reconnects']} reconnect(s), "
+          f"{len(resets)} reset event(s) delivered")
+    print(f"  {args.bulk}-row Bill insert: "
+          + ", ".join(f"{k} {v:.0f} ms" for k, v in timings.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Health and Fitness Club Management System
+Class Template Expansion Benchmark
+
+Creates enough weekly class templates to fill --occurrences classes over
+a 52-week season after the last booked day, spread over the group class
+rooms, days and hours so they do not clash with each other, then:
+
+  per-row     each week checked against ResourceBooking and inserted
+              with its own statements (rolled back)
+  dry run     services.expand_class_templates(dry_run=True): the
+              one-pass clash check alone
+  expansion   services.expand_class_templates(): check and insert
+
+It also dry-runs the same timetable over the coming weeks, where the
+existing classes and sessions clash with it, to show the clash report.
+Templates and their classes are deleted afterwards.
+
+    python bench/class_templates.py --occurrences 10000
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+from collections import Counter
+from datetime import date, timedelta
+from datetime import time as clock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import services  # noqa: E402
+from database import db  # noqa: E402
+
+WEEKS = 52
+HOURS = range(6, 22)
+
+RESOURCES = """
+    SELECT (SELECT array_agg(trainer_id ORDER BY trainer_id) FROM Trainer),
+           (SELECT array_agg(room_id ORDER BY room_id) FROM Room
+            WHERE room_type = 'Group Class'),
+           (SELECT MAX(upper(period))::date + 1 FROM ResourceBooking)
+"""
+
+# The per-row way: one clash check and one insert per week
+ROW_CLASH = """
+    SELECT EXISTS (
+        SELECT 1 FROM ResourceBooking
+        WHERE (trainer_id = %(trainer_id)s OR room_id = %(room_id)s)
+          AND period && tsrange(%(day)s::date + %(start_time)s::time,
+                                %(day)s::date + %(end_time)s::time))
+"""
+ROW_INSERT = """
+    INSERT INTO Class (class_name, trainer_id, room_id, schedule_date,
+                       start_time, end_time, capacity, template_id)
+    VALUES (%(class_name)s, %(trainer_id)s, %(room_id)s, %(day)s,
+            %(start_time)s, %(end_time)s, %(capacity)s, %(template_id)s)
+"""
+
+CLEANUP = """
+    DELETE FROM Class WHERE template_id = ANY(%(template_ids)s);
+    DELETE FROM ClassTemplate WHERE template_id = ANY(%(template_ids)s)
+"""
+
+
+def timetable(count, trainers, rooms):
+    """``count`` weekly slots (day, hour, room, trainer), no two sharing a
+    room or trainer at the same time"""
+    slots = [(day, hour, room)
+             for day in services.DAYS_OF_WEEK for hour in HOURS
+             for room in rooms]
+    if count > len(slots) or len(rooms) > len(trainers):
+        sys.exit(f"only {len(slots)} clash-free weekly slots available")
+    return [(day, hour, room, trainers[i % len(trainers)])
+            for i, (day, hour, room) in enumerate(slots[:count])]
+
+
+def create_templates(slots, season_start, season_end):
+    return [services.create_class_template(
+                f"Bench {day[:3]} {hour:02d}:00", trainer_id, room_id, day,
+                clock(hour), clock(hour, 50), 20, season_start, season_end)
+            for day, hour, room_id, trainer_id in slots]
+
+
+def per_row(template_ids, season_start, season_end):
+    """(seconds, inserted), one round trip per check and per insert"""
+    started = time.perf_counter()
+    inserted = 0
+    with db.connection() as conn, conn.cursor() as cursor:
+        for t in services.class_templates(season_start):
+            if t.template_id not in template_ids:
+                continue
+            cursor.execute("SELECT trainer_id, room_id FROM ClassTemplate "
+                           "WHERE template_id = %s", (t.template_id,))
+            trainer_id, room_id = cursor.fetchone()
+            day = season_start + timedelta(
+                (services.DAYS_OF_WEEK.index(t.day_of_week)
+                 - season_start.weekday()) % 7)
+            while day <= season_end:
+                params = {"class_name": t.class_name, "trainer_id": trainer_id,
+                          "room_id": room_id, "day": day,
+                          "start_time": t.start_time, "end_time": t.end_time,
+                          "capacity": t.capacity,
+                          "template_id": t.template_id}
+                cursor.execute(ROW_CLASH, params)
+                if not cursor.fetchone()[0]:
+                    cursor.execute(ROW_INSERT, params)
+                    inserted += 1
+                day += timedelta(days=7)
+        conn.rollback()
+    return time.perf_counter() - started, inserted
+
+
+def timed(template_ids, **kwargs):
+    started = time.perf_counter()
+    expansion = services.expand_class_templates(template_ids, **kwargs)
+    return time.perf_counter() - started, expansion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--occurrences", type=int, default=10000)
+    parser.add_argument("--skip-per-row", action="store_true")
+    args = parser.parse_args()
+
+    db.initialize_pool(1, 2)
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(RESOURCES)
+        trainers, rooms, free_from = cursor.fetchone()
+    season_start = max(free_from or date.today(), date.today())
+    season_end = season_start + timedelta(weeks=WEEKS, days=-1)
+    slots = timetable(math.ceil(args.occurrences / WEEKS), trainers, rooms)
+
+    template_ids = []
+    try:
+        template_ids = create_templates(slots, season_start, season_end)
+        print(f"{len(template_ids)} templates x {WEEKS} weeks, "
+              f"{season_start} to {season_end}:")
+
+        if not args.skip_per_row:
+            seconds, inserted = per_row(set(template_ids), season_start,
+                                        season_end)
+            print(f"  {'per-row':<10} {inserted:>7,} classes "
+                  f"{seconds:>8.3f}s  (rolled back)")
+        seconds, expansion = timed(template_ids, first_day=season_start,
+                                   dry_run=True)
+        print(f"  {'dry run':<10} {expansion.occurrences:>7,} checked "
+              f"{seconds:>8.3f}s  {len(expansion.clashes)} clash(es)")
+        seconds, expansion = timed(template_ids, first_day=season_start)
+        print(f"  {'expansion':<10} {expansion.scheduled:>7,} classes "
+              f"{seconds:>8.3f}s  {len(expansion.clashes)} clash(es)")
+        seconds, again = timed(template_ids, first_day=season_start)
+        print(f"  {'re-run':<10} {again.scheduled:>7,} classes "
+              f"{seconds:>8.3f}s")
+
+        # The same timetable over the coming weeks, among existing bookings
+        current = create_templates(slots, date.today(),
+                                   date.today() + timedelta(weeks=8))
+        template_ids += current
+        seconds, expansion = timed(current, dry_run=True)
+        kinds = Counter(c.clash_with.split()[0] for c in expansion.clashes)
+        print(f"\nSame timetable over the next 8 weeks (dry run, "
+              f"{seconds:.3f}s): {expansion.skipped:,} of "
+              f"{expansion.occurrences:,} weeks clash with "
+              + ", ".join(f"{n:,} {k}(s)" for k, n in sorted(kinds.items())))
+    finally:
+        with db.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(CLEANUP, {"template_ids": template_ids})
+            conn.commit()
+        db.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Health and Fitness Club Management System
+Dashboard Benchmark: correlated-subquery view vs. MemberSummary
+
+Seeds synthetic members (with health metrics, goals and bills) until the
+database holds --members rows, then times the original MemberDashboard
+definition against the MemberSummary-backed view for a full admin listing
+and for random single-member lookups.
+
+    python bench/dashboard_summary.py --members 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from psycopg2 import errors  # noqa: E402
+
+from database import db  # noqa: E402
+
+# The MemberDashboard view as originally defined in sql/DDL.sql (with the
+# unpaid balance covering overdue bills, as MemberSummary now does)
+LEGACY_VIEW = """
+CREATE TEMP VIEW LegacyMemberDashboard AS
+SELECT
+    m.member_id, m.first_name, m.last_name, m.email,
+    (SELECT weight FROM HealthMetric WHERE member_id = m.member_id ORDER BY recorded_date DESC LIMIT 1) AS latest_weight,
+    (SELECT heart_rate FROM HealthMetric WHERE member_id = m.member_id ORDER BY recorded_date DESC LIMIT 1) AS latest_heart_rate,
+    (SELECT recorded_date FROM HealthMetric WHERE member_id = m.member_id ORDER BY recorded_date DESC LIMIT 1) AS last_metric_date,
+    (SELECT COUNT(*) FROM FitnessGoal WHERE member_id = m.member_id AND status = 'Active') AS active_goals,
+    (SELECT COUNT(*) FROM PersonalTrainingSession
+     WHERE member_id = m.member_id AND session_date >= CURRENT_DATE AND status = 'Scheduled') AS upcoming_sessions,
+    (SELECT COUNT(*) FROM ClassRegistration
+     WHERE member_id = m.member_id AND status = 'Attended') AS classes_attended,
+    (SELECT COALESCE(SUM(total_amount - amount_paid), 0) FROM Bill
+     WHERE member_id = m.member_id AND status IN ('Pending', 'Overdue')) AS pending_balance
+FROM Member m
+"""
+
+SEED = """
+WITH new_members AS (
+    INSERT INTO Member (email, password, first_name, last_name, date_of_birth)
+    SELECT 'bench' || g || '@example.com', 'x', 'Bench', 'Member' || g,
+           DATE '1970-01-01' + (g %% 15000)
+    FROM generate_series(%(first)s, %(last)s) g
+    RETURNING member_id
+), metrics AS (
+    INSERT INTO HealthMetric (member_id, recorded_date, weight, heart_rate)
+    SELECT member_id, TIMESTAMP '2024-01-01' + k * INTERVAL '30 days',
+           150 + (member_id + k) %% 60, 60 + (member_id * k) %% 30
+    FROM new_members, generate_series(1, 3) k
+), goals AS (
+    INSERT INTO FitnessGoal (member_id, goal_type, target_value, current_value)
+    SELECT member_id, 'Weight Loss', 150, 170 FROM new_members
+)
+INSERT INTO Bill (member_id, due_date, total_amount, amount_paid, status)
+SELECT member_id, CURRENT_DATE + 14, 150, (member_id %% 3) * 50,
+       CASE WHEN member_id %% 3 = 2 THEN 'Paid' ELSE 'Pending' END
+FROM new_members
+"""
+
+
+def seed(cursor, target, batch=10000):
+    cursor.execute("SELECT COUNT(*) FROM Member")
+    have = cursor.fetchone()[0]
+    while have < target:
+        last = min(target, have + batch)
+        cursor.execute(SEED, {"first": have + 1, "last": last})
+        cursor.connection.commit()
+        have = last
+        print(f"  seeded {have} members", end="\r")
+    print()
+
+
+def timed(cursor, sql, repeat=1):
+    """Best-of-``repeat`` milliseconds, or None if statement_timeout hit"""
+    best = None
+    for _ in range(repeat):
+        cursor.execute("SAVEPOINT timed")
+        started = time.perf_counter()
+        try:
+            cursor.execute(sql)
+            cursor.fetchall()
+        except errors.QueryCanceled:
+            cursor.execute("ROLLBACK TO SAVEPOINT timed")
+            return None
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def fmt(ms):
+    return f"{'timeout':>14}" if ms is None else f"{ms:14.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--members", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--timeout", type=int, default=120,
+                        help="per-query statement_timeout in seconds")
+    args = parser.parse_args()
+
+    db.initialize_pool(1, 1)
+    with db.connection() as conn, conn.cursor() as cursor:
+        seed(cursor, args.members)
+        cursor.execute("ANALYZE")
+        cursor.execute(LEGACY_VIEW)
+        cursor.execute("SET statement_timeout = %s", (args.timeout * 1000,))
+        cursor.execute("SELECT MAX(member_id) FROM Member")
+        max_id = cursor.fetchone()[0]
+        ids = [random.randint(1, max_id) for _ in range(args.lookups)]
+
+        print(f"\nMembers: {args.members}")
+        print(f"{'':28}{'legacy view':>14}{'summary':>14}")
+        for label, sql in (
+            ("Full listing (ms)", "SELECT * FROM {}"),
+            ("Top 50 by balance (ms)",
+             "SELECT * FROM {} ORDER BY pending_balance DESC LIMIT 50"),
+        ):
+            legacy = timed(cursor, sql.format("LegacyMemberDashboard"),
+                           repeat=args.repeat)
+            summary = timed(cursor, sql.format("MemberDashboard"),
+                            repeat=args.repeat)
+            print(f"{label:28}{fmt(legacy)}{fmt(summary)}")
+
+        totals = []
+        for view in ("LegacyMemberDashboard", "MemberDashboard"):
+            started = time.perf_counter()
+            for member_id in ids:
+                cursor.execute(f"SELECT * FROM {view} WHERE member_id = %s",
+                               (member_id,))
+                cursor.fetchone()
+            totals.append((time.perf_counter() - started) * 1000 / len(ids))
+        print(f"{'Single lookup avg (ms)':28}{totals[0]:14.3f}{totals[1]:14.3f}")
+
+        # Spot-check correctness on the sampled members
+        cursor.execute("""
+            (SELECT * FROM LegacyMemberDashboard WHERE member_id = ANY(%(ids)s)
+             EXCEPT SELECT * FROM MemberDashboard WHERE member_id = ANY(%(ids)s))
+            UNION ALL
+            (SELECT * FROM MemberDashboard WHERE member_id = ANY(%(ids)s)
+             EXCEPT SELECT * FROM LegacyMemberDashboard WHERE member_id = ANY(%(ids)s))
+        """, {"ids": ids})
+        mismatches = len(cursor.fetchall())
+        print(f"\nSampled rows differing between views: {mismatches}")
+        conn.rollback()
+    db.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Health and Fitness Club Management System
+Wearable Ingestion Benchmark
+
+Measures sustained health-metric writes per second three ways, each for
+--seconds with --producers threads generating readings as fast as they
+can:
+
+  per-row   services.add_health_metric(): one INSERT and one commit per
+            reading (what the profile menu does)
+  values    MetricIngester, batches written with execute_values
+  copy      MetricIngester, batches COPYed through a staging table
+
+For the ingester runs the rate counts readings committed, including the
+time to drain the buffer at the end, and the report shows how often
+producers were held back by a full buffer.  About 1% of the generated
+readings are out of range, to exercise rejection.  Every reading written
+is tagged and deleted afterwards.
+
+    python bench/ingest.py --seconds 10 --producers 4 --batch 1000
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import ingest  # noqa: E402
+import services  # noqa: E402
+from database import db  # noqa: E402
+
+NOTE = "ingest bench"
+
+MEMBER_IDS = "SELECT member_id FROM Member ORDER BY member_id"
+
+CLEANUP = "DELETE FROM HealthMetric WHERE notes = %(note)s"
+
+
+def reading(rng, members):
+    heart_rate = 400 if rng.random() < 0.01 else rng.randint(50, 110)
+    return {"member_id": rng.choice(members),
+            "weight": round(rng.uniform(120, 260), 2),
+            "heart_rate": heart_rate,
+            "body_fat_percentage": round(rng.uniform(8, 35), 2),
+            "notes": NOTE}
+
+
+def run_producers(producers, seconds, work):
+    """Run ``work(rng, stop)`` on each producer thread for ``seconds``"""
+    stop = threading.Event()
+    threads = [threading.Thread(target=work, args=(random.Random(i), stop))
+               for i in range(producers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+
+def per_row(args, members):
+    written = []
+
+    def work(rng, stop):
+        count = 0
+        while not stop.is_set():
+            r = reading(rng, members)
+            if r["heart_rate"] > 250:
+                continue
+            services.add_health_metric(**r)
+            count += 1
+        written.append(count)
+
+    started = time.perf_counter()
+    run_producers(args.producers, args.seconds, work)
+    return {"written": sum(written), "seconds": time.perf_counter() - started}
+
+
+def batched(args, members, method):
+    ingester = ingest.MetricIngester(batch_size=args.batch,
+                                     max_buffer=args.buffer, method=method)
+    ingester.start()
+
+    def work(rng, stop):
+        while not stop.is_set():
+            try:
+                ingester.submit(reading(rng, members))
+            except ingest.IngestBusy:
+                pass
+
+    started = time.perf_counter()
+    run_producers(args.producers, args.seconds, work)
+    ingester.stop()
+    stats = ingester.stats()
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--producers", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=ingest.BATCH_SIZE)
+    parser.add_argument("--buffer", type=int, default=ingest.MAX_BUFFER)
+    parser.add_argument("--methods", default="per-row,values,copy",
+                        help="comma-separated subset of per-row,values,copy")
+    args = parser.parse_args()
+
+    db.initialize_pool(1, args.producers)
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(MEMBER_IDS)
+        members = [r[0] for r in cursor.fetchall()]
+
+    results = {}
+    for method in args.methods.split(","):
+        if method == "per-row":
+            results[method] = per_row(args, members)
+        else:
+            results[method] = batched(args, members, method)
+        r = results[method]
+        print(f"  {method:<8} {r['written']:>9,} rows in {r['seconds']:5.1f}s")
+
+    started = time.perf_counter()
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(CLEANUP, {"note": NOTE})
+        removed = cursor.rowcount
+        conn.commit()
+    print(f"  Removed {removed:,} bench readings "
+          f"in {time.perf_counter() - started:.1f}s")
+    db.close_all_connections()
+
+    base = results.get("per-row")
+    print(f"\nSustained ingest, {args.producers} producers:")
+    print(f"  {'method':<8} {'rows/s':>9} {'speedup':>8} {'batches':>8} "
+          f"{'avg batch':>9} {'rejected':>9} {'held back':>9} "
+          f"{'max delay':>9}")
+    for method, r in results.items():
+        rate = r["written"] / r["seconds"]
+        speedup = (f"{rate / (base['written'] / base['seconds']):.1f}x"
+                   if base else "-")
+        if method == "per-row":
+            print(f"  {method:<8} {rate:>9,.0f} {speedup:>8}")
+            continue
+        print(f"  {method:<8} {rate:>9,.0f} {speedup:>8} {r['batches']:>8} "
+              f"{r['avg_batch']:>9} {r['rejected']:>9} "
+              f"{r['backpressure_waits']:>9} {r['max_delay']:>8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Health and Fitness Club Management System
+Member Search Benchmark
+
+Grows Member to --members rows with syllable-built names (so trigrams are
+spread the way real surnames are), then times services.search_members on
+queries drawn from those members: exact surnames, surnames with a typo,
+partial "first last" names and email prefixes.  Reports p50/p99 per kind
+and the plan's index use.  Target: < 10 ms at 1M members.
+
+    python bench/member_search.py --members 1000000 --queries 200
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import queries  # noqa: E402
+import services  # noqa: E402
+from database import db  # noqa: E402
+
+SYLLABLES = ("an", "ber", "cal", "dor", "el", "fen", "gar", "hol", "is",
+             "jor", "kel", "lin", "mar", "nor", "ol", "per", "quin", "ros",
+             "sten", "tor", "ul", "van", "wes", "yor", "zel", "ash", "bran",
+             "cor", "dun", "ford", "ley", "ton", "wood", "field", "son", "ridge")
+
+SEED_MEMBERS = """
+INSERT INTO Member (email, password, first_name, last_name, date_of_birth)
+SELECT lower(f) || '.' || lower(l) || g || '@searchbench.example.com', 'x',
+       f, l, DATE '1980-01-01' + g %% 10000
+FROM generate_series(%(first)s, %(last)s) g,
+     LATERAL (SELECT %(syllables)s::text[] AS s) a,
+     LATERAL (SELECT
+         initcap(s[1 + g %% 19] || s[1 + (g / 19) %% 36]) AS f,
+         initcap(s[1 + (g / 7) %% 36] || s[1 + (g / 251) %% 36]
+                 || s[1 + (g / 9001) %% 36]) AS l) n
+ON CONFLICT (email) DO NOTHING
+"""
+
+SAMPLE = """
+SELECT first_name, last_name, email FROM Member
+WHERE email LIKE '%%@searchbench.example.com'
+ORDER BY random() LIMIT %(count)s
+"""
+
+
+def seed(cursor, members, batch=250000):
+    cursor.execute("SELECT COUNT(*) FROM Member")
+    have = cursor.fetchone()[0]
+    while have < members:
+        last = min(members, have + batch)
+        cursor.execute(SEED_MEMBERS, {"first": have + 1, "last": last,
+                                      "syllables": list(SYLLABLES)})
+        cursor.connection.commit()
+        have = last
+        print(f"  seeded {have} members", end="\r")
+    print()
+    cursor.connection.autocommit = True
+    cursor.execute("VACUUM ANALYZE Member")
+    cursor.connection.autocommit = False
+
+
+def typo(word):
+    """Swap two neighbouring letters, or drop one"""
+    i = random.randrange(1, len(word) - 1)
+    if random.random() < 0.5:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + word[i + 1:]
+
+
+def workload(sample):
+    kinds = {"exact surname": [], "surname typo": [], "partial name": [],
+             "email prefix": []}
+    for first, last, email in sample:
+        kinds["exact surname"].append(last)
+        kinds["surname typo"].append(typo(last.lower()))
+        kinds["partial name"].append(f"{first[:4]} {last[:5]}")
+        kinds["email prefix"].append(email.split("@")[0][:10])
+    return kinds
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--members", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    db.initialize_pool(1, 1)
+    with db.connection() as conn, conn.cursor() as cursor:
+        seed(cursor, args.members)
+        cursor.execute(SAMPLE, {"count": args.queries})
+        kinds = workload(cursor.fetchall())
+        cursor.execute("SELECT COUNT(*) FROM Member")
+        total = cursor.fetchone()[0]
+
+        cursor.execute(queries.MEMBER_SEARCH_THRESHOLD,
+                       {"threshold": str(services.SEARCH_THRESHOLD)})
+        cursor.execute("EXPLAIN " + queries.MEMBER_SEARCH, {
+            "query": kinds["surname typo"][0], "limit": 20, "offset": 0})
+        scans = [r[0].strip() for r in cursor.fetchall() if "Scan" in r[0]]
+        conn.rollback()
+
+    print(f"\nMembers: {total}, {args.queries} queries per kind, "
+          f"threshold {services.SEARCH_THRESHOLD}")
+    for kind, terms in kinds.items():
+        latencies = []
+        hits = 0
+        for term in terms:
+            started = time.perf_counter()
+            found = services.search_members(term)
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += bool(found)
+        print(f"  {kind:14} p50 {percentile(latencies, 0.5):6.1f} ms  "
+              f"p99 {percentile(latencies, 0.99):6.1f} ms  "
+              f"{hits}/{len(terms)} with results")
+    print("  Plan: " + "; ".join(scans))
+    db.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Health and Fitness Club Management System
+Bulk Payment Import Benchmark
+
+Seeds --payments / 2 unpaid bench bills, writes a processor CSV with two
+payments per bill, and times services.import_payments on it.  Then checks
+every bench bill's amount_paid against its payments and the members'
+MemberSummary balances against the bills.  Target: 1M payments < 60 s.
+
+    python bench/payment_import.py --payments 1000000
+"""
+
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import services  # noqa: E402
+from database import db  # noqa: E402
+
+DESCRIPTION = "Import bench bill"
+
+SEED_MEMBERS = """
+INSERT INTO Member (email, password, first_name, last_name, date_of_birth)
+SELECT 'paybench' || g || '@example.com', 'x', 'Bench', 'Payer' || g,
+       DATE '1980-01-01'
+FROM generate_series(1, %(members)s) g
+ON CONFLICT (email) DO NOTHING
+"""
+
+CLEAR = "DELETE FROM Bill WHERE description = %(description)s"
+
+SEED_BILLS = """
+INSERT INTO Bill (member_id, due_date, total_amount, description)
+SELECT m.first_id + g %% m.members, CURRENT_DATE + 30, 100, %(description)s
+FROM generate_series(1, %(bills)s) g,
+     (SELECT MIN(member_id) AS first_id, COUNT(*) AS members FROM Member
+      WHERE email LIKE 'paybench%%') m
+RETURNING bill_id
+"""
+
+CHECK_BILLS = """
+SELECT COUNT(*) FILTER (WHERE b.amount_paid <> COALESCE(p.paid, 0)),
+       COUNT(*) FILTER (WHERE b.status = 'Paid'),
+       COUNT(*)
+FROM Bill b
+LEFT JOIN (SELECT bill_id, SUM(amount) AS paid FROM Payment GROUP BY bill_id) p
+       ON p.bill_id = b.bill_id
+WHERE b.description = %(description)s
+"""
+
+CHECK_SUMMARY = """
+SELECT COUNT(*)
+FROM MemberSummary s
+JOIN Member m ON m.member_id = s.member_id
+LEFT JOIN (SELECT member_id, SUM(total_amount - amount_paid) AS balance
+           FROM Bill WHERE status IN ('Pending', 'Overdue')
+           GROUP BY member_id) b ON b.member_id = s.member_id
+WHERE m.email LIKE 'paybench%%'
+  AND s.pending_balance <> COALESCE(b.balance, 0)
+"""
+
+
+def write_csv(path, bill_ids):
+    methods = services.PAYMENT_METHODS
+    with open(path, "w", newline="") as f:
+        out = csv.writer(f)
+        out.writerow(["bill_id", "amount", "payment_date", "payment_method",
+                      "transaction_reference"])
+        for part in (1, 2):
+            for bill_id in bill_ids:
+                out.writerow([bill_id, "50.00", "2025-01-15 12:00:00",
+                              methods[bill_id % len(methods)],
+                              f"BENCH-{bill_id}-{part}"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--payments", type=int, default=1000000)
+    parser.add_argument("--members", type=int, default=50000)
+    args = parser.parse_args()
+
+    db.initialize_pool(1, 1)
+    params = {"description": DESCRIPTION, "members": args.members,
+              "bills": args.payments // 2}
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(SEED_MEMBERS, params)
+        cursor.execute(CLEAR, params)
+        cursor.execute(SEED_BILLS, params)
+        bill_ids = [r[0] for r in cursor.fetchall()]
+        conn.commit()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "payments.csv")
+        write_csv(path, bill_ids)
+        size_mb = os.path.getsize(path) / 2 ** 20
+
+        with open(path, newline="") as f:
+            started = time.perf_counter()
+            result = services.import_payments(f)
+            elapsed = time.perf_counter() - started
+        with open(path, newline="") as f:
+            again = services.import_payments(f)
+
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(CHECK_BILLS, params)
+        wrong_paid, paid, bills = cursor.fetchone()
+        cursor.execute(CHECK_SUMMARY)
+        wrong_summary = cursor.fetchone()[0]
+    db.close_all_connections()
+
+    print(f"\nFile: {result.rows} payments ({size_mb:.0f} MB)")
+    print(f"  Import:     {elapsed:.1f}s ({result.rows / elapsed:.0f} rows/s), "
+          f"{result.imported} imported, {result.bills_settled} bills settled")
+    print(f"  Re-import:  {again.seconds:.1f}s, {again.imported} imported, "
+          f"rejected {again.rejected}")
+    print(f"  Bills:      {paid}/{bills} paid, "
+          f"{wrong_paid} with amount_paid != sum(payments)")
+    print(f"  Summaries:  {wrong_summary} member balances out of step")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Health and Fitness Club Management System
+Prepared Statement Benchmark
+
+Runs the hot statements (queries.PREPARED) two ways from --threads
+threads sharing one pool, for --seconds each:
+
+  plain      cursor.execute() with the SQL text: parsed and planned on
+             every call
+  prepared   db.execute(): prepared once per connection, then EXECUTEd
+
+The operations are a member login, the dashboard, the open class
+listing, the trainer schedule and a PT booking (lock, book, and the
+blocker check), drawn at random.  Bookings are rolled back.  Reports
+throughput and per-operation latency for each way.  It also reports the
+server's planning time per statement, from EXPLAIN (ANALYZE, SUMMARY):
+every call for plain SQL, and once a prepared statement has run enough
+times to settle on a generic or custom plan.
+
+    python bench/prepared_statements.py --threads 8 --seconds 10
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from datetime import time as clock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import queries  # noqa: E402
+import services  # noqa: E402
+from database import db  # noqa: E402
+
+MEMBERS = "SELECT member_id, email, password FROM Member ORDER BY member_id"
+TRAINERS = "SELECT trainer_id FROM Trainer ORDER BY trainer_id"
+
+# Runs before a prepared statement's plan is taken as settled (PostgreSQL
+# compares custom plans with the generic one over the first five)
+WARMUP_RUNS = 6
+
+
+def plain(cursor, name, params):
+    cursor.execute(getattr(queries, name), params)
+
+
+def prepared(cursor, name, params):
+    db.execute(cursor, name, params)
+
+
+class Operations:
+    """Random parameters for each operation, and the statements it runs"""
+
+    def __init__(self):
+        with db.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(MEMBERS)
+            self.members = cursor.fetchall()
+            cursor.execute(TRAINERS)
+            self.trainers = [r[0] for r in cursor.fetchall()]
+
+    def params(self, rng, op):
+        member_id, email, password = rng.choice(self.members)
+        trainer_id = rng.choice(self.trainers)
+        if op == "login":
+            return [("MEMBER_LOGIN", {"email": email, "password": password})]
+        if op == "dashboard":
+            return [("MEMBER_DASHBOARD_SCREEN",
+                     {"member_id": member_id, "limit": 3})]
+        if op == "open_classes":
+            return [("OPEN_CLASSES", services.page_params("open_classes"))]
+        if op == "trainer_schedule":
+            return [("TRAINER_SCHEDULE_SCREEN",
+                     dict(services.page_params("trainer_sessions"),
+                          trainer_id=trainer_id))]
+        day = date.today() + timedelta(days=rng.randint(1, 60))
+        start = clock(rng.randint(6, 20))
+        params = {"member_id": member_id, "trainer_id": trainer_id,
+                  "session_date": day, "start_time": start,
+                  "end_time": clock(start.hour + 1),
+                  "day_of_week": day.strftime("%A")}
+        return [("TRAINER_BOOKING_LOCK", params), ("SESSION_BOOK", params),
+                ("BOOKING_BLOCKERS", params)]
+
+    def run(self, rng, op, execute):
+        with db.connection() as conn, conn.cursor() as cursor:
+            for name, params in self.params(rng, op):
+                execute(cursor, name, params)
+                cursor.fetchall()
+            conn.rollback()
+
+
+OPS = ("login", "dashboard", "open_classes", "trainer_schedule", "booking")
+
+
+def load(ops, execute, threads, seconds):
+    """{op: [latency ms, ...]} from ``threads`` threads for ``seconds``"""
+    timings = defaultdict(list)
+    stop = threading.Event()
+
+    def work(seed):
+        rng = random.Random(seed)
+        mine = defaultdict(list)
+        while not stop.is_set():
+            op = rng.choice(OPS)
+            started = time.perf_counter()
+            ops.run(rng, op, execute)
+            mine[op].append((time.perf_counter() - started) * 1000)
+        for op, values in mine.items():
+            timings[op].extend(values)
+
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in workers:
+        t.join()
+    return timings
+
+
+def planning_ms(cursor, statement, args=None):
+    cursor.execute("EXPLAIN (ANALYZE, SUMMARY, FORMAT JSON) " + statement,
+                   args)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Planning Time"]
+
+
+def planning_times(ops, repeat=20):
+    """{statement: (plain ms, prepared ms)}, medians over ``repeat`` runs"""
+    rng = random.Random(0)
+    samples = defaultdict(lambda: ([], []))
+    with db.connection() as conn, conn.cursor() as cursor:
+        for op in OPS:
+            for name, params in ops.params(rng, op):
+                for _ in range(WARMUP_RUNS):
+                    db.execute(cursor, name, params)
+                conn.rollback()
+        for _ in range(repeat):
+            for op in OPS:
+                for name, params in ops.params(rng, op):
+                    samples[name][0].append(planning_ms(
+                        cursor, getattr(queries, name), params))
+                    samples[name][1].append(planning_ms(
+                        cursor, *db.execute_statement(name, params)))
+                    conn.rollback()
+    return {name: (statistics.median(a), statistics.median(b))
+            for name, (a, b) in samples.items()}
+
+
+def summarize(timings, seconds):
+    ops = sum(len(v) for v in timings.values())
+    per_op = {op: statistics.mean(v) for op, v in timings.items()}
+    return ops / seconds, per_op
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    db.initialize_pool(args.threads, args.threads)
+    ops = Operations()
+
+    results = {}
+    for label, execute in (("plain", plain), ("prepared", prepared)):
+        load(ops, execute, args.threads, 1)        # warm up
+        results[label] = summarize(
+            load(ops, execute, args.threads, args.seconds), args.seconds)
+        print(f"  {label:<9} {results[label][0]:>9,.0f} ops/s")
+
+    print(f"\nOperations, {args.threads} threads, {args.seconds:g}s each:")
+    print(f"  {'operation':<18} {'plain ms':>9} {'prepared ms':>12} "
+          f"{'saved':>7}")
+    for op in OPS:
+        old, new = results["plain"][1][op], results["prepared"][1][op]
+        print(f"  {op:<18} {old:>9.3f} {new:>12.3f} "
+              f"{(old - new) / old:>6.0%}")
+    old, new = results["plain"][0], results["prepared"][0]
+    print(f"  {'throughput':<18} {old:>9,.0f} {new:>12,.0f} "
+          f"{(new - old) / old:>+6.0%}")
+
+    print("\nServer planning time per call (median):")
+    print(f"  {'statement':<26} {'plain ms':>9} {'prepared ms':>12}")
+    for name, (old, new) in planning_times(ops).items():
+        print(f"  {name:<26} {old:>9.3f} {new:>12.3f}")
+
+    db.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
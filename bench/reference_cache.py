@@ -0,0 +1,91 @@
+"""
+Health and Fitness Club Management System
+Reference Data Cache Benchmark
+
+Replays --visits booking-screen visits (trainer list, open classes, next
+free slots, a trainer's schedule) from --threads threads, first with every
+cache invalidated before each visit (the uncached behaviour), then with
+the caches left warm.  Reports visits/sec and the hit/miss counters, where
+each miss is a query that reached the database.
+
+    python bench/reference_cache.py --visits 2000 --threads 8
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import cache  # noqa: E402
+import services  # noqa: E402
+from database import db  # noqa: E402
+
+CACHES = (services.trainer_cache, services.room_cache,
+          services.availability_cache, services.class_cache)
+
+
+def visit(trainer_ids, cold):
+    if cold:
+        for c in CACHES:
+            c.invalidate()
+    services.list_trainers()
+    services.list_open_classes()
+    trainer_id = random.choice(trainer_ids)
+    services.find_free_slots(date.today(), date.today() + timedelta(days=7),
+                             limit=5, trainer_id=trainer_id)
+    services.trainer_schedule(trainer_id)
+
+
+def run(visits, threads, trainer_ids, cold):
+    before = cache.stats()
+    remaining = [visits]
+    claim = threading.Lock()
+
+    def worker():
+        while True:
+            with claim:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            visit(trainer_ids, cold)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+
+    after = cache.stats()
+    hits = sum(after[c.name]["hits"] - before[c.name]["hits"] for c in CACHES)
+    misses = sum(after[c.name]["misses"] - before[c.name]["misses"]
+                 for c in CACHES)
+    label = "invalidated" if cold else "warm"
+    print(f"  {label:12} {visits / elapsed:8.0f} visits/s   "
+          f"{hits:7} hits  {misses:7} misses "
+          f"({misses / visits:.1f} cached-data queries per visit)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--visits", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    db.initialize_pool(args.threads, args.threads)
+    trainer_ids = [t.trainer_id for t in services.list_trainers()]
+    print(f"\n{args.visits} booking-screen visits, {args.threads} threads, "
+          f"{len(trainer_ids)} trainers")
+    run(args.visits, args.threads, trainer_ids, cold=True)
+    run(args.visits, args.threads, trainer_ids, cold=False)
+    db.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Health and Fitness Club Management System
+Replica Routing Benchmark
+
+Needs a streaming replica of the database (see "Read Replicas" in the
+README).  From --threads threads, for --seconds each:
+
+  consistency   every thread updates one of its members' phone number
+                and at once loads that member's profile, twice: with
+                read-your-writes, and with the session's last write
+                forgotten (lag-aware routing only).  Counts profiles
+                that showed the old number.
+  reads         dashboards, profiles and trainer schedules at random,
+                primary only and then with the replica; reports
+                throughput and where the reads went.
+
+Phone numbers are restored afterwards.
+
+    python bench/replica_routing.py --replica localhost:5433 --threads 8
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import database  # noqa: E402
+import services  # noqa: E402
+from app import replica_address  # noqa: E402
+from database import db  # noqa: E402
+
+SAMPLE = """
+    SELECT member_id, phone FROM Member ORDER BY member_id LIMIT %(limit)s
+"""
+TRAINERS = "SELECT trainer_id FROM Trainer ORDER BY trainer_id"
+RESTORE = "UPDATE Member SET phone = %(phone)s WHERE member_id = %(member_id)s"
+
+
+def run(threads, seconds, work):
+    """Run ``work(index, stop)`` in ``threads`` threads for ``seconds``;
+    returns the per-thread results"""
+    stop = threading.Event()
+    results = [None] * threads
+
+    def target(i):
+        results[i] = work(i, stop)
+
+    workers = [threading.Thread(target=target, args=(i,))
+               for i in range(threads)]
+    for t in workers:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in workers:
+        t.join()
+    return results
+
+
+def consistency(members, threads, seconds, forget):
+    """(updates, stale profiles); thread i only touches members[i::threads]"""
+    def work(i, stop):
+        mine = members[i::threads]
+        updates = stale = 0
+        while not stop.is_set():
+            member_id = mine[updates % len(mine)][0]
+            phone = f"555-{i:03d}-{updates:06d}"
+            services.update_member_contact(member_id, phone=phone)
+            if forget:
+                database._last_write.set(None)
+            if services.member_profile(member_id).phone != phone:
+                stale += 1
+            updates += 1
+        return updates, stale
+
+    results = run(threads, seconds, work)
+    return sum(u for u, _ in results), sum(s for _, s in results)
+
+
+def reads(members, trainers, threads, seconds):
+    """(loads/s, mean ms)"""
+    loads = (lambda rng: services.member_dashboard(rng.choice(members)[0]),
+             lambda rng: services.member_profile(rng.choice(members)[0]),
+             lambda rng: services.trainer_schedule(rng.choice(trainers)))
+
+    def work(i, stop):
+        rng = random.Random(i)
+        timings = []
+        while not stop.is_set():
+            started = time.perf_counter()
+            rng.choice(loads)(rng)
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    timings = [t for ts in run(threads, seconds, work) for t in ts]
+    return len(timings) / seconds, statistics.mean(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--replica", type=replica_address, required=True,
+                        metavar="HOST[:PORT]")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--max-lag", type=float,
+                        default=database.MAX_REPLICA_LAG)
+    args = parser.parse_args()
+
+    db.initialize_pool(args.threads, args.threads)
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(SAMPLE, {"limit": args.threads * 20})
+        members = cursor.fetchall()
+        cursor.execute(TRAINERS)
+        trainers = [r[0] for r in cursor.fetchall()]
+
+    print(f"Reads, {args.threads} threads, {args.seconds:g}s each:")
+    print(f"  {'routing':<14} {'loads/s':>9} {'mean ms':>9}  reads")
+    throughput, mean = reads(members, trainers, args.threads, args.seconds)
+    print(f"  {'primary only':<14} {throughput:>9,.0f} {mean:>9.2f}")
+    db.close_all_connections()
+
+    db.initialize_pool(args.threads, args.threads, replicas=[args.replica],
+                       max_lag=args.max_lag)
+    try:
+        throughput, mean = reads(members, trainers, args.threads,
+                                 args.seconds)
+        routes = Counter(db.stats()["reads"])
+        print(f"  {'with replica':<14} {throughput:>9,.0f} {mean:>9.2f}  "
+              + ", ".join(f"{k} {v:,}" for k, v in routes.items() if v))
+
+        print(f"\nWrite then read the same member, {args.threads} threads:")
+        print(f"  {'routing':<18} {'updates':>8} {'stale':>6}")
+        for label, forget in (("read-your-writes", False),
+                              ("lag-aware only", True)):
+            updates, stale = consistency(members, args.threads,
+                                         args.seconds, forget)
+            print(f"  {label:<18} {updates:>8,} {stale:>6,}")
+        replica = db.stats()["replicas"][0]
+        print(f"\nReplica {replica['name']}: lag {replica['lag']}s, "
+              f"error {replica['error']}")
+    finally:
+        with db.connection() as conn, conn.cursor() as cursor:
+            cursor.executemany(RESTORE, [
+                {"member_id": m, "phone": p} for m, p in members])
+            conn.commit()
+        db.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
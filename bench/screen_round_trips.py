@@ -0,0 +1,268 @@
+"""
+Health and Fitness Club Management System
+Screen Round-Trip Benchmark
+
+Loads the busiest screens (member dashboard, trainer schedule, member
+search, member profile, room schedule) both ways, through a TCP proxy
+that delays every packet to simulate a remote database:
+
+  legacy      one statement per list, in a transaction, as before the
+              screen queries (SCREENS in queries.py)
+  composite   the services functions: one statement per screen
+
+For each added round-trip time (--delays, in ms) it reports the median
+and p95 load time per screen and the number of messages the client sent,
+i.e. round trips.  Both ways must return equal records.
+
+    python bench/screen_round_trips.py --delays 0,1,5,20 --repeat 20
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import database  # noqa: E402
+import queries  # noqa: E402
+import services  # noqa: E402
+from database import db  # noqa: E402
+from services import (AvailabilitySlot, Dashboard, Goal,  # noqa: E402
+                      HealthSnapshot, MemberMatch, MemberProfile,
+                      RoomClassBooking, RoomSchedule, RoomSessionBooking,
+                      TrainerClass, TrainerSchedule, TrainerSession,
+                      UpcomingSession, build_page, page_params)
+
+# The member with the most upcoming sessions, their trainer and the day
+# with the most bookings, so every list on every screen has rows
+SAMPLE = """
+    SELECT pts.member_id, pts.trainer_id, m.last_name,
+           (SELECT schedule_date FROM Class WHERE schedule_date >= CURRENT_DATE
+            GROUP BY schedule_date ORDER BY count(*) DESC LIMIT 1)
+    FROM PersonalTrainingSession pts
+    JOIN Member m ON m.member_id = pts.member_id
+    WHERE pts.status = 'Scheduled' AND pts.session_date >= CURRENT_DATE
+    GROUP BY pts.member_id, pts.trainer_id, m.last_name
+    ORDER BY count(*) DESC, pts.member_id
+    LIMIT 1
+"""
+
+
+# ============================================================================
+# DELAY PROXY
+# ============================================================================
+
+class DelayProxy:
+    """Forwards local connections to the database, holding every chunk
+    for half of ``rtt`` seconds in each direction, and counts the chunks
+    clients send (one per statement or protocol message batch)"""
+
+    def __init__(self, host, port):
+        self.target = (host, port)
+        self.rtt = 0.0
+        self.sent = 0
+        self._listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self._listener.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            client, _ = self._listener.accept()
+            server = socket.create_connection(self.target)
+            for sock in (client, server):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._pipe(client, server, count=True)
+            self._pipe(server, client, count=False)
+
+    def _pipe(self, source, sink, count):
+        chunks = deque()
+        ready = threading.Condition()
+
+        def read():
+            while True:
+                try:
+                    data = source.recv(65536)
+                except OSError:
+                    data = b""
+                if count and data:
+                    self.sent += 1
+                with ready:
+                    chunks.append((time.perf_counter() + self.rtt / 2, data))
+                    ready.notify()
+                if not data:
+                    return
+
+        def write():
+            while True:
+                with ready:
+                    while not chunks:
+                        ready.wait()
+                    due, data = chunks.popleft()
+                wait = due - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+                if not data:
+                    try:
+                        sink.shutdown(socket.SHUT_WR)
+                    except OSError:
+                        pass
+                    return
+                try:
+                    sink.sendall(data)
+                except OSError:
+                    return
+
+        threading.Thread(target=read, daemon=True).start()
+        threading.Thread(target=write, daemon=True).start()
+
+
+# ============================================================================
+# LEGACY LOADERS
+# ============================================================================
+
+def legacy_dashboard(member_id, session_limit=3):
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(queries.MEMBER_DASHBOARD, {"member_id": member_id})
+        row = cursor.fetchone()
+        cursor.execute(queries.MEMBER_ACTIVE_GOALS, {"member_id": member_id})
+        goals = [Goal(*g) for g in cursor.fetchall()]
+        cursor.execute(queries.MEMBER_UPCOMING_SESSIONS,
+                       {"member_id": member_id, "limit": session_limit})
+        sessions = [UpcomingSession(*s) for s in cursor.fetchall()]
+    return Dashboard(member_id, *row, goals=goals, next_sessions=sessions)
+
+
+def legacy_trainer_schedule(trainer_id, limit=services.PAGE_SIZE):
+    params = dict(page_params("trainer_sessions", limit=limit),
+                  trainer_id=trainer_id)
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(queries.TRAINER_UPCOMING_SESSIONS, params)
+        sessions = build_page("trainer_sessions", cursor.fetchall(), limit,
+                              TrainerSession)
+        cursor.execute(queries.TRAINER_UPCOMING_CLASSES, params)
+        classes = build_page("trainer_classes", cursor.fetchall(), limit,
+                             TrainerClass)
+        cursor.execute(queries.TRAINER_AVAILABILITY, params)
+        availability = tuple(AvailabilitySlot(*a) for a in cursor.fetchall())
+    return TrainerSchedule(sessions, classes, availability)
+
+
+def legacy_search(query, trainer_id):
+    params = {"query": query, "trainer_id": trainer_id,
+              "limit": services.SEARCH_PAGE_SIZE, "offset": 0}
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(queries.MEMBER_SEARCH_THRESHOLD,
+                       {"threshold": str(services.SEARCH_THRESHOLD)})
+        cursor.execute(queries.TRAINER_MEMBER_SEARCH, params)
+        return [MemberMatch(*m) for m in cursor.fetchall()]
+
+
+def legacy_profile(member_id):
+    params = {"member_id": member_id}
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(queries.MEMBER_DETAILS, params)
+        member = cursor.fetchone()
+        cursor.execute(queries.MEMBER_LATEST_METRIC, params)
+        metric = cursor.fetchone()
+        cursor.execute(queries.MEMBER_ACTIVE_GOALS, params)
+        goals = [Goal(*g) for g in cursor.fetchall()]
+    return MemberProfile(
+        *member, latest_metric=HealthSnapshot(*metric) if metric else None,
+        goals=goals)
+
+
+def legacy_room_schedule(day, limit=services.PAGE_SIZE):
+    params = dict(page_params("room_classes", limit=limit), day=day)
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(queries.ROOM_SCHEDULE_CLASSES, params)
+        classes = build_page("room_classes", cursor.fetchall(), limit,
+                             RoomClassBooking)
+        cursor.execute(queries.ROOM_SCHEDULE_SESSIONS, params)
+        sessions = build_page("room_sessions", cursor.fetchall(), limit,
+                              RoomSessionBooking)
+    return RoomSchedule(day, classes, sessions)
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def measure(proxy, load, repeat):
+    """(median ms, p95 ms, messages sent per load)"""
+    load()      # warm up: connection, plan cache
+    timings = []
+    sent = proxy.sent
+    for _ in range(repeat):
+        started = time.perf_counter()
+        load()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return (statistics.median(timings),
+            timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+            (proxy.sent - sent) / repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--delays", default="0,1,5,20",
+                        help="comma-separated added round-trip times, ms")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    proxy = DelayProxy(database.DB_CONFIG["host"], database.DB_CONFIG["port"])
+    database.DB_CONFIG.update(host="127.0.0.1", port=proxy.port)
+    db.initialize_pool(1, 1)
+
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(SAMPLE)
+        member_id, trainer_id, last_name, day = cursor.fetchone()
+    day = day or date.today()
+
+    screens = [
+        ("dashboard", lambda: legacy_dashboard(member_id),
+         lambda: services.member_dashboard(member_id)),
+        ("trainer schedule", lambda: legacy_trainer_schedule(trainer_id),
+         lambda: services.trainer_schedule(trainer_id)),
+        ("member search", lambda: legacy_search(last_name, trainer_id),
+         lambda: services.search_members(last_name, trainer_id)),
+        ("member profile", lambda: legacy_profile(member_id),
+         lambda: services.member_profile(member_id)),
+        ("room schedule", lambda: legacy_room_schedule(day),
+         lambda: services.room_schedule(day)),
+    ]
+
+    runnable = []
+    for name, legacy, composite in screens:
+        try:
+            if legacy() != composite():
+                sys.exit(f"{name}: legacy and composite records differ")
+        except Exception as e:
+            print(f"  {name}: skipped ({str(e).splitlines()[0]})")
+            continue
+        runnable.append((name, legacy, composite))
+
+    print(f"\nScreen load time (member {member_id}, trainer {trainer_id}, "
+          f"{day}), {args.repeat} loads each:")
+    print(f"  {'rtt':>5} {'screen':<18} {'legacy p50':>10} {'p95':>8} "
+          f"{'msgs':>5} {'composite p50':>13} {'p95':>8} {'msgs':>5} "
+          f"{'speedup':>8}")
+    for delay in args.delays.split(","):
+        proxy.rtt = float(delay) / 1000
+        for name, legacy, composite in runnable:
+            old = measure(proxy, legacy, args.repeat)
+            new = measure(proxy, composite, args.repeat)
+            print(f"  {delay:>3}ms {name:<18} {old[0]:>8.2f}ms "
+                  f"{old[1]:>6.2f}ms {old[2]:>5.0f} {new[0]:>11.2f}ms "
+                  f"{new[1]:>6.2f}ms {new[2]:>5.0f} {old[0] / new[0]:>7.1f}x")
+
+    db.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Health and Fitness Club Management System
+Class Seat-Claim Benchmark
+
+Releases --claimants threads at once against one class of --capacity
+seats, each registering a different member, and repeats for --rounds
+fresh classes.  --mode claim uses services.register_for_class (seat or
+waitlist in one call); --mode legacy replays the original
+check-then-insert path, where overflow is rejected by capacity_check.
+Reports registrations/sec, p50/p99 latency and checks the final counts.
+
+    python bench/seat_claim.py --claimants 1000 --capacity 30
+    python bench/seat_claim.py --claimants 1000 --capacity 30 --mode legacy
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from psycopg2 import errors  # noqa: E402
+
+import services  # noqa: E402
+from database import db  # noqa: E402
+
+CLASS_NAME = "Seat Bench"
+
+SEED_MEMBERS = """
+INSERT INTO Member (email, password, first_name, last_name, date_of_birth)
+SELECT 'seatbench' || g || '@example.com', 'x', 'Bench', 'Claimant' || g,
+       DATE '1990-01-01'
+FROM generate_series(1, %(claimants)s) g
+ON CONFLICT (email) DO NOTHING
+"""
+
+BENCH_MEMBERS = """
+SELECT member_id FROM Member
+WHERE email LIKE 'seatbench%%@example.com'
+ORDER BY member_id
+LIMIT %(claimants)s
+"""
+
+# Far-future slots so bench classes never collide with real bookings
+NEW_CLASS = """
+INSERT INTO Class (class_name, trainer_id, room_id, schedule_date,
+                   start_time, end_time, capacity)
+SELECT %(name)s, (SELECT MIN(trainer_id) FROM Trainer),
+       (SELECT MIN(room_id) FROM Room), CURRENT_DATE + %(days_ahead)s,
+       TIME '06:00', TIME '07:00', %(capacity)s
+RETURNING class_id
+"""
+
+CLEAR = "DELETE FROM Class WHERE class_name = %(name)s"
+
+# The register_for_class path before seat claiming
+LEGACY_EXISTS = """
+SELECT registration_id FROM ClassRegistration
+WHERE member_id = %(member_id)s AND class_id = %(class_id)s
+"""
+LEGACY_INSERT = """
+INSERT INTO ClassRegistration (member_id, class_id, status)
+VALUES (%(member_id)s, %(class_id)s, 'Registered')
+RETURNING registration_id
+"""
+
+CHECK = """
+SELECT c.capacity, c.current_enrollment,
+       COUNT(*) FILTER (WHERE r.status = 'Registered'),
+       COUNT(*) FILTER (WHERE r.status = 'Waitlisted')
+FROM Class c LEFT JOIN ClassRegistration r ON r.class_id = c.class_id
+WHERE c.class_id = %(class_id)s
+GROUP BY c.class_id
+"""
+
+
+def legacy_register(member_id, class_id):
+    params = {"member_id": member_id, "class_id": class_id}
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(LEGACY_EXISTS, params)
+        if cursor.fetchone():
+            raise services.ConflictError("Already registered for this class!")
+        try:
+            cursor.execute(LEGACY_INSERT, params)
+        except errors.CheckViolation:
+            raise services.ConflictError("Class is full!")
+        conn.commit()
+        return "Registered"
+
+
+def claim_register(member_id, class_id):
+    return services.register_for_class(member_id, class_id).status
+
+
+def run_round(register, member_ids, class_id):
+    """Release every claimant at once; return (latencies, outcomes, secs)"""
+    outcomes = Counter()
+    latencies = []
+    record = threading.Lock()
+    gate = threading.Barrier(len(member_ids) + 1)
+
+    def claimant(member_id):
+        gate.wait()
+        started = time.perf_counter()
+        try:
+            outcome = register(member_id, class_id)
+        except services.ServiceError as e:
+            outcome = str(e)
+        except Exception as e:
+            outcome = f"error: {type(e).__name__}"
+        with record:
+            latencies.append(time.perf_counter() - started)
+            outcomes[outcome] += 1
+
+    threads = [threading.Thread(target=claimant, args=(m,))
+               for m in member_ids]
+    for t in threads:
+        t.start()
+    gate.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    return latencies, outcomes, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mode", choices=("claim", "legacy"), default="claim")
+    parser.add_argument("--claimants", type=int, default=1000)
+    parser.add_argument("--capacity", type=int, default=30)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--pool", type=int, default=100,
+                        help="database connections shared by the claimants")
+    args = parser.parse_args()
+
+    db.initialize_pool(args.pool, args.pool, timeout=120,
+                       max_waiting=args.claimants)
+    params = {"name": CLASS_NAME, "claimants": args.claimants,
+              "capacity": args.capacity}
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(CLEAR, params)
+        cursor.execute(SEED_MEMBERS, params)
+        cursor.execute(BENCH_MEMBERS, params)
+        member_ids = [r[0] for r in cursor.fetchall()]
+        conn.commit()
+
+    register = claim_register if args.mode == "claim" else legacy_register
+    all_latencies = []
+    totals = Counter()
+    elapsed = 0.0
+    consistent = True
+    for round_no in range(args.rounds):
+        with db.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(NEW_CLASS, dict(params, days_ahead=3650 + round_no))
+            class_id = cursor.fetchone()[0]
+            conn.commit()
+
+        latencies, outcomes, secs = run_round(register, member_ids, class_id)
+        all_latencies += latencies
+        totals.update(outcomes)
+        elapsed += secs
+
+        with db.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(CHECK, {"class_id": class_id})
+            capacity, enrolled, registered, waitlisted = cursor.fetchone()
+        consistent &= enrolled == registered <= capacity
+        print(f"  round {round_no + 1}: {secs:.2f}s, "
+              f"{registered}/{capacity} seated, {waitlisted} waitlisted")
+
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(CLEAR, params)
+        conn.commit()
+    db.close_all_connections()
+
+    all_latencies.sort()
+    count = len(all_latencies)
+    print(f"\n=== {args.mode}: {args.claimants} claimants x {args.rounds} "
+          f"rounds, {args.pool} connections ===")
+    print(f"  Throughput: {count / elapsed:.0f} registrations/s")
+    print(f"  Latency:    p50 {all_latencies[count // 2] * 1000:.1f} ms, "
+          f"p99 {all_latencies[int(count * 0.99)] * 1000:.1f} ms")
+    for outcome, n in sorted(totals.items()):
+        print(f"  {outcome}: {n}")
+    print(f"  Enrollment counts consistent: {consistent}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Health and Fitness Club Management System
+Slot Finder Benchmark
+
+Seeds --trainers bench trainers (Mon-Fri 09:00-17:00 availability),
+101 'Personal Training' rooms and a busy 90-day calendar of sessions,
+then times services.find_free_slots for one trainer, for every bench
+trainer, and for exhausting the whole window.  Target: < 50 ms.
+
+    python bench/slot_finder.py --trainers 200 --days 90
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import services  # noqa: E402
+from database import db  # noqa: E402
+
+SPECIALIZATION = "Slot Bench"
+
+SEED_TRAINERS = """
+INSERT INTO Trainer (email, password, first_name, last_name, specialization)
+SELECT 'slotbench' || g || '@example.com', 'x', 'Bench', 'Trainer' || g,
+       %(specialization)s
+FROM generate_series(1, %(trainers)s) g
+ON CONFLICT (email) DO NOTHING
+"""
+
+SEED_AVAILABILITY = """
+INSERT INTO TrainerAvailability (trainer_id, day_of_week, start_time, end_time)
+SELECT t.trainer_id, d, TIME '09:00', TIME '17:00'
+FROM Trainer t,
+     unnest(ARRAY['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']) d
+WHERE t.specialization = %(specialization)s
+  AND NOT EXISTS (SELECT 1 FROM TrainerAvailability a
+                  WHERE a.trainer_id = t.trainer_id)
+"""
+
+SEED_ROOMS = """
+INSERT INTO Room (room_name, capacity, room_type)
+SELECT 'Bench PT ' || g, 2, 'Personal Training'
+FROM generate_series(1, 101) g
+WHERE NOT EXISTS (SELECT 1 FROM Room WHERE room_name LIKE 'Bench PT %%')
+"""
+
+# One-hour sessions on a quarter of each trainer's weekday hours.  Trainer i
+# always uses bench room i mod 101; trainers i and i + 101 are never busy in
+# the same hour, so the bench rooms never double-book.
+SEED_SESSIONS = """
+WITH t AS (
+    SELECT trainer_id, row_number() OVER (ORDER BY trainer_id) AS i
+    FROM Trainer WHERE specialization = %(specialization)s
+), r AS (
+    SELECT room_id, row_number() OVER (ORDER BY room_id) - 1 AS j
+    FROM Room WHERE room_name LIKE 'Bench PT %%'
+)
+INSERT INTO PersonalTrainingSession
+    (member_id, trainer_id, room_id, session_date, start_time, end_time)
+SELECT (SELECT MIN(member_id) FROM Member), t.trainer_id, r.room_id,
+       d::date, make_time(h, 0, 0), make_time(h + 1, 0, 0)
+FROM t
+JOIN r ON r.j = t.i %% 101
+CROSS JOIN generate_series(CURRENT_DATE + 1, CURRENT_DATE + %(days)s,
+                           INTERVAL '1 day') d
+CROSS JOIN generate_series(9, 16) h
+WHERE EXTRACT(ISODOW FROM d) < 6
+  AND (t.i + (d::date - CURRENT_DATE) + h) %% 4 = 0
+  AND NOT EXISTS (SELECT 1 FROM PersonalTrainingSession s
+                  WHERE s.trainer_id = t.trainer_id)
+"""
+
+
+def seed(trainers, days):
+    params = {"specialization": SPECIALIZATION, "trainers": trainers,
+              "days": days}
+    with db.connection() as conn, conn.cursor() as cursor:
+        for sql in (SEED_TRAINERS, SEED_AVAILABILITY, SEED_ROOMS,
+                    SEED_SESSIONS):
+            cursor.execute(sql, params)
+        cursor.execute("ANALYZE")
+        conn.commit()
+        cursor.execute("SELECT trainer_id FROM Trainer "
+                       "WHERE specialization = %s ORDER BY trainer_id",
+                       (SPECIALIZATION,))
+        return [r[0] for r in cursor.fetchall()]
+
+
+def timed(repeat, **kwargs):
+    """(median ms, slots found) over ``repeat`` calls"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        found = services.find_free_slots(**kwargs)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), len(found)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--trainers", type=int, default=200)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    db.initialize_pool(1, 2)
+    trainer_ids = seed(args.trainers, args.days)
+    first_day = date.today() + timedelta(days=1)
+    window = {"first_day": first_day,
+              "last_day": first_day + timedelta(days=args.days - 1)}
+
+    print(f"\nTrainers: {len(trainer_ids)}, window: {args.days} days")
+    print(f"{'':44}{'median ms':>12}{'slots':>8}")
+    for label, kwargs in (
+        (f"Next {args.limit}, one trainer",
+         dict(window, limit=args.limit, trainer_id=trainer_ids[-1])),
+        (f"Next {args.limit}, any bench trainer",
+         dict(window, limit=args.limit, specialization=SPECIALIZATION)),
+        (f"Next {args.limit}, 90-min sessions, any trainer",
+         dict(window, limit=args.limit, minutes=90,
+              specialization=SPECIALIZATION)),
+        ("Whole window, one trainer",
+         dict(window, limit=10 ** 6, trainer_id=trainer_ids[-1])),
+        ("Whole window, every bench trainer",
+         dict(window, limit=10 ** 6, specialization=SPECIALIZATION)),
+    ):
+        ms, count = timed(args.repeat, **kwargs)
+        print(f"{label:44}{ms:12.2f}{count:8}")
+    db.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
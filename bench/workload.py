@@ -0,0 +1,380 @@
+"""
+Health and Fitness Club Management System
+Workload Benchmark
+
+Replays a weighted mix of the operations members, trainers and admins
+run (dashboard, PT booking, class registration, trainer and room
+schedules, equipment, bills, payments, aging report) through services.py
+from --concurrency threads sharing one connection pool.  Reports
+throughput and p50/p95/p99 latency per operation plus pool saturation,
+and can save the run as JSON and compare it with an earlier one, exiting
+non-zero on a regression.
+
+Writes are real (bookings, registrations, payments), so run it against a
+generated data set, not production:
+
+    cd app && python app.py generate-data --scale 10 && cd ..
+    python bench/workload.py --mix mixed --concurrency 32 --duration 60 \\
+        --json before.json
+    python bench/workload.py --mix mixed --concurrency 32 --duration 60 \\
+        --json after.json --baseline before.json --tolerance 15
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as clock
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import services  # noqa: E402
+from database import db  # noqa: E402
+
+# Operation weights per mix; a custom mix is given as op=weight,op=weight
+MIXES = {
+    "member": {"dashboard": 40, "free_slots": 15, "booking": 10,
+               "class_registration": 20, "bills": 15},
+    "trainer": {"trainer_schedule": 70, "room_schedule": 20, "dashboard": 10},
+    "admin": {"room_schedule": 30, "equipment": 25, "bills": 25,
+              "payment": 15, "ar_aging": 5},
+    "mixed": {"dashboard": 28, "free_slots": 10, "booking": 7,
+              "class_registration": 14, "bills": 13, "trainer_schedule": 14,
+              "room_schedule": 7, "equipment": 3, "payment": 3,
+              "ar_aging": 1},
+}
+
+CACHES = (services.trainer_cache, services.room_cache,
+          services.availability_cache, services.class_cache,
+          services.equipment_cache)
+
+# Pool counters are sampled this often (seconds) for saturation
+SAMPLE_INTERVAL = 0.05
+
+MEMBER_IDS = "SELECT member_id FROM Member ORDER BY member_id"
+TRAINER_IDS = "SELECT trainer_id FROM Trainer ORDER BY trainer_id"
+UPCOMING_CLASSES = """
+SELECT class_id FROM Class
+WHERE status = 'Scheduled' AND schedule_date >= CURRENT_DATE
+ORDER BY class_id
+"""
+UNPAID_BILLS = """
+SELECT bill_id FROM Bill
+WHERE status IN ('Pending', 'Overdue')
+ORDER BY bill_id
+LIMIT 100000
+"""
+
+
+class Workload:
+    """The ids operations draw from, and one callable per operation"""
+
+    def __init__(self):
+        with db.connection() as conn, conn.cursor() as cursor:
+            ids = []
+            for statement in (MEMBER_IDS, TRAINER_IDS, UPCOMING_CLASSES,
+                              UNPAID_BILLS):
+                cursor.execute(statement)
+                ids.append([row[0] for row in cursor.fetchall()])
+        self.members, self.trainers, self.classes, self.bills = ids
+        if not self.members or not self.trainers:
+            sys.exit("No members or trainers: run app.py generate-data first")
+
+        self.operations = {
+            "dashboard": self.dashboard,
+            "free_slots": self.free_slots,
+            "booking": self.booking,
+            "class_registration": self.class_registration,
+            "bills": self.member_bills,
+            "trainer_schedule": self.trainer_schedule,
+            "room_schedule": self.room_schedule,
+            "equipment": self.equipment,
+            "payment": self.payment,
+            "ar_aging": self.ar_aging,
+        }
+
+    def dashboard(self, rng):
+        services.member_dashboard(rng.choice(self.members))
+
+    def free_slots(self, rng):
+        today = date.today()
+        services.find_free_slots(today, today + timedelta(days=7), limit=5)
+
+    def booking(self, rng):
+        hour = rng.randint(6, 20)
+        services.book_personal_training(
+            rng.choice(self.members), rng.choice(self.trainers),
+            date.today() + timedelta(days=rng.randint(1, 28)),
+            clock(hour), clock(hour + 1))
+
+    def class_registration(self, rng):
+        """Claim a seat; if already registered, cancel instead"""
+        if not self.classes:
+            raise services.NotFoundError("No upcoming classes")
+        member_id = rng.choice(self.members)
+        class_id = rng.choice(self.classes)
+        try:
+            services.register_for_class(member_id, class_id)
+        except services.ConflictError:
+            services.cancel_class_registration(member_id, class_id)
+
+    def member_bills(self, rng):
+        services.member_bills(rng.choice(self.members))
+
+    def trainer_schedule(self, rng):
+        services.trainer_schedule(rng.choice(self.trainers))
+
+    def room_schedule(self, rng):
+        services.room_schedule(date.today()
+                               + timedelta(days=rng.randint(-14, 14)))
+
+    def equipment(self, rng):
+        services.list_equipment()
+
+    def payment(self, rng):
+        if not self.bills:
+            raise services.NotFoundError("No unpaid bills")
+        services.record_payment(rng.choice(self.bills), Decimal("5.00"),
+                                "Credit Card")
+
+    def ar_aging(self, rng):
+        services.ar_aging_report(limit=20)
+
+
+def parse_mix(text):
+    if text in MIXES:
+        return dict(MIXES[text])
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def summarize(latencies, rejected, errors, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        "count": count,
+        "rejected": rejected,
+        "errors": errors,
+        "throughput": round(count / elapsed, 2),
+        "mean_ms": round(sum(latencies) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if count else 0.0,
+    }
+
+
+def run(workload, mix, args):
+    names = [name for name in mix if mix[name] > 0]
+    weights = [mix[name] for name in names]
+    operations = [workload.operations[name] for name in names]
+    latencies = {name: [] for name in names}
+    rejected = dict.fromkeys(names, 0)
+    errors = dict.fromkeys(names, 0)
+    last_error = {}
+    record = threading.Event()          # cleared during warm-up
+    stop = threading.Event()
+    samples = []
+
+    def worker(n):
+        rng = random.Random(f"{args.seed}:{n}")
+        while not stop.is_set():
+            i = rng.choices(range(len(names)), weights)[0]
+            if args.cold_cache:
+                for c in CACHES:
+                    c.invalidate()
+            started = time.perf_counter()
+            failed = refused = False
+            try:
+                operations[i](rng)
+            except (services.ConflictError, services.NotFoundError):
+                refused = True          # a business answer, still timed
+            except Exception as e:
+                failed = True
+                last_error[names[i]] = f"{type(e).__name__}: {e}".strip()
+            elapsed = time.perf_counter() - started
+            if not record.is_set():
+                continue
+            if failed:
+                errors[names[i]] += 1
+                continue
+            latencies[names[i]].append(elapsed)
+            rejected[names[i]] += refused
+
+    def sampler():
+        while not stop.wait(SAMPLE_INTERVAL):
+            if record.is_set():
+                stats = db.stats()
+                samples.append((stats["in_use"], stats["waiting"]))
+
+    threads = [threading.Thread(target=worker, args=(n,))
+               for n in range(args.concurrency)]
+    threads.append(threading.Thread(target=sampler))
+    for t in threads:
+        t.start()
+    time.sleep(args.warmup)
+    before = db.stats()
+    record.set()
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    elapsed = time.perf_counter() - started
+    after = db.stats()
+    stop.set()
+    for t in threads:
+        t.join()
+
+    checkouts = after["checkouts"] - before["checkouts"]
+    wait_total = after["wait_time_total"] - before["wait_time_total"]
+    all_latencies = [x for name in names for x in latencies[name]]
+    return {
+        "operations": {name: summarize(latencies[name], rejected[name],
+                                       errors[name], elapsed)
+                       for name in names},
+        "total": summarize(all_latencies, sum(rejected.values()),
+                           sum(errors.values()), elapsed),
+        "pool": {
+            "maxconn": after["maxconn"],
+            "utilization": round(sum(s[0] for s in samples)
+                                 / len(samples) / after["maxconn"], 3)
+                           if samples else 0.0,
+            "saturated": round(sum(1 for s in samples if s[1])
+                               / len(samples), 3) if samples else 0.0,
+            "peak_waiting": max((s[1] for s in samples), default=0),
+            "checkouts": checkouts,
+            "wait_avg_ms": round(wait_total / checkouts * 1000, 3)
+                           if checkouts else 0.0,
+            "timeouts": after["timeouts"] - before["timeouts"],
+            "rejected": after["rejected"] - before["rejected"],
+        },
+        "last_errors": last_error,
+        "seconds": round(elapsed, 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(result):
+    print(f"\n{'Operation':<20} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'rejected':>9} {'errors':>7}")
+    rows = list(result["operations"].items()) + [("TOTAL", result["total"])]
+    for name, s in rows:
+        print(f"{name:<20} {s['throughput']:>9.1f} {s['p50_ms']:>9.2f} "
+              f"{s['p95_ms']:>9.2f} {s['p99_ms']:>9.2f} {s['rejected']:>9} "
+              f"{s['errors']:>7}")
+    pool = result["pool"]
+    print(f"\nPool: {pool['utilization']:.0%} of {pool['maxconn']} connections "
+          f"in use on average, waiters present {pool['saturated']:.0%} of the "
+          f"time (peak {pool['peak_waiting']}); checkout wait avg "
+          f"{pool['wait_avg_ms']:.2f} ms, {pool['timeouts']} timeouts")
+    for name, error in result["last_errors"].items():
+        print(f"  last {name} error: {error}")
+
+
+def compare(result, baseline, tolerance):
+    """Print changes against a baseline run; return the regressions"""
+    regressions = []
+    print(f"\nAgainst baseline {baseline.get('commit') or '?'} "
+          f"({baseline['started']}), tolerance {tolerance:g}%:")
+    print(f"{'Operation':<20} {'ops/s':>16} {'p95 ms':>18}")
+    rows = list(result["operations"].items()) + [("TOTAL", result["total"])]
+    for name, s in rows:
+        old = (baseline["total"] if name == "TOTAL"
+               else baseline["operations"].get(name))
+        if not old or not old["count"]:
+            continue
+        throughput = (s["throughput"] / old["throughput"] - 1) * 100
+        p95 = (s["p95_ms"] / old["p95_ms"] - 1) * 100 if old["p95_ms"] else 0.0
+        flag = ""
+        if throughput < -tolerance or p95 > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<20} {s['throughput']:>8.1f} {throughput:>+6.1f}% "
+              f"{s['p95_ms']:>10.2f} {p95:>+6.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mix", default="mixed",
+                        help=f"{', '.join(MIXES)} or op=weight,... "
+                             f"(ops: {', '.join(MIXES['mixed'])})")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--pool", type=int, default=10,
+                        help="connection pool size (the app default is 10)")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--cold-cache", action="store_true",
+                        help="invalidate the reference caches before every "
+                             "operation")
+    parser.add_argument("--json", metavar="FILE", help="save the results")
+    parser.add_argument("--baseline", metavar="FILE",
+                        help="compare with an earlier --json run")
+    parser.add_argument("--tolerance", type=float, default=20.0,
+                        help="percent throughput drop or p95 rise counted as "
+                             "a regression")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    unknown = set(mix) - set(MIXES["mixed"])
+    if unknown:
+        parser.error(f"unknown operation(s): {', '.join(sorted(unknown))}")
+
+    db.initialize_pool(1, args.pool, max_waiting=max(100, args.concurrency))
+    workload = Workload()
+    print(f"{args.mix}: {args.concurrency} threads, pool {args.pool}, "
+          f"{args.duration:g}s after {args.warmup:g}s warm-up; "
+          f"{len(workload.members)} members, {len(workload.trainers)} "
+          f"trainers, {len(workload.classes)} upcoming classes")
+    started = datetime.now()
+    result = run(workload, mix, args)
+    db.close_all_connections()
+
+    result = {
+        "started": started.isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "config": {"mix": mix, "concurrency": args.concurrency,
+                   "pool": args.pool, "duration": args.duration,
+                   "warmup": args.warmup, "seed": args.seed,
+                   "cold_cache": args.cold_cache},
+        "data": {"members": len(workload.members),
+                 "trainers": len(workload.trainers),
+                 "upcoming_classes": len(workload.classes)},
+        **result,
+    }
+    report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,16 @@
 -- DDL (Data Definition Language)
 
 -- Drop tables if they exist (for clean setup)
+DROP TABLE IF EXISTS ResourceBooking CASCADE;
+DROP TABLE IF EXISTS MemberSummary CASCADE;
+DROP TABLE IF EXISTS HealthMetricWeekly CASCADE;
+DROP TABLE IF EXISTS HealthMetricDaily CASCADE;
 DROP TABLE IF EXISTS Payment CASCADE;
 DROP TABLE IF EXISTS Bill CASCADE;
 DROP TABLE IF EXISTS ClassRegistration CASCADE;
 DROP TABLE IF EXISTS PersonalTrainingSession CASCADE;
 DROP TABLE IF EXISTS Class CASCADE;
+DROP TABLE IF EXISTS ClassTemplate CASCADE;
 DROP TABLE IF EXISTS TrainerAvailability CASCADE;
 DROP TABLE IF EXISTS HealthMetric CASCADE;
 DROP TABLE IF EXISTS FitnessGoal CASCADE;
@@ -15,6 +20,17 @@ DROP TABLE IF EXISTS Room CASCADE;
 DROP TABLE IF EXISTS Trainer CASCADE;
 DROP TABLE IF EXISTS Member CASCADE;
 DROP TABLE IF EXISTS AdminStaff CASCADE;
+DROP TYPE IF EXISTS timerange CASCADE;
+
+-- btree_gist lets exclusion constraints mix equality (trainer, room, day)
+-- with range overlap
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- pg_trgm backs typo-tolerant member search (trigram GIN indexes)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Time-of-day range for weekly availability windows
+CREATE TYPE timerange AS RANGE (subtype = time);
 
 -- Member Table
 CREATE TABLE Member (
@@ -88,17 +104,64 @@ CREATE TABLE FitnessGoal (
 );
 
 -- Health Metric Table (Historical tracking)
+-- Range-partitioned by month on recorded_date, so the table can grow without
+-- bound: queries for a period touch only its months, and old months can be
+-- detached or dropped whole.  Partitions are created ahead of time by
+-- create_health_metric_partitions(); readings outside every month land in
+-- the default partition until their month is created.
 CREATE TABLE HealthMetric (
-    metric_id SERIAL PRIMARY KEY,
+    metric_id SERIAL,
     member_id INT REFERENCES Member(member_id) ON DELETE CASCADE,
-    recorded_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    recorded_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     weight DECIMAL(5, 2),
     height DECIMAL(5, 2),
     heart_rate INT,
     blood_pressure VARCHAR(20),
     body_fat_percentage DECIMAL(5, 2),
-    notes TEXT
-);
+    notes TEXT,
+    PRIMARY KEY (metric_id, recorded_date)
+) PARTITION BY RANGE (recorded_date);
+
+CREATE TABLE HealthMetric_default PARTITION OF HealthMetric DEFAULT;
+
+-- Create the monthly partitions covering p_from..p_to that do not exist yet;
+-- returns how many were created.  Rows already in the default partition for
+-- a new month are moved into it.  Run ahead of time (app.py
+-- metric-partitions) so readings never wait in the default partition.
+CREATE OR REPLACE FUNCTION create_health_metric_partitions(p_from DATE, p_to DATE)
+RETURNS INT AS $$
+DECLARE
+    v_month DATE := date_trunc('month', p_from);
+    v_next DATE;
+    v_name TEXT;
+    v_created INT := 0;
+BEGIN
+    WHILE v_month <= p_to LOOP
+        v_next := v_month + INTERVAL '1 month';
+        v_name := 'healthmetric_' || to_char(v_month, 'YYYY_MM');
+        IF to_regclass(v_name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I (LIKE HealthMetric INCLUDING DEFAULTS)',
+                           v_name);
+            EXECUTE format('WITH moved AS (DELETE FROM HealthMetric_default
+                                           WHERE recorded_date >= %L
+                                             AND recorded_date < %L
+                                           RETURNING *)
+                            INSERT INTO %I SELECT * FROM moved',
+                           v_month, v_next, v_name);
+            EXECUTE format('ALTER TABLE HealthMetric ATTACH PARTITION %I
+                            FOR VALUES FROM (%L) TO (%L)',
+                           v_name, v_month, v_next);
+            v_created := v_created + 1;
+        END IF;
+        v_month := v_next;
+    END LOOP;
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- From the sample data's first month to a quarter ahead
+SELECT create_health_metric_partitions(DATE '2024-01-01',
+                                       (CURRENT_DATE + INTERVAL '3 months')::date);
 
 -- Trainer Availability Table
 CREATE TABLE TrainerAvailability (
@@ -107,9 +170,31 @@ CREATE TABLE TrainerAvailability (
     day_of_week VARCHAR(20) NOT NULL,
     start_time TIME NOT NULL,
     end_time TIME NOT NULL,
+    available_hours timerange GENERATED ALWAYS AS (timerange(start_time, end_time)) STORED,
     CONSTRAINT valid_day CHECK (day_of_week IN ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')),
     CONSTRAINT valid_time_range CHECK (start_time < end_time),
-    CONSTRAINT no_overlap UNIQUE (trainer_id, day_of_week, start_time, end_time)
+    CONSTRAINT no_overlap EXCLUDE USING gist (
+        trainer_id WITH =, day_of_week WITH =, available_hours WITH &&)
+);
+
+-- Class Template Table (a class held every week of a season)
+-- Expanding a template (queries.CLASS_TEMPLATE_EXPAND) inserts one Class
+-- row per week, so the dated rows stay the single source for schedules,
+-- registrations and bookings.
+CREATE TABLE ClassTemplate (
+    template_id SERIAL PRIMARY KEY,
+    class_name VARCHAR(100) NOT NULL,
+    trainer_id INT REFERENCES Trainer(trainer_id) ON DELETE CASCADE,
+    room_id INT REFERENCES Room(room_id) ON DELETE CASCADE,
+    day_of_week VARCHAR(20) NOT NULL,
+    start_time TIME NOT NULL,
+    end_time TIME NOT NULL,
+    capacity INT NOT NULL CHECK (capacity > 0),
+    season_start DATE NOT NULL,
+    season_end DATE NOT NULL,
+    CONSTRAINT valid_template_day CHECK (day_of_week IN ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')),
+    CONSTRAINT valid_template_time CHECK (start_time < end_time),
+    CONSTRAINT valid_season CHECK (season_start <= season_end)
 );
 
 -- Class Table
@@ -124,6 +209,7 @@ CREATE TABLE Class (
     capacity INT NOT NULL CHECK (capacity > 0),
     current_enrollment INT DEFAULT 0 CHECK (current_enrollment >= 0),
     status VARCHAR(50) DEFAULT 'Scheduled',
+    template_id INT REFERENCES ClassTemplate(template_id) ON DELETE SET NULL,
     CONSTRAINT valid_class_time CHECK (start_time < end_time),
     CONSTRAINT capacity_check CHECK (current_enrollment <= capacity),
     CONSTRAINT valid_class_status CHECK (status IN ('Scheduled', 'Completed', 'Cancelled'))
@@ -151,7 +237,7 @@ CREATE TABLE ClassRegistration (
     class_id INT REFERENCES Class(class_id) ON DELETE CASCADE,
     registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     status VARCHAR(50) DEFAULT 'Registered',
-    CONSTRAINT valid_registration_status CHECK (status IN ('Registered', 'Attended', 'Cancelled')),
+    CONSTRAINT valid_registration_status CHECK (status IN ('Registered', 'Waitlisted', 'Attended', 'Cancelled')),
     CONSTRAINT unique_registration UNIQUE (member_id, class_id)
 );
 
@@ -165,7 +251,10 @@ CREATE TABLE Bill (
     amount_paid DECIMAL(10, 2) DEFAULT 0 CHECK (amount_paid >= 0),
     status VARCHAR(50) DEFAULT 'Pending',
     description TEXT,
-    CONSTRAINT valid_bill_status CHECK (status IN ('Pending', 'Paid', 'Overdue', 'Cancelled'))
+    billing_period DATE,
+    bill_type VARCHAR(30),
+    CONSTRAINT valid_bill_status CHECK (status IN ('Pending', 'Paid', 'Overdue', 'Cancelled')),
+    CONSTRAINT valid_bill_type CHECK (bill_type IN ('Membership', 'PT Package'))
 );
 
 -- Payment Table
@@ -179,12 +268,347 @@ CREATE TABLE Payment (
     CONSTRAINT valid_payment_method CHECK (payment_method IN ('Cash', 'Credit Card', 'Debit Card', 'Bank Transfer', 'Other'))
 );
 
+-- Resource Booking Table (scheduled time blocks for trainers and rooms)
+-- Mirrors every Scheduled PersonalTrainingSession and Class row, so one
+-- pair of exclusion constraints prevents double-booking a trainer or a
+-- room across both tables.
+CREATE TABLE ResourceBooking (
+    booking_id SERIAL PRIMARY KEY,
+    session_id INT REFERENCES PersonalTrainingSession(session_id) ON DELETE CASCADE,
+    class_id INT REFERENCES Class(class_id) ON DELETE CASCADE,
+    trainer_id INT,
+    room_id INT,
+    period TSRANGE NOT NULL,
+    CONSTRAINT one_source CHECK ((session_id IS NULL) <> (class_id IS NULL)),
+    CONSTRAINT booking_trainer_no_overlap EXCLUDE USING gist (trainer_id WITH =, period WITH &&),
+    CONSTRAINT booking_room_no_overlap EXCLUDE USING gist (room_id WITH =, period WITH &&)
+);
+
+CREATE UNIQUE INDEX idx_booking_session ON ResourceBooking(session_id);
+CREATE UNIQUE INDEX idx_booking_class ON ResourceBooking(class_id);
+
 -- Create Index for performance optimization
 CREATE INDEX idx_member_email ON Member(email);
 CREATE INDEX idx_health_metric_member_date ON HealthMetric(member_id, recorded_date DESC);
 CREATE INDEX idx_class_schedule ON Class(schedule_date, start_time);
 CREATE INDEX idx_session_trainer_date ON PersonalTrainingSession(trainer_id, session_date);
 
+-- One bill per member, type and billing period, so billing runs are idempotent
+CREATE UNIQUE INDEX idx_bill_period ON Bill(member_id, bill_type, billing_period)
+    WHERE billing_period IS NOT NULL;
+
+-- Unpaid bills only: drives the overdue sweep (status = 'Pending' prefix)
+-- and the aging report, which reads everything it needs from the index.
+-- Paid bills, the bulk of the table over time, are not indexed here.
+CREATE INDEX idx_bill_unpaid ON Bill(status, due_date)
+    INCLUDE (member_id, total_amount, amount_paid)
+    WHERE status IN ('Pending', 'Overdue');
+
+-- Member search: trigram indexes serve the word-similarity operator (<%)
+-- on full name and email, so lookups do not scan Member
+CREATE INDEX idx_member_name_trgm ON Member
+    USING gin ((first_name || ' ' || last_name) gin_trgm_ops);
+CREATE INDEX idx_member_email_trgm ON Member USING gin (email gin_trgm_ops);
+
+-- Payments per bill: the bill_id FK cascade and the settlement trigger
+CREATE INDEX idx_payment_bill ON Payment(bill_id);
+
+-- Duplicate detection for imported processor/bank payments
+CREATE INDEX idx_payment_reference ON Payment(transaction_reference)
+    WHERE transaction_reference IS NOT NULL;
+
+-- Waitlist order per class (first come, first promoted)
+CREATE INDEX idx_registration_waitlist ON ClassRegistration(class_id, registration_date, registration_id)
+    WHERE status = 'Waitlisted';
+
+-- Index pack (also in index_pack.sql for existing databases).  Each leads
+-- with a foreign key, so ON DELETE cascades probe instead of scanning,
+-- and is shaped to the screen that reads it.
+-- Active goals per member (dashboard, goal-count trigger)
+CREATE INDEX idx_goal_member_status ON FitnessGoal(member_id, status);
+-- Bill history newest first as a keyset range scan; the expression must
+-- match MEMBER_BILLS' sort key exactly
+CREATE INDEX idx_bill_member_date
+    ON Bill(member_id, (COALESCE(bill_date, DATE '0001-01-01')), bill_id);
+-- Roster and enrollment counts per class
+CREATE INDEX idx_registration_class_status ON ClassRegistration(class_id, status);
+-- Availability lookups during booking and slot finding
+CREATE INDEX idx_availability_trainer_day ON TrainerAvailability(trainer_id, day_of_week);
+-- A trainer's upcoming classes
+CREATE INDEX idx_class_trainer_date ON Class(trainer_id, schedule_date, start_time);
+-- Scheduled PT sessions by day (room schedule); completed and cancelled
+-- sessions, most of the table over time, are left out
+CREATE INDEX idx_session_day_scheduled ON PersonalTrainingSession(session_date, start_time)
+    WHERE status = 'Scheduled';
+-- One class per template and day (one-off classes have no template, and
+-- NULLs never collide): re-expanding a season only adds the missing
+-- weeks.  Also serves the template FK's ON DELETE SET NULL.
+CREATE UNIQUE INDEX idx_class_template_date ON Class(template_id, schedule_date);
+
+-- Health Metric Rollups (incrementally maintained chart data)
+-- Per member and day, and per member and week (starting Monday): reading
+-- count plus sum, count, min and max of weight, heart rate and body fat
+-- (average = sum / count).  A one-year trend is a primary-key range scan
+-- over at most 53 weekly rows instead of a pass over the raw readings.
+CREATE TABLE HealthMetricDaily (
+    member_id INT NOT NULL REFERENCES Member(member_id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    readings INT NOT NULL,
+    weight_sum DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    weight_count INT NOT NULL DEFAULT 0,
+    weight_min DECIMAL(5, 2),
+    weight_max DECIMAL(5, 2),
+    heart_rate_sum BIGINT NOT NULL DEFAULT 0,
+    heart_rate_count INT NOT NULL DEFAULT 0,
+    heart_rate_min INT,
+    heart_rate_max INT,
+    body_fat_sum DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    body_fat_count INT NOT NULL DEFAULT 0,
+    body_fat_min DECIMAL(5, 2),
+    body_fat_max DECIMAL(5, 2),
+    PRIMARY KEY (member_id, day)
+);
+
+CREATE TABLE HealthMetricWeekly (
+    member_id INT NOT NULL REFERENCES Member(member_id) ON DELETE CASCADE,
+    week DATE NOT NULL,
+    readings INT NOT NULL,
+    weight_sum DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    weight_count INT NOT NULL DEFAULT 0,
+    weight_min DECIMAL(5, 2),
+    weight_max DECIMAL(5, 2),
+    heart_rate_sum BIGINT NOT NULL DEFAULT 0,
+    heart_rate_count INT NOT NULL DEFAULT 0,
+    heart_rate_min INT,
+    heart_rate_max INT,
+    body_fat_sum DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    body_fat_count INT NOT NULL DEFAULT 0,
+    body_fat_min DECIMAL(5, 2),
+    body_fat_max DECIMAL(5, 2),
+    PRIMARY KEY (member_id, week)
+);
+
+-- Trigger: Fold inserted readings into the rollups
+-- Statement-level over the transition table, so a batch of readings
+-- updates each (member, day) and (member, week) once.
+CREATE OR REPLACE FUNCTION health_metric_rollup_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO HealthMetricDaily AS r (member_id, day, readings,
+        weight_sum, weight_count, weight_min, weight_max,
+        heart_rate_sum, heart_rate_count,
+        heart_rate_min, heart_rate_max,
+        body_fat_sum, body_fat_count,
+        body_fat_min, body_fat_max)
+    SELECT member_id, recorded_date::date, COUNT(*),
+           COALESCE(SUM(weight), 0), COUNT(weight), MIN(weight), MAX(weight),
+           COALESCE(SUM(heart_rate), 0), COUNT(heart_rate),
+           MIN(heart_rate), MAX(heart_rate),
+           COALESCE(SUM(body_fat_percentage), 0), COUNT(body_fat_percentage),
+           MIN(body_fat_percentage), MAX(body_fat_percentage)
+    FROM new_rows
+    WHERE member_id IS NOT NULL
+    GROUP BY member_id, recorded_date::date
+    ON CONFLICT (member_id, day) DO UPDATE SET
+        readings = r.readings + EXCLUDED.readings,
+        weight_sum = r.weight_sum + EXCLUDED.weight_sum,
+        weight_count = r.weight_count + EXCLUDED.weight_count,
+        weight_min = LEAST(r.weight_min, EXCLUDED.weight_min),
+        weight_max = GREATEST(r.weight_max, EXCLUDED.weight_max),
+        heart_rate_sum = r.heart_rate_sum + EXCLUDED.heart_rate_sum,
+        heart_rate_count = r.heart_rate_count + EXCLUDED.heart_rate_count,
+        heart_rate_min = LEAST(r.heart_rate_min, EXCLUDED.heart_rate_min),
+        heart_rate_max = GREATEST(r.heart_rate_max, EXCLUDED.heart_rate_max),
+        body_fat_sum = r.body_fat_sum + EXCLUDED.body_fat_sum,
+        body_fat_count = r.body_fat_count + EXCLUDED.body_fat_count,
+        body_fat_min = LEAST(r.body_fat_min, EXCLUDED.body_fat_min),
+        body_fat_max = GREATEST(r.body_fat_max, EXCLUDED.body_fat_max);
+
+    INSERT INTO HealthMetricWeekly AS r (member_id, week, readings,
+        weight_sum, weight_count, weight_min, weight_max,
+        heart_rate_sum, heart_rate_count,
+        heart_rate_min, heart_rate_max,
+        body_fat_sum, body_fat_count,
+        body_fat_min, body_fat_max)
+    SELECT member_id, date_trunc('week', recorded_date)::date, COUNT(*),
+           COALESCE(SUM(weight), 0), COUNT(weight), MIN(weight), MAX(weight),
+           COALESCE(SUM(heart_rate), 0), COUNT(heart_rate),
+           MIN(heart_rate), MAX(heart_rate),
+           COALESCE(SUM(body_fat_percentage), 0), COUNT(body_fat_percentage),
+           MIN(body_fat_percentage), MAX(body_fat_percentage)
+    FROM new_rows
+    WHERE member_id IS NOT NULL
+    GROUP BY member_id, date_trunc('week', recorded_date)::date
+    ON CONFLICT (member_id, week) DO UPDATE SET
+        readings = r.readings + EXCLUDED.readings,
+        weight_sum = r.weight_sum + EXCLUDED.weight_sum,
+        weight_count = r.weight_count + EXCLUDED.weight_count,
+        weight_min = LEAST(r.weight_min, EXCLUDED.weight_min),
+        weight_max = GREATEST(r.weight_max, EXCLUDED.weight_max),
+        heart_rate_sum = r.heart_rate_sum + EXCLUDED.heart_rate_sum,
+        heart_rate_count = r.heart_rate_count + EXCLUDED.heart_rate_count,
+        heart_rate_min = LEAST(r.heart_rate_min, EXCLUDED.heart_rate_min),
+        heart_rate_max = GREATEST(r.heart_rate_max, EXCLUDED.heart_rate_max),
+        body_fat_sum = r.body_fat_sum + EXCLUDED.body_fat_sum,
+        body_fat_count = r.body_fat_count + EXCLUDED.body_fat_count,
+        body_fat_min = LEAST(r.body_fat_min, EXCLUDED.body_fat_min),
+        body_fat_max = GREATEST(r.body_fat_max, EXCLUDED.body_fat_max);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recompute the daily rollups for the given (member, day) pairs from the
+-- raw readings, and the weekly rollups of their weeks from the daily ones.
+-- Min and max cannot be taken back incrementally, so updates and deletes
+-- (corrections, which are rare) come through here.
+CREATE OR REPLACE FUNCTION refresh_health_metric_rollups(p_members INT[], p_days DATE[])
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM HealthMetricDaily
+    WHERE (member_id, day) IN (SELECT * FROM unnest(p_members, p_days));
+    INSERT INTO HealthMetricDaily (member_id, day, readings,
+        weight_sum, weight_count, weight_min, weight_max,
+        heart_rate_sum, heart_rate_count,
+        heart_rate_min, heart_rate_max,
+        body_fat_sum, body_fat_count,
+        body_fat_min, body_fat_max)
+    SELECT hm.member_id, k.day, COUNT(*),
+           COALESCE(SUM(hm.weight), 0), COUNT(hm.weight), MIN(hm.weight), MAX(hm.weight),
+           COALESCE(SUM(hm.heart_rate), 0), COUNT(hm.heart_rate),
+           MIN(hm.heart_rate), MAX(hm.heart_rate),
+           COALESCE(SUM(hm.body_fat_percentage), 0), COUNT(hm.body_fat_percentage),
+           MIN(hm.body_fat_percentage), MAX(hm.body_fat_percentage)
+    FROM (SELECT DISTINCT * FROM unnest(p_members, p_days) k (member_id, day)) k
+    JOIN HealthMetric hm ON hm.member_id = k.member_id
+     AND hm.recorded_date >= k.day AND hm.recorded_date < k.day + 1
+    GROUP BY hm.member_id, k.day;
+
+    DELETE FROM HealthMetricWeekly
+    WHERE (member_id, week) IN (
+        SELECT member_id, date_trunc('week', day)::date
+        FROM unnest(p_members, p_days) k (member_id, day));
+    INSERT INTO HealthMetricWeekly (member_id, week, readings,
+        weight_sum, weight_count, weight_min, weight_max,
+        heart_rate_sum, heart_rate_count,
+        heart_rate_min, heart_rate_max,
+        body_fat_sum, body_fat_count,
+        body_fat_min, body_fat_max)
+    SELECT member_id, date_trunc('week', day)::date, SUM(readings),
+           SUM(weight_sum), SUM(weight_count), MIN(weight_min), MAX(weight_max),
+           SUM(heart_rate_sum), SUM(heart_rate_count),
+           MIN(heart_rate_min), MAX(heart_rate_max),
+           SUM(body_fat_sum), SUM(body_fat_count),
+           MIN(body_fat_min), MAX(body_fat_max)
+    FROM HealthMetricDaily d
+    WHERE (member_id, date_trunc('week', day)::date) IN (
+        SELECT member_id, date_trunc('week', day)::date
+        FROM unnest(p_members, p_days) k (member_id, day))
+    GROUP BY member_id, date_trunc('week', day)::date;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION health_metric_rollup_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_health_metric_rollups(
+        ARRAY(SELECT member_id FROM old_rows UNION ALL
+              SELECT member_id FROM new_rows),
+        ARRAY(SELECT recorded_date::date FROM old_rows UNION ALL
+              SELECT recorded_date::date FROM new_rows));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION health_metric_rollup_delete()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_health_metric_rollups(
+        ARRAY(SELECT member_id FROM old_rows),
+        ARRAY(SELECT recorded_date::date FROM old_rows));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER health_metric_rollup_insert_trigger
+AFTER INSERT ON HealthMetric
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION health_metric_rollup_insert();
+
+CREATE TRIGGER health_metric_rollup_update_trigger
+AFTER UPDATE ON HealthMetric
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION health_metric_rollup_update();
+
+CREATE TRIGGER health_metric_rollup_delete_trigger
+AFTER DELETE ON HealthMetric
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION health_metric_rollup_delete();
+
+-- Rebuild both rollups from the raw readings (initial load or repair);
+-- with p_after_member, only members with a higher id are rebuilt
+CREATE OR REPLACE FUNCTION rebuild_health_metric_rollups(p_after_member INT DEFAULT NULL)
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM HealthMetricDaily
+    WHERE p_after_member IS NULL OR member_id > p_after_member;
+    DELETE FROM HealthMetricWeekly
+    WHERE p_after_member IS NULL OR member_id > p_after_member;
+
+    INSERT INTO HealthMetricDaily (member_id, day, readings,
+        weight_sum, weight_count, weight_min, weight_max,
+        heart_rate_sum, heart_rate_count,
+        heart_rate_min, heart_rate_max,
+        body_fat_sum, body_fat_count,
+        body_fat_min, body_fat_max)
+    SELECT member_id, recorded_date::date, COUNT(*),
+           COALESCE(SUM(weight), 0), COUNT(weight), MIN(weight), MAX(weight),
+           COALESCE(SUM(heart_rate), 0), COUNT(heart_rate),
+           MIN(heart_rate), MAX(heart_rate),
+           COALESCE(SUM(body_fat_percentage), 0), COUNT(body_fat_percentage),
+           MIN(body_fat_percentage), MAX(body_fat_percentage)
+    FROM HealthMetric
+    WHERE member_id > COALESCE(p_after_member, 0)
+    GROUP BY member_id, recorded_date::date;
+
+    INSERT INTO HealthMetricWeekly (member_id, week, readings,
+        weight_sum, weight_count, weight_min, weight_max,
+        heart_rate_sum, heart_rate_count,
+        heart_rate_min, heart_rate_max,
+        body_fat_sum, body_fat_count,
+        body_fat_min, body_fat_max)
+    SELECT member_id, date_trunc('week', day)::date, SUM(readings),
+           SUM(weight_sum), SUM(weight_count), MIN(weight_min), MAX(weight_max),
+           SUM(heart_rate_sum), SUM(heart_rate_count),
+           MIN(heart_rate_min), MAX(heart_rate_max),
+           SUM(body_fat_sum), SUM(body_fat_count),
+           MIN(body_fat_min), MAX(body_fat_max)
+    FROM HealthMetricDaily
+    WHERE member_id > COALESCE(p_after_member, 0)
+    GROUP BY member_id, date_trunc('week', day)::date;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Member Summary Table (incrementally maintained dashboard aggregates)
+-- One row per member, kept current by the summary triggers below so the
+-- dashboard is a primary-key lookup instead of seven correlated subqueries.
+CREATE TABLE MemberSummary (
+    member_id INT PRIMARY KEY REFERENCES Member(member_id) ON DELETE CASCADE,
+    latest_weight DECIMAL(5, 2),
+    latest_heart_rate INT,
+    last_metric_date TIMESTAMP,
+    active_goals INT NOT NULL DEFAULT 0,
+    classes_attended INT NOT NULL DEFAULT 0,
+    pending_balance DECIMAL(12, 2) NOT NULL DEFAULT 0
+);
+
+-- Upcoming sessions depend on CURRENT_DATE, so they are counted live from
+-- this partial index rather than stored in MemberSummary.
+CREATE INDEX idx_session_member_scheduled ON PersonalTrainingSession(member_id, session_date)
+    WHERE status = 'Scheduled';
+
 -- Create View: Member Dashboard Summary
 CREATE OR REPLACE VIEW MemberDashboard AS
 SELECT 
@@ -193,38 +617,346 @@ SELECT
     m.last_name,
     m.email,
     -- Latest health metrics
-    (SELECT weight FROM HealthMetric WHERE member_id = m.member_id ORDER BY recorded_date DESC LIMIT 1) AS latest_weight,
-    (SELECT heart_rate FROM HealthMetric WHERE member_id = m.member_id ORDER BY recorded_date DESC LIMIT 1) AS latest_heart_rate,
-    (SELECT recorded_date FROM HealthMetric WHERE member_id = m.member_id ORDER BY recorded_date DESC LIMIT 1) AS last_metric_date,
+    s.latest_weight,
+    s.latest_heart_rate,
+    s.last_metric_date,
     -- Active goals count
-    (SELECT COUNT(*) FROM FitnessGoal WHERE member_id = m.member_id AND status = 'Active') AS active_goals,
+    s.active_goals,
     -- Upcoming sessions count
-    (SELECT COUNT(*) FROM PersonalTrainingSession 
-     WHERE member_id = m.member_id AND session_date >= CURRENT_DATE AND status = 'Scheduled') AS upcoming_sessions,
+    (SELECT COUNT(*) FROM PersonalTrainingSession pts
+     WHERE pts.member_id = m.member_id AND pts.session_date >= CURRENT_DATE
+       AND pts.status = 'Scheduled') AS upcoming_sessions,
     -- Total classes attended
-    (SELECT COUNT(*) FROM ClassRegistration 
-     WHERE member_id = m.member_id AND status = 'Attended') AS classes_attended,
-    -- Pending bill amount
-    (SELECT COALESCE(SUM(total_amount - amount_paid), 0) FROM Bill 
-     WHERE member_id = m.member_id AND status = 'Pending') AS pending_balance
-FROM Member m;
+    s.classes_attended,
+    -- Unpaid (pending or overdue) bill amount
+    s.pending_balance
+FROM Member m
+JOIN MemberSummary s ON s.member_id = m.member_id;
+
+-- Rebuild MemberSummary from the base tables in one pass (initial load or repair)
+CREATE OR REPLACE FUNCTION refresh_member_summary()
+RETURNS VOID AS $$
+BEGIN
+    TRUNCATE MemberSummary;
+    INSERT INTO MemberSummary (member_id, latest_weight, latest_heart_rate,
+                               last_metric_date, active_goals,
+                               classes_attended, pending_balance)
+    SELECT m.member_id, hm.weight, hm.heart_rate, hm.recorded_date,
+           COALESCE(g.active_goals, 0),
+           COALESCE(cr.classes_attended, 0),
+           COALESCE(b.pending_balance, 0)
+    FROM Member m
+    LEFT JOIN LATERAL (
+        SELECT weight, heart_rate, recorded_date
+        FROM HealthMetric
+        WHERE member_id = m.member_id
+        ORDER BY recorded_date DESC
+        LIMIT 1
+    ) hm ON TRUE
+    LEFT JOIN (
+        SELECT member_id, COUNT(*) AS active_goals
+        FROM FitnessGoal WHERE status = 'Active' GROUP BY member_id
+    ) g ON g.member_id = m.member_id
+    LEFT JOIN (
+        SELECT member_id, COUNT(*) AS classes_attended
+        FROM ClassRegistration WHERE status = 'Attended' GROUP BY member_id
+    ) cr ON cr.member_id = m.member_id
+    LEFT JOIN (
+        SELECT member_id, SUM(total_amount - amount_paid) AS pending_balance
+        FROM Bill WHERE status IN ('Pending', 'Overdue') GROUP BY member_id
+    ) b ON b.member_id = m.member_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger: Create the summary row for each new member
+CREATE OR REPLACE FUNCTION member_summary_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO MemberSummary (member_id) VALUES (NEW.member_id)
+    ON CONFLICT (member_id) DO NOTHING;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER member_summary_insert_trigger
+AFTER INSERT ON Member
+FOR EACH ROW
+EXECUTE FUNCTION member_summary_insert();
+
+-- Trigger: Keep latest health metric current
+-- Statement-level, so a batch of readings touches each member's summary
+-- once.  On insert a newer reading simply replaces the latest one (the
+-- newest of the batch, per member).
+CREATE OR REPLACE FUNCTION member_summary_health_metric_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE MemberSummary s
+    SET latest_weight = n.weight,
+        latest_heart_rate = n.heart_rate,
+        last_metric_date = n.recorded_date
+    FROM (
+        SELECT DISTINCT ON (member_id) member_id, weight, heart_rate,
+               recorded_date
+        FROM new_rows
+        WHERE member_id IS NOT NULL
+        ORDER BY member_id, recorded_date DESC, metric_id DESC
+    ) n
+    WHERE s.member_id = n.member_id
+      AND (s.last_metric_date IS NULL OR s.last_metric_date <= n.recorded_date);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Updates and deletes may remove the latest reading: re-read the top row
+-- of every member they touched
+CREATE OR REPLACE FUNCTION member_summary_health_metric()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_members INT[];
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        v_members := ARRAY(SELECT member_id FROM old_rows
+                           UNION SELECT member_id FROM new_rows);
+    ELSE
+        v_members := ARRAY(SELECT DISTINCT member_id FROM old_rows);
+    END IF;
+
+    UPDATE MemberSummary s
+    SET latest_weight = hm.weight,
+        latest_heart_rate = hm.heart_rate,
+        last_metric_date = hm.recorded_date
+    FROM unnest(v_members) k (member_id)
+    LEFT JOIN LATERAL (
+        SELECT weight, heart_rate, recorded_date
+        FROM HealthMetric
+        WHERE member_id = k.member_id
+        ORDER BY recorded_date DESC
+        LIMIT 1
+    ) hm ON TRUE
+    WHERE s.member_id = k.member_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER member_summary_health_metric_insert_trigger
+AFTER INSERT ON HealthMetric
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION member_summary_health_metric_insert();
+
+CREATE TRIGGER member_summary_health_metric_update_trigger
+AFTER UPDATE ON HealthMetric
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION member_summary_health_metric();
+
+CREATE TRIGGER member_summary_health_metric_delete_trigger
+AFTER DELETE ON HealthMetric
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION member_summary_health_metric();
+
+-- Trigger: Keep active goal count current
+CREATE OR REPLACE FUNCTION member_summary_fitness_goal()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'Active' THEN
+        UPDATE MemberSummary SET active_goals = active_goals - 1
+        WHERE member_id = OLD.member_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'Active' THEN
+        UPDATE MemberSummary SET active_goals = active_goals + 1
+        WHERE member_id = NEW.member_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER member_summary_fitness_goal_trigger
+AFTER INSERT OR UPDATE OF member_id, status OR DELETE ON FitnessGoal
+FOR EACH ROW
+EXECUTE FUNCTION member_summary_fitness_goal();
+
+-- Trigger: Keep classes attended count current
+CREATE OR REPLACE FUNCTION member_summary_class_registration()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'Attended' THEN
+        UPDATE MemberSummary SET classes_attended = classes_attended - 1
+        WHERE member_id = OLD.member_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'Attended' THEN
+        UPDATE MemberSummary SET classes_attended = classes_attended + 1
+        WHERE member_id = NEW.member_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER member_summary_class_registration_trigger
+AFTER INSERT OR UPDATE OF member_id, status OR DELETE ON ClassRegistration
+FOR EACH ROW
+EXECUTE FUNCTION member_summary_class_registration();
+
+-- Trigger: Keep pending balance current (pending and overdue bills)
+-- Statement-level over transition tables, so a billing run, overdue sweep
+-- or bulk payment import adjusts each member once with one UPDATE.
+CREATE OR REPLACE FUNCTION member_summary_bill()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE MemberSummary s
+        SET pending_balance = s.pending_balance + d.delta
+        FROM (SELECT member_id, SUM(total_amount - amount_paid) AS delta
+              FROM new_bills WHERE status IN ('Pending', 'Overdue')
+              GROUP BY member_id) d
+        WHERE s.member_id = d.member_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE MemberSummary s
+        SET pending_balance = s.pending_balance - d.delta
+        FROM (SELECT member_id, SUM(total_amount - amount_paid) AS delta
+              FROM old_bills WHERE status IN ('Pending', 'Overdue')
+              GROUP BY member_id) d
+        WHERE s.member_id = d.member_id;
+    ELSE
+        -- Pending -> Overdue nets to zero and is skipped
+        UPDATE MemberSummary s
+        SET pending_balance = s.pending_balance + d.delta
+        FROM (SELECT member_id, SUM(delta) AS delta
+              FROM (SELECT member_id, total_amount - amount_paid AS delta
+                    FROM new_bills WHERE status IN ('Pending', 'Overdue')
+                    UNION ALL
+                    SELECT member_id, amount_paid - total_amount
+                    FROM old_bills WHERE status IN ('Pending', 'Overdue')) c
+              GROUP BY member_id
+              HAVING SUM(delta) <> 0) d
+        WHERE s.member_id = d.member_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER member_summary_bill_insert_trigger
+AFTER INSERT ON Bill
+REFERENCING NEW TABLE AS new_bills
+FOR EACH STATEMENT
+EXECUTE FUNCTION member_summary_bill();
+
+CREATE TRIGGER member_summary_bill_update_trigger
+AFTER UPDATE ON Bill
+REFERENCING OLD TABLE AS old_bills NEW TABLE AS new_bills
+FOR EACH STATEMENT
+EXECUTE FUNCTION member_summary_bill();
+
+CREATE TRIGGER member_summary_bill_delete_trigger
+AFTER DELETE ON Bill
+REFERENCING OLD TABLE AS old_bills
+FOR EACH STATEMENT
+EXECUTE FUNCTION member_summary_bill();
+
+-- Trigger: Mirror scheduled PT sessions into ResourceBooking
+CREATE OR REPLACE FUNCTION sync_session_booking()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        DELETE FROM ResourceBooking WHERE session_id = OLD.session_id;
+    END IF;
+    IF NEW.status = 'Scheduled' THEN
+        INSERT INTO ResourceBooking (session_id, trainer_id, room_id, period)
+        VALUES (NEW.session_id, NEW.trainer_id, NEW.room_id,
+                tsrange(NEW.session_date + NEW.start_time, NEW.session_date + NEW.end_time));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER session_booking_trigger
+AFTER INSERT OR UPDATE OF trainer_id, room_id, session_date, start_time, end_time, status
+ON PersonalTrainingSession
+FOR EACH ROW
+EXECUTE FUNCTION sync_session_booking();
+
+-- Trigger: Mirror scheduled classes into ResourceBooking
+CREATE OR REPLACE FUNCTION sync_class_booking()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        DELETE FROM ResourceBooking WHERE class_id = OLD.class_id;
+    END IF;
+    IF NEW.status = 'Scheduled' THEN
+        INSERT INTO ResourceBooking (class_id, trainer_id, room_id, period)
+        VALUES (NEW.class_id, NEW.trainer_id, NEW.room_id,
+                tsrange(NEW.schedule_date + NEW.start_time, NEW.schedule_date + NEW.end_time));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Inserts are mirrored per statement, so expanding a season of classes
+-- books them all with one INSERT
+CREATE OR REPLACE FUNCTION sync_new_class_bookings()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO ResourceBooking (class_id, trainer_id, room_id, period)
+    SELECT class_id, trainer_id, room_id,
+           tsrange(schedule_date + start_time, schedule_date + end_time)
+    FROM new_classes
+    WHERE status = 'Scheduled';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER class_booking_trigger
+AFTER UPDATE OF trainer_id, room_id, schedule_date, start_time, end_time, status
+ON Class
+FOR EACH ROW
+EXECUTE FUNCTION sync_class_booking();
+
+CREATE TRIGGER class_booking_insert_trigger
+AFTER INSERT ON Class
+REFERENCING NEW TABLE AS new_classes
+FOR EACH STATEMENT
+EXECUTE FUNCTION sync_new_class_bookings();
 
 -- Trigger: Automatically update class enrollment count
+-- A seat freed by a cancellation goes to the head of the waitlist.  Every
+-- path here first updates the Class row, whose lock orders concurrent
+-- claims, cancellations and promotions for the class.
 CREATE OR REPLACE FUNCTION update_class_enrollment()
 RETURNS TRIGGER AS $$
+DECLARE
+    freed_class INT;
 BEGIN
     IF TG_OP = 'INSERT' AND NEW.status = 'Registered' THEN
         UPDATE Class 
         SET current_enrollment = current_enrollment + 1 
         WHERE class_id = NEW.class_id;
+    ELSIF TG_OP = 'UPDATE' AND OLD.status <> 'Registered' AND NEW.status = 'Registered' THEN
+        UPDATE Class 
+        SET current_enrollment = current_enrollment + 1 
+        WHERE class_id = NEW.class_id;
     ELSIF TG_OP = 'UPDATE' AND OLD.status = 'Registered' AND NEW.status = 'Cancelled' THEN
         UPDATE Class 
         SET current_enrollment = current_enrollment - 1 
-        WHERE class_id = NEW.class_id;
+        WHERE class_id = NEW.class_id
+        RETURNING class_id INTO freed_class;
     ELSIF TG_OP = 'DELETE' AND OLD.status = 'Registered' THEN
+        -- No promotion when the class itself is being deleted
         UPDATE Class 
         SET current_enrollment = current_enrollment - 1 
-        WHERE class_id = OLD.class_id;
+        WHERE class_id = OLD.class_id
+        RETURNING class_id INTO freed_class;
+    END IF;
+
+    IF freed_class IS NOT NULL THEN
+        UPDATE ClassRegistration
+        SET status = 'Registered'
+        WHERE status = 'Waitlisted' AND registration_id = (
+            SELECT registration_id FROM ClassRegistration
+            WHERE class_id = freed_class AND status = 'Waitlisted'
+            ORDER BY registration_date, registration_id
+            LIMIT 1
+        );
     END IF;
     RETURN NEW;
 END;
@@ -235,34 +967,158 @@ AFTER INSERT OR UPDATE OR DELETE ON ClassRegistration
 FOR EACH ROW
 EXECUTE FUNCTION update_class_enrollment();
 
+-- Function: Claim a class seat, or a place on the waitlist if it is full
+-- Locks the Class row once, decides, and inserts in a single call, so a
+-- burst of claimants queues briefly on one lock and nobody trips the
+-- capacity_check constraint.  A previously cancelled registration is
+-- reused and goes to the back of the queue.
+CREATE OR REPLACE FUNCTION claim_class_seat(p_member_id INT, p_class_id INT)
+RETURNS TABLE (registration_id INT, status VARCHAR, waitlist_position INT) AS $$
+DECLARE
+    has_seat BOOLEAN;
+    claimed_id INT;
+    claimed_at TIMESTAMP;
+BEGIN
+    SELECT c.current_enrollment < c.capacity INTO has_seat
+    FROM Class c
+    WHERE c.class_id = p_class_id AND c.status = 'Scheduled'
+    FOR NO KEY UPDATE;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Class % not found', p_class_id
+            USING ERRCODE = 'no_data_found';
+    END IF;
+
+    INSERT INTO ClassRegistration AS r (member_id, class_id, status)
+    VALUES (p_member_id, p_class_id,
+            CASE WHEN has_seat THEN 'Registered' ELSE 'Waitlisted' END)
+    ON CONFLICT ON CONSTRAINT unique_registration DO UPDATE
+        SET status = EXCLUDED.status, registration_date = CURRENT_TIMESTAMP
+        WHERE r.status = 'Cancelled'
+    RETURNING r.registration_id, r.status, r.registration_date
+    INTO claimed_id, status, claimed_at;
+    IF claimed_id IS NULL THEN
+        RAISE EXCEPTION 'Member % already registered for class %', p_member_id, p_class_id
+            USING ERRCODE = 'unique_violation';
+    END IF;
+
+    IF status = 'Waitlisted' THEN
+        SELECT COUNT(*) INTO waitlist_position
+        FROM ClassRegistration w
+        WHERE w.class_id = p_class_id AND w.status = 'Waitlisted'
+          AND (w.registration_date, w.registration_id) <= (claimed_at, claimed_id);
+    END IF;
+    registration_id := claimed_id;
+    RETURN NEXT;
+END;
+$$ LANGUAGE plpgsql;
+
 -- Trigger: Update bill status when payment is made
+-- Adds each statement's payments to amount_paid in one set-based UPDATE.
+-- The increment happens under the Bill row lock, so concurrent payments on
+-- one bill queue and each adds to the latest committed total.
 CREATE OR REPLACE FUNCTION update_bill_status()
 RETURNS TRIGGER AS $$
-DECLARE
-    total_paid DECIMAL(10, 2);
-    bill_total DECIMAL(10, 2);
 BEGIN
-    SELECT COALESCE(SUM(amount), 0) INTO total_paid
-    FROM Payment
-    WHERE bill_id = NEW.bill_id;
-    
-    SELECT total_amount INTO bill_total
-    FROM Bill
-    WHERE bill_id = NEW.bill_id;
-    
-    UPDATE Bill
-    SET amount_paid = total_paid,
+    UPDATE Bill b
+    SET amount_paid = b.amount_paid + p.paid,
         status = CASE 
-            WHEN total_paid >= bill_total THEN 'Paid'
+            WHEN b.amount_paid + p.paid >= b.total_amount THEN 'Paid'
+            WHEN b.status = 'Overdue' THEN 'Overdue'
             ELSE 'Pending'
         END
-    WHERE bill_id = NEW.bill_id;
+    FROM (SELECT bill_id, SUM(amount) AS paid
+          FROM new_payments GROUP BY bill_id) p
+    WHERE b.bill_id = p.bill_id;
     
-    RETURN NEW;
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER payment_bill_update_trigger
 AFTER INSERT ON Payment
-FOR EACH ROW
-EXECUTE FUNCTION update_bill_status();
\ No newline at end of file
+REFERENCING NEW TABLE AS new_payments
+FOR EACH STATEMENT
+EXECUTE FUNCTION update_bill_status();
+
+-- ============================================================================
+-- Change feed: one compact NOTIFY per statement on channel 'fitness_changes'
+-- ============================================================================
+-- Payload: '<table> <op> <keys>' where op is I, U or D and keys are the
+-- distinct values of the key column (TG_ARGV[0]) the statement touched,
+-- comma-separated.  If the list would not fit in a notification, '*' is
+-- sent and listeners treat every key as changed.  Notifications are
+-- delivered at commit (never for rolled-back work) to every listening
+-- process, so caches and live views elsewhere follow writes without polling.
+CREATE OR REPLACE FUNCTION notify_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed_keys TEXT;
+BEGIN
+    EXECUTE format('SELECT string_agg(DISTINCT %I::text, '','') FROM changed_rows',
+                   TG_ARGV[0])
+    INTO changed_keys;
+
+    IF changed_keys IS NULL THEN
+        RETURN NULL;  -- statement touched no rows
+    END IF;
+    IF length(changed_keys) > 7000 THEN
+        changed_keys := '*';
+    END IF;
+
+    PERFORM pg_notify('fitness_changes',
+                      TG_TABLE_NAME || ' ' || left(TG_OP, 1) || ' ' || changed_keys);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Keys: class_id for classes and registrations, trainer_id for
+-- availability, equipment_id for equipment, member_id for bills
+CREATE TRIGGER class_notify_insert_trigger AFTER INSERT ON Class
+REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT
+EXECUTE FUNCTION notify_change('class_id');
+CREATE TRIGGER class_notify_update_trigger AFTER UPDATE ON Class
+REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT
+EXECUTE FUNCTION notify_change('class_id');
+CREATE TRIGGER class_notify_delete_trigger AFTER DELETE ON Class
+REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT
+EXECUTE FUNCTION notify_change('class_id');
+
+CREATE TRIGGER registration_notify_insert_trigger AFTER INSERT ON ClassRegistration
+REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT
+EXECUTE FUNCTION notify_change('class_id');
+CREATE TRIGGER registration_notify_update_trigger AFTER UPDATE ON ClassRegistration
+REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT
+EXECUTE FUNCTION notify_change('class_id');
+CREATE TRIGGER registration_notify_delete_trigger AFTER DELETE ON ClassRegistration
+REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT
+EXECUTE FUNCTION notify_change('class_id');
+
+CREATE TRIGGER availability_notify_insert_trigger AFTER INSERT ON TrainerAvailability
+REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT
+EXECUTE FUNCTION notify_change('trainer_id');
+CREATE TRIGGER availability_notify_update_trigger AFTER UPDATE ON TrainerAvailability
+REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT
+EXECUTE FUNCTION notify_change('trainer_id');
+CREATE TRIGGER availability_notify_delete_trigger AFTER DELETE ON TrainerAvailability
+REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT
+EXECUTE FUNCTION notify_change('trainer_id');
+
+CREATE TRIGGER equipment_notify_insert_trigger AFTER INSERT ON Equipment
+REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT
+EXECUTE FUNCTION notify_change('equipment_id');
+CREATE TRIGGER equipment_notify_update_trigger AFTER UPDATE ON Equipment
+REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT
+EXECUTE FUNCTION notify_change('equipment_id');
+CREATE TRIGGER equipment_notify_delete_trigger AFTER DELETE ON Equipment
+REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT
+EXECUTE FUNCTION notify_change('equipment_id');
+
+CREATE TRIGGER bill_notify_insert_trigger AFTER INSERT ON Bill
+REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT
+EXECUTE FUNCTION notify_change('member_id');
+CREATE TRIGGER bill_notify_update_trigger AFTER UPDATE ON Bill
+REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT
+EXECUTE FUNCTION notify_change('member_id');
+CREATE TRIGGER bill_notify_delete_trigger AFTER DELETE ON Bill
+REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT
+EXECUTE FUNCTION notify_change('member_id');
\ No newline at end of file
@@ -111,15 +111,15 @@ INSERT INTO ClassRegistration (member_id, class_id, status) VALUES
 (3, 7, 'Attended');
 
 -- Insert Bills
-INSERT INTO Bill (member_id, bill_date, due_date, total_amount, amount_paid, status, description) VALUES
-(1, '2024-11-01', '2024-11-15', 150.00, 150.00, 'Paid', 'Monthly Membership - November 2024'),
-(2, '2024-11-01', '2024-11-15', 150.00, 150.00, 'Paid', 'Monthly Membership - November 2024'),
-(3, '2024-11-01', '2024-11-15', 150.00, 0.00, 'Pending', 'Monthly Membership - November 2024'),
-(4, '2024-11-01', '2024-11-15', 150.00, 75.00, 'Pending', 'Monthly Membership - November 2024'),
-(1, '2024-11-05', '2024-11-20', 200.00, 0.00, 'Pending', 'Personal Training Package (4 sessions)'),
-(5, '2024-11-01', '2024-11-15', 150.00, 0.00, 'Pending', 'Monthly Membership - November 2024');
+INSERT INTO Bill (member_id, bill_date, due_date, total_amount, amount_paid, status, description, billing_period, bill_type) VALUES
+(1, '2024-11-01', '2024-11-15', 150.00, 0.00, 'Pending', 'Monthly Membership - November 2024', '2024-11-01', 'Membership'),
+(2, '2024-11-01', '2024-11-15', 150.00, 0.00, 'Pending', 'Monthly Membership - November 2024', '2024-11-01', 'Membership'),
+(3, '2024-11-01', '2024-11-15', 150.00, 0.00, 'Pending', 'Monthly Membership - November 2024', '2024-11-01', 'Membership'),
+(4, '2024-11-01', '2024-11-15', 150.00, 0.00, 'Pending', 'Monthly Membership - November 2024', '2024-11-01', 'Membership'),
+(1, '2024-11-05', '2024-11-20', 200.00, 0.00, 'Pending', 'Personal Training Package (4 sessions)', '2024-11-01', 'PT Package'),
+(5, '2024-11-01', '2024-11-15', 150.00, 0.00, 'Pending', 'Monthly Membership - November 2024', '2024-11-01', 'Membership');
 
--- Insert Payments
+-- Insert Payments (the payment trigger settles amount_paid and status)
 INSERT INTO Payment (bill_id, payment_date, amount, payment_method, transaction_reference) VALUES
 (1, '2024-11-02 10:30:00', 150.00, 'Credit Card', 'TXN-2024110201'),
 (2, '2024-11-03 14:20:00', 150.00, 'Debit Card', 'TXN-2024110302'),
@@ -0,0 +1,62 @@
+-- Class templates: adds ClassTemplate, Class.template_id and the
+-- per-statement class booking trigger (see "Class Templates" in
+-- README.md).  DDL.sql creates the same objects for new databases; run
+-- this file once against an existing one:
+--
+--     psql -d fitness_club -f sql/class_templates.sql
+--
+-- Runs in one transaction and is safe to re-run.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS ClassTemplate (
+    template_id SERIAL PRIMARY KEY,
+    class_name VARCHAR(100) NOT NULL,
+    trainer_id INT REFERENCES Trainer(trainer_id) ON DELETE CASCADE,
+    room_id INT REFERENCES Room(room_id) ON DELETE CASCADE,
+    day_of_week VARCHAR(20) NOT NULL,
+    start_time TIME NOT NULL,
+    end_time TIME NOT NULL,
+    capacity INT NOT NULL CHECK (capacity > 0),
+    season_start DATE NOT NULL,
+    season_end DATE NOT NULL,
+    CONSTRAINT valid_template_day CHECK (day_of_week IN ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')),
+    CONSTRAINT valid_template_time CHECK (start_time < end_time),
+    CONSTRAINT valid_season CHECK (season_start <= season_end)
+);
+
+ALTER TABLE Class ADD COLUMN IF NOT EXISTS
+    template_id INT REFERENCES ClassTemplate(template_id) ON DELETE SET NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_class_template_date
+    ON Class(template_id, schedule_date);
+
+-- Class inserts are mirrored into ResourceBooking per statement; updates
+-- stay per row (sync_class_booking)
+CREATE OR REPLACE FUNCTION sync_new_class_bookings()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO ResourceBooking (class_id, trainer_id, room_id, period)
+    SELECT class_id, trainer_id, room_id,
+           tsrange(schedule_date + start_time, schedule_date + end_time)
+    FROM new_classes
+    WHERE status = 'Scheduled';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS class_booking_trigger ON Class;
+CREATE TRIGGER class_booking_trigger
+AFTER UPDATE OF trainer_id, room_id, schedule_date, start_time, end_time, status
+ON Class
+FOR EACH ROW
+EXECUTE FUNCTION sync_class_booking();
+
+DROP TRIGGER IF EXISTS class_booking_insert_trigger ON Class;
+CREATE TRIGGER class_booking_insert_trigger
+AFTER INSERT ON Class
+REFERENCING NEW TABLE AS new_classes
+FOR EACH STATEMENT
+EXECUTE FUNCTION sync_new_class_bookings();
+
+COMMIT;
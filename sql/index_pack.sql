@@ -0,0 +1,44 @@
+-- Index pack: foreign-key and partial indexes matched to the application's
+-- predicates (see "Index Audit" in README.md).  DDL.sql creates the same
+-- indexes for new databases; run this file once against an existing one:
+--
+--     psql -d fitness_club -f sql/index_pack.sql
+--
+-- CONCURRENTLY builds each index without blocking writes, so it cannot
+-- run inside a transaction block.  IF NOT EXISTS makes it safe to re-run;
+-- if a build is interrupted, drop the INVALID index it leaves and re-run.
+
+-- Active goals per member (dashboard, goal-count trigger) and the member
+-- FK's ON DELETE CASCADE
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_goal_member_status
+    ON FitnessGoal(member_id, status);
+
+-- Bill history, newest first, as a keyset range scan (MEMBER_BILLS), and
+-- the member FK; the expression must match the query's sort key exactly
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_bill_member_date
+    ON Bill(member_id, (COALESCE(bill_date, DATE '0001-01-01')), bill_id);
+
+-- Payments per bill: the bill_id FK cascade and the settlement trigger
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_payment_bill
+    ON Payment(bill_id);
+
+-- Roster and enrollment counts per class, and the class FK
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_registration_class_status
+    ON ClassRegistration(class_id, status);
+
+-- Availability lookups during booking and slot finding, and the trainer FK
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_availability_trainer_day
+    ON TrainerAvailability(trainer_id, day_of_week);
+
+-- A trainer's upcoming classes (schedule screen), and the trainer FK
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_class_trainer_date
+    ON Class(trainer_id, schedule_date, start_time);
+
+-- Scheduled PT sessions by day (room schedule, booking checks); completed
+-- and cancelled sessions, most of the table over time, are left out
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_session_day_scheduled
+    ON PersonalTrainingSession(session_date, start_time)
+    WHERE status = 'Scheduled';
+
+ANALYZE FitnessGoal, Bill, Payment, ClassRegistration, TrainerAvailability,
+    Class, PersonalTrainingSession;